@@ -4,7 +4,16 @@ RESPONSABILITE : Configuration admin Django pour les modeles d'absences
 """
 from django.contrib import admin
 
-from .models import Absence, Justification, QRAttendanceToken, QRScanLog, QRScanRecord
+from .models import (
+    Absence,
+    AbsenceDailyFact,
+    EligibilityRecalcJob,
+    InscriptionAbsenceSummary,
+    Justification,
+    QRAttendanceToken,
+    QRScanLog,
+    QRScanRecord,
+)
 
 
 @admin.register(Absence)
@@ -20,6 +29,33 @@ class JustificationAdmin(admin.ModelAdmin):
     list_select_related = ("id_absence",)
 
 
+@admin.register(InscriptionAbsenceSummary)
+class InscriptionAbsenceSummaryAdmin(admin.ModelAdmin):
+    list_display = ("id_inscription", "heures_non_justifiees", "nb_absences",
+                    "derniere_absence", "prochaine_echeance", "date_maj")
+    list_select_related = ("id_inscription",)
+    readonly_fields = [f.name for f in InscriptionAbsenceSummary._meta.fields]
+
+
+@admin.register(AbsenceDailyFact)
+class AbsenceDailyFactAdmin(admin.ModelAdmin):
+    list_display = ("date_seance", "id_cours", "id_annee", "statut", "nb_absences", "heures")
+    list_filter = ("statut", "niveau")
+    list_select_related = ("id_cours", "id_annee")
+    readonly_fields = [f.name for f in AbsenceDailyFact._meta.fields]
+    ordering = ("-date_seance",)
+
+
+@admin.register(EligibilityRecalcJob)
+class EligibilityRecalcJobAdmin(admin.ModelAdmin):
+    list_display = ("id_inscription", "statut", "tentatives", "prochaine_tentative",
+                    "date_demande", "derniere_erreur")
+    list_filter = ("statut",)
+    list_select_related = ("id_inscription",)
+    readonly_fields = [f.name for f in EligibilityRecalcJob._meta.fields]
+    ordering = ("prochaine_tentative",)
+
+
 @admin.register(QRAttendanceToken)
 class QRAttendanceTokenAdmin(admin.ModelAdmin):
     list_display = ("token", "seance", "created_by", "expires_at", "is_active", "verify_location")
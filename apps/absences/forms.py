@@ -9,7 +9,7 @@ DEPENDANCES CLES : apps.absences.models, apps.accounts.models, apps.academics.mo
 from django import forms
 
 from apps.absences.models import Absence
-from apps.academic_sessions.models import AnneeAcademique
+from apps.academic_sessions.active_year import get_active_year
 from apps.academics.models import Cours
 from apps.accounts.models import User
 
@@ -97,7 +97,7 @@ class SecretaryJustifiedAbsenceForm(forms.Form):
         super().__init__(*args, **kwargs)
 
         # Filtrer les cours par année académique active
-        annee_active = AnneeAcademique.objects.filter(active=True).first()
+        annee_active = get_active_year()
         if annee_active:
             self.fields["cours"].queryset = (
                 Cours.objects.filter(id_annee=annee_active)
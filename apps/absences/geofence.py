@@ -0,0 +1,201 @@
+"""
+FICHIER : apps/absences/geofence.py
+RESPONSABILITE : Zones GPS autorisees des campus (academics.Batiment) pour les scans QR
+FONCTIONNALITES PRINCIPALES :
+  - Zone : cercle (centre + rayon) ou polygone [[lat, lng], ...] d'un batiment actif
+  - GeofenceIndex : grille de cellules de GRID_DEGREES -> zones dont l'emprise
+    touche la cellule ; resolve() ne teste que les zones de la cellule du point
+    (ou le seul batiment epingle au cours / a la seance)
+  - get_geofence_index() : index garde en memoire du processus, reconstruit
+    quand la version partagee (cache) change ; invalidate_geofences() est
+    appele par les signaux de Campus / Batiment (absences.signals)
+DEPENDANCES CLES : academics.Batiment, django.core.cache (version partagee)
+"""
+
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+EARTH_RADIUS_METERS = 6_371_000
+METERS_PER_DEGREE = 111_320
+
+# ~1,1 km en latitude : une salle de cours tombe dans une ou deux zones candidates
+GRID_DEGREES = 0.01
+GEOFENCE_VERSION_KEY = "geofence:version"
+# Délai maximal avant qu'un autre processus voie une zone modifiée
+GEOFENCE_RECHECK_SECONDS = 30
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distance en mètres entre deux points GPS."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlam = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+    )
+    return EARTH_RADIUS_METERS * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+@dataclass(frozen=True)
+class Zone:
+    id: int
+    name: str
+    latitude: float
+    longitude: float
+    radius: int
+    polygon: tuple = ()
+
+    @property
+    def bounds(self):
+        """Emprise (min_lat, min_lng, max_lat, max_lng)."""
+        if self.polygon:
+            lats = [p[0] for p in self.polygon]
+            lngs = [p[1] for p in self.polygon]
+            return min(lats), min(lngs), max(lats), max(lngs)
+        dlat = self.radius / METERS_PER_DEGREE
+        dlng = self.radius / (
+            METERS_PER_DEGREE * max(math.cos(math.radians(self.latitude)), 0.01)
+        )
+        return (
+            self.latitude - dlat,
+            self.longitude - dlng,
+            self.latitude + dlat,
+            self.longitude + dlng,
+        )
+
+    def distance(self, lat, lng):
+        """Distance au centre de la zone (mètres)."""
+        return haversine(self.latitude, self.longitude, lat, lng)
+
+    def contains(self, lat, lng, distance=None):
+        if self.polygon:
+            return _in_polygon(lat, lng, self.polygon)
+        if distance is None:
+            distance = self.distance(lat, lng)
+        return distance <= self.radius
+
+
+def _in_polygon(lat, lng, polygon):
+    """Lancer de rayon (plan lat/lng, suffisant à l'échelle d'un bâtiment)."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            crossing = lng_i + (lat - lat_i) * (lng_j - lng_i) / (lat_j - lat_i)
+            if lng < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+def _cell(lat, lng):
+    return math.floor(lat / GRID_DEGREES), math.floor(lng / GRID_DEGREES)
+
+
+class GeofenceIndex:
+    """Zones indexées par cellule de grille : la résolution d'un point est O(1)."""
+
+    def __init__(self, zones):
+        self.zones = {zone.id: zone for zone in zones}
+        self.cells = defaultdict(list)
+        for zone in self.zones.values():
+            min_lat, min_lng, max_lat, max_lng = zone.bounds
+            lo_i, lo_j = _cell(min_lat, min_lng)
+            hi_i, hi_j = _cell(max_lat, max_lng)
+            for i in range(lo_i, hi_i + 1):
+                for j in range(lo_j, hi_j + 1):
+                    self.cells[(i, j)].append(zone)
+
+    def __bool__(self):
+        return bool(self.zones)
+
+    def resolve(self, lat, lng, zone_id=None):
+        """
+        Zone autorisée contenant le point.
+
+        Args:
+            zone_id: bâtiment épinglé au cours ou à la séance : seule zone acceptée.
+
+        Returns:
+            (zone, distance, inside) : la zone retenue (ou la plus proche si le
+            point n'est dans aucune), la distance à son centre et l'appartenance.
+            (None, None, False) si aucune zone n'est définie.
+        """
+        pinned = self.zones.get(zone_id) if zone_id is not None else None
+        if pinned is not None:
+            distance = pinned.distance(lat, lng)
+            return pinned, distance, pinned.contains(lat, lng, distance)
+
+        best = None
+        for zone in self.cells.get(_cell(lat, lng), ()):
+            distance = zone.distance(lat, lng)
+            if zone.contains(lat, lng, distance) and (
+                best is None or distance < best[1]
+            ):
+                best = (zone, distance)
+        if best is not None:
+            return best[0], best[1], True
+
+        # Refus : la zone la plus proche sert au message (parcours complet, hors chemin nominal)
+        nearest = min(
+            ((zone, zone.distance(lat, lng)) for zone in self.zones.values()),
+            key=lambda item: item[1],
+            default=(None, None),
+        )
+        return nearest[0], nearest[1], False
+
+
+def load_zones():
+    from apps.academics.models import Batiment
+
+    return [
+        Zone(
+            id=b.id_batiment,
+            name=str(b),
+            latitude=b.latitude,
+            longitude=b.longitude,
+            radius=b.rayon_metres,
+            polygon=tuple(tuple(point) for point in (b.polygone or [])),
+        )
+        for b in Batiment.objects.filter(
+            actif=True, id_campus__actif=True
+        ).select_related("id_campus")
+    ]
+
+
+_index = None
+_index_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_geofence_index():
+    """Index des zones du processus, reconstruit si la version partagée a changé."""
+    global _index, _index_version, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < GEOFENCE_RECHECK_SECONDS:
+        return _index
+    with _lock:
+        version = cache.get(GEOFENCE_VERSION_KEY)
+        if _index is None or version != _index_version:
+            _index = GeofenceIndex(load_zones())
+            _index_version = version
+        _checked_at = now
+        return _index
+
+
+def invalidate_geofences():
+    """Zones modifiées : nouvelle version partagée, index local reconstruit au prochain scan."""
+    global _index
+    cache.set(GEOFENCE_VERSION_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _index = None
@@ -0,0 +1,194 @@
+"""
+FICHIER : apps/absences/live_feed.py
+RESPONSABILITE : Flux temps reel des scans QR pour le dashboard professeur
+FONCTIONNALITES PRINCIPALES :
+  - publish_scan_event() : publie un scan valide (apres commit) sur le canal
+    Redis pub/sub de la seance
+  - stream_scan_events() : generateur asynchrone Server-Sent Events consomme
+    par la vue qr_live_feed (servie par config/asgi.py)
+  - Repli en memoire (un seul processus) quand Redis n'est pas configure (dev, tests)
+DEPENDANCES CLES : redis (pub/sub, client asyncio), django_redis
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Message SSE envoyé à chaque (re)connexion : le client recharge une fois la
+# liste complète, les événements perdus pendant une coupure sont ainsi rattrapés.
+SSE_SYNC = "retry: 3000\nevent: sync\ndata: {}\n\n"
+SSE_KEEPALIVE = ": keepalive\n\n"
+
+
+def scan_channel(seance_id):
+    return f"unabsences:qr-scans:{seance_id}"
+
+
+def _redis_url():
+    """URL Redis du cache partagé, ou None (cache local : repli en mémoire)."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if not backend.startswith("django_redis"):
+        return None
+    return (
+        getattr(settings, "REDIS_URL", None) or settings.CACHES["default"]["LOCATION"]
+    )
+
+
+# ========================================================================== #
+#                    REPLI EN MEMOIRE (SANS REDIS)                            #
+# ========================================================================== #
+
+
+class _LocalBroker:
+    """Pub/sub en mémoire : abonnés du processus courant uniquement."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                # Boucle fermée : l'abonné est parti
+                pass
+
+    def subscribe(self, channel):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            self._subscribers[channel].discard(subscriber)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+
+_local_broker = _LocalBroker()
+
+
+# ========================================================================== #
+#                    PUBLICATION                                             #
+# ========================================================================== #
+
+
+def scan_event_payload(record, student_name):
+    """Contenu d'un événement « scan » : uniquement ce que le dashboard affiche."""
+    return {
+        "inscription": record.inscription_id,
+        "student": student_name,
+        "scanned_at": record.scanned_at.isoformat() if record.scanned_at else None,
+        "is_suspicious": bool(record.is_suspicious),
+        "distance": (
+            float(record.distance_meters)
+            if record.distance_meters is not None
+            else None
+        ),
+    }
+
+
+def publish_scan_event(seance_id, payload):
+    """
+    Publie un scan sur le canal de la séance. Never raises.
+
+    À appeler après commit (transaction.on_commit) : un scan annulé n'est
+    jamais annoncé au dashboard.
+    """
+    message = json.dumps(payload)
+    channel = scan_channel(seance_id)
+    if _redis_url() is None:
+        _local_broker.publish(channel, message)
+        return
+    try:
+        from django_redis import get_redis_connection
+
+        get_redis_connection("default").publish(channel, message)
+    except Exception:
+        logger.exception("Failed to publish QR scan event on %s", channel)
+
+
+# ========================================================================== #
+#                    ABONNEMENT (SSE)                                        #
+# ========================================================================== #
+
+
+async def stream_scan_events(seance_id, max_seconds=None, heartbeat=None):
+    """
+    Générateur asynchrone de messages SSE pour une séance.
+
+    Envoie ``sync`` à la connexion, puis un événement ``scan`` par scan publié
+    et un commentaire keepalive toutes les ``heartbeat`` secondes. La connexion
+    est fermée après ``max_seconds`` ; EventSource se reconnecte seul.
+    """
+    if max_seconds is None:
+        max_seconds = getattr(settings, "QR_LIVE_FEED_MAX_SECONDS", 300)
+    if heartbeat is None:
+        heartbeat = getattr(settings, "QR_LIVE_FEED_HEARTBEAT_SECONDS", 15)
+    channel = scan_channel(seance_id)
+    deadline = time.monotonic() + max_seconds
+
+    redis_url = _redis_url()
+    if redis_url is None:
+        subscriber = _local_broker.subscribe(channel)
+        queue = subscriber[1]
+
+        async def next_message(timeout):
+            try:
+                return await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        async def close():
+            _local_broker.unsubscribe(channel, subscriber)
+
+    else:
+        import redis.asyncio as aioredis
+
+        client = aioredis.from_url(redis_url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+
+        async def next_message(timeout):
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=timeout
+            )
+            if message is None:
+                return None
+            data = message["data"]
+            return data.decode() if isinstance(data, bytes) else data
+
+        async def close():
+            try:
+                await pubsub.unsubscribe(channel)
+                await pubsub.aclose()
+                await client.aclose()
+            except Exception:
+                logger.debug(
+                    "Error while closing QR live feed subscription", exc_info=True
+                )
+
+    try:
+        yield SSE_SYNC
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            message = await next_message(min(heartbeat, remaining))
+            if message is None:
+                yield SSE_KEEPALIVE
+            else:
+                yield f"event: scan\ndata: {message}\n\n"
+    finally:
+        await close()
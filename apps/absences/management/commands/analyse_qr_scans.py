@@ -0,0 +1,68 @@
+"""
+Management command: batch GPS / device anomaly analysis of QR scans.
+
+Usage:
+    python manage.py analyse_qr_scans                         # yesterday and today
+    python manage.py analyse_qr_scans --seance 1234
+    python manage.py analyse_qr_scans --date 2026-10-16
+    python manage.py analyse_qr_scans --since-days 120        # a whole semester
+
+Recomputes QRScanRecord.anomaly_flags (see apps.absences.scan_anomalies):
+identical or implausibly close positions, one device or IP shared by
+several students, scans far from the rest of the class. Flags are shown on
+the QR dashboard. Intended for a nightly cron; qr_finalize and the
+dashboard analyse their own séance.
+"""
+
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.absences.scan_anomalies import analyse_seances
+from apps.academic_sessions.models import Seance
+
+
+class Command(BaseCommand):
+    help = "Flag anomalous QR scans (shared positions, devices, IPs, outliers)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seance", type=int, default=None, help="Analyse one séance."
+        )
+        parser.add_argument(
+            "--date",
+            type=str,
+            default=None,
+            help="Analyse the séances of one day (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--since-days",
+            type=int,
+            default=1,
+            help="Analyse the séances of the last N days (default: 1).",
+        )
+
+    def handle(self, *args, **options):
+        if options["seance"] is not None:
+            seances = Seance.objects.filter(id_seance=options["seance"])
+        elif options["date"]:
+            try:
+                day = date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD.")
+            seances = Seance.objects.filter(date_seance=day)
+        else:
+            since = timezone.localdate() - timedelta(days=max(options["since_days"], 0))
+            seances = Seance.objects.filter(date_seance__gte=since)
+
+        started = time.monotonic()
+        stats = analyse_seances(seances)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Analysed {stats['scans']} scans in {stats['seances']} séances "
+                f"in {elapsed:.2f}s: {stats['flagged']} flagged, {stats['updated']} updated."
+            )
+        )
@@ -1,6 +1,17 @@
 """
 Management command to purge old QRScanLog entries.
 Intended for cron / scheduled execution to prevent unbounded table growth.
+
+On PostgreSQL, qr_scan_log is partitioned by month (migration 0025): the
+command creates the partitions of the coming months and drops the months
+that are entirely past the retention window (DROP TABLE, no row scan). The
+rows left in the partially expired month, and every expired row on other
+databases (SQLite in development), are deleted in bounded primary key
+batches.
+
+Usage:
+    python manage.py cleanup_qr_logs                    # 90 days, 3 months ahead
+    python manage.py cleanup_qr_logs --days 30 --batch-size 1000
 """
 
 from datetime import timedelta
@@ -8,7 +19,12 @@ from datetime import timedelta
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
-from apps.absences.models import QRScanLog
+from apps.absences.partitions import (
+    delete_expired_in_batches,
+    drop_expired_partitions,
+    ensure_partitions,
+    is_partitioned,
+)
 
 
 class Command(BaseCommand):
@@ -21,9 +37,34 @@ class Command(BaseCommand):
             default=90,
             help="Delete logs older than this many days (default: 90).",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Primary key range deleted per statement (default: 5000).",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Monthly partitions created in advance, PostgreSQL only (default: 3).",
+        )
 
     def handle(self, *args, **options):
         days = options["days"]
-        cutoff = timezone.now() - timedelta(days=days)
-        deleted, _ = QRScanLog.objects.filter(timestamp__lt=cutoff).delete()
+        now = timezone.now()
+        cutoff = now - timedelta(days=days)
+
+        if is_partitioned():
+            for name in ensure_partitions(now, months_ahead=max(options["months_ahead"], 0)):
+                self.stdout.write(f"Created partition {name}.")
+            for name in drop_expired_partitions(cutoff):
+                self.stdout.write(f"Dropped partition {name}.")
+
+        def progress(total, last_pk):
+            self.stdout.write(f"  {total} entries deleted (up to id {last_pk})")
+
+        deleted = delete_expired_in_batches(
+            cutoff, batch_size=max(options["batch_size"], 1), progress=progress
+        )
         self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} QRScanLog entries older than {days} days."))
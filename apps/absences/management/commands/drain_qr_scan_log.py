@@ -0,0 +1,105 @@
+"""
+Management command: drain the shared QR scan log queue (QR_SCAN_LOG_SINK=redis).
+
+Usage:
+    python manage.py drain_qr_scan_log           # long-running drainer
+    python manage.py drain_qr_scan_log --once    # drain the queue, then exit
+    python manage.py drain_qr_scan_log --stats   # print pending/dropped counts, then exit
+
+Run as the docker-compose "scanlog" service when QR_SCAN_LOG_SINK=redis.
+Several drainers may run side by side: batches are popped atomically.
+On SIGTERM/SIGINT the queue is drained one last time before exiting.
+"""
+
+import json
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from apps.absences.scan_log import drain_scan_log_queue, scan_log_stats
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Write buffered QR scan attempts (QRScanLog) from the Redis queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of log entries inserted per batch (default: 500).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.5,
+            help="Seconds to wait when the queue is empty (default: 0.5).",
+        )
+        parser.add_argument(
+            "--metrics-interval",
+            type=float,
+            default=60.0,
+            help="Seconds between queue metrics log lines (default: 60).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain every queued entry, then exit.",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print queue metrics as JSON and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(scan_log_stats()))
+            return
+        if getattr(settings, "QR_SCAN_LOG_SINK", "sync") != "redis":
+            raise CommandError("QR_SCAN_LOG_SINK is not 'redis': nothing to drain.")
+
+        batch_size = max(1, options["batch_size"])
+        self._stopping = False
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._request_stop)
+            signal.signal(signal.SIGINT, self._request_stop)
+
+        written = 0
+        last_metrics = 0.0
+        while True:
+            close_old_connections()
+            try:
+                count = drain_scan_log_queue(batch_size)
+            except Exception:
+                logger.exception("Failed to drain QR scan log queue")
+                count = 0
+                if self._stopping or options["once"]:
+                    break
+                time.sleep(options["sleep"])
+            written += count
+
+            now = time.monotonic()
+            if (
+                not options["once"]
+                and now - last_metrics >= options["metrics_interval"]
+            ):
+                logger.info("QR scan log queue: %s", scan_log_stats())
+                last_metrics = now
+
+            if not count:
+                # Arrêt demandé : on ne sort qu'une fois la file vide
+                if options["once"] or self._stopping:
+                    break
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} QR scan log entries."))
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
@@ -0,0 +1,481 @@
+"""
+Management command: QR scan burst load test.
+
+Usage:
+    python manage.py loadtest_qr_scan                          # 200 students, 50 concurrent scans
+    python manage.py loadtest_qr_scan --students 500 --concurrency 100 --output qr-500.json
+    python manage.py loadtest_qr_scan --base-url http://127.0.0.1:8000   # runserver / gunicorn
+
+Seeds a throw-away course of --students enrolled students (active academic
+year required), opens a QR session through qr_generate, lets every student
+open the confirmation page, then fires all the qr_scan POSTs at once from
+--concurrency threads. Only the POSTs are timed.
+
+In-process mode goes through Django's test client (one DB connection per
+thread, queries counted per scan). With --base-url the POSTs go over HTTP to
+a running server sharing this database; per-scan query counts are then not
+available. On PostgreSQL a monitor thread samples pg_stat_activity during the
+burst to report lock waits.
+
+The report (throughput, p50/p95/p99 latency, queries per scan, lock waits,
+scan results) is printed and written as JSON with --output, to be compared
+between releases. The seeded data is deleted afterwards unless --keep.
+The QR token must outlive the burst: raise qr_token_duration_seconds or use
+QR_STATELESS_CODES for large runs.
+"""
+
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.absences.models import QRAttendanceToken, QRScanLog, QRScanRecord
+from apps.absences.qr_codes import current_window, stateless_codes_enabled, window_code
+from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.academics.models import Cours, Departement, Faculte
+from apps.accounts.models import User
+from apps.enrollments.models import Inscription
+
+CSRF_INPUT_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+# Attente de verrou vue par PostgreSQL pendant la rafale (hors moniteur)
+LOCK_WAITERS_SQL = """
+    SELECT count(*) FROM pg_stat_activity
+    WHERE datname = current_database()
+      AND wait_event_type = 'Lock'
+      AND pid <> pg_backend_pid()
+"""
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = "Load-test QR attendance: N students scanning one QR code concurrently."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--students",
+            type=int,
+            default=200,
+            help="Number of seeded students, one scan each (default: 200).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=50,
+            help="Number of scans in flight at once (default: 50).",
+        )
+        parser.add_argument(
+            "--base-url",
+            type=str,
+            default=None,
+            help="Send the scans over HTTP to a running server (e.g. http://127.0.0.1:8000) "
+            "instead of the in-process test client.",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            default=None,
+            help="Write the JSON report to this file.",
+        )
+        parser.add_argument(
+            "--label",
+            type=str,
+            default="",
+            help="Free-form label stored in the report (release, branch...).",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30.0,
+            help="HTTP timeout per request in seconds, --base-url only (default: 30).",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the seeded course, students and scans after the run.",
+        )
+
+    def handle(self, *args, **opts):
+        nb_students = opts["students"]
+        concurrency = opts["concurrency"]
+        if nb_students < 1 or concurrency < 1:
+            raise CommandError("--students and --concurrency must be positive.")
+
+        year = AnneeAcademique.objects.filter(active=True).first()
+        if year is None:
+            raise CommandError(
+                "No active academic year found. Run 'python manage.py seed_demo' first."
+            )
+
+        tag = uuid.uuid4().hex[:8]
+        self.stdout.write(f"Seeding course LT-{tag} with {nb_students} students...")
+        seeded = self._seed(tag, year, nb_students)
+        try:
+            report = self._run(seeded, opts)
+        finally:
+            if not opts["keep"]:
+                self._cleanup(seeded)
+
+        payload = json.dumps(report, indent=2, default=str)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                fh.write(payload + "\n")
+            self.stdout.write(f"Report written to {opts['output']}")
+        self.stdout.write(payload)
+
+    # ------------------------------------------------------------------ #
+    #  Seed / cleanup
+    # ------------------------------------------------------------------ #
+
+    def _seed(self, tag, year, nb_students):
+        with transaction.atomic():
+            faculte = Faculte.objects.create(nom_faculte=f"Load test {tag}")
+            departement = Departement.objects.create(
+                nom_departement=f"Load test {tag}", id_faculte=faculte
+            )
+            prof = User.objects.create_user(
+                email=f"loadtest_prof_{tag}@loadtest.local",
+                nom="Loadtest",
+                prenom="Prof",
+                password=uuid.uuid4().hex,
+                role=User.Role.PROFESSEUR,
+            )
+            course = Cours.objects.create(
+                code_cours=f"LT-{tag}",
+                nom_cours=f"Load test {tag}",
+                id_departement=departement,
+                professeur=prof,
+                nombre_total_periodes=30,
+                niveau=1,
+                id_annee=year,
+            )
+            # Un seul hachage de mot de passe : les étudiants sont connectés par session
+            password = make_password(None)
+            User.objects.bulk_create(
+                [
+                    User(
+                        email=f"loadtest_etu{i:05d}_{tag}@loadtest.local",
+                        nom="Loadtest",
+                        prenom=f"Etu{i:05d}",
+                        password=password,
+                        role=User.Role.ETUDIANT,
+                        niveau=1,
+                    )
+                    for i in range(nb_students)
+                ],
+                batch_size=500,
+            )
+            students = list(
+                User.objects.filter(
+                    email__endswith=f"_{tag}@loadtest.local", role=User.Role.ETUDIANT
+                )
+            )
+            Inscription.objects.bulk_create(
+                [
+                    Inscription(
+                        id_etudiant=student,
+                        id_cours=course,
+                        id_annee=year,
+                        status=Inscription.Status.EN_COURS,
+                    )
+                    for student in students
+                ],
+                batch_size=500,
+            )
+        return {
+            "tag": tag,
+            "faculte": faculte,
+            "departement": departement,
+            "prof": prof,
+            "course": course,
+            "students": students,
+        }
+
+    def _cleanup(self, seeded):
+        course = seeded["course"]
+        users = [seeded["prof"], *seeded["students"]]
+        try:
+            with transaction.atomic():
+                seances = Seance.objects.filter(id_cours=course)
+                QRScanLog.objects.filter(seance__in=seances).delete()
+                QRScanRecord.objects.filter(seance__in=seances).delete()
+                QRAttendanceToken.objects.filter(seance__in=seances).delete()
+                seances.delete()
+                Inscription.objects.filter(id_cours=course).delete()
+                course.delete()
+                User.objects.filter(pk__in=[u.pk for u in users]).delete()
+                seeded["departement"].delete()
+                seeded["faculte"].delete()
+        except Exception as exc:
+            self.stderr.write(
+                f"Cleanup of LT-{seeded['tag']} failed ({exc}); remove it manually."
+            )
+
+    # ------------------------------------------------------------------ #
+    #  Run
+    # ------------------------------------------------------------------ #
+
+    def _host(self):
+        host = next((h for h in settings.ALLOWED_HOSTS if h != "*"), "localhost")
+        return host.lstrip(".")
+
+    def _client(self, user):
+        client = Client(HTTP_HOST=self._host())
+        client.force_login(user)
+        return client
+
+    def _open_session(self, seeded):
+        """Open the QR session through qr_generate, as the professor would."""
+        prof_client = self._client(seeded["prof"])
+        now = timezone.localtime()
+        response = prof_client.post(
+            reverse(
+                "absences:qr_generate", kwargs={"course_id": seeded["course"].id_cours}
+            ),
+            {
+                "date_seance": now.date().isoformat(),
+                "heure_debut": now.strftime("%H:%M"),
+                "heure_fin": (now + timedelta(hours=2)).strftime("%H:%M"),
+            },
+            secure=True,
+        )
+        token = (
+            QRAttendanceToken.objects.filter(
+                seance__id_cours=seeded["course"], is_active=True
+            )
+            .order_by("-created_at")
+            .first()
+        )
+        if response.status_code != 302 or token is None:
+            raise CommandError(
+                f"qr_generate did not open a session (HTTP {response.status_code})."
+            )
+        return token
+
+    def _scan_path(self, token):
+        if stateless_codes_enabled():
+            window = current_window()
+            return reverse(
+                "absences:qr_scan_code",
+                kwargs={
+                    "seance_id": token.seance_id,
+                    "window": window,
+                    "code": window_code(token.pk, token.seance_id, window),
+                },
+            )
+        return reverse("absences:qr_scan", kwargs={"token": str(token.token)})
+
+    def _run(self, seeded, opts):
+        started_at = timezone.now()
+        token = self._open_session(seeded)
+        path = self._scan_path(token)
+        base_url = (opts["base_url"] or "").rstrip("/")
+
+        self.stdout.write("Logging students in and opening the confirmation page...")
+        if base_url:
+            scanners = [
+                self._http_scanner(student, base_url, path, opts["timeout"])
+                for student in seeded["students"]
+            ]
+        else:
+            scanners = [
+                self._local_scanner(student, path) for student in seeded["students"]
+            ]
+
+        self.stdout.write(
+            f"Firing {len(scanners)} scans, {opts['concurrency']} at a time..."
+        )
+        results, duration, locks = self._burst(scanners, opts["concurrency"])
+
+        latencies = [r["latency_ms"] for r in results if r["latency_ms"] is not None]
+        queries = [r["queries"] for r in results if r["queries"] is not None]
+        statuses = Counter(str(r["status"]) for r in results)
+        scan_results = dict(
+            QRScanLog.objects.filter(seance_id=token.seance_id)
+            .values_list("scan_result")
+            .annotate(n=Count("pk"))
+        )
+
+        return {
+            "label": opts["label"],
+            "started_at": started_at.isoformat(),
+            "mode": "http" if base_url else "in-process",
+            "target": base_url or None,
+            "database": connection.vendor,
+            "settings": {
+                "QR_SCAN_LOG_SINK": getattr(settings, "QR_SCAN_LOG_SINK", "sync"),
+                "QR_STATELESS_CODES": stateless_codes_enabled(),
+                "CACHE_BACKEND": settings.CACHES["default"]["BACKEND"],
+            },
+            "students": len(seeded["students"]),
+            "concurrency": opts["concurrency"],
+            "scans": len(results),
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(results) / duration, 1) if duration else None,
+            "latency_ms": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": max(latencies, default=None),
+                "mean": (
+                    round(sum(latencies) / len(latencies), 2) if latencies else None
+                ),
+            },
+            "queries_per_scan": {
+                "mean": round(sum(queries) / len(queries), 2) if queries else None,
+                "p95": percentile(queries, 95),
+                "max": max(queries, default=None),
+            },
+            "lock_waits": locks,
+            "http_status": dict(statuses),
+            "errors": [r["error"] for r in results if r["error"]][:20],
+            # Journal différé (QR_SCAN_LOG_SINK memory/redis) : peut être incomplet
+            "scan_results": scan_results,
+            "scan_records": QRScanRecord.objects.filter(
+                seance_id=token.seance_id
+            ).count(),
+        }
+
+    def _local_scanner(self, student, path):
+        client = self._client(student)
+        client.get(path, secure=True)
+
+        def scan():
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.post(
+                    path, {"gps_status": "not_required"}, secure=True
+                )
+            return response.status_code, len(ctx.captured_queries)
+
+        return scan
+
+    def _http_scanner(self, student, base_url, path, timeout):
+        import requests
+
+        # Session Django créée localement (même base), cookie réutilisé en HTTP
+        session_cookie = (
+            self._client(student).cookies[settings.SESSION_COOKIE_NAME].value
+        )
+        http = requests.Session()
+        http.cookies.set(settings.SESSION_COOKIE_NAME, session_cookie)
+        url = base_url + path
+        page = http.get(url, timeout=timeout)
+        match = CSRF_INPUT_RE.search(page.text)
+        csrf = match.group(1) if match else ""
+
+        def scan():
+            response = http.post(
+                url,
+                data={"gps_status": "not_required", "csrfmiddlewaretoken": csrf},
+                headers={"Referer": url},
+                timeout=timeout,
+                allow_redirects=False,
+            )
+            return response.status_code, None
+
+        return scan
+
+    def _burst(self, scanners, concurrency):
+        pending = list(reversed(scanners))
+        pending_lock = threading.Lock()
+        results = []
+        start = threading.Event()
+
+        def worker():
+            start.wait()
+            try:
+                while True:
+                    with pending_lock:
+                        if not pending:
+                            return
+                        scan = pending.pop()
+                    t0 = time.perf_counter()
+                    try:
+                        status, nb_queries = scan()
+                        error = None
+                    except Exception as exc:
+                        status, nb_queries, error = "exception", None, repr(exc)
+                    results.append(
+                        {
+                            "status": status,
+                            "latency_ms": round((time.perf_counter() - t0) * 1000, 2),
+                            "queries": nb_queries,
+                            "error": error,
+                        }
+                    )
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker)
+            for _ in range(min(concurrency, len(scanners)))
+        ]
+        for thread in threads:
+            thread.start()
+
+        monitor = _LockMonitor() if connection.vendor == "postgresql" else None
+        if monitor:
+            monitor.start()
+        t0 = time.perf_counter()
+        start.set()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - t0
+        locks = monitor.stop() if monitor else {"supported": False}
+        return results, duration, locks
+
+
+class _LockMonitor(threading.Thread):
+    """Samples PostgreSQL backends waiting on a lock every ``interval`` seconds."""
+
+    def __init__(self, interval=0.02):
+        super().__init__(name="qr-loadtest-lock-monitor", daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._stop.is_set():
+                    cursor.execute(LOCK_WAITERS_SQL)
+                    self.samples.append(cursor.fetchone()[0])
+                    self._stop.wait(self.interval)
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self._stop.set()
+        self.join()
+        waiting = [n for n in self.samples if n]
+        return {
+            "supported": True,
+            "samples": len(self.samples),
+            "samples_with_waiters": len(waiting),
+            "max_waiters": max(self.samples, default=0),
+            "mean_waiters": (
+                round(sum(self.samples) / len(self.samples), 3) if self.samples else 0
+            ),
+        }
@@ -0,0 +1,99 @@
+"""
+Management command: drain the eligibility recalculation queue (EligibilityRecalcJob).
+
+Usage:
+    python manage.py process_eligibility_queue           # long-running worker
+    python manage.py process_eligibility_queue --once    # drain ready jobs, then exit
+    python manage.py process_eligibility_queue --stats   # print queue depth, then exit
+
+Run as the docker-compose "worker" service when ELIGIBILITY_RECALC_ASYNC=True.
+Several workers may run side by side: jobs are claimed with SKIP LOCKED.
+"""
+
+import json
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.absences.services import eligibility_queue_depth, process_eligibility_queue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Process pending eligibility recalculations (EligibilityRecalcJob)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of inscriptions recomputed per batch (default: 200).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when the queue is empty (default: 2).",
+        )
+        parser.add_argument(
+            "--metrics-interval",
+            type=float,
+            default=60.0,
+            help="Seconds between queue depth log lines (default: 60).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process every ready job, then exit.",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print queue depth as JSON and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(eligibility_queue_depth()))
+            return
+
+        batch_size = max(1, options["batch_size"])
+        self._stopping = False
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._request_stop)
+            signal.signal(signal.SIGINT, self._request_stop)
+
+        totals = {"processed": 0, "retried": 0, "failed": 0}
+        last_metrics = 0.0
+        while not self._stopping:
+            close_old_connections()
+            result = process_eligibility_queue(batch_size=batch_size)
+            for key in totals:
+                totals[key] += result[key]
+
+            now = time.monotonic()
+            if (
+                not options["once"]
+                and now - last_metrics >= options["metrics_interval"]
+            ):
+                logger.info("Eligibility queue depth: %s", eligibility_queue_depth())
+                last_metrics = now
+
+            if not any(result.values()):
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {totals['processed']} eligibility recalculations "
+                f"({totals['retried']} rescheduled, {totals['failed']} failed)."
+            )
+        )
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
@@ -0,0 +1,64 @@
+"""
+Management command to rebuild AbsenceDailyFact from the absence table.
+
+Run once after deploying the fact table, after a bulk import or a manual SQL
+fix; the signals keep it current afterwards. Recomputes one batch of
+(course, academic year) pairs per transaction.
+
+Usage:
+    python manage.py rebuild_absence_facts
+    python manage.py rebuild_absence_facts --year 3 --batch-size 20
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.absences.models import Absence, AbsenceDailyFact
+from apps.absences.services import refresh_absence_facts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily absence facts (AbsenceDailyFact) used by the admin statistics."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--year",
+            type=int,
+            default=None,
+            help="Only rebuild the facts of this academic year (id_annee).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Number of (course, year) pairs recomputed per transaction (default: 50).",
+        )
+
+    def handle(self, *args, **options):
+        absences = Absence.objects.order_by()
+        facts = AbsenceDailyFact.objects.order_by()
+        if options["year"] is not None:
+            absences = absences.filter(id_inscription__id_annee=options["year"])
+            facts = facts.filter(id_annee=options["year"])
+
+        # Pairs with absences, plus existing facts that may now be orphaned
+        courses = sorted(
+            set(
+                absences.values_list(
+                    "id_inscription__id_cours", "id_inscription__id_annee"
+                ).distinct()
+            )
+            | set(facts.values_list("id_cours", "id_annee").distinct())
+        )
+
+        batch_size = max(1, options["batch_size"])
+        written = 0
+        for start in range(0, len(courses), batch_size):
+            with transaction.atomic():
+                written += refresh_absence_facts(courses[start : start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {written} absence facts for {len(courses)} course/year pairs."
+            )
+        )
@@ -0,0 +1,65 @@
+"""
+Management command to rebuild InscriptionAbsenceSummary from the absence table.
+
+Run once after a bulk import or a manual SQL fix; with --stale-only it only
+refreshes summaries whose future seance has now passed (cheap, cron-friendly).
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.absences.models import Absence, InscriptionAbsenceSummary
+from apps.absences.services import (
+    refresh_absence_summaries,
+    refresh_stale_absence_summaries,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-inscription absence summaries (InscriptionAbsenceSummary)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale-only",
+            action="store_true",
+            help="Only refresh summaries whose next future seance date has passed.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of inscriptions recomputed per transaction (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        if options["stale_only"]:
+            refreshed = refresh_stale_absence_summaries()
+            self.stdout.write(
+                self.style.SUCCESS(f"Refreshed {refreshed} stale absence summaries.")
+            )
+            return
+
+        batch_size = max(1, options["batch_size"])
+        # Inscriptions with absences, plus existing rows that may now be orphaned
+        inscription_ids = sorted(
+            set(
+                Absence.objects.order_by()
+                .values_list("id_inscription", flat=True)
+                .distinct()
+            )
+            | set(
+                InscriptionAbsenceSummary.objects.values_list(
+                    "id_inscription", flat=True
+                )
+            )
+        )
+
+        for start in range(0, len(inscription_ids), batch_size):
+            with transaction.atomic():
+                refresh_absence_summaries(inscription_ids[start : start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt absence summaries for {len(inscription_ids)} inscriptions."
+            )
+        )
@@ -0,0 +1,144 @@
+"""
+Migration: Resume d'absences materialise par inscription.
+
+Schema change:
+- Cree la table inscription_absence_summary (une ligne par inscription ayant des absences)
+
+Data migration:
+- Remplit la table depuis les absences existantes (meme agregation que
+  apps.absences.services.refresh_absence_summaries)
+"""
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def populate_summaries(apps, schema_editor):
+    Absence = apps.get_model("absences", "Absence")
+    InscriptionAbsenceSummary = apps.get_model("absences", "InscriptionAbsenceSummary")
+
+    today = timezone.localdate()
+    past = Q(id_seance__date_seance__lte=today)
+    non_justifiee = Q(statut="NON_JUSTIFIEE")
+
+    rows = (
+        Absence.objects.values("id_inscription")
+        .annotate(
+            heures_non_justifiees=Sum("duree_absence", filter=non_justifiee & past),
+            heures_en_attente=Sum("duree_absence", filter=Q(statut="EN_ATTENTE")),
+            heures_justifiees=Sum("duree_absence", filter=Q(statut="JUSTIFIEE")),
+            nb_absences=Count("id_absence"),
+            nb_non_justifiees=Count("id_absence", filter=non_justifiee & past),
+            nb_en_attente=Count("id_absence", filter=Q(statut="EN_ATTENTE")),
+            nb_justifiees=Count("id_absence", filter=Q(statut="JUSTIFIEE")),
+            derniere_absence=Max("id_seance__date_seance", filter=past),
+            prochaine_echeance=Min(
+                "id_seance__date_seance", filter=non_justifiee & ~past
+            ),
+        )
+        .order_by()
+    )
+
+    batch = []
+    for row in rows.iterator():
+        batch.append(
+            InscriptionAbsenceSummary(
+                id_inscription_id=row["id_inscription"],
+                heures_non_justifiees=row["heures_non_justifiees"] or 0,
+                heures_en_attente=row["heures_en_attente"] or 0,
+                heures_justifiees=row["heures_justifiees"] or 0,
+                nb_absences=row["nb_absences"],
+                nb_non_justifiees=row["nb_non_justifiees"],
+                nb_en_attente=row["nb_en_attente"],
+                nb_justifiees=row["nb_justifiees"],
+                derniere_absence=row["derniere_absence"],
+                prochaine_echeance=row["prochaine_echeance"],
+            )
+        )
+        if len(batch) >= BATCH_SIZE:
+            InscriptionAbsenceSummary.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        InscriptionAbsenceSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("absences", "0020_audit_pre_production_fixes"),
+        ("enrollments", "0006_audit_pre_production_fixes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InscriptionAbsenceSummary",
+            fields=[
+                (
+                    "id_inscription",
+                    models.OneToOneField(
+                        db_column="id_inscription",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="absence_summary",
+                        serialize=False,
+                        to="enrollments.inscription",
+                        verbose_name="Inscription",
+                    ),
+                ),
+                (
+                    "heures_non_justifiees",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Somme des absences NON_JUSTIFIEE pour les séances passées",
+                        max_digits=8,
+                        verbose_name="Heures non justifiées",
+                    ),
+                ),
+                (
+                    "heures_en_attente",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=8,
+                        verbose_name="Heures en attente",
+                    ),
+                ),
+                (
+                    "heures_justifiees",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=8,
+                        verbose_name="Heures justifiées",
+                    ),
+                ),
+                ("nb_absences", models.PositiveIntegerField(default=0)),
+                ("nb_non_justifiees", models.PositiveIntegerField(default=0)),
+                ("nb_en_attente", models.PositiveIntegerField(default=0)),
+                ("nb_justifiees", models.PositiveIntegerField(default=0)),
+                ("derniere_absence", models.DateField(blank=True, null=True)),
+                (
+                    "prochaine_echeance",
+                    models.DateField(
+                        blank=True,
+                        db_index=True,
+                        help_text="Date de la prochaine séance future portant une absence non justifiée",
+                        null=True,
+                    ),
+                ),
+                ("date_maj", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Résumé d'absences",
+                "verbose_name_plural": "Résumés d'absences",
+                "db_table": "inscription_absence_summary",
+                "managed": True,
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
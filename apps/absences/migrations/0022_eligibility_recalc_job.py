@@ -0,0 +1,63 @@
+# Generated by Django 6.0.5 on 2026-10-16 23:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("absences", "0021_inscription_absence_summary"),
+        ("enrollments", "0006_audit_pre_production_fixes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EligibilityRecalcJob",
+            fields=[
+                (
+                    "id_inscription",
+                    models.OneToOneField(
+                        db_column="id_inscription",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="eligibility_recalc_job",
+                        serialize=False,
+                        to="enrollments.inscription",
+                        verbose_name="Inscription",
+                    ),
+                ),
+                (
+                    "statut",
+                    models.CharField(
+                        choices=[("EN_ATTENTE", "En attente"), ("ECHEC", "Échec")],
+                        default="EN_ATTENTE",
+                        max_length=20,
+                    ),
+                ),
+                ("tentatives", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "prochaine_tentative",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("derniere_erreur", models.TextField(blank=True, default="")),
+                (
+                    "date_demande",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "verbose_name": "Recalcul d'éligibilité en attente",
+                "verbose_name_plural": "Recalculs d'éligibilité en attente",
+                "db_table": "eligibility_recalc_job",
+                "managed": True,
+                "indexes": [
+                    models.Index(
+                        fields=["statut", "prochaine_tentative"],
+                        name="elig_job_statut_next_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 6.0.5 on 2026-10-17 00:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("absences", "0022_eligibility_recalc_job"),
+        ("academic_sessions", "0008_unique_seance_par_cours_date"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttendanceSubmission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cle_idempotence", models.CharField(max_length=255)),
+                ("empreinte", models.CharField(max_length=64)),
+                ("reponse", models.JSONField()),
+                ("date_creation", models.DateTimeField(auto_now_add=True)),
+                (
+                    "auteur",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attendance_submissions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "id_seance",
+                    models.ForeignKey(
+                        db_column="id_seance",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attendance_submissions",
+                        to="academic_sessions.seance",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Appel soumis via l'API",
+                "verbose_name_plural": "Appels soumis via l'API",
+                "db_table": "attendance_submission",
+                "managed": True,
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("auteur", "cle_idempotence"),
+                        name="attendance_submission_unique_key",
+                    )
+                ],
+            },
+        ),
+    ]
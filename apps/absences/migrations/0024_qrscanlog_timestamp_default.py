@@ -0,0 +1,19 @@
+# Generated by Django 6.0.5 on 2026-10-17 01:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("absences", "0023_attendance_submission"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="qrscanlog",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
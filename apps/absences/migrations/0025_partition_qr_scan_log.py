@@ -0,0 +1,90 @@
+# Generated by Django 6.0.5 on 2026-10-17 09:40
+
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.db import migrations
+
+# Mois créés d'avance ; ensuite `manage.py cleanup_qr_logs` (cron mensuel)
+# crée les suivants et supprime les mois expirés.
+MONTHS_AHEAD = 3
+
+
+def _month(index):
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_qr_scan_log(apps, schema_editor):
+    """
+    PostgreSQL : recrée qr_scan_log en table partitionnée par mois sur
+    "timestamp". La clé primaire devient (id, timestamp) (la clé de partition
+    doit en faire partie) ; id garde sa séquence, les index et clés
+    étrangères sont recréés sous leurs noms Django.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = 'qr_scan_log' "
+            "AND indexname <> 'qr_scan_log_pkey'"
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'qr_scan_log'::regclass AND contype = 'f'"
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT MIN(timestamp), COALESCE(MAX(id), 0), now() FROM qr_scan_log"
+        )
+        oldest, max_id, now = cursor.fetchone()
+
+    schema_editor.execute("ALTER TABLE qr_scan_log RENAME TO qr_scan_log_legacy;")
+    schema_editor.execute(
+        "CREATE TABLE qr_scan_log ("
+        "LIKE qr_scan_log_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+        'PRIMARY KEY (id, "timestamp")'
+        ') PARTITION BY RANGE ("timestamp");'
+    )
+    first = oldest or now
+    start = first.year * 12 + first.month - 1
+    end = now.year * 12 + now.month - 1 + MONTHS_AHEAD
+    for index in range(start, end + 1):
+        month, next_month = _month(index), _month(index + 1)
+        schema_editor.execute(
+            f"CREATE TABLE qr_scan_log_p{month.year:04d}{month.month:02d} "
+            "PARTITION OF qr_scan_log FOR VALUES FROM (%s) TO (%s);",
+            [month.isoformat(), next_month.isoformat()],
+        )
+    # Filet de sécurité si la création mensuelle des partitions est oubliée
+    schema_editor.execute(
+        "CREATE TABLE qr_scan_log_default PARTITION OF qr_scan_log DEFAULT;"
+    )
+
+    schema_editor.execute("INSERT INTO qr_scan_log SELECT * FROM qr_scan_log_legacy;")
+    schema_editor.execute("DROP TABLE qr_scan_log_legacy;")
+
+    schema_editor.execute("CREATE SEQUENCE qr_scan_log_id_seq OWNED BY qr_scan_log.id;")
+    schema_editor.execute(
+        "SELECT setval('qr_scan_log_id_seq', %s, false);", [max_id + 1]
+    )
+    schema_editor.execute(
+        "ALTER TABLE qr_scan_log ALTER COLUMN id SET DEFAULT nextval('qr_scan_log_id_seq');"
+    )
+    for index_def in index_defs:
+        schema_editor.execute(index_def)
+    for name, definition in foreign_keys:
+        schema_editor.execute(
+            f'ALTER TABLE qr_scan_log ADD CONSTRAINT "{name}" {definition};'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("absences", "0024_qrscanlog_timestamp_default"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_qr_scan_log, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.5 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("absences", "0025_partition_qr_scan_log"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="qrscanrecord",
+            name="anomaly_flags",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,177 @@
+"""
+Migration: Faits quotidiens d'absences (statistiques admin).
+
+Schema change:
+- Cree la table absence_daily_fact (une ligne par jour de seance, cours,
+  annee et statut)
+
+Data migration:
+- Remplit la table depuis les absences existantes, par lots de cours (meme
+  agregation que apps.absences.services.refresh_absence_facts)
+"""
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+COURSE_BATCH_SIZE = 50
+
+
+def populate_facts(apps, schema_editor):
+    Absence = apps.get_model("absences", "Absence")
+    AbsenceDailyFact = apps.get_model("absences", "AbsenceDailyFact")
+
+    course_ids = sorted(
+        Absence.objects.order_by()
+        .values_list("id_inscription__id_cours", flat=True)
+        .distinct()
+    )
+    for start in range(0, len(course_ids), COURSE_BATCH_SIZE):
+        rows = (
+            Absence.objects.filter(
+                id_inscription__id_cours__in=course_ids[
+                    start : start + COURSE_BATCH_SIZE
+                ]
+            )
+            .values(
+                "statut",
+                day=F("id_seance__date_seance"),
+                course_id=F("id_inscription__id_cours"),
+                year_id=F("id_inscription__id_annee"),
+                departement_id=F("id_inscription__id_cours__id_departement"),
+                course_niveau=F("id_inscription__id_cours__niveau"),
+                professeur_id=F("id_inscription__id_cours__professeur"),
+            )
+            .annotate(nb=Count("id_absence"), heures=Sum("duree_absence"))
+            .order_by()
+        )
+        AbsenceDailyFact.objects.bulk_create(
+            [
+                AbsenceDailyFact(
+                    date_seance=row["day"],
+                    id_cours_id=row["course_id"],
+                    id_annee_id=row["year_id"],
+                    id_departement_id=row["departement_id"],
+                    niveau=row["course_niveau"],
+                    professeur_id=row["professeur_id"],
+                    statut=row["statut"],
+                    nb_absences=row["nb"],
+                    heures=row["heures"] or 0,
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("absences", "0026_qrscanrecord_anomaly_flags"),
+        ("academic_sessions", "0009_seance_batiment"),
+        ("academics", "0007_campus_batiment"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AbsenceDailyFact",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date_seance", models.DateField(verbose_name="Date de séance")),
+                ("niveau", models.IntegerField(verbose_name="Niveau d'étude")),
+                (
+                    "statut",
+                    models.CharField(
+                        choices=[
+                            ("EN_ATTENTE", "En attente"),
+                            ("JUSTIFIEE", "Justifiée"),
+                            ("NON_JUSTIFIEE", "Non justifiée"),
+                        ],
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                ("nb_absences", models.PositiveIntegerField(default=0)),
+                (
+                    "heures",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=10,
+                        verbose_name="Heures",
+                    ),
+                ),
+                (
+                    "id_annee",
+                    models.ForeignKey(
+                        db_column="id_annee",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="academic_sessions.anneeacademique",
+                        verbose_name="Année académique",
+                    ),
+                ),
+                (
+                    "id_cours",
+                    models.ForeignKey(
+                        db_column="id_cours",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="academics.cours",
+                        verbose_name="Cours",
+                    ),
+                ),
+                (
+                    "id_departement",
+                    models.ForeignKey(
+                        db_column="id_departement",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="academics.departement",
+                        verbose_name="Département",
+                    ),
+                ),
+                (
+                    "professeur",
+                    models.ForeignKey(
+                        blank=True,
+                        db_column="id_professeur",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Professeur",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Fait quotidien d'absences",
+                "verbose_name_plural": "Faits quotidiens d'absences",
+                "db_table": "absence_daily_fact",
+                "managed": True,
+                "indexes": [
+                    models.Index(
+                        fields=["id_annee", "date_seance"],
+                        name="absence_fact_annee_date_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date_seance", "id_cours", "id_annee", "statut"),
+                        name="absence_daily_fact_unique_cell",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_facts, migrations.RunPython.noop),
+    ]
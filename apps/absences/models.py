@@ -4,6 +4,10 @@ RESPONSABILITE : Modeles du coeur metier - absences, justifications et QR code
 FONCTIONNALITES PRINCIPALES :
   - Absence : enregistrement d'une absence (type, duree, statut)
   - Justification : document soumis par l'etudiant (workflow EN_ATTENTE -> ACCEPTEE/REFUSEE)
+  - InscriptionAbsenceSummary : agregats d'absences materialises par inscription
+  - AbsenceDailyFact : agregats quotidiens (jour, cours, statut) des statistiques admin
+  - EligibilityRecalcJob : file durable des recalculs d'eligibilite (worker dedie)
+  - AttendanceSubmission : appels soumis via l'API (cle d'idempotence + diff rendu)
   - QRAttendanceToken : token QR a duree limitee avec verification GPS
   - QRScanRecord : enregistrement d'un scan valide
   - QRScanLog : log audit de TOUTES les tentatives de scan (succes et echecs)
@@ -15,7 +19,8 @@ import uuid
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxLengthValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.utils import timezone
 
 
 # ========================================================================== #
@@ -272,6 +277,256 @@ class Justification(models.Model):
         return f"Justification pour l'absence n°{self.id_absence.id_absence}"
 
 
+# ========================================================================== #
+#                  RESUME D'ABSENCES PAR INSCRIPTION                         #
+# ========================================================================== #
+
+
+class InscriptionAbsenceSummary(models.Model):
+    """
+    Agrégats d'absences matérialisés pour une inscription (une ligne par inscription).
+
+    Maintenu par les signaux post_save/post_delete d'Absence (voir signals.py),
+    donc aussi par le workflow de justification qui passe par Absence.save().
+    Les dashboards et exports lisent cette ligne au lieu de re-sommer la table
+    absence à chaque affichage.
+
+    Seules les absences NON_JUSTIFIEE de séances passées comptent dans
+    heures_non_justifiees. Une absence encodée sur une séance future est
+    comptée le jour de la séance : prochaine_echeance retient cette date ; une
+    ligne dont l'échéance est atteinte est re-sommée à la lecture (sans
+    écriture) jusqu'à son rafraîchissement par rebuild_absence_summaries
+    --stale-only.
+    Une inscription sans ligne n'a aucune absence.
+    """
+
+    id_inscription = models.OneToOneField(
+        "enrollments.Inscription",
+        models.CASCADE,
+        primary_key=True,
+        db_column="id_inscription",
+        verbose_name="Inscription",
+        related_name="absence_summary",
+    )
+    heures_non_justifiees = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        default=0,
+        verbose_name="Heures non justifiées",
+        help_text="Somme des absences NON_JUSTIFIEE pour les séances passées",
+    )
+    heures_en_attente = models.DecimalField(
+        max_digits=8, decimal_places=2, default=0, verbose_name="Heures en attente"
+    )
+    heures_justifiees = models.DecimalField(
+        max_digits=8, decimal_places=2, default=0, verbose_name="Heures justifiées"
+    )
+    nb_absences = models.PositiveIntegerField(default=0)
+    nb_non_justifiees = models.PositiveIntegerField(default=0)
+    nb_en_attente = models.PositiveIntegerField(default=0)
+    nb_justifiees = models.PositiveIntegerField(default=0)
+    derniere_absence = models.DateField(null=True, blank=True)
+    prochaine_echeance = models.DateField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Date de la prochaine séance future portant une absence non justifiée",
+    )
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = "inscription_absence_summary"
+        app_label = "absences"
+        verbose_name = "Résumé d'absences"
+        verbose_name_plural = "Résumés d'absences"
+
+    def __str__(self):
+        return f"Résumé absences inscription n°{self.id_inscription_id}"
+
+    @property
+    def is_stale(self):
+        return (
+            self.prochaine_echeance is not None
+            and self.prochaine_echeance <= timezone.localdate()
+        )
+
+
+# ========================================================================== #
+#                  FAITS QUOTIDIENS D'ABSENCES (STATISTIQUES)                #
+# ========================================================================== #
+
+
+class AbsenceDailyFact(models.Model):
+    """
+    Nombre et heures d'absences par jour de séance, cours, année et statut.
+
+    Les statistiques admin (page et API analytics) lisent cette table au lieu
+    de regrouper la table absence : sa taille dépend du nombre de jours de
+    cours, pas du nombre d'absences. Département, niveau et professeur sont
+    ceux du cours, recopiés pour les regroupements.
+
+    Recalculée au commit, par couple (cours, année), par les signaux
+    d'Absence, de Seance (date) et de Cours (voir signals.py) ;
+    reconstruite par la commande rebuild_absence_facts. L'année est celle
+    de l'inscription, comme pour les filtres des dashboards.
+    """
+
+    date_seance = models.DateField(verbose_name="Date de séance")
+    id_cours = models.ForeignKey(
+        "academics.Cours",
+        models.CASCADE,
+        db_column="id_cours",
+        verbose_name="Cours",
+        related_name="+",
+    )
+    id_annee = models.ForeignKey(
+        "academic_sessions.AnneeAcademique",
+        models.CASCADE,
+        db_column="id_annee",
+        verbose_name="Année académique",
+        related_name="+",
+    )
+    id_departement = models.ForeignKey(
+        "academics.Departement",
+        models.CASCADE,
+        db_column="id_departement",
+        verbose_name="Département",
+        related_name="+",
+    )
+    niveau = models.IntegerField(verbose_name="Niveau d'étude")
+    professeur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        models.SET_NULL,
+        db_column="id_professeur",
+        null=True,
+        blank=True,
+        verbose_name="Professeur",
+        related_name="+",
+    )
+    statut = models.CharField(max_length=20, choices=Absence.Statut, verbose_name="Statut")
+    nb_absences = models.PositiveIntegerField(default=0)
+    heures = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Heures")
+
+    class Meta:
+        managed = True
+        db_table = "absence_daily_fact"
+        app_label = "absences"
+        verbose_name = "Fait quotidien d'absences"
+        verbose_name_plural = "Faits quotidiens d'absences"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date_seance", "id_cours", "id_annee", "statut"],
+                name="absence_daily_fact_unique_cell",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["id_annee", "date_seance"], name="absence_fact_annee_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date_seance} cours n°{self.id_cours_id} {self.statut} : {self.nb_absences}"
+
+
+# ========================================================================== #
+#                  FILE DE RECALCUL D'ELIGIBILITE                            #
+# ========================================================================== #
+
+
+class EligibilityRecalcJob(models.Model):
+    """
+    Demande de recalcul d'eligible_examen pour une inscription, traitée hors requête.
+
+    Une ligne par inscription au plus (clé primaire = inscription) : une
+    nouvelle demande pour une inscription déjà en file remplace la précédente
+    au lieu de l'empiler. Le worker process_eligibility_queue traite les
+    lignes par lots (recalculer_eligibilite_batch) puis les supprime ; une
+    erreur repousse prochaine_tentative avec un délai exponentiel, et après
+    MAX_TENTATIVES la ligne passe en ECHEC pour inspection.
+    """
+
+    MAX_TENTATIVES = 5
+
+    class Statut(models.TextChoices):
+        EN_ATTENTE = "EN_ATTENTE", "En attente"
+        ECHEC = "ECHEC", "Échec"
+
+    id_inscription = models.OneToOneField(
+        "enrollments.Inscription",
+        models.CASCADE,
+        primary_key=True,
+        db_column="id_inscription",
+        verbose_name="Inscription",
+        related_name="eligibility_recalc_job",
+    )
+    statut = models.CharField(
+        max_length=20, choices=Statut.choices, default=Statut.EN_ATTENTE
+    )
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    prochaine_tentative = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True, default="")
+    date_demande = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        managed = True
+        db_table = "eligibility_recalc_job"
+        app_label = "absences"
+        verbose_name = "Recalcul d'éligibilité en attente"
+        verbose_name_plural = "Recalculs d'éligibilité en attente"
+        indexes = [
+            models.Index(
+                fields=["statut", "prochaine_tentative"],
+                name="elig_job_statut_next_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Recalcul éligibilité inscription n°{self.id_inscription_id}"
+
+
+class AttendanceSubmission(models.Model):
+    """
+    Appel complet soumis via l'API (POST /api/seances/{id}/attendance/).
+
+    Enregistré dans la transaction qui applique l'appel : une nouvelle
+    soumission avec la même clé d'idempotence (même auteur) renvoie la réponse
+    mémorisée sans rien réappliquer. L'empreinte du contenu permet de refuser
+    la réutilisation d'une clé pour un appel différent.
+    """
+
+    cle_idempotence = models.CharField(max_length=255)
+    auteur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        models.CASCADE,
+        related_name="attendance_submissions",
+    )
+    id_seance = models.ForeignKey(
+        "academic_sessions.Seance",
+        models.CASCADE,
+        db_column="id_seance",
+        related_name="attendance_submissions",
+    )
+    empreinte = models.CharField(max_length=64)
+    reponse = models.JSONField()
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = True
+        db_table = "attendance_submission"
+        app_label = "absences"
+        verbose_name = "Appel soumis via l'API"
+        verbose_name_plural = "Appels soumis via l'API"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["auteur", "cle_idempotence"],
+                name="attendance_submission_unique_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Appel séance n°{self.id_seance_id} ({self.cle_idempotence})"
+
+
 # ========================================================================== #
 #                     SYSTEME QR CODE (3 modeles)                            #
 # ========================================================================== #
@@ -328,6 +583,55 @@ class QRAttendanceToken(models.Model):
         return self.is_active and not self.is_expired
 
 
+class QRScanRecordManager(models.Manager):
+    def record_scan(self, **fields):
+        """
+        Insère un scan en une seule instruction :
+        ``INSERT ... ON CONFLICT (seance_id, inscription_id) DO NOTHING RETURNING``.
+
+        Pas de lecture préalable ni de transaction explicite : la contrainte
+        d'unicité arbitre les scans concurrents.
+
+        Returns:
+            Le QRScanRecord créé, ou None si l'étudiant avait déjà scanné.
+        """
+        record = self.model(**fields)
+        connection = connections[router.db_for_write(self.model)]
+        if connection.vendor not in ("postgresql", "sqlite"):
+            try:
+                with transaction.atomic(using=connection.alias):
+                    record.save(using=connection.alias, force_insert=True)
+            except IntegrityError:
+                return None
+            return record
+
+        opts = self.model._meta
+        fields_to_insert = [f for f in opts.concrete_fields if not f.primary_key]
+        qn = connection.ops.quote_name
+        columns = ", ".join(qn(f.column) for f in fields_to_insert)
+        placeholders = ", ".join(["%s"] * len(fields_to_insert))
+        params = [
+            f.get_db_prep_save(f.pre_save(record, add=True), connection)
+            for f in fields_to_insert
+        ]
+        conflict = ", ".join(
+            qn(opts.get_field(name).column) for name in ("seance", "inscription")
+        )
+        sql = (
+            f"INSERT INTO {qn(opts.db_table)} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({conflict}) DO NOTHING RETURNING {qn(opts.pk.column)}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        record.pk = row[0]
+        record._state.adding = False
+        record._state.db = connection.alias
+        return record
+
+
 class QRScanRecord(models.Model):
     """
     Records a student's QR scan for a given seance.
@@ -360,6 +664,11 @@ class QRScanRecord(models.Model):
     longitude = models.FloatField(null=True, blank=True)
     distance_meters = models.FloatField(null=True, blank=True)
     is_suspicious = models.BooleanField(default=False)
+    # Signaux de l'analyse par lot (apps.absences.scan_anomalies) : position
+    # partagée, appareil/IP partagés, scan éloigné du groupe
+    anomaly_flags = models.JSONField(default=list, blank=True)
+
+    objects = QRScanRecordManager()
 
     class Meta:
         db_table = "qr_scan_record"
@@ -415,7 +724,9 @@ class QRScanLog(models.Model):
     scan_result = models.CharField(max_length=25, choices=ScanResult.choices)
     qr_token_used = models.CharField(max_length=255, blank=True, default="")
     user_agent = models.TextField(blank=True, default="")
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Heure de la tentative, fixée à la construction : les entrées peuvent être
+    # insérées plus tard par lot (apps.absences.scan_log)
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = "qr_scan_log"
@@ -0,0 +1,181 @@
+"""
+FICHIER : apps/absences/partitions.py
+RESPONSABILITE : Partitions mensuelles du journal des scans QR (qr_scan_log)
+FONCTIONNALITES PRINCIPALES :
+  - PostgreSQL : qr_scan_log est partitionnee par mois sur "timestamp"
+    (migration 0025) ; une partition par mois nommee qr_scan_log_pAAAAMM et une
+    partition par defaut qui recueille les lignes hors plage
+  - ensure_partitions() : cree les partitions des mois a venir ; les lignes du
+    mois deja tombees dans la partition par defaut y sont deplacees
+  - drop_expired_partitions() : supprime en O(1) les mois entierement expires
+  - delete_expired_in_batches() : purge par tranches de cle primaire (SQLite,
+    et reliquat du mois partiellement expire sous PostgreSQL)
+DEPENDANCES CLES : absences.models.QRScanLog, catalogues PostgreSQL (pg_inherits)
+"""
+
+import re
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.db import connection as default_connection
+from django.db import transaction
+
+from .models import QRScanLog
+
+TABLE = QRScanLog._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+_PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+
+
+def month_start(value):
+    """Premier instant (UTC) du mois contenant ``value``."""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month.year:04d}{month.month:02d}"
+
+
+def is_partitioned(connection=default_connection):
+    """True si qr_scan_log est une table partitionnée (PostgreSQL, migration 0025)."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection=default_connection):
+    """Partitions mensuelles existantes : ``{début du mois: nom}``."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if match:
+            month = datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+            partitions[month] = name
+    return partitions
+
+
+def create_partition(month, connection=default_connection):
+    """
+    Crée la partition de ``month``.
+
+    Si la partition par défaut contient déjà des lignes de ce mois, PostgreSQL
+    refuse la création (contrainte de la partition par défaut violée) : on la
+    détache, on crée la partition, on y déplace les lignes du mois puis on
+    rattache la partition par défaut, le tout dans une seule transaction.
+    """
+    qn = connection.ops.quote_name
+    bounds = [month.isoformat(), add_months(month, 1).isoformat()]
+    create_sql = (
+        f"CREATE TABLE IF NOT EXISTS {qn(partition_name(month))} "
+        f"PARTITION OF {qn(TABLE)} FOR VALUES FROM (%s) TO (%s)"
+    )
+    in_range = '"timestamp" >= %s AND "timestamp" < %s'
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [DEFAULT_PARTITION])
+        has_default = cursor.fetchone()[0] is not None
+        if has_default:
+            cursor.execute(
+                f"SELECT 1 FROM {qn(DEFAULT_PARTITION)} WHERE {in_range} LIMIT 1",
+                bounds,
+            )
+            has_default = cursor.fetchone() is not None
+        if not has_default:
+            cursor.execute(create_sql, bounds)
+            return
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(DEFAULT_PARTITION)}"
+        )
+        cursor.execute(create_sql, bounds)
+        cursor.execute(
+            f"INSERT INTO {qn(partition_name(month))} "
+            f"SELECT * FROM {qn(DEFAULT_PARTITION)} WHERE {in_range}",
+            bounds,
+        )
+        cursor.execute(f"DELETE FROM {qn(DEFAULT_PARTITION)} WHERE {in_range}", bounds)
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(DEFAULT_PARTITION)} DEFAULT"
+        )
+
+
+def ensure_partitions(now, months_ahead=3, connection=default_connection):
+    """
+    Crée les partitions du mois courant et des ``months_ahead`` mois suivants.
+
+    Returns:
+        list[str]: noms des partitions créées.
+    """
+    existing = list_partitions(connection)
+    created = []
+    current = month_start(now)
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            create_partition(month, connection)
+            created.append(partition_name(month))
+    return created
+
+
+def drop_expired_partitions(cutoff, connection=default_connection):
+    """
+    Supprime les partitions dont tout le mois est antérieur à ``cutoff``
+    (DROP TABLE : ni lecture ni suppression ligne à ligne).
+
+    Returns:
+        list[str]: noms des partitions supprimées.
+    """
+    qn = connection.ops.quote_name
+    dropped = []
+    for month, name in sorted(list_partitions(connection).items()):
+        if add_months(month, 1) > cutoff:
+            break
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {qn(name)}")
+        dropped.append(name)
+    return dropped
+
+
+def delete_expired_in_batches(cutoff, batch_size=5000, progress=None):
+    """
+    Supprime les entrées antérieures à ``cutoff`` par tranches de clé primaire :
+    chaque DELETE porte sur au plus ``batch_size`` identifiants consécutifs et
+    s'exécute dans sa propre transaction (verrous et mémoire bornés).
+
+    Args:
+        progress: callable(total_supprimé, dernier_pk) appelé après chaque tranche.
+
+    Returns:
+        int: nombre d'entrées supprimées.
+    """
+    expired = QRScanLog.objects.filter(timestamp__lt=cutoff)
+    first = expired.order_by("pk").values_list("pk", flat=True).first()
+    if first is None:
+        return 0
+    last = expired.order_by("-pk").values_list("pk", flat=True).first()
+
+    total = 0
+    start = first
+    while start <= last:
+        end = start + batch_size
+        deleted, _ = expired.filter(pk__gte=start, pk__lt=end).delete()
+        total += deleted
+        if progress:
+            progress(total, min(end - 1, last))
+        start = end
+    return total
@@ -0,0 +1,90 @@
+"""
+FICHIER : apps/absences/qr_codes.py
+RESPONSABILITE : Codes QR sans etat, derives par fenetre de temps (QR_STATELESS_CODES)
+FONCTIONNALITES PRINCIPALES :
+  - Le QRAttendanceToken cree a la generation sert de session : son identifiant
+    interne (pk) et SECRET_KEY derivent le secret de la seance. L'UUID du token
+    n'identifie la session que cote professeur (dashboard, image, flux) : il
+    n'entre pas dans le HMAC et /qr/scan/<uuid>/ est refuse dans ce mode
+  - Le code affiche est un HMAC de (seance, fenetre) ; une fenetre dure
+    qr_token_duration_seconds (SystemSettings)
+  - verify_window_code() : accepte la fenetre courante et la precedente,
+    sans lecture ni ecriture de la table des tokens
+DEPENDANCES CLES : hmac (stdlib), settings.SECRET_KEY, dashboard.SystemSettings
+"""
+
+import hashlib
+import hmac
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+# Durée d'une session sans état : le QR reste affichable tout un créneau de
+# cours sans nouvelle ligne QRAttendanceToken (seule la fenêtre change).
+STATELESS_SESSION_LIFETIME = timedelta(hours=4)
+
+
+def stateless_codes_enabled():
+    return getattr(settings, "QR_STATELESS_CODES", False)
+
+
+def window_seconds():
+    from apps.dashboard.models import SystemSettings
+
+    return max(int(SystemSettings.current().qr_token_duration_seconds), 1)
+
+
+def current_window(now=None):
+    """Numéro de la fenêtre de temps courante."""
+    now = now or timezone.now()
+    return int(now.timestamp()) // window_seconds()
+
+
+def window_expires_at(window):
+    """Fin de validité (affichée) d'une fenêtre : le début de la suivante."""
+    return datetime.fromtimestamp((window + 1) * window_seconds(), tz=dt_timezone.utc)
+
+
+def _seance_secret(session_id):
+    return hmac.new(
+        settings.SECRET_KEY.encode("utf-8"),
+        f"qr-session:{session_id}".encode("utf-8"),
+        hashlib.sha256,
+    ).digest()
+
+
+def window_code(session_id, seance_id, window):
+    """
+    Code affiché dans le QR pour une fenêtre (HMAC tronqué à 128 bits).
+
+    Args:
+        session_id: pk du QRAttendanceToken de la session (pas son UUID,
+            présent dans les URL du professeur).
+    """
+    return hmac.new(
+        _seance_secret(session_id),
+        f"{seance_id}:{window}".encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()[:32]
+
+
+def verify_window_code(session_id, seance_id, window, code, now=None):
+    """
+    Vérifie un code scanné.
+
+    Returns:
+        "ok" (fenêtre courante ou précédente), "expired" (code authentique
+        d'une fenêtre plus ancienne) ou "invalid".
+    """
+    if session_id is None:
+        return "invalid"
+    if not hmac.compare_digest(window_code(session_id, seance_id, window), str(code)):
+        return "invalid"
+    current = current_window(now)
+    if window > current:
+        return "invalid"
+    if window < current - 1:
+        return "expired"
+    return "ok"
@@ -0,0 +1,291 @@
+"""
+FICHIER : apps/absences/qr_context.py
+RESPONSABILITE : Contexte de scan QR en cache pour les rafales de scans
+FONCTIONNALITES PRINCIPALES :
+  - ScanContext : etat du token, expiration, ids seance/cours/annee, reference GPS
+    du professeur et informations affichees a l'etudiant (un objet par token)
+  - get_scan_roster() : etudiants inscrits (EN_COURS) -> inscription, par cours/annee
+  - Marqueurs « deja scanne » par (seance, inscription)
+  - get_seance_scan_context() : contexte de la session active d'une seance, pour
+    les codes sans etat (apps.absences.qr_codes) qui ne portent pas d'UUID
+  - prime_scan_context() a la creation d'un token, deactivate_seance_tokens() et
+    invalidate_seance_scan_contexts() pour le rafraichissement et la finalisation ;
+    les changements d'inscription et de batiment sont invalides par signal (absences.signals)
+DEPENDANCES CLES : django.core.cache (Redis en production), QRAttendanceToken, Inscription
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QRAttendanceToken, QRScanRecord
+
+# Les marqueurs « déjà scanné » vivent le temps d'une journée de cours ; un
+# marqueur absent n'est qu'une optimisation perdue (la contrainte d'unicité
+# de QRScanRecord reste l'arbitre final).
+SCANNED_MARKER_TIMEOUT = 12 * 3600
+
+
+def _context_timeout():
+    return getattr(settings, "QR_SCAN_CONTEXT_TIMEOUT", 900)
+
+
+def scan_context_key(token):
+    return f"qr:scan-ctx:{token}"
+
+
+def seance_scan_context_key(seance_id):
+    return f"qr:scan-ctx:seance:{seance_id}"
+
+
+def scan_roster_key(course_id, annee_id):
+    return f"qr:scan-roster:{course_id}:{annee_id}"
+
+
+def scanned_marker_key(seance_id, inscription_id):
+    return f"qr:scanned:{seance_id}:{inscription_id}"
+
+
+@dataclass(frozen=True)
+class ScanContext:
+    """Tout ce dont qr_scan a besoin pour valider un scan, sans requête SQL."""
+
+    token: str
+    is_active: bool
+    expires_at: datetime
+    verify_location: bool
+    latitude: float | None
+    longitude: float | None
+    seance_id: int
+    seance_validated: bool
+    date_seance: date
+    heure_debut: time
+    heure_fin: time
+    annee_id: int
+    course_id: int
+    code_cours: str
+    nom_cours: str
+    professeur_nom: str
+    # Bâtiment épinglé (séance, sinon cours) : seule zone GPS acceptée
+    building_id: int | None = None
+    # pk du token : secret des codes sans état (apps.absences.qr_codes)
+    token_id: int | None = None
+
+    @property
+    def is_expired(self):
+        return timezone.now() > self.expires_at
+
+    @property
+    def course(self):
+        """Objet d'affichage pour les templates (course.code_cours, ...)."""
+        return SimpleNamespace(
+            id_cours=self.course_id,
+            code_cours=self.code_cours,
+            nom_cours=self.nom_cours,
+            professeur=SimpleNamespace(get_full_name=self.professeur_nom),
+        )
+
+    @property
+    def seance(self):
+        return SimpleNamespace(
+            id_seance=self.seance_id,
+            date_seance=self.date_seance,
+            heure_debut=self.heure_debut,
+            heure_fin=self.heure_fin,
+        )
+
+
+# ========================================================================== #
+#                    CONSTRUCTION ET LECTURE                                 #
+# ========================================================================== #
+
+
+def build_scan_context(token):
+    """
+    Construit et met en cache le contexte d'un token (une requête), et pose
+    les marqueurs des scans déjà enregistrés de la séance.
+
+    Returns:
+        ScanContext, ou None si le token n'existe pas.
+    """
+    qr_token = (
+        QRAttendanceToken.objects.select_related("seance__id_cours__professeur")
+        .filter(token=token)
+        .first()
+    )
+    if qr_token is None:
+        return None
+    seance = qr_token.seance
+    course = seance.id_cours
+    ctx = ScanContext(
+        token=str(qr_token.token),
+        is_active=qr_token.is_active,
+        expires_at=qr_token.expires_at,
+        verify_location=qr_token.verify_location,
+        latitude=qr_token.latitude,
+        longitude=qr_token.longitude,
+        seance_id=seance.id_seance,
+        seance_validated=seance.validated,
+        date_seance=seance.date_seance,
+        heure_debut=seance.heure_debut,
+        heure_fin=seance.heure_fin,
+        annee_id=seance.id_annee_id,
+        course_id=course.id_cours,
+        code_cours=course.code_cours,
+        nom_cours=course.nom_cours,
+        professeur_nom=course.professeur.get_full_name() if course.professeur else "",
+        building_id=seance.batiment_id or course.batiment_id,
+        token_id=qr_token.pk,
+    )
+    # Conservé un peu au-delà de l'expiration : les scans tardifs reçoivent
+    # « QR expiré » depuis le cache.
+    remaining = int((qr_token.expires_at - timezone.now()).total_seconds())
+    timeout = max(remaining, 0) + 60
+    cache.set(scan_context_key(ctx.token), ctx, timeout)
+
+    if qr_token.is_active:
+        cache.set(seance_scan_context_key(ctx.seance_id), ctx, timeout)
+        scanned = QRScanRecord.objects.filter(seance_id=ctx.seance_id).values_list(
+            "inscription_id", "scanned_at"
+        )
+        markers = {
+            scanned_marker_key(ctx.seance_id, inscription_id): scanned_at
+            for inscription_id, scanned_at in scanned
+        }
+        if markers:
+            cache.set_many(markers, SCANNED_MARKER_TIMEOUT)
+    return ctx
+
+
+def get_scan_context(token):
+    """Contexte du token depuis le cache, reconstruit depuis la base si absent."""
+    ctx = cache.get(scan_context_key(token))
+    if ctx is None:
+        ctx = build_scan_context(token)
+    return ctx
+
+
+def get_seance_scan_context(seance_id):
+    """
+    Contexte du token actif (le plus récent) d'une séance, ou None si aucun.
+
+    Utilisé par les codes sans état : le scan n'identifie que la séance.
+    """
+    ctx = cache.get(seance_scan_context_key(seance_id))
+    if ctx is None:
+        token = (
+            QRAttendanceToken.objects.filter(seance_id=seance_id, is_active=True)
+            .order_by("-created_at")
+            .values_list("token", flat=True)
+            .first()
+        )
+        if token is not None:
+            ctx = build_scan_context(token)
+    return ctx
+
+
+def get_scan_roster(course_id, annee_id):
+    """
+    Inscriptions EN_COURS d'un cours pour une année : ``{id_etudiant: id_inscription}``.
+
+    Invalidé par les signaux d'Inscription (création, modification, suppression).
+    """
+    key = scan_roster_key(course_id, annee_id)
+    roster = cache.get(key)
+    if roster is None:
+        from apps.enrollments.models import Inscription
+
+        roster = dict(
+            Inscription.objects.filter(
+                id_cours_id=course_id,
+                id_annee_id=annee_id,
+                status=Inscription.Status.EN_COURS,
+            ).values_list("id_etudiant_id", "id_inscription")
+        )
+        cache.set(key, roster, _context_timeout())
+    return roster
+
+
+def get_scanned_at(seance_id, inscription_id):
+    """Horodatage du scan déjà enregistré (marqueur en cache), ou None."""
+    return cache.get(scanned_marker_key(seance_id, inscription_id))
+
+
+def mark_scanned(seance_id, inscription_id, scanned_at):
+    cache.set(
+        scanned_marker_key(seance_id, inscription_id),
+        scanned_at,
+        SCANNED_MARKER_TIMEOUT,
+    )
+
+
+def prime_scan_context(qr_token):
+    """
+    Met en cache le contexte d'un token qui vient d'être créé (et le roster du
+    cours), pour que la rafale de scans qui suit ne touche pas la base.
+    """
+    ctx = build_scan_context(qr_token.token)
+    if ctx is not None:
+        get_scan_roster(ctx.course_id, ctx.annee_id)
+    return ctx
+
+
+# ========================================================================== #
+#                    INVALIDATION                                            #
+# ========================================================================== #
+
+
+def _delete_keys(keys):
+    """
+    Supprime les clés tout de suite et de nouveau au commit : un scan servi
+    pendant la transaction a pu recharger l'ancien état depuis la base.
+    """
+    if not keys:
+        return
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _drop_contexts(seance_id, tokens):
+    _delete_keys(
+        [seance_scan_context_key(seance_id)]
+        + [scan_context_key(token) for token in tokens]
+    )
+
+
+def deactivate_seance_tokens(seance):
+    """Désactive les tokens actifs d'une séance et retire leurs contextes du cache."""
+    active = QRAttendanceToken.objects.filter(seance=seance, is_active=True)
+    tokens = list(active.values_list("token", flat=True))
+    if tokens:
+        active.update(is_active=False)
+        _drop_contexts(seance.pk, tokens)
+
+
+def invalidate_seance_scan_contexts(seance_id):
+    """Retire les contextes de tous les tokens d'une séance (ex. séance validée)."""
+    _drop_contexts(
+        seance_id,
+        QRAttendanceToken.objects.filter(seance_id=seance_id).values_list(
+            "token", flat=True
+        ),
+    )
+
+
+def invalidate_course_scan_contexts(course_id):
+    """Retire les contextes des tokens actifs d'un cours (ex. bâtiment du cours modifié)."""
+    active = QRAttendanceToken.objects.filter(
+        seance__id_cours_id=course_id, is_active=True
+    )
+    for seance_id, token in active.values_list("seance_id", "token"):
+        _drop_contexts(seance_id, [token])
+
+
+def invalidate_scan_roster(course_id, annee_id):
+    _delete_keys([scan_roster_key(course_id, annee_id)])
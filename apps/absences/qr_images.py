@@ -0,0 +1,98 @@
+"""
+FICHIER : apps/absences/qr_images.py
+RESPONSABILITE : Rendu des images QR code (service partage)
+FONCTIONNALITES PRINCIPALES :
+  - render_qr() : encode une chaine en PNG ou SVG (aucun cache)
+  - get_qr_image() : image mise en cache (LRU en memoire + cache Django/Redis)
+    avec un ETag stable, pour l'endpoint d'image du dashboard QR
+  - qr_data_uri() : data-URI base64 pour les pages qui incorporent l'image
+DEPENDANCES CLES : qrcode, django.core.cache
+"""
+
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import cache
+
+QR_CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+# Taille du LRU en mémoire (images récentes du processus)
+QR_LRU_SIZE = 256
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def render_qr(data, fmt="png"):
+    """
+    Encode ``data`` en QR code et retourne les octets de l'image.
+
+    Rien n'est mis en cache ni écrit sur disque : à utiliser directement pour
+    les contenus secrets (URI de provisioning TOTP).
+    """
+    if fmt not in QR_CONTENT_TYPES:
+        raise ValueError(f"Unsupported QR format: {fmt}")
+    qr = qrcode.QRCode(
+        version=1,
+        box_size=10,
+        border=4,
+        image_factory=qrcode.image.svg.SvgPathImage if fmt == "svg" else None,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    buf = io.BytesIO()
+    if fmt == "svg":
+        qr.make_image().save(buf)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def qr_etag(data, fmt):
+    """ETag d'une image QR : le rendu est déterministe pour (contenu, format)."""
+    return hashlib.sha256(f"{fmt}|{data}".encode("utf-8")).hexdigest()[:32]
+
+
+def get_qr_image(data, fmt="png"):
+    """
+    Image QR mise en cache, retourne ``(octets, etag)``.
+
+    Cherche d'abord dans le LRU du processus, puis dans le cache partagé
+    (Redis en production) ; le rendu n'a lieu qu'au premier affichage d'un
+    token, quel que soit le nombre de workers et de requêtes.
+    """
+    etag = qr_etag(data, fmt)
+    key = f"qr:img:{etag}"
+
+    with _lru_lock:
+        image = _lru.get(key)
+        if image is not None:
+            _lru.move_to_end(key)
+            return image, etag
+
+    image = cache.get(key)
+    if image is None:
+        image = render_qr(data, fmt)
+        cache.set(key, image, getattr(settings, "QR_IMAGE_CACHE_TIMEOUT", 900))
+
+    with _lru_lock:
+        _lru[key] = image
+        _lru.move_to_end(key)
+        while len(_lru) > QR_LRU_SIZE:
+            _lru.popitem(last=False)
+    return image, etag
+
+
+def qr_data_uri(data, fmt="png"):
+    """Data-URI base64 d'un QR code (rendu sans cache, voir render_qr)."""
+    encoded = base64.b64encode(render_qr(data, fmt)).decode()
+    return f"data:{QR_CONTENT_TYPES[fmt]};base64,{encoded}"
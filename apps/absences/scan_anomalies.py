@@ -0,0 +1,198 @@
+"""
+FICHIER : apps/absences/scan_anomalies.py
+RESPONSABILITE : Analyse par lot des scans QR d'une ou plusieurs seances (anti-fraude)
+FONCTIONNALITES PRINCIPALES :
+  - detect_anomalies() : signale, pour les scans d'une seance,
+      * same_position  : coordonnees identiques ou trop proches d'autres scans
+      * shared_device  : meme (IP, user agent) que le scan d'un autre etudiant
+      * shared_ip      : IP partagee par plusieurs etudiants (hors NAT du campus)
+      * far_from_group : scan loin du centre (median) des scans de la seance
+  - analyse_seances() : charge les scans d'un ensemble de seances en une lecture,
+    calcule les signaux par seance et ecrit QRScanRecord.anomaly_flags par lot
+DEPENDANCES CLES : absences.models (QRScanRecord, QRScanLog)
+
+Sans NumPy (non requis par le projet) : les distances par paire sont limitees
+aux cellules voisines d'une grille metrique, et les regroupements IP / appareil
+sont des comptages par cle ; le cout est lineaire en nombre de scans.
+"""
+
+import math
+from collections import defaultdict
+from itertools import groupby
+from statistics import median
+
+from .models import QRScanLog, QRScanRecord
+
+EARTH_RADIUS_METERS = 6_371_000
+
+# Deux téléphones distincts ne rapportent pas la même position au mètre près
+CLOSE_METERS = 1.0
+MIN_CLOSE_CLUSTER = 3
+SHARED_DEVICE_MIN_STUDENTS = 2
+SHARED_IP_MIN_STUDENTS = 3
+# Une IP utilisée par la majorité de la séance est la passerelle du campus
+SHARED_IP_MAX_SHARE = 0.5
+FAR_FROM_GROUP_METERS = 300
+MIN_SCANS_FOR_GROUP = 5
+
+ANOMALY_LABELS = {
+    "same_position": "Position identique à d'autres scans",
+    "shared_device": "Même appareil qu'un autre étudiant",
+    "shared_ip": "Adresse IP partagée",
+    "far_from_group": "Loin du groupe",
+}
+
+
+def _project(scans):
+    """Coordonnées métriques locales (équirectangulaire autour de la médiane)."""
+    lat0 = median(s["latitude"] for s in scans)
+    lng0 = median(s["longitude"] for s in scans)
+    k = math.cos(math.radians(lat0))
+    rad = math.pi / 180 * EARTH_RADIUS_METERS
+    return [
+        ((s["longitude"] - lng0) * rad * k, (s["latitude"] - lat0) * rad) for s in scans
+    ]
+
+
+def _close_clusters(points):
+    """Indices des points ayant au moins MIN_CLOSE_CLUSTER - 1 voisins à moins de CLOSE_METERS."""
+    cells = defaultdict(list)
+    for i, (x, y) in enumerate(points):
+        cells[(math.floor(x / CLOSE_METERS), math.floor(y / CLOSE_METERS))].append(i)
+    flagged = set()
+    limit = CLOSE_METERS * CLOSE_METERS
+    for (cx, cy), members in cells.items():
+        neighbours = [
+            j
+            for dx in (-1, 0, 1)
+            for dy in (-1, 0, 1)
+            for j in cells.get((cx + dx, cy + dy), ())
+        ]
+        for i in members:
+            xi, yi = points[i]
+            close = sum(
+                1
+                for j in neighbours
+                if j != i
+                and (points[j][0] - xi) ** 2 + (points[j][1] - yi) ** 2 <= limit
+            )
+            if close >= MIN_CLOSE_CLUSTER - 1:
+                flagged.add(i)
+    return flagged
+
+
+def _shared(scans, key, min_students, max_share=1.0):
+    """Ids des scans dont la clé est partagée par au moins ``min_students`` étudiants."""
+    students = defaultdict(set)
+    for scan in scans:
+        value = key(scan)
+        if value:
+            students[value].add(scan["student_id"])
+    total = len({scan["student_id"] for scan in scans}) or 1
+    shared = {
+        value
+        for value, members in students.items()
+        if len(members) >= min_students and len(members) / total <= max_share
+    }
+    return {scan["id"] for scan in scans if key(scan) in shared}
+
+
+def detect_anomalies(scans):
+    """
+    Signaux d'anomalie des scans d'une séance.
+
+    Args:
+        scans: dicts avec id, student_id, latitude, longitude, ip_address, user_agent.
+
+    Returns:
+        dict: {id du scan: liste triée des signaux} (tous les scans, liste vide si aucun).
+    """
+    flags = {scan["id"]: set() for scan in scans}
+
+    located = [
+        s for s in scans if s["latitude"] is not None and s["longitude"] is not None
+    ]
+    if located:
+        points = _project(located)
+        for i in _close_clusters(points):
+            flags[located[i]["id"]].add("same_position")
+        if len(located) >= MIN_SCANS_FOR_GROUP:
+            for scan, (x, y) in zip(located, points):
+                if math.hypot(x, y) > FAR_FROM_GROUP_METERS:
+                    flags[scan["id"]].add("far_from_group")
+
+    for scan_id in _shared(
+        scans,
+        lambda s: (
+            (s["ip_address"], s["user_agent"])
+            if s["ip_address"] and s["user_agent"]
+            else None
+        ),
+        SHARED_DEVICE_MIN_STUDENTS,
+    ):
+        flags[scan_id].add("shared_device")
+    for scan_id in _shared(
+        scans, lambda s: s["ip_address"], SHARED_IP_MIN_STUDENTS, SHARED_IP_MAX_SHARE
+    ):
+        flags[scan_id].add("shared_ip")
+
+    return {scan_id: sorted(values) for scan_id, values in flags.items()}
+
+
+def analyse_seances(seances, batch_size=1000):
+    """
+    Recalcule ``anomaly_flags`` des scans d'un ensemble de séances.
+
+    Une lecture des scans (triés par séance), une lecture des user agents
+    (QRScanLog validés), puis un bulk_update des seuls scans dont les signaux
+    changent.
+
+    Args:
+        seances: queryset de Seance (ex. une séance, une journée, un semestre).
+
+    Returns:
+        dict: {'seances': int, 'scans': int, 'flagged': int, 'updated': int}
+    """
+    user_agents = {
+        (seance_id, student_id): user_agent
+        for seance_id, student_id, user_agent in QRScanLog.objects.filter(
+            seance__in=seances, scan_result=QRScanLog.ScanResult.VALIDATED
+        ).values_list("seance_id", "etudiant_id", "user_agent")
+    }
+    rows = (
+        QRScanRecord.objects.filter(seance__in=seances)
+        .order_by("seance_id")
+        .values(
+            "id",
+            "seance_id",
+            "student_id",
+            "latitude",
+            "longitude",
+            "ip_address",
+            "anomaly_flags",
+        )
+        .iterator(chunk_size=5000)
+    )
+
+    stats = {"seances": 0, "scans": 0, "flagged": 0, "updated": 0}
+    changed = []
+    for seance_id, group in groupby(rows, key=lambda row: row["seance_id"]):
+        scans = list(group)
+        for scan in scans:
+            scan["user_agent"] = user_agents.get((seance_id, scan["student_id"]), "")
+        flags = detect_anomalies(scans)
+        stats["seances"] += 1
+        stats["scans"] += len(scans)
+        for scan in scans:
+            new_flags = flags[scan["id"]]
+            if new_flags:
+                stats["flagged"] += 1
+            if new_flags != (scan["anomaly_flags"] or []):
+                changed.append(QRScanRecord(id=scan["id"], anomaly_flags=new_flags))
+    # Écritures après la lecture en flux (pas de mise à jour pendant l'itération)
+    if changed:
+        QRScanRecord.objects.bulk_update(
+            changed, ["anomaly_flags"], batch_size=batch_size
+        )
+    stats["updated"] = len(changed)
+    return stats
@@ -0,0 +1,335 @@
+"""
+FICHIER : apps/absences/scan_log.py
+RESPONSABILITE : Ecriture differee du journal des tentatives de scan QR (QRScanLog)
+FONCTIONNALITES PRINCIPALES :
+  - record_scan_log() : point d'entree unique de _log_scan_attempt
+  - QR_SCAN_LOG_SINK = "sync" (INSERT immediat), "memory" (tampon du processus vide
+    par un thread toutes les QR_SCAN_LOG_FLUSH_MS ms ou QR_SCAN_LOG_FLUSH_SIZE entrees)
+    ou "redis" (liste Redis partagee videe par la commande drain_qr_scan_log)
+  - Vidage garanti a l'arret du processus (atexit) et du drainer (SIGTERM)
+  - scan_log_stats() : entrees en attente, ecrites et perdues (metrique)
+DEPENDANCES CLES : absences.models.QRScanLog, django_redis (mode redis)
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import QRScanLog
+
+logger = logging.getLogger(__name__)
+
+REDIS_QUEUE_KEY = "unabsences:qr-scan-log:queue"
+REDIS_DROPPED_KEY = "unabsences:qr-scan-log:dropped"
+
+# Champs sérialisés pour la file Redis (valeurs JSON natives)
+_ROW_FIELDS = (
+    "etudiant_id",
+    "seance_id",
+    "ip_address",
+    "latitude",
+    "longitude",
+    "distance_meters",
+    "gps_status",
+    "scan_result",
+    "qr_token_used",
+    "user_agent",
+)
+
+
+def _insert_entries(entries, batch_size):
+    """
+    bulk_create des entrées ; retourne (écrites, perdues).
+
+    Une IntegrityError vient d'ordinaire d'une séance ou d'un étudiant
+    supprimé pendant que ses entrées attendaient : ces clés passent à NULL,
+    comme le ferait SET_NULL, et le lot est réinséré. Si le lot échoue encore,
+    les lignes sont insérées une à une et les fautives sont perdues. Les
+    autres erreurs (base indisponible) remontent à l'appelant.
+    """
+    try:
+        QRScanLog.objects.bulk_create(entries, batch_size=batch_size)
+        return len(entries), 0
+    except IntegrityError:
+        logger.warning(
+            "QR scan log batch of %d entries rejected, retrying without dangling keys",
+            len(entries),
+        )
+
+    from apps.academic_sessions.models import Seance
+    from apps.accounts.models import User
+
+    seance_ids = set(
+        Seance.objects.filter(
+            pk__in={e.seance_id for e in entries if e.seance_id}
+        ).values_list("pk", flat=True)
+    )
+    user_ids = set(
+        User.objects.filter(
+            pk__in={e.etudiant_id for e in entries if e.etudiant_id}
+        ).values_list("pk", flat=True)
+    )
+    for entry in entries:
+        if entry.seance_id not in seance_ids:
+            entry.seance_id = None
+        if entry.etudiant_id not in user_ids:
+            entry.etudiant_id = None
+    try:
+        QRScanLog.objects.bulk_create(entries, batch_size=batch_size)
+        return len(entries), 0
+    except IntegrityError:
+        pass
+
+    written = 0
+    for entry in entries:
+        entry.pk = None
+        try:
+            with transaction.atomic():
+                entry.save()
+            written += 1
+        except IntegrityError:
+            logger.warning("QR scan log entry dropped: %s", _serialize(entry))
+    return written, len(entries) - written
+
+
+def _sink():
+    return getattr(settings, "QR_SCAN_LOG_SINK", "sync")
+
+
+def _flush_size():
+    return getattr(settings, "QR_SCAN_LOG_FLUSH_SIZE", 200)
+
+
+def _max_pending():
+    return getattr(settings, "QR_SCAN_LOG_MAX_PENDING", 10000)
+
+
+def record_scan_log(entry):
+    """
+    Enregistre une tentative de scan (QRScanLog non sauvegardé) selon QR_SCAN_LOG_SINK.
+
+    L'horodatage est celui de la tentative (fixé à la construction de l'entrée),
+    pas celui de l'insertion différée.
+    """
+    sink = _sink()
+    if sink == "memory":
+        _get_buffer().submit(entry)
+    elif sink == "redis":
+        if not _push_redis(entry):
+            entry.save()
+    else:
+        entry.save()
+
+
+# ========================================================================== #
+#                    TAMPON DU PROCESSUS (MODE MEMORY)                        #
+# ========================================================================== #
+
+
+class _ScanLogBuffer:
+    """
+    File bornée du processus, vidée par un thread en arrière-plan avec un
+    bulk_create toutes les ``interval`` secondes ou dès ``flush_size`` entrées.
+
+    Au-delà de ``max_pending`` entrées en attente (base indisponible), les
+    nouvelles entrées sont perdues et comptées dans ``dropped``. Les entrées en
+    attente sont écrites à l'arrêt du processus (atexit).
+    """
+
+    def __init__(self, interval, flush_size, max_pending):
+        self.interval = interval
+        self.flush_size = flush_size
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.flushed = 0
+        self.dropped = 0
+        self._stop = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="qr-scan-log-flusher", daemon=True
+        )
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, entry):
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning(
+                    "QR scan log buffer full: %d entries dropped so far", self.dropped
+                )
+
+    def stats(self):
+        return {
+            "pending": self.queue.qsize(),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+        }
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self.thread.join(timeout=max(self.interval * 4, 5))
+
+    def _take_batch(self, deadline):
+        batch = []
+        while len(batch) < self.flush_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or self._stop.is_set():
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch(time.monotonic() + self.interval)
+            if batch:
+                self._write(batch)
+            elif self._stop.is_set():
+                return
+
+    def _write(self, entries):
+        close_old_connections()
+        try:
+            written, dropped = _insert_entries(entries, self.flush_size)
+            self.flushed += written
+            self.dropped += dropped
+        except Exception:
+            self.dropped += len(entries)
+            logger.exception(
+                "QR scan log flusher failed to write %d entries", len(entries)
+            )
+        finally:
+            close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def _get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = _ScanLogBuffer(
+                interval=getattr(settings, "QR_SCAN_LOG_FLUSH_MS", 500) / 1000,
+                flush_size=_flush_size(),
+                max_pending=_max_pending(),
+            )
+        return _buffer
+
+
+# ========================================================================== #
+#                    FILE REDIS PARTAGEE (MODE REDIS)                         #
+# ========================================================================== #
+
+
+def _redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def _serialize(entry):
+    row = {name: getattr(entry, name) for name in _ROW_FIELDS}
+    row["timestamp"] = entry.timestamp.isoformat()
+    return json.dumps(row)
+
+
+def _deserialize(raw):
+    row = json.loads(raw)
+    row["timestamp"] = parse_datetime(row["timestamp"])
+    return QRScanLog(**row)
+
+
+def _push_redis(entry):
+    """RPUSH de l'entrée ; False si Redis est indisponible (écriture directe)."""
+    try:
+        client = _redis()
+        length = client.rpush(REDIS_QUEUE_KEY, _serialize(entry))
+        overflow = length - _max_pending()
+        if overflow > 0:
+            # Drainer arrêté : on garde les plus récentes, la perte est comptée
+            pipe = client.pipeline()
+            pipe.ltrim(REDIS_QUEUE_KEY, overflow, -1)
+            pipe.incrby(REDIS_DROPPED_KEY, overflow)
+            pipe.execute()
+        return True
+    except Exception:
+        logger.warning(
+            "QR scan log queue unavailable, writing synchronously", exc_info=True
+        )
+        return False
+
+
+def drain_scan_log_queue(batch_size=None):
+    """
+    Insère un lot de la file Redis (un bulk_create). Retourne le nombre écrit.
+
+    Le lot est retiré atomiquement (LRANGE + LTRIM en MULTI) : plusieurs
+    drainers peuvent tourner côte à côte. Les lignes qu'aucune réinsertion
+    n'accepte (voir _insert_entries) sont perdues et comptées dans
+    REDIS_DROPPED_KEY ; seule une erreur transitoire (base indisponible)
+    remet le lot en tête de file, pour qu'un lot invalide ne bloque jamais
+    ceux qui le suivent.
+    """
+    batch_size = batch_size or _flush_size()
+    client = _redis()
+    pipe = client.pipeline(transaction=True)
+    pipe.lrange(REDIS_QUEUE_KEY, 0, batch_size - 1)
+    pipe.ltrim(REDIS_QUEUE_KEY, batch_size, -1)
+    raw_rows, _ = pipe.execute()
+    if not raw_rows:
+        return 0
+    try:
+        written, dropped = _insert_entries(
+            [_deserialize(raw) for raw in raw_rows], batch_size
+        )
+    except Exception:
+        client.lpush(REDIS_QUEUE_KEY, *reversed(raw_rows))
+        raise
+    if dropped:
+        client.incrby(REDIS_DROPPED_KEY, dropped)
+    return written
+
+
+# ========================================================================== #
+#                    METRIQUES                                               #
+# ========================================================================== #
+
+
+def scan_log_stats():
+    """
+    Métrique du journal de scans (drainer, supervision).
+
+    Returns:
+        dict: {'sink': str, 'pending': int, 'dropped': int, 'flushed': int|None}
+        (``flushed`` n'est connu que du processus en mode memory)
+    """
+    sink = _sink()
+    if sink == "memory":
+        return {"sink": sink, **_get_buffer().stats()}
+    if sink == "redis":
+        client = _redis()
+        return {
+            "sink": sink,
+            "pending": client.llen(REDIS_QUEUE_KEY),
+            "dropped": int(client.get(REDIS_DROPPED_KEY) or 0),
+            "flushed": None,
+        }
+    return {"sink": sink, "pending": 0, "dropped": 0, "flushed": None}
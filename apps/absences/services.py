@@ -3,34 +3,81 @@ FICHIER : apps/absences/services.py
 RESPONSABILITE : Logique metier centrale de la gestion des absences
 FONCTIONNALITES PRINCIPALES :
   - Calcul de statistiques d'absences (taux, heures, periodes)
+  - Resume d'absences materialise par inscription (InscriptionAbsenceSummary)
+  - Faits quotidiens d'absences (AbsenceDailyFact) et regroupements des statistiques admin
   - Calcul du pourcentage d'absence base sur les heures reelles
   - Detection des etudiants en alerte (depassement seuil)
   - Recalcul automatique de l'eligibilite examen (coeur du systeme)
-  - Calcul de risque centralise pour les dashboards
+  - Recalcul d'eligibilite par lot (changement de seuil cours / systeme, exemption)
+  - File durable de recalcul d'eligibilite traitee par un worker (EligibilityRecalcJob)
+  - Application d'un appel complet en ecritures groupees (formulaire et API)
+  - Calcul de risque centralise pour les dashboards (moteur SQL ensembliste)
   - Detection predictive d'absences (projection fin de semestre)
 DEPENDANCES CLES : absences.models, enrollments.Inscription, notifications.email
 """
 
 import datetime
 import logging
+from decimal import Decimal
 
+from django.conf import settings
 from django.db import transaction
-from django.db.models import DurationField, ExpressionWrapper, F, Sum
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    DecimalField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    IntegerField,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Least, TruncMonth
 from django.utils import timezone
 
 from apps.audits.models import LogAudit
 from apps.notifications.email import (
+    build_absence_recorded_email,
     build_eligibility_restored_email,
     build_threshold_exceeded_email,
     build_threshold_exceeded_professor_email,
+    send_batch_with_dedup,
     send_notification_email,
 )
 from apps.notifications.models import Notification
 
-from .models import Absence
+from .models import (
+    Absence,
+    AbsenceDailyFact,
+    EligibilityRecalcJob,
+    InscriptionAbsenceSummary,
+)
 
 logger = logging.getLogger(__name__)
 
+# Champs recopiés lors de l'upsert des résumés d'absences
+SUMMARY_FIELDS = [
+    "heures_non_justifiees",
+    "heures_en_attente",
+    "heures_justifiees",
+    "nb_absences",
+    "nb_non_justifiees",
+    "nb_en_attente",
+    "nb_justifiees",
+    "derniere_absence",
+    "prochaine_echeance",
+    "date_maj",
+]
+
 # Nombre de jours apres la date d'absence pour soumettre une justification
 JUSTIFICATION_DEADLINE_DAYS = 3
 
@@ -79,15 +126,9 @@ def calculer_absence_stats(inscription):
     # Seules les absences NON_JUSTIFIEE pour des séances passées comptent.
     # EN_ATTENTE = justificatif soumis, ne doit pas pénaliser l'étudiant.
     # Séances futures exclues pour ne pas fausser le taux.
-    today = timezone.localdate()
-    total_absence = float(
-        Absence.objects.filter(
-            id_inscription=inscription,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        ).aggregate(total=Sum("duree_absence"))["total"]
-        or 0
-    )
+    # Lecture du résumé matérialisé (une ligne indexée) au lieu d'un Sum().
+    summary = get_absence_summaries([inscription.pk]).get(inscription.pk)
+    total_absence = float(summary.heures_non_justifiees) if summary else 0.0
 
     total_periodes = inscription.id_cours.nombre_total_periodes or 0
     taux = min((total_absence / total_periodes) * 100, 100) if total_periodes else 0
@@ -111,6 +152,328 @@ def get_absences_queryset(inscription):
     )
 
 
+# ========================================================================== #
+#              RESUME D'ABSENCES MATERIALISE                                 #
+# ========================================================================== #
+
+
+def refresh_absence_summaries(inscription_ids):
+    """
+    Recalcule depuis la table absence les résumés des inscriptions données.
+
+    Une seule requête agrégée (GROUP BY inscription) puis un upsert groupé.
+    Les inscriptions qui n'ont plus aucune absence perdent leur ligne
+    (absence de ligne = aucune absence).
+
+    Les inscriptions sont verrouillées (SELECT FOR UPDATE, ordre des clés)
+    avant l'agrégat : deux transactions qui modifient les absences d'une même
+    inscription recalculent l'une après l'autre, la seconde voyant les
+    écritures validées de la première. Sans verrou, chacune agrège sans voir
+    l'autre et le dernier upsert écrase la mise à jour précédente.
+
+    Returns:
+        dict: {id_inscription: InscriptionAbsenceSummary} pour les lignes conservées
+    """
+    from apps.enrollments.models import Inscription
+
+    ids = {pk for pk in inscription_ids if pk is not None}
+    if not ids:
+        return {}
+
+    # savepoint=False : simple bloc atomique quand l'appelant en ouvre déjà un
+    with transaction.atomic(savepoint=False):
+        list(
+            Inscription.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        summaries = _aggregate_absence_summaries(ids)
+
+        empty_ids = ids - set(summaries)
+        if empty_ids:
+            InscriptionAbsenceSummary.objects.filter(id_inscription__in=empty_ids).delete()
+        if summaries:
+            InscriptionAbsenceSummary.objects.bulk_create(
+                summaries.values(),
+                update_conflicts=True,
+                unique_fields=["id_inscription"],
+                update_fields=SUMMARY_FIELDS,
+            )
+    return summaries
+
+
+def _aggregate_absence_summaries(ids):
+    """Résumés (non enregistrés) calculés depuis la table absence pour les inscriptions données."""
+    today = timezone.localdate()
+    past = Q(id_seance__date_seance__lte=today)
+    non_justifiee = Q(statut=Absence.Statut.NON_JUSTIFIEE)
+
+    rows = (
+        Absence.objects.filter(id_inscription__in=ids)
+        .values("id_inscription")
+        .annotate(
+            heures_non_justifiees=Sum("duree_absence", filter=non_justifiee & past),
+            heures_en_attente=Sum(
+                "duree_absence", filter=Q(statut=Absence.Statut.EN_ATTENTE)
+            ),
+            heures_justifiees=Sum(
+                "duree_absence", filter=Q(statut=Absence.Statut.JUSTIFIEE)
+            ),
+            nb_absences=Count("id_absence"),
+            nb_non_justifiees=Count("id_absence", filter=non_justifiee & past),
+            nb_en_attente=Count("id_absence", filter=Q(statut=Absence.Statut.EN_ATTENTE)),
+            nb_justifiees=Count("id_absence", filter=Q(statut=Absence.Statut.JUSTIFIEE)),
+            derniere_absence=Max("id_seance__date_seance", filter=past),
+            prochaine_echeance=Min("id_seance__date_seance", filter=non_justifiee & ~past),
+        )
+        .order_by()
+    )
+
+    summaries = {}
+    for row in rows:
+        pk = row["id_inscription"]
+        summaries[pk] = InscriptionAbsenceSummary(
+            id_inscription_id=pk,
+            heures_non_justifiees=row["heures_non_justifiees"] or Decimal("0"),
+            heures_en_attente=row["heures_en_attente"] or Decimal("0"),
+            heures_justifiees=row["heures_justifiees"] or Decimal("0"),
+            nb_absences=row["nb_absences"],
+            nb_non_justifiees=row["nb_non_justifiees"],
+            nb_en_attente=row["nb_en_attente"],
+            nb_justifiees=row["nb_justifiees"],
+            derniere_absence=row["derniere_absence"],
+            prochaine_echeance=row["prochaine_echeance"],
+        )
+    return summaries
+
+
+def refresh_stale_absence_summaries():
+    """
+    Recalcule les résumés dont une séance future (absence NON_JUSTIFIEE) est
+    désormais passée. Requête indexée sur prochaine_echeance, vide la plupart du temps.
+
+    Returns:
+        int: nombre de résumés recalculés
+    """
+    stale_ids = list(
+        InscriptionAbsenceSummary.objects.filter(
+            prochaine_echeance__lte=timezone.localdate()
+        ).values_list("id_inscription", flat=True)
+    )
+    refresh_absence_summaries(stale_ids)
+    return len(stale_ids)
+
+
+def get_absence_summaries(inscription_ids):
+    """
+    Retourne les résumés d'absences des inscriptions données, en une requête.
+
+    Les lignes échues (prochaine_echeance atteinte) sont recalculées en
+    mémoire, sans écriture : la lecture reste une lecture, la ligne est
+    rafraîchie par rebuild_absence_summaries --stale-only (cron). Une
+    inscription absente du dict n'a aucune absence.
+
+    Args:
+        inscription_ids: liste d'ids ou QuerySet values_list("id_inscription")
+
+    Returns:
+        dict: {id_inscription: InscriptionAbsenceSummary}
+    """
+    summaries = {
+        s.id_inscription_id: s
+        for s in InscriptionAbsenceSummary.objects.filter(
+            id_inscription__in=inscription_ids
+        )
+    }
+    stale_ids = [pk for pk, s in summaries.items() if s.is_stale]
+    if stale_ids:
+        for pk in stale_ids:
+            del summaries[pk]
+        summaries.update(_aggregate_absence_summaries(stale_ids))
+    return summaries
+
+
+def get_absence_sums(inscription_ids):
+    """
+    Heures d'absences NON_JUSTIFIEE (séances passées) par inscription.
+
+    Remplace l'agrégation Sum("duree_absence") dupliquée dans les vues :
+    même forme de résultat, lue depuis InscriptionAbsenceSummary.
+
+    Returns:
+        dict: {id_inscription: Decimal} (inscriptions sans heures omises)
+    """
+    return {
+        pk: s.heures_non_justifiees
+        for pk, s in get_absence_summaries(inscription_ids).items()
+        if s.heures_non_justifiees
+    }
+
+
+# ========================================================================== #
+#              FAITS QUOTIDIENS D'ABSENCES (STATISTIQUES)                    #
+# ========================================================================== #
+
+
+def _course_scope(courses, prefix=""):
+    """Filtre des couples (cours, année ou None pour toutes les années)."""
+    scope = Q()
+    for course_id, year_id in courses:
+        cell = Q(**{f"{prefix}id_cours_id": course_id})
+        if year_id is not None:
+            cell &= Q(**{f"{prefix}id_annee_id": year_id})
+        scope |= cell
+    return scope
+
+
+def refresh_absence_facts(courses):
+    """
+    Recalcule depuis la table absence les faits quotidiens des cours donnés.
+
+    Une requête agrégée (GROUP BY jour, cours, année, statut) limitée aux
+    absences de ces cours, un upsert groupé et la suppression des faits
+    devenus vides.
+
+    Lecture et upsert dans une même transaction, les cours verrouillés
+    (SELECT FOR UPDATE, ordre des clés) au préalable : deux rafraîchissements
+    concurrents d'un même cours s'exécutent l'un après l'autre, et le second
+    agrège les absences validées par le premier au lieu d'écraser ses faits
+    avec un agrégat plus ancien.
+
+    Args:
+        courses: couples (id du cours, id de l'année ou None pour toutes).
+
+    Returns:
+        int: nombre de faits écrits
+    """
+    from apps.academics.models import Cours
+
+    courses = {(course_id, year_id) for course_id, year_id in courses if course_id is not None}
+    if not courses:
+        return 0
+
+    # savepoint=False : simple bloc atomique quand l'appelant en ouvre déjà un
+    with transaction.atomic(savepoint=False):
+        list(
+            Cours.objects.select_for_update()
+            .filter(pk__in={course_id for course_id, _ in courses})
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        return _write_absence_facts(courses)
+
+
+def _write_absence_facts(courses):
+    """Agrégat et upsert des faits des couples (cours, année) donnés (verrous pris)."""
+    rows = (
+        Absence.objects.filter(_course_scope(courses, "id_inscription__"))
+        .values(
+            "statut",
+            day=F("id_seance__date_seance"),
+            course_id=F("id_inscription__id_cours"),
+            year_id=F("id_inscription__id_annee"),
+            departement_id=F("id_inscription__id_cours__id_departement"),
+            course_niveau=F("id_inscription__id_cours__niveau"),
+            professeur_id=F("id_inscription__id_cours__professeur"),
+        )
+        .annotate(nb=Count("id_absence"), heures=Sum("duree_absence"))
+        .order_by()
+    )
+    facts = {
+        (row["day"], row["course_id"], row["year_id"], row["statut"]): AbsenceDailyFact(
+            date_seance=row["day"],
+            id_cours_id=row["course_id"],
+            id_annee_id=row["year_id"],
+            id_departement_id=row["departement_id"],
+            niveau=row["course_niveau"],
+            professeur_id=row["professeur_id"],
+            statut=row["statut"],
+            nb_absences=row["nb"],
+            heures=row["heures"] or Decimal("0"),
+        )
+        for row in rows
+    }
+
+    empty_ids = [
+        pk
+        for pk, *cell in AbsenceDailyFact.objects.filter(_course_scope(courses)).values_list(
+            "pk", "date_seance", "id_cours_id", "id_annee_id", "statut"
+        )
+        if tuple(cell) not in facts
+    ]
+    if empty_ids:
+        AbsenceDailyFact.objects.filter(pk__in=empty_ids).delete()
+    if facts:
+        AbsenceDailyFact.objects.bulk_create(
+            facts.values(),
+            update_conflicts=True,
+            unique_fields=["date_seance", "id_cours", "id_annee", "statut"],
+            update_fields=["id_departement", "niveau", "professeur", "nb_absences", "heures"],
+        )
+    return len(facts)
+
+
+def refresh_absence_facts_for_inscriptions(inscription_ids):
+    """Recalcule les faits des couples (cours, année) d'un lot d'inscriptions."""
+    from apps.enrollments.models import Inscription
+
+    if not inscription_ids:
+        return 0
+    courses = (
+        Inscription.objects.filter(pk__in=inscription_ids)
+        .values_list("id_cours_id", "id_annee_id")
+        .distinct()
+    )
+    return refresh_absence_facts(courses)
+
+
+def absence_fact_breakdowns(academic_year=None):
+    """
+    Regroupements des statistiques admin, lus dans AbsenceDailyFact.
+
+    Six petites requêtes dont le coût dépend du nombre de jours de cours,
+    pas du nombre d'absences.
+
+    Args:
+        academic_year: année (inscriptions) à retenir, toutes si None.
+
+    Returns:
+        dict: listes de dicts ``total`` (nombre d'absences) par professeur
+        (top 5), cours (top 5), mois, département, statut et niveau.
+    """
+    facts = AbsenceDailyFact.objects.all()
+    if academic_year:
+        facts = facts.filter(id_annee=academic_year)
+    total = Sum("nb_absences")
+
+    return {
+        "top_professors": list(
+            facts.values(nom=F("professeur__nom"), prenom=F("professeur__prenom"))
+            .annotate(total=total)
+            .order_by("-total")[:5]
+        ),
+        "top_courses": list(
+            facts.values(nom_cours=F("id_cours__nom_cours"))
+            .annotate(total=total)
+            .order_by("-total")[:5]
+        ),
+        "monthly": list(
+            facts.annotate(month=TruncMonth("date_seance"))
+            .values("month")
+            .annotate(total=total)
+            .order_by("month")
+        ),
+        "departments": list(
+            facts.values(nom_departement=F("id_departement__nom_departement"))
+            .annotate(total=total)
+            .order_by("-total")
+        ),
+        "statuses": list(facts.values("statut").annotate(total=total).order_by("statut")),
+        "levels": list(facts.values("niveau").annotate(total=total).order_by("niveau")),
+    }
+
+
 # ========================================================================== #
 #              POURCENTAGE D'ABSENCE (HEURES REELLES)                        #
 # ========================================================================== #
@@ -188,12 +551,7 @@ def calculer_pourcentage_absence(etudiant, cours):
     # Somme des durées d'absence NON_JUSTIFIEE uniquement
     # EN_ATTENTE ne pénalise pas l'étudiant (justificatif soumis)
     total_heures_absence = float(
-        Absence.objects.filter(
-            id_inscription=inscription,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        ).aggregate(total=Sum("duree_absence"))["total"]
-        or 0
+        get_absence_sums([inscription.id_inscription]).get(inscription.id_inscription, 0)
     )
 
     pourcentage_absence = min(round((total_heures_absence / total_heures_cours) * 100, 2), 100)
@@ -266,16 +624,7 @@ def etudiants_en_alerte(cours, seuil=None):
     ).select_related("id_etudiant")
 
     # Agrégation des heures d'absence par inscription (séances passées, une seule requête SQL)
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscriptions,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscriptions)
 
     alertes = []
     for ins in inscriptions:
@@ -452,6 +801,418 @@ def _send_threshold_emails(student, professor, course_name, taux, seuil):
         logger.exception("Failed to send threshold emails for %s", course_name)
 
 
+# ========================================================================== #
+#           RECALCUL D'ELIGIBILITE PAR LOT (COURS / SYSTEME)                 #
+# ========================================================================== #
+
+
+def recalculer_eligibilite_batch(inscriptions_qs, system_threshold=None):
+    """
+    Version ensembliste de recalculer_eligibilite() pour un lot d'inscriptions.
+
+    Une seule requête (annotate_absence_risk) sélectionne les inscriptions dont
+    eligible_examen doit basculer ; seules celles-ci sont écrites (bulk_update),
+    avec leurs Notification et LogAudit insérés en lot. Les emails partent
+    après le commit, comme dans la version unitaire.
+
+    Utilisé quand un seuil change (cours, exemption, seuil système) : un
+    changement qui touche des milliers d'inscriptions reste en O(1) requêtes.
+
+    Args:
+        inscriptions_qs: QuerySet d'Inscription à réévaluer
+        system_threshold: Seuil système pré-chargé (optionnel)
+
+    Returns:
+        dict: {'blocked': int, 'unblocked': int}
+    """
+    from apps.enrollments.models import Inscription
+
+    flipped_qs = (
+        annotate_absence_risk(inscriptions_qs, system_threshold)
+        .filter(
+            Q(is_blocked=True, eligible_examen=True)
+            | Q(is_blocked=False, eligible_examen=False)
+        )
+        .select_related("id_etudiant", "id_cours__professeur")
+    )
+
+    flipped = list(flipped_qs)
+    if not flipped:
+        return {"blocked": 0, "unblocked": 0}
+
+    with transaction.atomic():
+        for ins in flipped:
+            ins.eligible_examen = not ins.is_blocked
+        Inscription.objects.bulk_update(flipped, ["eligible_examen"], batch_size=500)
+
+        notifications = []
+        audits = []
+        blocked_emails = []
+        restored_emails = []
+        for ins in flipped:
+            cours = ins.id_cours
+            if ins.is_blocked:
+                if ins.exemption_40:
+                    msg = (
+                        f"ALERTE : Seuil d'exemption de {ins.seuil_effectif}% dépassé pour {cours.nom_cours}. "
+                        f"Examen bloqué malgré l'exemption."
+                    )
+                else:
+                    msg = f"ALERTE : Seuil de {ins.seuil}% dépassé pour {cours.nom_cours}. Examen bloqué."
+                notifications.append(
+                    Notification(id_utilisateur=ins.id_etudiant, message=msg, type="ALERTE")
+                )
+                audits.append(
+                    LogAudit(
+                        id_utilisateur=ins.id_etudiant,
+                        action=(
+                            f"CRITIQUE: Blocage automatique examen - {cours.nom_cours} "
+                            f"(Taux: {ins.taux:.1f}%, Seuil effectif: {ins.seuil_effectif}%"
+                            f"{', exempté' if ins.exemption_40 else ''})"
+                        ),
+                        adresse_ip="0.0.0.0",  # nosec B104
+                        niveau="CRITIQUE",
+                        objet_type="INSCRIPTION",
+                        objet_id=ins.id_inscription,
+                    )
+                )
+                blocked_emails.append(
+                    (ins.id_etudiant, cours.professeur, cours.nom_cours, ins.taux, ins.seuil_effectif)
+                )
+            else:
+                notifications.append(
+                    Notification(
+                        id_utilisateur=ins.id_etudiant,
+                        message=f"Information : Vous êtes à nouveau éligible à l'examen pour {cours.nom_cours}.",
+                        type="INFO",
+                    )
+                )
+                restored_emails.append((ins.id_etudiant, cours.nom_cours))
+
+        Notification.objects.bulk_create(notifications, batch_size=500)
+        LogAudit.objects.bulk_create(audits, batch_size=500)
+
+        transaction.on_commit(
+            lambda: _send_batch_eligibility_emails(blocked_emails, restored_emails)
+        )
+
+    logger.info(
+        "Batch eligibility recalculation: %d blocked, %d unblocked",
+        len(blocked_emails),
+        len(restored_emails),
+    )
+    return {"blocked": len(blocked_emails), "unblocked": len(restored_emails)}
+
+
+def _send_batch_eligibility_emails(blocked, restored):
+    """Emails de blocage / déblocage d'un recalcul par lot. Never raises."""
+    for student, professor, course_name, taux, seuil in blocked:
+        _send_threshold_emails(student, professor, course_name, taux, seuil)
+    for student, course_name in restored:
+        try:
+            subj, body, html_body = build_eligibility_restored_email(student, course_name)
+            send_notification_email(student, subj, body, html_body)
+        except Exception:
+            logger.exception("Failed to send eligibility restored email for %s", course_name)
+
+
+# ========================================================================== #
+#              FILE DE RECALCUL D'ELIGIBILITE (WORKER)                       #
+# ========================================================================== #
+
+# Délai avant nouvelle tentative : 30s, 60s, 120s... plafonné à 1h
+RECALC_RETRY_BASE_SECONDS = 30
+RECALC_RETRY_MAX_SECONDS = 3600
+
+
+def schedule_eligibility_recalc(inscription_ids, system_threshold=None):
+    """
+    Point d'entrée unique des recalculs déclenchés par les signaux.
+
+    Avec ELIGIBILITY_RECALC_ASYNC, les inscriptions sont mises en file
+    (EligibilityRecalcJob) et traitées par le worker process_eligibility_queue :
+    la requête qui a modifié les absences ne paie ni les emails, ni les
+    notifications, ni l'audit. Sinon, recalcul immédiat par lot.
+
+    Returns:
+        int: nombre d'inscriptions mises en file ou recalculées
+    """
+    from apps.enrollments.models import Inscription
+
+    inscription_ids = set(inscription_ids)
+    if not inscription_ids:
+        return 0
+    if getattr(settings, "ELIGIBILITY_RECALC_ASYNC", False):
+        return enqueue_eligibility_recalc(inscription_ids)
+    recalculer_eligibilite_batch(
+        Inscription.objects.filter(pk__in=inscription_ids), system_threshold
+    )
+    return len(inscription_ids)
+
+
+def enqueue_eligibility_recalc(inscription_ids):
+    """
+    Met des inscriptions en file de recalcul, de façon idempotente.
+
+    Une inscription déjà en file (même en ECHEC) voit sa demande réinitialisée
+    au lieu d'être dupliquée : une seule requête d'upsert pour tout le lot.
+    Les inscriptions supprimées entre-temps sont ignorées.
+
+    Returns:
+        int: nombre d'inscriptions mises en file
+    """
+    from apps.enrollments.models import Inscription
+
+    ids = sorted(
+        Inscription.objects.filter(pk__in=set(inscription_ids)).values_list("pk", flat=True)
+    )
+    if not ids:
+        return 0
+
+    now = timezone.now()
+    EligibilityRecalcJob.objects.bulk_create(
+        [
+            EligibilityRecalcJob(
+                id_inscription_id=pk, prochaine_tentative=now, date_demande=now
+            )
+            for pk in ids
+        ],
+        update_conflicts=True,
+        unique_fields=["id_inscription"],
+        update_fields=[
+            "statut",
+            "tentatives",
+            "prochaine_tentative",
+            "derniere_erreur",
+            "date_demande",
+        ],
+        batch_size=1000,
+    )
+    return len(ids)
+
+
+def process_eligibility_queue(batch_size=200):
+    """
+    Traite un lot de demandes de recalcul prêtes (appelé par le worker).
+
+    Les lignes sont verrouillées (SKIP LOCKED) le temps du traitement : plusieurs
+    workers peuvent tourner en parallèle, et une nouvelle demande pour une
+    inscription en cours de traitement attend la fin du lot au lieu d'être perdue.
+    Si le lot échoue, chaque inscription est reprise seule pour isoler la
+    fautive ; celle-ci est replanifiée avec un délai exponentiel, puis passe
+    en ECHEC après EligibilityRecalcJob.MAX_TENTATIVES.
+
+    Returns:
+        dict: {'processed': int, 'retried': int, 'failed': int}
+    """
+    from apps.enrollments.models import Inscription
+
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            EligibilityRecalcJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                statut=EligibilityRecalcJob.Statut.EN_ATTENTE,
+                prochaine_tentative__lte=now,
+            )
+            .order_by("prochaine_tentative")[:batch_size]
+        )
+        if not jobs:
+            return {"processed": 0, "retried": 0, "failed": 0}
+
+        ids = [job.id_inscription_id for job in jobs]
+        errors = {}
+        try:
+            with transaction.atomic():
+                recalculer_eligibilite_batch(Inscription.objects.filter(pk__in=ids))
+        except Exception:
+            logger.exception("Batch eligibility job failed, retrying inscriptions one by one")
+            for pk in ids:
+                try:
+                    with transaction.atomic():
+                        recalculer_eligibilite_batch(Inscription.objects.filter(pk=pk))
+                except Exception as exc:
+                    errors[pk] = exc
+
+        EligibilityRecalcJob.objects.filter(pk__in=[pk for pk in ids if pk not in errors]).delete()
+
+        retried = failed = 0
+        for job in jobs:
+            exc = errors.get(job.id_inscription_id)
+            if exc is None:
+                continue
+            job.tentatives += 1
+            job.derniere_erreur = f"{type(exc).__name__}: {exc}"[:2000]
+            if job.tentatives >= EligibilityRecalcJob.MAX_TENTATIVES:
+                job.statut = EligibilityRecalcJob.Statut.ECHEC
+                failed += 1
+                logger.error(
+                    "Eligibility recalculation for inscription %s failed %d times, giving up",
+                    job.id_inscription_id,
+                    job.tentatives,
+                )
+            else:
+                delay = min(
+                    RECALC_RETRY_BASE_SECONDS * 2 ** (job.tentatives - 1),
+                    RECALC_RETRY_MAX_SECONDS,
+                )
+                job.prochaine_tentative = now + datetime.timedelta(seconds=delay)
+                retried += 1
+        if errors:
+            EligibilityRecalcJob.objects.bulk_update(
+                [job for job in jobs if job.id_inscription_id in errors],
+                ["statut", "tentatives", "prochaine_tentative", "derniere_erreur"],
+            )
+
+    return {"processed": len(ids) - len(errors), "retried": retried, "failed": failed}
+
+
+def eligibility_queue_depth():
+    """
+    Métrique de profondeur de la file (worker, health check).
+
+    Returns:
+        dict: {'pending': int, 'ready': int, 'failed': int, 'oldest_age_seconds': int}
+    """
+    now = timezone.now()
+    en_attente = Q(statut=EligibilityRecalcJob.Statut.EN_ATTENTE)
+    stats = EligibilityRecalcJob.objects.aggregate(
+        pending=Count("pk", filter=en_attente),
+        ready=Count("pk", filter=en_attente & Q(prochaine_tentative__lte=now)),
+        failed=Count("pk", filter=Q(statut=EligibilityRecalcJob.Statut.ECHEC)),
+        oldest=Min("date_demande", filter=en_attente),
+    )
+    oldest = stats.pop("oldest")
+    stats["oldest_age_seconds"] = int((now - oldest).total_seconds()) if oldest else 0
+    return stats
+
+
+# ========================================================================== #
+#                    APPEL COMPLET PAR LOT                                   #
+# ========================================================================== #
+
+# Champs réécrits lorsqu'un appel modifie une absence existante
+ROSTER_UPDATE_FIELDS = [
+    "type_absence",
+    "duree_absence",
+    "statut",
+    "encodee_par",
+    "note_professeur",
+]
+
+
+def apply_attendance_roster(seance, entries, user):
+    """
+    Applique un appel complet à une séance en écritures groupées.
+
+    À appeler dans une transaction, la séance verrouillée (select_for_update).
+    Les absences existantes sont lues en une requête, comparées en mémoire à
+    l'appel, puis le diff est appliqué par bulk_create / bulk_update / un
+    delete() dans bulk_absence_changes() (un seul recalcul pour le lot).
+
+    RÈGLE MÉTIER : les absences JUSTIFIEE et EN_ATTENTE ne sont ni modifiées
+    ni supprimées par un appel.
+
+    Args:
+        seance: Séance verrouillée
+        entries: dicts validés {"inscription": Inscription,
+            "status": "PRESENT" | "ABSENT", "type_absence", "duree", "note"}
+        user: Utilisateur qui encode l'appel
+
+    Returns:
+        dict : "created" / "updated" (listes d'Absence), "deleted",
+        "unchanged" et "protected" (listes d'id_inscription)
+    """
+    from .signals import bulk_absence_changes
+
+    existing = {
+        ab.id_inscription_id: ab
+        for ab in Absence.objects.filter(id_seance=seance).order_by()
+    }
+    diff = {"created": [], "updated": [], "deleted": [], "unchanged": [], "protected": []}
+    to_delete = []
+
+    for entry in entries:
+        inscription = entry["inscription"]
+        absence = existing.get(inscription.id_inscription)
+        if absence and absence.statut in (
+            Absence.Statut.JUSTIFIEE, Absence.Statut.EN_ATTENTE
+        ):
+            diff["protected"].append(inscription.id_inscription)
+            continue
+
+        if entry["status"] != "ABSENT":
+            if absence:
+                to_delete.append(absence.id_absence)
+                diff["deleted"].append(inscription.id_inscription)
+            else:
+                diff["unchanged"].append(inscription.id_inscription)
+            continue
+
+        note = entry.get("note", "")
+        if (
+            absence
+            and absence.type_absence == entry["type_absence"]
+            and absence.duree_absence == entry["duree"]
+            and absence.statut == Absence.Statut.NON_JUSTIFIEE
+            and absence.encodee_par_id == user.pk
+            and absence.note_professeur == note
+        ):
+            diff["unchanged"].append(inscription.id_inscription)
+            continue
+
+        target = absence or Absence(id_seance=seance)
+        target.id_inscription = inscription  # déjà chargée par l'appelant
+        target.type_absence = entry["type_absence"]
+        target.duree_absence = entry["duree"]
+        target.statut = Absence.Statut.NON_JUSTIFIEE
+        target.encodee_par = user
+        target.note_professeur = note
+        diff["updated" if absence else "created"].append(target)
+
+    with bulk_absence_changes() as touched:
+        Absence.objects.bulk_create(diff["created"])
+        Absence.objects.bulk_update(diff["updated"], ROSTER_UPDATE_FIELDS)
+        if to_delete:
+            Absence.objects.filter(id_absence__in=to_delete).delete()
+        touched.update(ab.id_inscription_id for ab in diff["created"] + diff["updated"])
+    return diff
+
+
+def send_absence_recorded_emails(inscriptions, course, date_seance, seance_id):
+    """
+    Emails « absence enregistrée » d'un appel, à envoyer après commit.
+
+    Les taux sont lus en une requête (résumés d'absences) ; la déduplication,
+    le rendu et l'envoi passent par send_batch_with_dedup() (une requête
+    EmailLog, une connexion SMTP). Never raises.
+    """
+    try:
+        sums = get_absence_sums([ins.pk for ins in inscriptions])
+    except Exception:
+        logger.exception("Failed to load absence sums for absence recorded emails")
+        return
+    total_periodes = course.nombre_total_periodes or 0
+    items = []
+    for inscription in inscriptions:
+        total_absence = float(sums.get(inscription.pk, 0))
+        taux = min((total_absence / total_periodes) * 100, 100) if total_periodes else 0
+        items.append(
+            (
+                inscription.id_etudiant,
+                f"{inscription.id_inscription}-{seance_id}",
+                taux,
+            )
+        )
+    send_batch_with_dedup(
+        items,
+        event_type="absence_recorded",
+        build_email=lambda student, taux: build_absence_recorded_email(
+            student, course.nom_cours, date_seance, taux
+        ),
+    )
+
+
 # ========================================================================== #
 #                    SEUIL SYSTEME PAR DEFAUT                                #
 # ========================================================================== #
@@ -464,7 +1225,7 @@ def get_system_threshold():
     """
     from apps.dashboard.models import SystemSettings
 
-    return SystemSettings.get_settings().default_absence_threshold
+    return SystemSettings.current().default_absence_threshold
 
 
 # ========================================================================== #
@@ -528,55 +1289,159 @@ def calculer_risque_inscription(inscription, system_threshold=None):
     }
 
 
-def get_at_risk_count_for_queryset(inscriptions_qs, system_threshold=None):
+def annotate_absence_risk(inscriptions_qs, system_threshold=None):
     """
-    FIX VERT #15 — Compte les inscriptions à risque dans un queryset.
+    Moteur de risque ensembliste : la règle du seuil évaluée entièrement en SQL.
+
+    Même règle que calculer_risque_inscription(), appliquée à tout un queryset
+    sans boucle Python. Le résultat reste un QuerySet : il peut être compté,
+    filtré (ex: .filter(is_blocked=True)), trié et paginé en base.
 
-    Optimisé pour les vues dashboard : pré-charge le seuil système une seule fois,
-    et effectue la sommation des absences en une seule requête SQL agrégée.
+    Annotations ajoutées :
+        total_absence (Decimal)   : heures NON_JUSTIFIEE des séances passées
+        taux (float)              : total_absence / total périodes * 100, plafonné à 100
+        seuil (int)               : seuil du cours, sinon seuil système
+        seuil_effectif (int)      : seuil + marge d'exemption (plafonné à 100) si exempté
+        is_at_risk (bool)         : taux >= seuil (cours avec périodes uniquement)
+        is_blocked (bool)         : taux >= seuil_effectif
+        is_under_exemption (bool) : exempté, entre seuil et seuil_effectif
 
     Args:
-        inscriptions_qs: QuerySet d'Inscription filtré (doit inclure select_related id_cours)
+        inscriptions_qs: QuerySet d'Inscription déjà filtré (année, statut, ...)
         system_threshold: Seuil système pré-chargé (optionnel)
 
     Returns:
-        tuple: (at_risk_count: int, absence_sums: dict {id_inscription: total_heures})
+        QuerySet annoté
     """
     if system_threshold is None:
         system_threshold = get_system_threshold()
 
-    inscription_ids = list(inscriptions_qs.values_list("id_inscription", flat=True))
-    if not inscription_ids:
-        return 0, {}
-
+    # Les heures viennent du résumé matérialisé. Une ligne échue (séance
+    # future désormais passée, pas encore rafraîchie par le cron) est
+    # re-sommée depuis la table absence pour cette seule inscription.
     today = timezone.localdate()
-
-    # Agrégation SQL unique — seules les NON_JUSTIFIEE pour séances passées comptent
-    absence_sums = dict(
+    heures_passees = (
         Absence.objects.filter(
-            id_inscription__in=inscription_ids,
+            id_inscription=OuterRef("pk"),
             statut=Absence.Statut.NON_JUSTIFIEE,
             id_seance__date_seance__lte=today,
         )
+        .order_by()
         .values("id_inscription")
         .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
+        .values("total")
     )
+    hours_field = DecimalField(max_digits=8, decimal_places=2)
 
-    at_risk_count = 0
-    for ins in inscriptions_qs:
-        cours = ins.id_cours
-        if not cours.nombre_total_periodes:
-            continue
-        seuil = (
-            cours.seuil_absence if cours.seuil_absence is not None else system_threshold
+    return (
+        inscriptions_qs.annotate(
+            total_absence=Coalesce(
+                Case(
+                    When(
+                        absence_summary__prochaine_echeance__lte=today,
+                        then=Subquery(heures_passees, output_field=hours_field),
+                    ),
+                    default=F("absence_summary__heures_non_justifiees"),
+                    output_field=hours_field,
+                ),
+                Value(Decimal("0")),
+                output_field=hours_field,
+            ),
+            seuil=Coalesce(
+                F("id_cours__seuil_absence"),
+                Value(system_threshold),
+                output_field=IntegerField(),
+            ),
         )
-        total_abs = absence_sums.get(ins.id_inscription, 0) or 0
-        taux = min((total_abs / cours.nombre_total_periodes) * 100, 100)
-        seuil_effectif = min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-        if taux >= seuil_effectif:
-            at_risk_count += 1
+        .annotate(
+            taux=Case(
+                When(
+                    id_cours__nombre_total_periodes__gt=0,
+                    then=Least(
+                        Cast("total_absence", FloatField())
+                        * Value(100.0)
+                        / F("id_cours__nombre_total_periodes"),
+                        Value(100.0),
+                    ),
+                ),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+            seuil_effectif=Case(
+                When(
+                    exemption_40=True,
+                    then=Least(F("seuil") + F("exemption_margin"), Value(100)),
+                ),
+                default=F("seuil"),
+                output_field=IntegerField(),
+            ),
+        )
+        .annotate(
+            # Un cours sans périodes n'est jamais en infraction (taux 0 >= seuil 0)
+            is_at_risk=ExpressionWrapper(
+                Q(id_cours__nombre_total_periodes__gt=0, taux__gte=F("seuil")),
+                output_field=BooleanField(),
+            ),
+            is_blocked=ExpressionWrapper(
+                Q(
+                    id_cours__nombre_total_periodes__gt=0,
+                    taux__gte=F("seuil_effectif"),
+                ),
+                output_field=BooleanField(),
+            ),
+            is_under_exemption=ExpressionWrapper(
+                Q(
+                    id_cours__nombre_total_periodes__gt=0,
+                    exemption_40=True,
+                    taux__gte=F("seuil"),
+                    taux__lt=F("seuil_effectif"),
+                ),
+                output_field=BooleanField(),
+            ),
+        )
+    )
+
 
+def at_risk_item(ins):
+    """
+    Ligne d'affichage (dict) pour une inscription annotée par annotate_absence_risk().
+    Format attendu par les templates des listes d'étudiants en infraction.
+    """
+    return {
+        "inscription": ins,
+        "etudiant": ins.id_etudiant,
+        "cours": ins.id_cours,
+        "total_abs": float(ins.total_absence),
+        "rate": round(ins.taux, 1),
+        "seuil": ins.seuil,
+        "seuil_effectif": ins.seuil_effectif,
+        "is_blocked": ins.is_blocked,
+        "is_under_exemption": ins.is_under_exemption,
+        "exemption": ins.exemption_40,
+        "exemption_margin": ins.exemption_margin,
+    }
+
+
+def get_at_risk_count_for_queryset(inscriptions_qs, system_threshold=None):
+    """
+    FIX VERT #15 — Compte les inscriptions à risque (bloquées) dans un queryset.
+
+    Le comptage est un seul COUNT SQL via annotate_absence_risk() ; les heures
+    par inscription sont lues dans le résumé matérialisé.
+
+    Args:
+        inscriptions_qs: QuerySet d'Inscription filtré
+        system_threshold: Seuil système pré-chargé (optionnel)
+
+    Returns:
+        tuple: (at_risk_count: int, absence_sums: dict {id_inscription: total_heures})
+    """
+    at_risk_count = (
+        annotate_absence_risk(inscriptions_qs, system_threshold)
+        .filter(is_blocked=True)
+        .count()
+    )
+    absence_sums = get_absence_sums(inscriptions_qs.values("id_inscription"))
     return at_risk_count, absence_sums
 
 
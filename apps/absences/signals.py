@@ -4,24 +4,58 @@ RESPONSABILITE : Signaux Django pour recalcul automatique de l'eligibilite
 FONCTIONNALITES PRINCIPALES :
   - post_save sur Absence : recalcule eligibilite apres chaque sauvegarde
   - post_delete sur Absence : recalcule eligibilite apres suppression
+  - Maintient InscriptionAbsenceSummary (resume materialise) dans la transaction
+  - Changement de seuil (cours ou systeme) : recalcul d'eligibilite par lot
   - Utilise transaction.on_commit() pour eviter les ecritures imbriquees
-DEPENDANCES CLES : absences.services.recalculer_eligibilite
+  - Regroupe par transaction les inscriptions touchees et les cles de cache :
+    un seul recalcul par lot et une seule invalidation au commit
+  - bulk_absence_changes() : ecritures en masse (bulk_create/bulk_update/delete)
+    traitees en un seul passage (resumes, eligibilite, cache)
+  - ELIGIBILITY_RECALC_ASYNC : recalculs mis en file pour le worker au lieu d'etre faits en requete
+  - Invalidation du contexte de scan QR en cache (seance validee, inscriptions modifiees,
+    batiment du cours ou de la seance modifie) et de l'index des zones GPS (Campus, Batiment)
+  - Versions de donnees des tableaux de bord (etudiant, cours, annee) changees au
+    commit par les modifications d'Absence, Justification, Inscription, Seance et Cours
+  - Faits quotidiens d'absences (AbsenceDailyFact) recalcules au commit pour les
+    cours touches (absences, date de seance, departement / niveau / professeur du cours)
+DEPENDANCES CLES : absences.services (schedule_eligibility_recalc, refresh_absence_summaries,
+                   refresh_absence_facts),
+                   absences.qr_context, absences.geofence, dashboard.data_versions
 """
 
 import logging
+import threading
+import weakref
+from contextlib import contextmanager
 
 from django.core.cache import cache
 from django.db import transaction
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from apps.dashboard.data_versions import (
+    absence_version_keys,
+    course_version_keys,
+    inscription_version_keys,
+    version_keys,
+)
+
+from .geofence import invalidate_geofences
 from .models import Absence
-from .services import recalculer_eligibilite
+from .qr_context import (
+    invalidate_course_scan_contexts,
+    invalidate_scan_roster,
+    invalidate_seance_scan_contexts,
+)
+from .services import (
+    refresh_absence_facts,
+    refresh_absence_facts_for_inscriptions,
+    refresh_absence_summaries,
+    schedule_eligibility_recalc,
+)
 
 logger = logging.getLogger("django")
 
-CACHE_KEY_AT_RISK = "admin_dashboard:at_risk_count"
-
 
 # ── P3-02 FIX: Recalculate eligibility when course threshold changes ────────
 
@@ -42,44 +76,390 @@ def cours_seuil_changed(sender, instance, **kwargs):
     inscriptions = Inscription.objects.filter(
         id_cours=instance,
         status=Inscription.Status.EN_COURS,
-    ).select_related("id_cours")
+    )
 
     if not inscriptions.exists():
         return
 
     def _recalculate_all():
-        for ins in inscriptions:
+        try:
+            schedule_eligibility_recalc(inscriptions.values_list("pk", flat=True))
+        except Exception:
+            logger.exception(
+                "Failed to recalculate eligibility for course %s after seuil change",
+                instance.pk,
+            )
+
+    transaction.on_commit(_recalculate_all)
+
+
+# ── Seuil système par défaut : recalcul des cours sans seuil personnalisé ───
+
+
+@receiver(pre_save, sender="dashboard.SystemSettings")
+def system_settings_remember_threshold(sender, instance, **kwargs):
+    """Mémorise l'ancien seuil par défaut pour détecter sa modification."""
+    instance._previous_default_threshold = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list("default_absence_threshold", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender="dashboard.SystemSettings")
+def system_threshold_changed(sender, instance, created, **kwargs):
+    """
+    Quand le seuil système par défaut change, recalcule eligible_examen pour
+    toutes les inscriptions actives dont le cours n'a pas de seuil personnalisé.
+    """
+    previous = getattr(instance, "_previous_default_threshold", None)
+    if created or previous is None or previous == instance.default_absence_threshold:
+        return
+
+    from apps.enrollments.models import Inscription
+
+    inscriptions = Inscription.objects.filter(
+        status=Inscription.Status.EN_COURS,
+        id_cours__seuil_absence__isnull=True,
+    )
+    new_threshold = instance.default_absence_threshold
+
+    def _recalculate_all():
+        try:
+            schedule_eligibility_recalc(
+                inscriptions.values_list("pk", flat=True),
+                system_threshold=new_threshold,
+            )
+        except Exception:
+            logger.exception(
+                "Failed to recalculate eligibility after system threshold change"
+            )
+
+    transaction.on_commit(_recalculate_all)
+
+
+@receiver(post_save, sender="academic_sessions.Seance")
+def seance_date_changed(sender, instance, created, **kwargs):
+    """
+    Une séance déplacée peut passer du futur au passé (ou l'inverse) :
+    les résumés d'absences des inscriptions concernées sont recalculés.
+    """
+    if created:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "date_seance" not in update_fields:
+        return
+
+    inscription_ids = list(
+        Absence.objects.filter(id_seance=instance).values_list(
+            "id_inscription", flat=True
+        )
+    )
+    if inscription_ids:
+        refresh_absence_summaries(inscription_ids)
+        _refresh_facts_on_commit([(instance.id_cours_id, None)])
+
+
+@receiver(post_save, sender="academics.Cours")
+def cours_absence_facts(sender, instance, created, **kwargs):
+    """Département, niveau ou professeur du cours recopiés dans ses faits d'absences."""
+    if created:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not {
+        "id_departement",
+        "niveau",
+        "professeur",
+    } & set(update_fields):
+        return
+    _refresh_facts_on_commit([(instance.id_cours, None)])
+
+
+# ── Contexte de scan QR en cache (apps.absences.qr_context) ─────────────────
+
+
+@receiver(post_save, sender="academic_sessions.Seance")
+def seance_validated_qr_context(sender, instance, created, **kwargs):
+    """Une séance validée n'accepte plus de scans : ses contextes en cache sont retirés."""
+    if created or not instance.validated:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "validated" not in update_fields:
+        return
+    invalidate_seance_scan_contexts(instance.id_seance)
+
+
+@receiver(post_save, sender="enrollments.Inscription")
+@receiver(post_delete, sender="enrollments.Inscription")
+def inscription_qr_roster_changed(sender, instance, **kwargs):
+    """Inscription créée, modifiée (statut) ou supprimée : le roster en cache est périmé."""
+    invalidate_scan_roster(instance.id_cours_id, instance.id_annee_id)
+
+
+@receiver(post_save, sender="academic_sessions.Seance")
+def seance_batiment_qr_context(sender, instance, created, **kwargs):
+    """Bâtiment de la séance modifié : la zone GPS de ses contextes en cache est périmée."""
+    update_fields = kwargs.get("update_fields")
+    if created or (update_fields is not None and "batiment" not in update_fields):
+        return
+    invalidate_seance_scan_contexts(instance.id_seance)
+
+
+@receiver(post_save, sender="academics.Cours")
+def cours_batiment_qr_context(sender, instance, created, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if created or (update_fields is not None and "batiment" not in update_fields):
+        return
+    invalidate_course_scan_contexts(instance.id_cours)
+
+
+@receiver(post_save, sender="academics.Campus")
+@receiver(post_delete, sender="academics.Campus")
+@receiver(post_save, sender="academics.Batiment")
+@receiver(post_delete, sender="academics.Batiment")
+def geofence_changed(sender, instance, **kwargs):
+    """Campus ou bâtiment modifié : l'index des zones GPS est reconstruit (tous processus)."""
+    transaction.on_commit(invalidate_geofences)
+
+
+# ── Versions de données des tableaux de bord (apps.dashboard.data_versions) ─
+
+
+@receiver(post_save, sender="enrollments.Inscription")
+@receiver(post_delete, sender="enrollments.Inscription")
+def inscription_dashboard_versions(sender, instance, **kwargs):
+    _bump_dashboard_versions(
+        version_keys(
+            instance.id_etudiant_id, instance.id_cours_id, instance.id_annee_id
+        )
+    )
+
+
+@receiver(post_save, sender="absences.Justification")
+@receiver(post_delete, sender="absences.Justification")
+def justification_dashboard_versions(sender, instance, **kwargs):
+    _bump_dashboard_versions(absence_version_keys(instance.id_absence_id))
+
+
+@receiver(post_save, sender="academic_sessions.Seance")
+@receiver(post_delete, sender="academic_sessions.Seance")
+def seance_dashboard_versions(sender, instance, **kwargs):
+    """Séance ajoutée, déplacée, validée ou supprimée : cours, année et étudiants du cours."""
+    _bump_dashboard_versions(courses=[(instance.id_cours_id, instance.id_annee_id)])
+
+
+@receiver(post_save, sender="academics.Cours")
+@receiver(post_delete, sender="academics.Cours")
+def cours_dashboard_versions(sender, instance, **kwargs):
+    """Seuil, volume horaire, professeur ou statut du cours modifié."""
+    _bump_dashboard_versions(courses=[(instance.id_cours, instance.id_annee_id)])
+
+
+class _CommitBuffer:
+    """
+    Inscriptions et clés de cache touchées pendant la transaction courante.
+
+    Enregistré une seule fois via transaction.on_commit() : au commit, les
+    inscriptions (dédupliquées) sont transmises en un lot à
+    schedule_eligibility_recalc() (recalcul immédiat ou mise en file selon
+    ELIGIBILITY_RECALC_ASYNC) et chaque clé de cache n'est supprimée qu'une fois. Un appel de
+    mark_absence sur 200 étudiants coûte ainsi un recalcul et une invalidation.
+    Les faits quotidiens et les versions de tableaux de bord des inscriptions
+    dont les absences ont changé sont recalculés au même moment.
+    """
+
+    def __init__(self):
+        self.inscription_ids = set()
+        self.changed_inscription_ids = set()
+        self.cache_keys = set()
+        self.pending = False
+
+    def __call__(self):
+        self.pending = False
+        if self.inscription_ids:
             try:
-                recalculer_eligibilite(ins)
+                schedule_eligibility_recalc(self.inscription_ids)
             except Exception:
                 logger.exception(
-                    "Failed to recalculate eligibility for inscription %s after seuil change",
-                    ins.id_inscription,
+                    "Failed to recalculate eligibility for inscriptions %s",
+                    sorted(self.inscription_ids),
                 )
-        cache.delete(CACHE_KEY_AT_RISK)
+        if self.changed_inscription_ids:
+            _refresh_facts(
+                refresh_absence_facts_for_inscriptions, self.changed_inscription_ids
+            )
+            self.cache_keys.update(
+                inscription_version_keys(self.changed_inscription_ids)
+            )
+        if self.cache_keys:
+            cache.delete_many(list(self.cache_keys))
 
-    transaction.on_commit(_recalculate_all)
+
+class _VersionBuffer:
+    """
+    Versions de tableaux de bord changées pendant la transaction courante.
+
+    Au commit, les étudiants des cours touchés (séances, cours) sont résolus
+    en une requête et tous les jetons sont supprimés en un appel : supprimer
+    une année entière et ses séances ne coûte pas une requête par séance.
+    Les faits d'absences des cours déplacés ou réaffectés sont recalculés avant.
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self.courses = set()
+        self.fact_courses = set()
+        self.pending = False
+
+    def __call__(self):
+        self.pending = False
+        if self.fact_courses:
+            _refresh_facts(refresh_absence_facts, self.fact_courses)
+        if self.courses:
+            self.keys.update(course_version_keys(self.courses))
+        if self.keys:
+            cache.delete_many(list(self.keys))
+
+
+_local = threading.local()
+
+
+def _pending_buffer(attr, factory):
+    """
+    Retourne le tampon ``attr`` de la transaction courante, ou None hors transaction.
+
+    Le tampon porte lui-même son état : ``pending`` est levé à l'inscription
+    du callback on_commit et baissé par le callback. Le thread n'en garde
+    qu'une référence faible : la connexion, qui détient le callback, est son
+    seul propriétaire, et un rollback (complet ou de savepoint) qui abandonne
+    le callback libère aussi le tampon. Une transaction déjà condamnée
+    (get_rollback()) n'en réutilise pas. Dans tous ces cas un nouveau tampon
+    est créé et inscrit.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        return None
+    ref = getattr(_local, attr, None)
+    buffer = ref() if ref is not None else None
+    if buffer is None or not buffer.pending or transaction.get_rollback():
+        buffer = factory()
+        transaction.on_commit(buffer)
+        buffer.pending = True
+        setattr(_local, attr, weakref.ref(buffer))
+    return buffer
+
+
+def _get_commit_buffer():
+    return _pending_buffer("commit_buffer", _CommitBuffer)
+
+
+def _invalidate_on_commit(*cache_keys):
+    """Supprime les clés de cache une seule fois, au commit de la transaction."""
+    buffer = _get_commit_buffer()
+    if buffer is None:
+        cache.delete_many(list(cache_keys))
+        return
+    buffer.cache_keys.update(cache_keys)
+
+
+def _bump_dashboard_versions(keys=(), courses=()):
+    """
+    Change des versions de tableaux de bord au commit de la transaction.
+
+    Args:
+        keys: jetons à supprimer (student_key(), course_key(), year_key()).
+        courses: couples (cours, année) dont les étudiants sont aussi touchés.
+    """
+    buffer = _pending_buffer("version_buffer", _VersionBuffer)
+    if buffer is None:
+        buffer = _VersionBuffer()
+        buffer.keys.update(keys)
+        buffer.courses.update(courses)
+        buffer()
+        return
+    buffer.keys.update(keys)
+    buffer.courses.update(courses)
+
+
+def _refresh_facts(refresh, ids):
+    """Recalcul des faits d'absences au commit : un échec est journalisé (rebuild_absence_facts)."""
+    try:
+        with transaction.atomic():
+            refresh(ids)
+    except Exception:
+        logger.exception("Failed to refresh absence facts for %s", sorted(ids))
+
+
+def _refresh_facts_on_commit(courses):
+    """Faits d'absences des couples (cours, année) recalculés au commit."""
+    buffer = _pending_buffer("version_buffer", _VersionBuffer)
+    if buffer is None:
+        _refresh_facts(refresh_absence_facts, set(courses))
+        return
+    buffer.fact_courses.update(courses)
 
 
 def _schedule_eligibility_recalc(inscription_pk):
     """Defer eligibility recalculation to after the current transaction commits."""
+    buffer = _get_commit_buffer()
+    if buffer is None:
+        buffer = _CommitBuffer()
+        buffer.inscription_ids.add(inscription_pk)
+        buffer()
+        return
+    buffer.inscription_ids.add(inscription_pk)
 
-    def _recalcul():
-        from apps.enrollments.models import Inscription
 
-        try:
-            inscription = Inscription.objects.get(pk=inscription_pk)
-        except Inscription.DoesNotExist:
-            return
-        try:
-            recalculer_eligibilite(inscription)
-        except Exception:
-            logger.exception(
-                "Failed to recalculate eligibility for inscription %s",
-                inscription_pk,
-            )
+def absence_changes_applied(inscription_ids):
+    """
+    Effets d'une modification d'absences pour un lot d'inscriptions.
+
+    Résumés recalculés dans la transaction ; éligibilité, faits quotidiens
+    et cache au commit. À appeler après bulk_create/bulk_update, qui
+    n'émettent pas de signal.
+    """
+    inscription_ids = set(inscription_ids)
+    if not inscription_ids:
+        return
+    refresh_absence_summaries(inscription_ids)
+    for inscription_pk in inscription_ids:
+        _schedule_eligibility_recalc(inscription_pk)
+    buffer = _get_commit_buffer()
+    if buffer is None:
+        _refresh_facts(refresh_absence_facts_for_inscriptions, inscription_ids)
+        cache.delete_many(list(inscription_version_keys(inscription_ids)))
+        return
+    buffer.changed_inscription_ids.update(inscription_ids)
 
-    transaction.on_commit(_recalcul)
+
+@contextmanager
+def bulk_absence_changes():
+    """
+    Regroupe les effets des signaux Absence pendant une écriture en masse.
+
+    Dans le bloc, post_save/post_delete se contentent de noter l'inscription ;
+    l'appelant ajoute à l'ensemble retourné les inscriptions modifiées par
+    bulk_create/bulk_update. À la sortie (sans exception), absence_changes_applied()
+    est appelé une seule fois pour tout le lot. Les blocs imbriqués partagent
+    l'ensemble du bloc le plus externe.
+    """
+    outer = getattr(_local, "bulk_touched", None)
+    touched = set() if outer is None else outer
+    _local.bulk_touched = touched
+    try:
+        yield touched
+    finally:
+        if outer is None:
+            _local.bulk_touched = None
+    if outer is None:
+        absence_changes_applied(touched)
+
+
+def _absence_changed(inscription_pk):
+    touched = getattr(_local, "bulk_touched", None)
+    if touched is not None:
+        touched.add(inscription_pk)
+        return
+    absence_changes_applied([inscription_pk])
 
 
 @receiver(post_save, sender=Absence)
@@ -90,10 +470,14 @@ def absence_post_save(sender, instance, **kwargs):
     Utilise transaction.on_commit() pour différer le recalcul après la fin
     de la transaction en cours, évitant les écritures DB imbriquées et
     garantissant que toutes les données sont cohérentes avant le recalcul.
+
+    Le résumé d'absences est mis à jour immédiatement (même transaction) :
+    les lectures qui suivent, y compris le recalcul différé, le voient à jour.
+    Couvre aussi le workflow de justification (absence.save(update_fields=["statut"])).
+    Dans un bloc bulk_absence_changes(), ces effets sont regroupés à sa sortie.
     """
     if instance.id_inscription_id:
-        _schedule_eligibility_recalc(instance.id_inscription_id)
-        cache.delete(CACHE_KEY_AT_RISK)
+        _absence_changed(instance.id_inscription_id)
 
 
 @receiver(post_delete, sender=Absence)
@@ -106,5 +490,4 @@ def absence_post_delete(sender, instance, **kwargs):
     statut eligible_examen.
     """
     if instance.id_inscription_id:
-        _schedule_eligibility_recalc(instance.id_inscription_id)
-        cache.delete(CACHE_KEY_AT_RISK)
+        _absence_changed(instance.id_inscription_id)
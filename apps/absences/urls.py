@@ -61,6 +61,10 @@ urlpatterns = [
     path("qr/generate/<int:course_id>/", views.qr_generate, name="qr_generate"),
     path("qr/dashboard/<uuid:token>/", views.qr_dashboard, name="qr_dashboard"),
     path("qr/refresh/<uuid:token>/", views.qr_refresh_token, name="qr_refresh_token"),
+    path("qr/analyse/<uuid:token>/", views.qr_analyse, name="qr_analyse"),
+    path("qr/image/<uuid:token>.<str:fmt>", views.qr_image, name="qr_image"),
+    path("qr/live/<uuid:token>/", views.qr_live_feed, name="qr_live_feed"),
     path("qr/finalize/<uuid:token>/", views.qr_finalize, name="qr_finalize"),
     path("qr/scan/<uuid:token>/", views.qr_scan, name="qr_scan"),
+    path("qr/c/<int:seance_id>/<int:window>/<str:code>/", views.qr_scan_code, name="qr_scan_code"),
 ]
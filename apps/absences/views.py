@@ -11,14 +11,16 @@ DEPENDANCES CLES : absences.models, absences.services, academic_sessions.models
 
 import datetime
 import logging
+from dataclasses import replace
 from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
 from pathlib import Path
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
-from django.db import IntegrityError, transaction
+from django.db import transaction
 from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
@@ -26,22 +28,26 @@ from django.utils import timezone
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
 
 from apps.absences.models import Absence, Justification, QRAttendanceToken, QRScanLog, QRScanRecord
+from apps.absences.signals import bulk_absence_changes
 from apps.absences.services import (
+    apply_attendance_roster,
     calculer_absence_stats,
     calculer_pourcentage_absence,
     get_absences_queryset,
     get_justification_deadline,
     is_justification_expired,
+    send_absence_recorded_emails,
 )
 from apps.absences.utils_upload import (
     UploadValidationError,
     generate_safe_upload_filename,
     validate_uploaded_file,
 )
-from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.academic_sessions.active_year import get_active_year
+from apps.academic_sessions.models import Seance
 from apps.academics.models import Cours
 from apps.accounts.models import User
-from apps.audits.utils import log_action
+from apps.audits.utils import audit_buffer, log_action
 from apps.dashboard.decorators import (
     professor_required,
     roles_required,
@@ -50,10 +56,8 @@ from apps.dashboard.decorators import (
 )
 from apps.enrollments.models import Inscription
 from apps.notifications.email import (
-    build_absence_recorded_email,
     build_justification_submitted_professor_email,
     send_notification_email,
-    send_with_dedup,
 )
 
 logger = logging.getLogger(__name__)
@@ -436,7 +440,7 @@ def session_create(request, course_id):
         messages.error(request, "Accès non autorisé à ce cours.")
         return redirect("dashboard:instructor_dashboard")
 
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
+    academic_year = get_active_year()
     if not academic_year:
         messages.error(request, "Aucune année académique active.")
         return redirect("dashboard:instructor_course_detail", course_id)
@@ -513,17 +517,16 @@ def session_create(request, course_id):
 
             # Create QR token and redirect to dashboard
             from apps.dashboard.models import SystemSettings
-            sys_settings = SystemSettings.get_settings()
-            qr_duration_seconds = sys_settings.qr_token_duration_seconds
+            sys_settings = SystemSettings.current()
 
             verify_location = request.POST.get("verify_location") == "on"
 
-            QRAttendanceToken.objects.filter(seance=seance, is_active=True).update(is_active=False)
+            deactivate_seance_tokens(seance)
 
             token_kwargs = {
                 "seance": seance,
                 "created_by": request.user,
-                "expires_at": timezone.now() + timedelta(seconds=qr_duration_seconds),
+                "expires_at": timezone.now() + _qr_token_lifetime(sys_settings),
                 "verify_location": verify_location,
             }
             try:
@@ -536,6 +539,7 @@ def session_create(request, course_id):
                 pass
 
             new_token = QRAttendanceToken.objects.create(**token_kwargs)
+            prime_scan_context(new_token)
 
             log_action(
                 request.user,
@@ -617,7 +621,7 @@ def mark_absence(request, course_id):
         return redirect("dashboard:instructor_dashboard")
 
     # Filter by active year and EN_COURS status to exclude past/inactive students
-    active_year = AnneeAcademique.objects.filter(active=True).first()
+    active_year = get_active_year()
     inscriptions_qs = Inscription.objects.filter(
         id_cours=course, status=Inscription.Status.EN_COURS
     ).select_related("id_etudiant")
@@ -701,7 +705,7 @@ def mark_absence(request, course_id):
         duree_seance = duree_seance.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
         # Vérification de l'année active AVANT la transaction
-        annee = AnneeAcademique.objects.filter(active=True).first()
+        annee = get_active_year()
         if not annee:
             messages.error(
                 request,
@@ -709,7 +713,8 @@ def mark_absence(request, course_id):
             )
             return redirect("absences:mark_absence", course_id=course_id)
 
-        with transaction.atomic():
+        # audit_buffer : toutes les entrées d'audit de l'appel en un seul INSERT
+        with transaction.atomic(), audit_buffer():
             # --- OPÉRATIONS DB (données validées, aucun risque de séance fantôme) ---
             # Unique par cours + date — .get() crashe si doublon (fail fast)
             seance_created = False
@@ -753,6 +758,14 @@ def mark_absence(request, course_id):
             # Traitement des etudiants
             # On itere sur les cles POST qui commencent par 'status_'
             # Format attendu : status_{inscription_id}
+            # La feuille d'appel est validée ici puis appliquée par
+            # apply_attendance_roster() : une lecture des absences existantes,
+            # bulk_create / bulk_update / un delete(). Le nombre de requêtes ne
+            # dépend plus de la taille de la classe.
+            is_prof = request.user.role == User.Role.PROFESSEUR
+            _ALLOWED_TYPES = {Absence.TypeAbsence.ABSENT, Absence.TypeAbsence.PARTIEL}
+            entries = []
+
             for key, value in request.POST.items():
                 if not key.startswith("status_"):
                     continue
@@ -771,121 +784,86 @@ def mark_absence(request, course_id):
                 # Les absences encodees par le secretariat (statut JUSTIFIEE) sont OFFICIELLES
                 # Le professeur peut les CONSULTER mais ne peut PAS les modifier
                 # Cela garantit l'integrite des donnees et la hierarchie des roles
+                # JUSTIFIEE and EN_ATTENTE absences can be neither modified nor deleted
+                # (enforced by apply_attendance_roster); professors can correct
+                # their own NON_JUSTIFIEE absences.
+                if status != "ABSENT":
+                    entries.append({"inscription": inscription, "status": "PRESENT"})
+                    continue
+
+                type_absence = request.POST.get(f"type_{inscription_id}", Absence.TypeAbsence.ABSENT)
+                if type_absence not in _ALLOWED_TYPES:
+                    logger.warning(
+                        "Type d'absence invalide recu (%s) pour inscription %s. Fallback ABSENT.",
+                        type_absence,
+                        inscription_id,
+                    )
+                    type_absence = Absence.TypeAbsence.ABSENT
 
-                existing_absence = Absence.objects.filter(
-                    id_inscription=inscription, id_seance=seance
-                ).first()
-                is_prof = request.user.role == User.Role.PROFESSEUR
-
-                if status == "ABSENT":
-                    # CORRECTION FIX ORANGE #8 — Protection correctement ciblée
-                    # AVANT : deux checks erronés :
-                    #   1. "if is_prof and existing_absence: continue" → trop large, bloquait
-                    #      même la correction d'une erreur de saisie NON_JUSTIFIEE.
-                    #   2. "if is_prof and ... JUSTIFIEE: continue" → code mort (jamais atteint).
-                    # APRÈS : la protection JUSTIFIEE est gérée ligne ~584 pour TOUS les rôles.
-                    #         Un professeur peut corriger ses propres absences NON_JUSTIFIEE.
-
-                    _ALLOWED_TYPES = {Absence.TypeAbsence.ABSENT, Absence.TypeAbsence.PARTIEL}
-                    type_absence = request.POST.get(f"type_{inscription_id}", Absence.TypeAbsence.ABSENT)
-                    if type_absence not in _ALLOWED_TYPES:
+                # Determiner la duree
+                duree = duree_seance  # Default for ABSENT (= full session)
+                if type_absence == Absence.TypeAbsence.PARTIEL:
+                    try:
+                        duree = Decimal(
+                            str(float(request.POST.get(f"duree_{inscription_id}", 0)))
+                        ).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                        # Même règle qu'Absence.clean(), que les écritures groupées
+                        # n'appellent pas : une absence partielle est strictement
+                        # plus courte que la séance
+                        if duree <= 0 or duree >= duree_seance:
+                            raise ValueError("invalid duration range")
+                    except (TypeError, ValueError):
                         logger.warning(
-                            "Type d'absence invalide recu (%s) pour inscription %s. Fallback ABSENT.",
-                            type_absence,
+                            "Duree d'absence invalide pour inscription %s. Utilisation de la duree de seance.",
                             inscription_id,
                         )
+                        duree = duree_seance
                         type_absence = Absence.TypeAbsence.ABSENT
-
-                    # Determiner la duree
-                    duree = duree_seance  # Default for ABSENT (= full session)
-                    if type_absence == Absence.TypeAbsence.PARTIEL:
-                        try:
-                            duree = Decimal(
-                                str(float(request.POST.get(f"duree_{inscription_id}", 0)))
-                            ).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-                            if duree <= 0 or duree > duree_seance:
-                                raise ValueError("invalid duration range")
-                        except (TypeError, ValueError):
-                            logger.warning(
-                                "Duree d'absence invalide pour inscription %s. Utilisation de la duree de seance.",
-                                inscription_id,
-                            )
-                            duree = duree_seance
-                            student_name = inscription.id_etudiant.get_full_name()
-                            messages.warning(
-                                request,
-                                f"Durée invalide pour {student_name} — absence complète ({duree_seance}h) "
-                                f"appliquée par défaut. Corrigez si nécessaire.",
-                            )
-
-                    # Creation ou Mise a jour Absence (only if not validated/pending)
-                    if existing_absence and existing_absence.statut in (Absence.Statut.JUSTIFIEE, Absence.Statut.EN_ATTENTE):
-                        # Skip validated or pending absences - professors cannot modify them
-                        continue
-
-                    note = request.POST.get(
-                        f"note_{inscription_id}", ""
-                    ).strip()[:500]
-
-                    try:
-                        absence, created = Absence.objects.update_or_create(
-                            id_inscription=inscription,
-                            id_seance=seance,
-                            defaults={
-                                "type_absence": type_absence,
-                                "duree_absence": duree,
-                                "statut": Absence.Statut.NON_JUSTIFIEE,
-                                "encodee_par": request.user,
-                                "note_professeur": note,
-                            },
-                        )
-                    except IntegrityError:
                         student_name = inscription.id_etudiant.get_full_name()
                         messages.warning(
                             request,
-                            f"Absence déjà enregistrée pour {student_name} sur cette séance (doublon ignoré).",
+                            f"Durée invalide pour {student_name} — absence complète ({duree_seance}h) "
+                            f"appliquée par défaut. Corrigez si nécessaire.",
                         )
-                        continue
 
-                    # Audit logging for professor actions
-                    if is_prof:
-                        action_desc = (
-                            f"Professeur a enregistre une absence pour "
-                            f"{inscription.id_etudiant.get_full_name()} - {course.code_cours} le {date_seance}"
-                        )
-                        log_action(
-                            request.user,
-                            action_desc,
-                            request,
-                            niveau="INFO",
-                            objet_type="ABSENCE",
-                            objet_id=absence.id_absence,
-                        )
+                note = request.POST.get(
+                    f"note_{inscription_id}", ""
+                ).strip()[:500]
 
-                    # Email notification to student (with dedup to avoid spam)
-                    if created:
-                        from apps.absences.services import calculer_absence_stats
+                entries.append(
+                    {
+                        "inscription": inscription,
+                        "status": "ABSENT",
+                        "type_absence": type_absence,
+                        "duree": duree,
+                        "note": note,
+                    }
+                )
 
-                        stats = calculer_absence_stats(inscription)
-                        student = inscription.id_etudiant
-                        subj, body, html_body = build_absence_recorded_email(
-                            student, course.nom_cours, date_seance, stats["taux"]
-                        )
-                        event_key = f"{inscription.id_inscription}-{seance.id_seance}"
-                        send_with_dedup(
-                            student, subj, body, html_body,
-                            event_type="absence_recorded",
-                            event_key=event_key,
-                        )
-                else:
-                    # Si marque PRESENT, on supprime une eventuelle absence existante pour cette seance
-                    if existing_absence:
-                        # PROTECTION: JUSTIFIEE and EN_ATTENTE absences cannot be deleted
-                        if existing_absence.statut in (Absence.Statut.JUSTIFIEE, Absence.Statut.EN_ATTENTE):
-                            continue
-                        # Professors can correct their own NON_JUSTIFIEE absences
-                        # (e.g., marked absent by mistake, now correcting to present)
-                        existing_absence.delete()
+            diff = apply_attendance_roster(seance, entries, request.user)
+            to_create, to_update = diff["created"], diff["updated"]
+
+            # Audit logging for professor actions
+            if is_prof:
+                for ab in to_create + to_update:
+                    log_action(
+                        request.user,
+                        f"Professeur a enregistre une absence pour "
+                        f"{ab.id_inscription.id_etudiant.get_full_name()} - {course.code_cours} le {date_seance}",
+                        request,
+                        niveau="INFO",
+                        objet_type="ABSENCE",
+                        objet_id=ab.id_absence,
+                    )
+
+            # Email notification to students (with dedup to avoid spam), after commit
+            if to_create:
+                new_absentees = [ab.id_inscription for ab in to_create]
+                transaction.on_commit(
+                    lambda: send_absence_recorded_emails(
+                        new_absentees, course, date_seance, seance.id_seance
+                    )
+                )
 
             # Audit logging for session creation/attendance
             if request.user.role == User.Role.PROFESSEUR:
@@ -1031,7 +1009,7 @@ def mark_absence_htmx(request, course_id):
     inscription_id = request.POST.get("inscription_id", "")
     status = request.POST.get("status", "")
 
-    active_year = AnneeAcademique.objects.filter(active=True).first()
+    active_year = get_active_year()
     ins_qs = Inscription.objects.filter(
         id_inscription=inscription_id,
         id_cours=course,
@@ -1234,12 +1212,36 @@ def validate_session(request, seance_id):
 #                    SYSTEME QR CODE                                          #
 # ========================================================================== #
 
-import base64
-import io
 import math
 
-import qrcode
+from django.utils.http import parse_etags, quote_etag
 
+from apps.absences.geofence import get_geofence_index
+from apps.absences.live_feed import (
+    publish_scan_event,
+    scan_event_payload,
+    stream_scan_events,
+)
+from apps.absences.qr_context import (
+    deactivate_seance_tokens,
+    get_scan_context,
+    get_scan_roster,
+    get_scanned_at,
+    get_seance_scan_context,
+    mark_scanned,
+    prime_scan_context,
+)
+from apps.absences.qr_codes import (
+    STATELESS_SESSION_LIFETIME,
+    current_window,
+    stateless_codes_enabled,
+    verify_window_code,
+    window_code,
+    window_expires_at,
+)
+from apps.absences.qr_images import QR_CONTENT_TYPES, get_qr_image, qr_etag
+from apps.absences.scan_anomalies import ANOMALY_LABELS, analyse_seances
+from apps.absences.scan_log import record_scan_log
 from apps.audits.utils import get_client_ip
 
 
@@ -1253,16 +1255,48 @@ def _haversine(lat1, lon1, lat2, lon2):
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
-def _generate_qr_data_uri(url):
-    """Generate a QR code PNG as a base64 data-URI (no file storage needed)."""
-    qr = qrcode.QRCode(version=1, box_size=10, border=4)
-    qr.add_data(url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+def _qr_token_lifetime(sys_settings):
+    """
+    Validity of a new QR token: one rotation period, or the whole session when
+    codes are stateless (QR_STATELESS_CODES) and only the time window rotates.
+    """
+    if stateless_codes_enabled():
+        return STATELESS_SESSION_LIFETIME
+    return timedelta(seconds=sys_settings.qr_token_duration_seconds)
+
+
+def _qr_expires_at(qr_token):
+    """Expiry shown on the dashboard countdown (end of the current window if stateless)."""
+    if stateless_codes_enabled():
+        return min(qr_token.expires_at, window_expires_at(current_window()))
+    return qr_token.expires_at
+
+
+def _qr_scan_url(request, qr_token):
+    """
+    Absolute scan URL encoded in the QR code of a token.
+
+    Stateless mode encodes the séance, the current time window and its HMAC
+    code instead of the session token UUID.
+    """
+    if stateless_codes_enabled():
+        window = current_window()
+        url = reverse("absences:qr_scan_code", kwargs={
+            "seance_id": qr_token.seance_id,
+            "window": window,
+            "code": window_code(qr_token.pk, qr_token.seance_id, window),
+        })
+    else:
+        url = reverse("absences:qr_scan", kwargs={"token": str(qr_token.token)})
+    return request.build_absolute_uri(url)
+
+
+def _qr_image_url(token, fmt="svg"):
+    url = reverse("absences:qr_image", kwargs={"token": token, "fmt": fmt})
+    if stateless_codes_enabled():
+        # Une URL par fenêtre : le navigateur recharge l'image à chaque rotation
+        url = f"{url}?w={current_window()}"
+    return url
 
 
 @login_required
@@ -1275,7 +1309,7 @@ def qr_generate(request, course_id):
         messages.error(request, "Accès non autorisé à ce cours.")
         return redirect("dashboard:instructor_dashboard")
 
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
+    academic_year = get_active_year()
     if not academic_year:
         messages.error(request, "Aucune année académique active.")
         return redirect("dashboard:instructor_course_detail", course_id)
@@ -1338,16 +1372,15 @@ def qr_generate(request, course_id):
 
         # Use system-configured QR duration if available
         from apps.dashboard.models import SystemSettings
-        sys_settings = SystemSettings.get_settings()
-        qr_duration_seconds = sys_settings.qr_token_duration_seconds
+        sys_settings = SystemSettings.current()
 
         # Deactivate any previous active tokens for this seance
-        QRAttendanceToken.objects.filter(seance=seance, is_active=True).update(is_active=False)
+        deactivate_seance_tokens(seance)
 
         token_kwargs = {
             "seance": seance,
             "created_by": request.user,
-            "expires_at": timezone.now() + timedelta(seconds=qr_duration_seconds),
+            "expires_at": timezone.now() + _qr_token_lifetime(sys_settings),
             "verify_location": verify_location,
         }
         try:
@@ -1358,6 +1391,7 @@ def qr_generate(request, course_id):
             pass  # GPS optional — skip silently
 
         token = QRAttendanceToken.objects.create(**token_kwargs)
+        prime_scan_context(token)
 
         log_action(
             request.user,
@@ -1383,7 +1417,7 @@ def qr_generate(request, course_id):
 @professor_required
 @require_GET
 def qr_dashboard(request, token):
-    """Live dashboard: QR image + real-time scan list (HTMX polling)."""
+    """Live dashboard: QR image + real-time scan list (SSE feed, see qr_live_feed)."""
     qr_token = get_object_or_404(QRAttendanceToken, token=token)
     seance = qr_token.seance
     course = seance.id_cours
@@ -1392,11 +1426,10 @@ def qr_dashboard(request, token):
         messages.error(request, "Accès non autorisé.")
         return redirect("dashboard:instructor_dashboard")
 
-    scan_url = request.build_absolute_uri(
-        reverse("absences:qr_scan", kwargs={"token": str(token)})
-    )
-    qr_data_uri = _generate_qr_data_uri(scan_url)
+    scan_url = _qr_scan_url(request, qr_token)
 
+    # Signaux de fraude lus tels quels : recalculés par qr_analyse (bouton du
+    # dashboard), qr_finalize et la commande analyse_qr_scans, jamais par un GET
     inscriptions = list(
         Inscription.objects.filter(
             id_cours=course,
@@ -1417,19 +1450,20 @@ def qr_dashboard(request, token):
         if ins.id_inscription in scanned_ids:
             sr = scan_records[ins.id_inscription]
             ins.scan_record = sr
-            if sr.is_suspicious:
+            ins.anomaly_labels = [ANOMALY_LABELS.get(flag, flag) for flag in sr.anomaly_flags]
+            if sr.is_suspicious or sr.anomaly_flags:
                 suspicious_count += 1
             scanned.append(ins)
     not_scanned = [ins for ins in inscriptions if ins.id_inscription not in scanned_ids]
 
     from apps.dashboard.models import SystemSettings
-    sys_settings = SystemSettings.get_settings()
+    sys_settings = SystemSettings.current()
 
     ctx = {
         "qr_token": qr_token,
         "seance": seance,
         "course": course,
-        "qr_data_uri": qr_data_uri,
+        "qr_image_url": _qr_image_url(qr_token.token),
         "scan_url": scan_url,
         "scanned": scanned,
         "not_scanned": not_scanned,
@@ -1437,6 +1471,7 @@ def qr_dashboard(request, token):
         "scanned_count": len(scanned),
         "suspicious_count": suspicious_count,
         "is_expired": qr_token.is_expired,
+        "expires_at": _qr_expires_at(qr_token),
         "has_gps": qr_token.latitude is not None,
         "verify_location": qr_token.verify_location,
         "qr_duration_seconds": sys_settings.qr_token_duration_seconds,
@@ -1449,11 +1484,33 @@ def qr_dashboard(request, token):
     return render(request, "absences/qr_dashboard.html", ctx)
 
 
+@login_required
+@professor_required
+@require_POST
+def qr_analyse(request, token):
+    """Recalcule les signaux de fraude des scans de la séance, puis retour au dashboard."""
+    qr_token = get_object_or_404(QRAttendanceToken, token=token)
+    seance = qr_token.seance
+
+    if seance.id_cours.professeur_id != request.user.pk:
+        messages.error(request, "Accès non autorisé.")
+        return redirect("dashboard:instructor_dashboard")
+
+    stats = analyse_seances(Seance.objects.filter(pk=seance.pk))
+    messages.info(request, f"Analyse des scans : {stats['flagged']} scan(s) signalé(s).")
+    return redirect("absences:qr_dashboard", token=qr_token.token)
+
+
 @login_required
 @professor_required
 @require_POST
 def qr_refresh_token(request, token):
-    """Deactivate current token and create a fresh one (preserves scans)."""
+    """
+    Deactivate current token and create a fresh one (preserves scans).
+
+    With stateless codes (QR_STATELESS_CODES) the session token is kept and
+    only the QR of the current time window is returned: no token rows written.
+    """
     from django.http import JsonResponse
     from apps.dashboard.models import SystemSettings
 
@@ -1467,45 +1524,125 @@ def qr_refresh_token(request, token):
         messages.error(request, "Accès non autorisé.")
         return redirect("dashboard:instructor_dashboard")
 
-    sys_settings = SystemSettings.get_settings()
-    qr_duration_seconds = sys_settings.qr_token_duration_seconds
+    is_ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
+    if stateless_codes_enabled() and qr_token.is_active and not qr_token.is_expired:
+        if is_ajax:
+            return JsonResponse(_qr_refresh_payload(request, qr_token))
+        return redirect("absences:qr_dashboard", token=qr_token.token)
+
+    sys_settings = SystemSettings.current()
 
     # Preserve verify_location and professor GPS from the original token
     old_verify_location = qr_token.verify_location
     old_lat = qr_token.latitude
     old_lng = qr_token.longitude
 
-    QRAttendanceToken.objects.filter(seance=seance, is_active=True).update(is_active=False)
+    deactivate_seance_tokens(seance)
 
     new_token = QRAttendanceToken.objects.create(
         seance=seance,
         created_by=request.user,
-        expires_at=timezone.now() + timedelta(seconds=qr_duration_seconds),
+        expires_at=timezone.now() + _qr_token_lifetime(sys_settings),
         verify_location=old_verify_location,
         latitude=old_lat,
         longitude=old_lng,
     )
+    prime_scan_context(new_token)
 
     # AJAX response for auto-refresh
-    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-        scan_url = request.build_absolute_uri(
-            reverse("absences:qr_scan", kwargs={"token": str(new_token.token)})
-        )
-        qr_data_uri = _generate_qr_data_uri(scan_url)
-        return JsonResponse({
-            "token": str(new_token.token),
-            "qr_data_uri": qr_data_uri,
-            "scan_url": scan_url,
-            "expires_at": new_token.expires_at.isoformat(),
-            "refresh_url": reverse("absences:qr_refresh_token", kwargs={"token": str(new_token.token)}),
-            "dashboard_url": reverse("absences:qr_dashboard", kwargs={"token": str(new_token.token)}),
-            "finalize_url": reverse("absences:qr_finalize", kwargs={"token": str(new_token.token)}),
-        })
+    if is_ajax:
+        return JsonResponse(_qr_refresh_payload(request, new_token))
 
     messages.success(request, "QR code rafraîchi avec un nouveau token.")
     return redirect("absences:qr_dashboard", token=new_token.token)
 
 
+def _qr_refresh_payload(request, qr_token):
+    """JSON answer of qr_refresh_token for the dashboard auto-refresh."""
+    token = str(qr_token.token)
+    return {
+        "token": token,
+        "qr_image_url": _qr_image_url(qr_token.token),
+        "scan_url": _qr_scan_url(request, qr_token),
+        "expires_at": _qr_expires_at(qr_token).isoformat(),
+        "refresh_url": reverse("absences:qr_refresh_token", kwargs={"token": token}),
+        "dashboard_url": reverse("absences:qr_dashboard", kwargs={"token": token}),
+        "finalize_url": reverse("absences:qr_finalize", kwargs={"token": token}),
+    }
+
+
+@login_required
+@professor_required
+@require_GET
+def qr_image(request, token, fmt):
+    """
+    QR image of a token (SVG or PNG), served from the QR image cache.
+
+    Kept out of the dashboard HTML so HTMX polls and token refreshes no
+    longer carry an inline base64 image. The ETag is derived from the encoded
+    URL, so a browser revalidation is answered with 304 without rendering.
+    """
+    if fmt not in QR_CONTENT_TYPES:
+        raise Http404
+    qr_token = get_object_or_404(
+        QRAttendanceToken.objects.select_related("seance__id_cours"), token=token
+    )
+    if qr_token.seance.id_cours.professeur_id != request.user.pk:
+        raise PermissionDenied
+
+    scan_url = _qr_scan_url(request, qr_token)
+    max_age = max(int((_qr_expires_at(qr_token) - timezone.now()).total_seconds()), 0)
+    cache_control = f"private, max-age={max_age}"
+
+    etag = quote_etag(qr_etag(scan_url, fmt))
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponse(status=304)
+    else:
+        image, _ = get_qr_image(scan_url, fmt)
+        response = HttpResponse(image, content_type=QR_CONTENT_TYPES[fmt])
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
+
+
+@require_GET
+async def qr_live_feed(request, token):
+    """
+    Flux Server-Sent Events des nouveaux scans d'une séance (dashboard QR).
+
+    Vue asynchrone servie par config/asgi.py : une connexion ouverte n'occupe
+    pas de worker WSGI et ne coûte rien tant qu'aucun scan n'est publié.
+    professor_required est synchrone : les mêmes contrôles sont faits ici.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+
+    user = await request.auser()
+    if not user.is_authenticated or user.role != User.Role.PROFESSEUR:
+        raise PermissionDenied
+    try:
+        qr_token = await QRAttendanceToken.objects.select_related(
+            "seance__id_cours"
+        ).aget(token=token)
+    except QRAttendanceToken.DoesNotExist:
+        raise Http404
+    if qr_token.seance.id_cours.professeur_id != user.pk:
+        raise PermissionDenied
+
+    if not isinstance(request, ASGIRequest):
+        # Sous WSGI le flux occuperait un worker : 204 arrête EventSource,
+        # le dashboard repasse alors en rafraîchissement périodique.
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        stream_scan_events(qr_token.seance_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Nginx : transmettre chaque événement sans mise en tampon
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 @professor_required
 @require_POST
@@ -1539,25 +1676,34 @@ def qr_finalize(request, token):
         )
 
         # Deactivate token
-        QRAttendanceToken.objects.filter(seance=seance, is_active=True).update(is_active=False)
-
-        absent_count = 0
-        for ins in inscriptions:
-            if ins.id_inscription not in scanned_ids:
-                duree = seance.duree_heures() or 2.0  # fallback if times missing
-                _absence, created = Absence.objects.get_or_create(
-                    id_inscription=ins,
-                    id_seance=seance,
-                    defaults={
-                        "type_absence": Absence.TypeAbsence.ABSENT,
-                        "duree_absence": duree,
-                        "statut": Absence.Statut.NON_JUSTIFIEE,
-                        "encodee_par": request.user,
-                        "note_professeur": "Absent (QR non scanné)",
-                    },
-                )
-                if created:
-                    absent_count += 1
+        deactivate_seance_tokens(seance)
+
+        # Ensemble des absents calculé une fois, inséré en un seul bulk_create ;
+        # les absences déjà saisies (appel manuel) sont conservées telles quelles.
+        already_absent = set(
+            Absence.objects.filter(id_seance=seance)
+            .order_by()
+            .values_list("id_inscription_id", flat=True)
+        )
+        duree = seance.duree_heures() or 2.0  # fallback if times missing
+        to_create = [
+            Absence(
+                id_inscription=ins,
+                id_seance=seance,
+                type_absence=Absence.TypeAbsence.ABSENT,
+                duree_absence=duree,
+                statut=Absence.Statut.NON_JUSTIFIEE,
+                encodee_par=request.user,
+                note_professeur="Absent (QR non scanné)",
+            )
+            for ins in inscriptions
+            if ins.id_inscription not in scanned_ids
+            and ins.id_inscription not in already_absent
+        ]
+        with bulk_absence_changes() as touched:
+            Absence.objects.bulk_create(to_create, ignore_conflicts=True)
+            touched.update(ab.id_inscription_id for ab in to_create)
+        absent_count = len(to_create)
 
         seance.validated = True
         seance.validated_by = request.user
@@ -1574,6 +1720,8 @@ def qr_finalize(request, token):
             objet_id=seance.id_seance,
         )
 
+    analyse_seances(Seance.objects.filter(pk=seance.pk))
+
     messages.success(
         request,
         f"Séance finalisée : {len(scanned_ids)} présent(s), {absent_count} absent(s).",
@@ -1581,6 +1729,7 @@ def qr_finalize(request, token):
     return redirect("dashboard:instructor_course_detail", course.id_cours)
 
 
+@lru_cache(maxsize=1024)
 def _hash_qr_token(raw_token):
     """
     Return ``sha256:<hex>`` digest of a QR token, or ``""`` if no token.
@@ -1599,10 +1748,15 @@ def _hash_qr_token(raw_token):
 
 def _log_scan_attempt(request, seance, qr_token, gps_status, scan_result,
                       latitude=None, longitude=None, distance=None):
-    """Log every QR scan attempt for audit. Token is hashed (SHA-256) before storage."""
-    QRScanLog.objects.create(
+    """
+    Log every QR scan attempt for audit. Token is hashed (SHA-256) before storage.
+
+    Written through the scan log sink (QR_SCAN_LOG_SINK): synchronously, or
+    buffered and bulk-inserted off the request path.
+    """
+    record_scan_log(QRScanLog(
         etudiant=request.user,
-        seance=seance,
+        seance_id=seance.id_seance if seance else None,
         ip_address=get_client_ip(request),
         latitude=latitude,
         longitude=longitude,
@@ -1611,13 +1765,13 @@ def _log_scan_attempt(request, seance, qr_token, gps_status, scan_result,
         scan_result=scan_result,
         qr_token_used=_hash_qr_token(qr_token.token if qr_token else None),
         user_agent=request.META.get("HTTP_USER_AGENT", "")[:500],
-    )
+    ))
 
 
 def _get_establishment_gps():
     """Return (latitude, longitude, radius) from SystemSettings, or (None, None, 100)."""
     from apps.dashboard.models import SystemSettings
-    settings = SystemSettings.get_settings()
+    settings = SystemSettings.current()
     return settings.gps_latitude, settings.gps_longitude, settings.gps_radius_meters
 
 
@@ -1641,10 +1795,54 @@ def _is_valid_coordinate(coord):
 @student_required
 @require_http_methods(["GET", "POST"])
 def qr_scan(request, token):
-    """Student scans QR → confirmation page (GET) → record attendance (POST)."""
-    qr_token = get_object_or_404(QRAttendanceToken, token=token)
+    """
+    Student scans QR → confirmation page (GET) → record attendance (POST).
+
+    Token, séance, roster and "already scanned" checks are answered from the
+    cached scan context (apps.absences.qr_context): during a scan burst the
+    database is only written to (scan record and scan log).
+
+    With QR_STATELESS_CODES the session UUID is not a scan credential: it
+    appears in the professor's URLs for the whole session, only the
+    windowed codes of qr_scan_code are accepted.
+    """
+    if stateless_codes_enabled():
+        raise Http404
+    qr_token = get_scan_context(token)
+    if qr_token is None:
+        raise Http404
+    return _process_scan(request, qr_token)
+
+
+@login_required
+@student_required
+@require_http_methods(["GET", "POST"])
+def qr_scan_code(request, seance_id, window, code):
+    """
+    Stateless QR code (QR_STATELESS_CODES): séance + time window + HMAC code.
+
+    The code is checked against the séance's active session token (cached
+    scan context); the current and previous windows are accepted. The scan
+    then goes through the same checks as qr_scan, the log storing the hash
+    of the scanned code.
+    """
+    session = get_seance_scan_context(seance_id)
+    if session is None:
+        raise Http404
+    status = verify_window_code(session.token_id, seance_id, window, code)
+    if status == "invalid":
+        raise Http404
+    # Le code scanné reste valable jusqu'à la fin de la fenêtre suivante
+    expires_at = min(session.expires_at, window_expires_at(window + 1))
+    if status == "expired":
+        expires_at = min(expires_at, timezone.now())
+    return _process_scan(request, replace(session, token=code, expires_at=expires_at))
+
+
+def _process_scan(request, qr_token):
+    """Confirmation page (GET) or attendance record (POST) for a scan context."""
     seance = qr_token.seance
-    course = seance.id_cours
+    course = qr_token.course
 
     error_ctx = {"course": course, "seance": seance}
 
@@ -1667,7 +1865,7 @@ def qr_scan(request, token):
             "message": "Ce QR code a expiré. Scannez le nouveau QR affiché par le professeur.",
         })
 
-    if seance.validated:
+    if qr_token.seance_validated:
         _log_scan_attempt(request, seance, qr_token,
                           QRScanLog.GPSStatus.NOT_REQUIRED,
                           QRScanLog.ScanResult.REJECTED_LOCKED)
@@ -1676,14 +1874,9 @@ def qr_scan(request, token):
             "message": "Cette séance est déjà validée et verrouillée.",
         })
 
-    inscription = Inscription.objects.filter(
-        id_etudiant=request.user,
-        id_cours=course,
-        id_annee=seance.id_annee,
-        status=Inscription.Status.EN_COURS,
-    ).first()
+    inscription_id = get_scan_roster(qr_token.course_id, qr_token.annee_id).get(request.user.pk)
 
-    if not inscription:
+    if inscription_id is None:
         _log_scan_attempt(request, seance, qr_token,
                           QRScanLog.GPSStatus.NOT_REQUIRED,
                           QRScanLog.ScanResult.REJECTED_NOT_ENROLLED)
@@ -1692,15 +1885,15 @@ def qr_scan(request, token):
             "message": "Vous n'êtes pas inscrit(e) à ce cours.",
         })
 
-    existing = QRScanRecord.objects.filter(seance=seance, inscription=inscription).first()
-    if existing:
+    scanned_at = get_scanned_at(qr_token.seance_id, inscription_id)
+    if scanned_at:
         _log_scan_attempt(request, seance, qr_token,
                           QRScanLog.GPSStatus.NOT_REQUIRED,
                           QRScanLog.ScanResult.REJECTED_DUPLICATE)
         return render(request, "absences/qr_scan_result.html", {
             **error_ctx, "scan_status": "duplicate",
             "message": "Votre présence a déjà été enregistrée.",
-            "scanned_at": existing.scanned_at,
+            "scanned_at": scanned_at,
         })
 
     # Determine GPS requirement
@@ -1756,8 +1949,29 @@ def qr_scan(request, token):
                            "Réessayez ou contactez le professeur.",
             })
 
+        # Campus geofences (academics.Batiment): the pinned building, or the zone
+        # of the grid cell containing the student
+        geofences = get_geofence_index()
+        if geofences:
+            zone, zone_distance, inside = geofences.resolve(
+                stu_lat_f, stu_lng_f, qr_token.building_id
+            )
+            if not inside:
+                _log_scan_attempt(request, seance, qr_token,
+                                  QRScanLog.GPSStatus.ACCEPTED,
+                                  QRScanLog.ScanResult.REJECTED_DISTANCE,
+                                  stu_lat_f, stu_lng_f, zone_distance)
+                limit = "contour du bâtiment" if zone.polygon else f"max : {zone.radius} m"
+                return render(request, "absences/qr_scan_result.html", {
+                    **error_ctx, "scan_status": "error",
+                    "message": f"Vous n'êtes pas dans la zone autorisée ({zone.name}). "
+                               f"Distance : {zone_distance:.0f} m ({limit}).",
+                    "distance": round(zone_distance, 0),
+                    "radius": None if zone.polygon else zone.radius,
+                })
+            distance = zone_distance
         # Calculate distance against establishment coordinates
-        if _is_valid_coordinate(etab_lat) and _is_valid_coordinate(etab_lng):
+        elif _is_valid_coordinate(etab_lat) and _is_valid_coordinate(etab_lng):
             distance = _haversine(etab_lat, etab_lng, stu_lat_f, stu_lng_f)
 
             # CAS B: GPS OK but outside radius
@@ -1803,11 +2017,11 @@ def qr_scan(request, token):
             })
         # CAS A: GPS OK + within radius → proceed to record
 
-    # --- Build scan record (inside transaction to prevent double-scan race) ---
+    # --- Build scan record ---
     scan_kwargs = {
-        "seance": seance,
+        "seance_id": qr_token.seance_id,
         "student": request.user,
-        "inscription": inscription,
+        "inscription_id": inscription_id,
         "ip_address": get_client_ip(request),
     }
     is_suspicious = False
@@ -1822,32 +2036,24 @@ def qr_scan(request, token):
             is_suspicious = distance > QRAttendanceToken.DISTANCE_THRESHOLD_METERS
             scan_kwargs["is_suspicious"] = is_suspicious
 
-    try:
-        with transaction.atomic():
-            # Re-check with row lock inside transaction to prevent TOCTOU race
-            dup = (
-                QRScanRecord.objects
-                .select_for_update()
-                .filter(seance=seance, inscription=inscription)
-                .first()
-            )
-            if dup:
-                _log_scan_attempt(request, seance, qr_token,
-                                  QRScanLog.GPSStatus.NOT_REQUIRED,
-                                  QRScanLog.ScanResult.REJECTED_DUPLICATE)
-                return render(request, "absences/qr_scan_result.html", {
-                    **error_ctx, "scan_status": "duplicate",
-                    "message": "Votre présence a déjà été enregistrée.",
-                    "scanned_at": dup.scanned_at,
-                })
-            QRScanRecord.objects.create(**scan_kwargs)
-    except IntegrityError:
-        # Unique constraint violation — ultimate safety net
+    # One statement: INSERT ... ON CONFLICT DO NOTHING RETURNING. No row back
+    # means the student already scanned (marker missing from the cache, or a
+    # concurrent scan of the same student).
+    record = QRScanRecord.objects.record_scan(**scan_kwargs)
+    if record is None:
+        _log_scan_attempt(request, seance, qr_token,
+                          QRScanLog.GPSStatus.NOT_REQUIRED,
+                          QRScanLog.ScanResult.REJECTED_DUPLICATE)
         return render(request, "absences/qr_scan_result.html", {
             **error_ctx, "scan_status": "duplicate",
             "message": "Votre présence a déjà été enregistrée.",
         })
 
+    # Dashboard temps réel : annoncé seulement si le scan est commité
+    payload = scan_event_payload(record, request.user.get_full_name())
+    transaction.on_commit(lambda: publish_scan_event(qr_token.seance_id, payload))
+    mark_scanned(qr_token.seance_id, inscription_id, record.scanned_at)
+
     # Log successful scan
     gps_log_status = (
         QRScanLog.GPSStatus.ACCEPTED if stu_lat_f is not None
@@ -23,7 +23,8 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
 
-from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.academic_sessions.active_year import get_active_year
+from apps.academic_sessions.models import Seance
 from apps.accounts.models import User
 from apps.audits.utils import log_action
 from apps.dashboard.decorators import (
@@ -99,7 +100,7 @@ def validation_list(request):
         status_filter = Absence.Statut.NON_JUSTIFIEE
 
     # Filter by active academic year
-    active_year = AnneeAcademique.objects.filter(active=True).first()
+    active_year = get_active_year()
 
     absences = Absence.objects.filter(statut=status_filter).select_related(
         "id_inscription",
@@ -318,7 +319,7 @@ def create_justified_absence(request):
             document_file = form.cleaned_data.get("document")
 
             # Recuperer l'annee academique active
-            annee_active = AnneeAcademique.objects.filter(active=True).first()
+            annee_active = get_active_year()
             if not annee_active:
                 messages.error(request, "Aucune annee academique active n'est definie.")
                 return render(
@@ -498,7 +499,7 @@ def create_justified_absence(request):
     else:
         form = SecretaryJustifiedAbsenceForm()
 
-    annee_active = AnneeAcademique.objects.filter(active=True).first()
+    annee_active = get_active_year()
     return render(
         request,
         "absences/create_justified_absence.html",
@@ -534,7 +535,7 @@ def student_absence_history_api(request):
 
     try:
         # Filter by active academic year for consistency with all other views
-        active_year = AnneeAcademique.objects.filter(active=True).first()
+        active_year = get_active_year()
         absences_qs = Absence.objects.filter(
             id_inscription__id_etudiant_id=student_id
         ).select_related(
@@ -615,7 +616,7 @@ def justified_absences_list(request):
     """
     try:
         # Filter by active academic year for consistency with all other views
-        active_year = AnneeAcademique.objects.filter(active=True).first()
+        active_year = get_active_year()
 
         # Filtrer les absences justifiées
         absences = Absence.objects.filter(statut=Absence.Statut.JUSTIFIEE)
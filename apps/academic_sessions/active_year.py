@@ -0,0 +1,103 @@
+"""
+FICHIER : apps/academic_sessions/active_year.py
+RESPONSABILITE : Resolution de l'annee academique active sans requete par page
+FONCTIONNALITES PRINCIPALES :
+  - get_active_year() : annee active (ou, avec fallback=True, la plus recente
+    par id_annee si aucune n'est active), gardee en memoire du processus
+  - La valeur locale est validee par une version partagee (cache Redis),
+    relue au plus toutes les ACTIVE_YEAR_RECHECK_SECONDS secondes
+  - invalidate_active_year() : appele par AnneeAcademique.save() / delete()
+    et par les desactivations en masse (update(active=False))
+DEPENDANCES CLES : academic_sessions.AnneeAcademique, django.core.cache
+"""
+
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+ACTIVE_YEAR_VERSION_KEY = "active_year:version"
+# Délai maximal avant qu'un autre processus voie un changement d'année active
+ACTIVE_YEAR_RECHECK_SECONDS = 5
+
+_FIELDS = ("id_annee", "libelle", "active")
+_MISSING = object()
+
+# {fallback (bool): (id_annee, libelle, active) ou None}
+_values = None
+_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _load(fallback):
+    from .models import AnneeAcademique
+
+    row = AnneeAcademique.objects.filter(active=True).values_list(*_FIELDS).first()
+    if row is None and fallback:
+        row = (
+            AnneeAcademique.objects.order_by("-id_annee").values_list(*_FIELDS).first()
+        )
+    return row
+
+
+def get_active_year(fallback=False):
+    """
+    Année académique active.
+
+    Args:
+        fallback: si aucune année n'est active, renvoyer la plus récente.
+
+    Returns:
+        AnneeAcademique | None : nouvelle instance à chaque appel (l'appelant
+        peut la modifier sans toucher la valeur partagée du processus).
+    """
+    global _values, _version, _checked_at
+    now = time.monotonic()
+    with _lock:
+        if _values is None or now - _checked_at >= ACTIVE_YEAR_RECHECK_SECONDS:
+            version = cache.get(ACTIVE_YEAR_VERSION_KEY)
+            if _values is None or version != _version:
+                _values = {}
+                _version = version
+            _checked_at = now
+        values = _values
+        row = values.get(fallback, _MISSING)
+
+    if row is _MISSING:
+        row = _load(fallback)
+        # Invalidé pendant la lecture : ``values`` n'est plus la valeur courante
+        with _lock:
+            values[fallback] = row
+
+    if row is None:
+        return None
+    from .models import AnneeAcademique
+
+    return AnneeAcademique.from_db(DEFAULT_DB_ALIAS, _FIELDS, row)
+
+
+def clear_local_active_year():
+    """Oublie la valeur du processus sans toucher la version partagée (tests)."""
+    global _values
+    with _lock:
+        _values = None
+
+
+def _bump():
+    cache.set(ACTIVE_YEAR_VERSION_KEY, uuid.uuid4().hex, None)
+    clear_local_active_year()
+
+
+def invalidate_active_year():
+    """
+    Année active ou liste des années modifiée.
+
+    Invalide tout de suite (le processus courant relit la base) puis de
+    nouveau au commit, pour qu'un autre processus ayant relu l'ancienne
+    valeur avant le commit ne la garde pas.
+    """
+    _bump()
+    transaction.on_commit(_bump)
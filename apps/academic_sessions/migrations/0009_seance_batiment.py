@@ -0,0 +1,29 @@
+# Generated by Django 6.0.5 on 2026-10-17 11:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("academic_sessions", "0008_unique_seance_par_cours_date"),
+        ("academics", "0007_campus_batiment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="seance",
+            name="batiment",
+            field=models.ForeignKey(
+                blank=True,
+                db_column="id_batiment",
+                help_text="Remplace le bâtiment du cours pour cette séance (zone GPS des scans QR)",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="seances",
+                to="academics.batiment",
+                verbose_name="Bâtiment",
+            ),
+        ),
+    ]
@@ -6,6 +6,7 @@ FONCTIONNALITES PRINCIPALES :
   - Seance : seance de cours avec date/heure, validation et verrouillage
   - Calcul de duree en heures decimales et format lisible (2h30)
   - Contrainte unicite : une seule seance par cours par date
+  - save() / delete() d'une annee invalident le resolveur get_active_year()
 DEPENDANCES CLES : academics.Cours, accounts.User (validated_by)
 """
 
@@ -16,6 +17,7 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models, transaction
 
+from .active_year import invalidate_active_year
 
 # ========================================================================== #
 #                          ANNEE ACADEMIQUE                                  #
@@ -110,6 +112,12 @@ class AnneeAcademique(models.Model):
 
             self.full_clean()
             super().save(*args, **kwargs)
+            invalidate_active_year()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_active_year()
+        return result
 
     def __str__(self):
         return self.libelle
@@ -143,6 +151,16 @@ class Seance(models.Model):
         verbose_name="Année académique",
         related_name="seances",
     )
+    batiment = models.ForeignKey(
+        "academics.Batiment",
+        models.SET_NULL,
+        db_column="id_batiment",
+        null=True,
+        blank=True,
+        verbose_name="Bâtiment",
+        related_name="seances",
+        help_text="Remplace le bâtiment du cours pour cette séance (zone GPS des scans QR)",
+    )
     validated = models.BooleanField(
         default=False,
         verbose_name="Séance validée",
@@ -1,10 +1,10 @@
 """
 FICHIER : apps/academics/admin.py
-RESPONSABILITE : Configuration admin Django pour Faculte, Departement, Cours
+RESPONSABILITE : Configuration admin Django pour Faculte, Departement, Cours, Campus, Batiment
 """
 from django.contrib import admin
 
-from .models import Cours, Departement, Faculte
+from .models import Batiment, Campus, Cours, Departement, Faculte
 
 
 @admin.register(Faculte)
@@ -19,4 +19,15 @@ class DepartementAdmin(admin.ModelAdmin):
 
 @admin.register(Cours)
 class CoursAdmin(admin.ModelAdmin):
-    list_display = ("code_cours", "nom_cours", "id_departement")
+    list_display = ("code_cours", "nom_cours", "id_departement", "batiment")
+
+
+@admin.register(Campus)
+class CampusAdmin(admin.ModelAdmin):
+    list_display = ("id_campus", "nom_campus", "actif")
+
+
+@admin.register(Batiment)
+class BatimentAdmin(admin.ModelAdmin):
+    list_display = ("nom_batiment", "id_campus", "latitude", "longitude", "rayon_metres", "actif")
+    list_filter = ("id_campus", "actif")
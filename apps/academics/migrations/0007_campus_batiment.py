@@ -0,0 +1,142 @@
+# Generated by Django 6.0.5 on 2026-10-17 11:50
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("academics", "0006_departement_departement_unique_nom_per_faculte"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Campus",
+            fields=[
+                ("id_campus", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "nom_campus",
+                    models.CharField(
+                        db_index=True,
+                        max_length=200,
+                        unique=True,
+                        verbose_name="Nom du campus",
+                    ),
+                ),
+                (
+                    "actif",
+                    models.BooleanField(
+                        db_index=True,
+                        default=True,
+                        help_text="Désactiver un campus retire ses bâtiments des zones GPS autorisées",
+                        verbose_name="Actif",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Campus",
+                "verbose_name_plural": "Campus",
+                "db_table": "campus",
+                "ordering": ["nom_campus"],
+                "managed": True,
+            },
+        ),
+        migrations.CreateModel(
+            name="Batiment",
+            fields=[
+                ("id_batiment", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "nom_batiment",
+                    models.CharField(max_length=200, verbose_name="Nom du bâtiment"),
+                ),
+                (
+                    "latitude",
+                    models.FloatField(
+                        validators=[
+                            django.core.validators.MinValueValidator(-90),
+                            django.core.validators.MaxValueValidator(90),
+                        ],
+                        verbose_name="Latitude du centre",
+                    ),
+                ),
+                (
+                    "longitude",
+                    models.FloatField(
+                        validators=[
+                            django.core.validators.MinValueValidator(-180),
+                            django.core.validators.MaxValueValidator(180),
+                        ],
+                        verbose_name="Longitude du centre",
+                    ),
+                ),
+                (
+                    "rayon_metres",
+                    models.PositiveIntegerField(
+                        default=100,
+                        validators=[
+                            django.core.validators.MinValueValidator(10),
+                            django.core.validators.MaxValueValidator(5000),
+                        ],
+                        verbose_name="Rayon autorisé (m)",
+                    ),
+                ),
+                (
+                    "polygone",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        help_text="Points [[lat, lng], ...] du contour ; vide : cercle autour du centre",
+                        verbose_name="Contour",
+                    ),
+                ),
+                (
+                    "actif",
+                    models.BooleanField(
+                        db_index=True,
+                        default=True,
+                        help_text="Désactiver un bâtiment le retire des zones GPS autorisées",
+                        verbose_name="Actif",
+                    ),
+                ),
+                (
+                    "id_campus",
+                    models.ForeignKey(
+                        db_column="id_campus",
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="batiments",
+                        to="academics.campus",
+                        verbose_name="Campus",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Bâtiment",
+                "verbose_name_plural": "Bâtiments",
+                "db_table": "batiment",
+                "ordering": ["id_campus__nom_campus", "nom_batiment"],
+                "managed": True,
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("nom_batiment", "id_campus"),
+                        name="batiment_unique_nom_per_campus",
+                    )
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="cours",
+            name="batiment",
+            field=models.ForeignKey(
+                blank=True,
+                db_column="id_batiment",
+                help_text="Si renseigné, les scans QR ne sont acceptés que dans la zone de ce bâtiment",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="cours",
+                to="academics.batiment",
+                verbose_name="Bâtiment",
+            ),
+        ),
+    ]
@@ -6,6 +6,8 @@ FONCTIONNALITES PRINCIPALES :
   - Seuil d'absence personnalisable par cours (ou seuil systeme par defaut)
   - Prerequis entre cours (ManyToMany, filtres par niveau)
   - Soft delete via champ 'actif' sur chaque entite
+  - Sites d'enseignement : Campus > Batiment (zone GPS cercle ou polygone),
+    batiment optionnel par cours (verification GPS des scans QR)
 DEPENDANCES CLES : accounts.User (professeur), academic_sessions.AnneeAcademique
 """
 
@@ -85,6 +87,107 @@ class Departement(models.Model):
         return f"{self.nom_departement} ({self.id_faculte.nom_faculte})"
 
 
+class Campus(models.Model):
+    """
+    Site d'enseignement de l'université (regroupe des bâtiments).
+    """
+
+    id_campus = models.AutoField(primary_key=True)
+    nom_campus = models.CharField(
+        unique=True, max_length=200, verbose_name="Nom du campus", db_index=True
+    )
+    actif = models.BooleanField(
+        default=True,
+        verbose_name="Actif",
+        db_index=True,
+        help_text="Désactiver un campus retire ses bâtiments des zones GPS autorisées",
+    )
+
+    class Meta:
+        managed = True
+        db_table = "campus"
+        app_label = "academics"
+        verbose_name = "Campus"
+        verbose_name_plural = "Campus"
+        ordering = ["nom_campus"]
+
+    def __str__(self):
+        return self.nom_campus
+
+
+class Batiment(models.Model):
+    """
+    Bâtiment d'un campus et sa zone GPS autorisée pour les scans QR :
+    un cercle (centre + rayon) ou, si renseigné, un polygone.
+    """
+
+    id_batiment = models.AutoField(primary_key=True)
+    nom_batiment = models.CharField(max_length=200, verbose_name="Nom du bâtiment")
+    id_campus = models.ForeignKey(
+        Campus,
+        models.PROTECT,  # Empêche la suppression d'un campus avec des bâtiments
+        db_column="id_campus",
+        verbose_name="Campus",
+        related_name="batiments",
+    )
+    latitude = models.FloatField(
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+        verbose_name="Latitude du centre",
+    )
+    longitude = models.FloatField(
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+        verbose_name="Longitude du centre",
+    )
+    rayon_metres = models.PositiveIntegerField(
+        default=100,
+        validators=[MinValueValidator(10), MaxValueValidator(5000)],
+        verbose_name="Rayon autorisé (m)",
+    )
+    polygone = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Contour",
+        help_text="Points [[lat, lng], ...] du contour ; vide : cercle autour du centre",
+    )
+    actif = models.BooleanField(
+        default=True,
+        verbose_name="Actif",
+        db_index=True,
+        help_text="Désactiver un bâtiment le retire des zones GPS autorisées",
+    )
+
+    class Meta:
+        managed = True
+        db_table = "batiment"
+        app_label = "academics"
+        verbose_name = "Bâtiment"
+        verbose_name_plural = "Bâtiments"
+        ordering = ["id_campus__nom_campus", "nom_batiment"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["nom_batiment", "id_campus"],
+                name="batiment_unique_nom_per_campus",
+            ),
+        ]
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if self.polygone and (
+            not isinstance(self.polygone, list)
+            or len(self.polygone) < 3
+            or any(
+                not isinstance(p, (list, tuple)) or len(p) != 2 for p in self.polygone
+            )
+        ):
+            raise ValidationError(
+                {"polygone": "Le contour doit compter au moins 3 points [lat, lng]."}
+            )
+
+    def __str__(self):
+        return f"{self.nom_batiment} ({self.id_campus.nom_campus})"
+
+
 class Cours(models.Model):
     """
     Modèle représentant un cours académique.
@@ -165,6 +268,19 @@ class Cours(models.Model):
     # SET_NULL : si le professeur est supprimé, le champ devient NULL (le cours reste)
     # limit_choices_to : seuls les utilisateurs avec le rôle PROFESSEUR peuvent être assignés
 
+    batiment = models.ForeignKey(
+        Batiment,
+        models.SET_NULL,
+        db_column="id_batiment",
+        null=True,
+        blank=True,
+        verbose_name="Bâtiment",
+        related_name="cours",
+        help_text="Si renseigné, les scans QR ne sont acceptés que dans la zone de ce bâtiment",
+    )
+    # Bâtiment du cours : zone GPS unique acceptée pour ses scans QR
+    # (une séance peut en désigner un autre, voir Seance.batiment)
+
     # ============================================
     # ORGANISATION ACADÉMIQUE
     # ============================================
@@ -272,4 +388,4 @@ class Cours(models.Model):
         # Import ici pour éviter l'importation circulaire
         from apps.dashboard.models import SystemSettings
 
-        return SystemSettings.get_settings().default_absence_threshold
+        return SystemSettings.current().default_absence_threshold
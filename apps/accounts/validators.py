@@ -24,7 +24,7 @@ class SystemSettingsPasswordValidator:
         try:
             from apps.dashboard.models import SystemSettings
 
-            settings = SystemSettings.get_settings()
+            settings = SystemSettings.current()
         except (OperationalError, ProgrammingError, ImportError):
             # Table doesn't exist yet (migrations) or app not ready
             return
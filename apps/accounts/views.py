@@ -170,13 +170,11 @@ def download_report_pdf(request):
         messages.error(request, "Accès réservé aux étudiants.")
         return redirect("dashboard:index")
 
-    from apps.academic_sessions.models import AnneeAcademique
+    from apps.academic_sessions.active_year import get_active_year
 
     system_threshold = get_system_threshold()
 
-    active_year = AnneeAcademique.objects.filter(active=True).first()
-    if not active_year:
-        active_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    active_year = get_active_year(fallback=True)
 
     inscriptions = Inscription.objects.filter(
         id_etudiant=user, status=Inscription.Status.EN_COURS
@@ -286,7 +284,7 @@ class CustomPasswordResetConfirmView(auth_views.PasswordResetConfirmView):
         context = super().get_context_data(**kwargs)
         from apps.dashboard.models import SystemSettings
 
-        pw_settings = SystemSettings.get_settings()
+        pw_settings = SystemSettings.current()
         context["password_settings"] = {
             "min_length": pw_settings.password_min_length,
             "require_uppercase": pw_settings.password_require_uppercase,
@@ -308,7 +306,7 @@ class CustomPasswordChangeView(auth_views.PasswordChangeView):
         context = super().get_context_data(**kwargs)
         from apps.dashboard.models import SystemSettings
 
-        settings = SystemSettings.get_settings()
+        settings = SystemSettings.current()
         context["password_settings"] = {
             "min_length": settings.password_min_length,
             "require_uppercase": settings.password_require_uppercase,
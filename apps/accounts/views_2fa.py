@@ -6,16 +6,13 @@ FONCTIONNALITES PRINCIPALES :
   - verify_2fa : verification du code TOTP apres login (gate post-login)
   - disable_2fa : desactivation 2FA avec confirmation par mot de passe
   - backup_codes : generation + affichage one-shot des codes de secours
-DEPENDANCES CLES : pyotp (TOTP), qrcode (PNG QR), apps.audits.utils.log_action
+DEPENDANCES CLES : pyotp (TOTP), absences.qr_images (PNG QR), apps.audits.utils.log_action
 """
 
-import base64
-import io
 import logging
 import secrets
 
 import pyotp
-import qrcode
 from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
@@ -26,6 +23,7 @@ from django.urls import reverse
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods, require_POST
 
+from apps.absences.qr_images import qr_data_uri
 from apps.audits.utils import log_action
 
 from .models import TwoFactorBackupCode
@@ -82,17 +80,10 @@ def _generate_qr_data_uri(uri: str) -> str:
     """
     Encode un URI de provisioning TOTP en PNG QR code, retourne un data-URI base64.
 
-    Le QR n'est jamais ecrit sur le disque : tout se fait en memoire pour eviter
-    les fuites de secrets via le filesystem.
+    Le QR n'est jamais ecrit sur le disque ni mis en cache (render_qr via
+    qr_data_uri) : tout se fait en memoire pour eviter les fuites de secrets.
     """
-    qr = qrcode.QRCode(version=1, box_size=10, border=4)
-    qr.add_data(uri)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+    return qr_data_uri(uri)
 
 
 def _normalize_token(raw: str) -> str:
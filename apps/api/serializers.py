@@ -7,12 +7,15 @@ FONCTIONNALITES PRINCIPALES :
   - CoursListSerializer, CoursDetailSerializer, CoursWriteSerializer : lecture liste/detail et ecriture des cours
   - InscriptionListSerializer, InscriptionWriteSerializer : lecture et ecriture des inscriptions
   - AbsenceListSerializer, AbsenceWriteSerializer : lecture et ecriture des absences
+  - AttendanceRosterSerializer, AttendanceResultSerializer : appel complet d'une seance (entree / diff)
   - JustificationListSerializer, JustificationCreateSerializer, JustificationProcessSerializer : gestion des justifications
   - NotificationSerializer : serialisation des notifications
   - DashboardAnalyticsSerializer, StatisticsAnalyticsSerializer : donnees analytiques du tableau de bord
 DEPENDANCES CLES : rest_framework.serializers, apps.absences.models, apps.academics.models, apps.accounts.models, apps.enrollments.models
 """
 
+from decimal import Decimal
+
 from rest_framework import serializers
 
 from apps.absences.models import Absence, Justification
@@ -293,6 +296,54 @@ class AbsenceWriteSerializer(serializers.ModelSerializer):
         return data
 
 
+class AttendanceEntrySerializer(serializers.Serializer):
+    inscription = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=["PRESENT", "ABSENT"])
+    type_absence = serializers.ChoiceField(
+        choices=[Absence.TypeAbsence.ABSENT, Absence.TypeAbsence.PARTIEL],
+        default=Absence.TypeAbsence.ABSENT,
+    )
+    duree_absence = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=Decimal("0.01"), required=False
+    )
+    note = serializers.CharField(max_length=500, allow_blank=True, default="")
+
+    def validate(self, data):
+        if (
+            data["status"] == "ABSENT"
+            and data["type_absence"] == Absence.TypeAbsence.PARTIEL
+            and data.get("duree_absence") is None
+        ):
+            raise serializers.ValidationError(
+                {"duree_absence": "La durée est obligatoire pour une absence partielle."}
+            )
+        return data
+
+
+class AttendanceRosterSerializer(serializers.Serializer):
+    """Appel complet d'une séance : une entrée par inscription."""
+
+    idempotency_key = serializers.CharField(max_length=255, required=False)
+    validate_seance = serializers.BooleanField(default=False)
+    entries = AttendanceEntrySerializer(many=True, allow_empty=False)
+
+    def validate_entries(self, value):
+        ids = [entry["inscription"] for entry in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Une inscription apparaît plusieurs fois.")
+        return value
+
+
+class AttendanceResultSerializer(serializers.Serializer):
+    seance = serializers.IntegerField()
+    validated = serializers.BooleanField()
+    created = serializers.ListField(child=serializers.IntegerField())
+    updated = serializers.ListField(child=serializers.IntegerField())
+    deleted = serializers.ListField(child=serializers.IntegerField())
+    unchanged = serializers.ListField(child=serializers.IntegerField())
+    protected = serializers.ListField(child=serializers.IntegerField())
+
+
 # ── Justifications ────────────────────────────────────────────────────────────
 
 
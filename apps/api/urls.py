@@ -57,6 +57,11 @@ urlpatterns = [
         views.export_at_risk_excel_api,
         name="export-at-risk-excel",
     ),
+    path(
+        "seances/<int:seance_id>/attendance/",
+        views.seance_attendance,
+        name="seance-attendance",
+    ),
     path(
         "notifications/",
         views.NotificationViewSet.as_view({"get": "list"}),
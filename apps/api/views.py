@@ -7,41 +7,56 @@ FONCTIONNALITES PRINCIPALES :
   - Endpoints analytics : dashboard KPIs + statistiques avancees
   - Exports : PDF etudiant + Excel etudiants a risque
   - Approbation/rejet justifications via API
+  - Appel complet d'une seance en un appel idempotent (POST /api/seances/{id}/attendance/)
 DEPENDANCES CLES : api.serializers, api.filters, api.permissions, absences.services
 """
 
 import datetime
+import hashlib
 import io
+import json
+from decimal import ROUND_HALF_UP, Decimal
 
-from django.db import transaction
-from django.db.models import Count, F, Q, Sum
-from django.db.models.functions import TruncMonth
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_spectacular.utils import extend_schema, extend_schema_view
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from openpyxl import Workbook
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from apps.absences.models import Absence, Justification
-from apps.absences.services import get_system_threshold
+from apps.absences.models import Absence, AttendanceSubmission, Justification
+from apps.absences.services import (
+    absence_fact_breakdowns,
+    annotate_absence_risk,
+    apply_attendance_roster,
+    get_absence_sums,
+    get_system_threshold,
+    send_absence_recorded_emails,
+)
 from apps.notifications.email import (
     build_justification_decision_email,
     build_justification_decision_professor_email,
     build_justification_submitted_professor_email,
     send_notification_email,
 )
-from apps.academic_sessions.models import AnneeAcademique
+from apps.academic_sessions.active_year import get_active_year
+from apps.academic_sessions.models import Seance
 from apps.academics.models import Cours
 from apps.accounts.models import User
 from apps.audits.models import LogAudit
+from apps.audits.utils import audit_buffer, log_action
+from apps.dashboard.data_versions import cached_context, year_key
 from apps.enrollments.models import Inscription
 from apps.notifications.models import Notification
 
@@ -57,11 +72,14 @@ from .permissions import (
     IsAdmin,
     IsAdminOrSecretary,
     IsAdminOrSecretaryOrProfessor,
+    IsProfessor,
     IsStudent,
 )
 from .serializers import (
     AbsenceListSerializer,
     AbsenceWriteSerializer,
+    AttendanceResultSerializer,
+    AttendanceRosterSerializer,
     CoursDetailSerializer,
     CoursListSerializer,
     CoursWriteSerializer,
@@ -196,7 +214,7 @@ class CoursViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         if user.role == User.Role.ETUDIANT:
-            active_year = AnneeAcademique.objects.filter(active=True).first()
+            active_year = get_active_year()
             ins_qs = Inscription.objects.filter(
                 id_etudiant=user, status=Inscription.Status.EN_COURS
             )
@@ -259,13 +277,13 @@ class InscriptionViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         if user.role == User.Role.ETUDIANT:
-            active_year = AnneeAcademique.objects.filter(active=True).first()
+            active_year = get_active_year()
             flt = {"id_etudiant": user, "status": Inscription.Status.EN_COURS}
             if active_year:
                 flt["id_annee"] = active_year
             return qs.filter(**flt)
         if user.role == User.Role.PROFESSEUR:
-            active_year = AnneeAcademique.objects.filter(active=True).first()
+            active_year = get_active_year()
             flt = {"id_cours__professeur": user, "status": Inscription.Status.EN_COURS}
             if active_year:
                 flt["id_annee"] = active_year
@@ -333,13 +351,13 @@ class AbsenceViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         if user.role == User.Role.ETUDIANT:
-            active_year = AnneeAcademique.objects.filter(active=True).first()
+            active_year = get_active_year()
             flt = {"id_inscription__id_etudiant": user}
             if active_year:
                 flt["id_inscription__id_annee"] = active_year
             return qs.filter(**flt)
         if user.role == User.Role.PROFESSEUR:
-            active_year = AnneeAcademique.objects.filter(active=True).first()
+            active_year = get_active_year()
             flt = {
                 "id_inscription__id_cours__professeur": user,
                 "id_inscription__status": Inscription.Status.EN_COURS,
@@ -557,6 +575,232 @@ class NotificationViewSet(viewsets.GenericViewSet, mixins.ListModelMixin):
         return Response({"marked_read": count})
 
 
+# ──────────────────────────────────────────────────────────────
+#  APPEL COMPLET (IDEMPOTENT)
+# ──────────────────────────────────────────────────────────────
+
+
+def _roster_fingerprint(seance_id, data):
+    """Empreinte SHA-256 du contenu validé d'un appel (hors clé d'idempotence)."""
+    canonical = {
+        "seance": seance_id,
+        "validate_seance": data["validate_seance"],
+        "entries": sorted(
+            (
+                {key: str(value) for key, value in entry.items()}
+                for entry in data["entries"]
+            ),
+            key=lambda entry: int(entry["inscription"]),
+        ),
+    }
+    return hashlib.sha256(
+        json.dumps(canonical, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def _replay_submission(submission, seance_id, fingerprint):
+    """Réponse mémorisée d'une clé déjà utilisée, ou 409 si le contenu diffère."""
+    if submission.id_seance_id != seance_id or submission.empreinte != fingerprint:
+        return Response(
+            {"detail": "Cette clé d'idempotence a déjà été utilisée pour un autre appel."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return Response(submission.reponse, headers={"Idempotent-Replayed": "true"})
+
+
+@extend_schema(
+    summary="Submit the full attendance roster of a session (idempotent)",
+    tags=["Absences"],
+    request=AttendanceRosterSerializer,
+    responses=AttendanceResultSerializer,
+    parameters=[
+        OpenApiParameter(
+            "Idempotency-Key",
+            str,
+            OpenApiParameter.HEADER,
+            description="Unique key per roster submission (or `idempotency_key` in the body).",
+        ),
+    ],
+)
+@api_view(["POST"])
+@permission_classes([IsProfessor])
+def seance_attendance(request, seance_id):
+    """
+    Applique l'appel complet d'une séance en une transaction.
+
+    Même règles que la saisie web (mark_absence) : professeur du cours
+    uniquement, séance non validée, absences JUSTIFIEE / EN_ATTENTE protégées.
+    Une soumission rejouée avec la même clé renvoie la réponse mémorisée
+    (en-tête ``Idempotent-Replayed``) sans rien réappliquer.
+    """
+    seance = get_object_or_404(
+        Seance.objects.select_related("id_cours"), pk=seance_id
+    )
+    course = seance.id_cours
+    if course.professeur_id != request.user.pk:
+        raise PermissionDenied("Accès non autorisé à ce cours.")
+
+    serializer = AttendanceRosterSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+    if not key:
+        return Response(
+            {"detail": "En-tête Idempotency-Key requis."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    key = key[:255]
+    fingerprint = _roster_fingerprint(seance.id_seance, data)
+
+    submission = AttendanceSubmission.objects.filter(
+        auteur=request.user, cle_idempotence=key
+    ).first()
+    if submission is not None:
+        return _replay_submission(submission, seance.id_seance, fingerprint)
+
+    # Inscriptions de l'appel : une requête, toutes doivent appartenir au cours
+    requested_ids = [entry["inscription"] for entry in data["entries"]]
+    inscriptions = {
+        ins.id_inscription: ins
+        for ins in Inscription.objects.filter(
+            pk__in=requested_ids,
+            id_cours=course,
+            id_annee=seance.id_annee_id,
+            status=Inscription.Status.EN_COURS,
+        ).select_related("id_etudiant")
+    }
+    invalid_ids = [pk for pk in requested_ids if pk not in inscriptions]
+    if invalid_ids:
+        log_action(
+            request.user,
+            "Tentative d'acces a des inscriptions non autorisees: "
+            + ", ".join(str(pk) for pk in invalid_ids),
+            request,
+            niveau="WARNING",
+            objet_type="INSCRIPTION",
+            objet_id=None,
+        )
+        return Response(
+            {"entries": f"Inscriptions inconnues pour cette séance : {invalid_ids}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    duree_seance = Decimal(str(seance.duree_heures())).quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP
+    )
+    entries = []
+    for entry in data["entries"]:
+        duree = duree_seance
+        if entry["type_absence"] == Absence.TypeAbsence.PARTIEL:
+            duree = entry["duree_absence"]
+            # Écriture en masse sans Absence.clean() : une absence partielle
+            # est strictement plus courte que la séance (sinon type ABSENT)
+            if duree >= duree_seance:
+                return Response(
+                    {
+                        "entries": (
+                            f"Inscription {entry['inscription']} : une absence partielle "
+                            f"({duree}h) doit être plus courte que la séance "
+                            f"({duree_seance}h)."
+                        )
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        entries.append(
+            {
+                "inscription": inscriptions[entry["inscription"]],
+                "status": entry["status"],
+                "type_absence": entry["type_absence"],
+                "duree": duree,
+                "note": entry["note"].strip(),
+            }
+        )
+
+    try:
+        with transaction.atomic(), audit_buffer():
+            seance = Seance.objects.select_for_update().get(pk=seance.pk)
+
+            # Sous verrou : une soumission concurrente de la même clé a pu aboutir
+            submission = AttendanceSubmission.objects.filter(
+                auteur=request.user, cle_idempotence=key
+            ).first()
+            if submission is not None:
+                return _replay_submission(submission, seance.id_seance, fingerprint)
+
+            if seance.validated:
+                return Response(
+                    {"detail": "Cette séance a déjà été validée."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            diff = apply_attendance_roster(seance, entries, request.user)
+
+            for ab in diff["created"] + diff["updated"]:
+                log_action(
+                    request.user,
+                    f"Professeur a enregistre une absence pour "
+                    f"{ab.id_inscription.id_etudiant.get_full_name()} - {course.code_cours} "
+                    f"le {seance.date_seance} (API)",
+                    request,
+                    niveau="INFO",
+                    objet_type="ABSENCE",
+                    objet_id=ab.id_absence,
+                )
+
+            if data["validate_seance"]:
+                seance.validated = True
+                seance.validated_by = request.user
+                seance.date_validated = timezone.now()
+                seance.save(update_fields=["validated", "validated_by", "date_validated"])
+
+            log_action(
+                request.user,
+                f"Professeur a enregistré la présence pour {course.code_cours} "
+                f"le {seance.date_seance} (API)",
+                request,
+                niveau="INFO",
+                objet_type="SEANCE",
+                objet_id=seance.id_seance,
+            )
+
+            if diff["created"]:
+                new_absentees = [ab.id_inscription for ab in diff["created"]]
+                date_seance = seance.date_seance
+                transaction.on_commit(
+                    lambda: send_absence_recorded_emails(
+                        new_absentees, course, date_seance, seance.id_seance
+                    )
+                )
+
+            result = {
+                "seance": seance.id_seance,
+                "validated": seance.validated,
+                "created": [ab.id_inscription_id for ab in diff["created"]],
+                "updated": [ab.id_inscription_id for ab in diff["updated"]],
+                "deleted": diff["deleted"],
+                "unchanged": diff["unchanged"],
+                "protected": diff["protected"],
+            }
+            AttendanceSubmission.objects.create(
+                cle_idempotence=key,
+                auteur=request.user,
+                id_seance=seance,
+                empreinte=fingerprint,
+                reponse=result,
+            )
+    except IntegrityError:
+        # Même clé enregistrée entre-temps par une requête concurrente
+        submission = AttendanceSubmission.objects.filter(
+            auteur=request.user, cle_idempotence=key
+        ).first()
+        if submission is None:
+            raise
+        return _replay_submission(submission, seance.id_seance, fingerprint)
+
+    return Response(result)
+
+
 # ──────────────────────────────────────────────────────────────
 #  ENDPOINTS ANALYTICS
 # ──────────────────────────────────────────────────────────────
@@ -571,8 +815,29 @@ class NotificationViewSet(viewsets.GenericViewSet, mixins.ListModelMixin):
 @permission_classes([IsAdmin])
 def dashboard_analytics(request):
     """Admin dashboard KPIs as JSON."""
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
+    academic_year = get_active_year()
+    data = _cached_analytics("api_dashboard", academic_year, _dashboard_analytics_data)
+    return Response(DashboardAnalyticsSerializer(data).data)
+
 
+def _cached_analytics(name, academic_year, build):
+    """
+    Données d'un endpoint analytics, recalculées par une seule requête à la fois.
+
+    Invalidées par la version de l'année active ; les comptes globaux
+    (utilisateurs, audit) sont servis au plus ANALYTICS_CACHE_TIMEOUT secondes.
+    """
+    year_id = academic_year.pk if academic_year else None
+    return cached_context(
+        name,
+        [year_key(year_id)] if year_id else [],
+        lambda: build(academic_year),
+        extra=(year_id, get_system_threshold()),
+        timeout=getattr(settings, "ANALYTICS_CACHE_TIMEOUT", 60),
+    )
+
+
+def _dashboard_analytics_data(academic_year):
     total_students = User.objects.filter(
         role=User.Role.ETUDIANT, actif=True
     ).count()
@@ -593,48 +858,22 @@ def dashboard_analytics(request):
         Q(id_inscription__id_annee=academic_year) if academic_year else Q()
     ).count()
 
-    # Students at risk
-    system_threshold = get_system_threshold()
+    # Students at risk — un seul COUNT SQL (moteur ensembliste)
     all_inscriptions = Inscription.objects.filter(
         status=Inscription.Status.EN_COURS
-    ).select_related("id_cours")
+    )
     if academic_year:
         all_inscriptions = all_inscriptions.filter(id_annee=academic_year)
-    inscription_ids = list(
-        all_inscriptions.values_list("id_inscription", flat=True)
-    )
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
+    at_risk_count = (
+        annotate_absence_risk(all_inscriptions).filter(is_blocked=True).count()
     )
-    at_risk_count = 0
-    for ins in all_inscriptions:
-        cours = ins.id_cours
-        if cours.nombre_total_periodes > 0:
-            total_abs = float(absence_sums.get(ins.id_inscription, 0) or 0)
-            rate = (total_abs / cours.nombre_total_periodes) * 100
-            seuil = (
-                cours.seuil_absence
-                if cours.seuil_absence is not None
-                else system_threshold
-            )
-            seuil_effectif = min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-            if rate >= seuil_effectif:
-                at_risk_count += 1
 
     seven_days_ago = timezone.now() - datetime.timedelta(days=7)
     critical_actions = LogAudit.objects.filter(
         date_action__gte=seven_days_ago, niveau="CRITIQUE"
     ).count()
 
-    data = {
+    return {
         "academic_year": academic_year.libelle if academic_year else None,
         "total_students": total_students,
         "total_professors": total_professors,
@@ -645,7 +884,6 @@ def dashboard_analytics(request):
         "students_at_risk": at_risk_count,
         "critical_actions_7d": critical_actions,
     }
-    return Response(DashboardAnalyticsSerializer(data).data)
 
 
 @extend_schema(
@@ -657,61 +895,40 @@ def dashboard_analytics(request):
 @permission_classes([IsAdmin])
 def statistics_analytics(request):
     """Advanced absence statistics as JSON (for charts)."""
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    year_filter = (
-        Q(id_inscription__id_annee=academic_year) if academic_year else Q()
-    )
+    academic_year = get_active_year()
+    data = _cached_analytics("api_statistics", academic_year, _statistics_analytics_data)
+    return Response(StatisticsAnalyticsSerializer(data).data)
+
+
+def _statistics_analytics_data(academic_year):
+    # Every chart is read from the daily facts (AbsenceDailyFact)
+    breakdowns = absence_fact_breakdowns(academic_year)
 
     # Top 5 professors by absence count
-    top_professors = list(
-        Absence.objects.filter(year_filter)
-        .values(
-            nom=F("id_inscription__id_cours__professeur__nom"),
-            prenom=F("id_inscription__id_cours__professeur__prenom"),
-        )
-        .annotate(total=Count("id_absence"))
-        .order_by("-total")[:5]
-    )
     top_professors = [
         {"name": f"{p['prenom']} {p['nom']}", "count": p["total"]}
-        for p in top_professors
+        for p in breakdowns["top_professors"]
         if p["nom"]
     ]
 
     # Top 5 courses by absence count
-    top_courses = list(
-        Absence.objects.filter(year_filter)
-        .values(name=F("id_inscription__id_cours__nom_cours"))
-        .annotate(count=Count("id_absence"))
-        .order_by("-count")[:5]
-    )
+    top_courses = [
+        {"name": c["nom_cours"], "count": c["total"]} for c in breakdowns["top_courses"]
+    ]
 
     # Monthly evolution
-    monthly_absences = list(
-        Absence.objects.filter(year_filter)
-        .annotate(month=TruncMonth("id_seance__date_seance"))
-        .values("month")
-        .annotate(count=Count("id_absence"))
-        .order_by("month")
-    )
     monthly_absences = [
-        {"month": m["month"].strftime("%Y-%m"), "count": m["count"]}
-        for m in monthly_absences
+        {"month": m["month"].strftime("%Y-%m"), "count": m["total"]}
+        for m in breakdowns["monthly"]
         if m["month"]
     ]
 
     # By department
-    dept_absences = list(
-        Absence.objects.filter(year_filter)
-        .values(
-            name=F(
-                "id_inscription__id_cours__id_departement__nom_departement"
-            )
-        )
-        .annotate(count=Count("id_absence"))
-        .order_by("-count")
-    )
-    dept_absences = [d for d in dept_absences if d["name"]]
+    dept_absences = [
+        {"name": d["nom_departement"], "count": d["total"]}
+        for d in breakdowns["departments"]
+        if d["nom_departement"]
+    ]
 
     # By status
     status_map = {
@@ -719,31 +936,19 @@ def statistics_analytics(request):
         Absence.Statut.EN_ATTENTE: "En attente",
         Absence.Statut.JUSTIFIEE: "Justifiée",
     }
-    status_absences = list(
-        Absence.objects.filter(year_filter)
-        .values("statut")
-        .annotate(count=Count("id_absence"))
-        .order_by("statut")
-    )
     status_absences = [
-        {"status": status_map.get(s["statut"], s["statut"]), "count": s["count"]}
-        for s in status_absences
+        {"status": status_map.get(s["statut"], s["statut"]), "count": s["total"]}
+        for s in breakdowns["statuses"]
     ]
 
     # By level
-    level_absences = list(
-        Absence.objects.filter(year_filter)
-        .values(niveau=F("id_inscription__id_cours__niveau"))
-        .annotate(count=Count("id_absence"))
-        .order_by("niveau")
-    )
     level_absences = [
-        {"level": f"Année {lv['niveau']}", "count": lv["count"]}
-        for lv in level_absences
+        {"level": f"Année {lv['niveau']}", "count": lv["total"]}
+        for lv in breakdowns["levels"]
         if lv["niveau"]
     ]
 
-    data = {
+    return {
         "academic_year": academic_year.libelle if academic_year else None,
         "top_professors": top_professors,
         "top_courses": top_courses,
@@ -752,7 +957,6 @@ def statistics_analytics(request):
         "absences_by_status": status_absences,
         "absences_by_level": level_absences,
     }
-    return Response(StatisticsAnalyticsSerializer(data).data)
 
 
 # ──────────────────────────────────────────────────────────────
@@ -789,7 +993,7 @@ def export_student_pdf_api(request, student_id):
             status=status.HTTP_403_FORBIDDEN,
         )
 
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
+    academic_year = get_active_year()
 
     insc_filter = {
         "id_etudiant": student,
@@ -806,16 +1010,7 @@ def export_student_pdf_api(request, student_id):
     )
 
     today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscription_ids)
 
     absences = (
         Absence.objects.filter(
@@ -918,12 +1113,11 @@ def _build_student_pdf(student, academic_year, inscriptions, absence_sums, absen
     return response
 
 
-def _export_status(ins, rate, seuil):
-    """Return export status label based on exemption logic."""
-    seuil_eff = min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-    if rate >= seuil_eff:
+def _export_status(ins):
+    """Return export status label from the annotate_absence_risk() flags."""
+    if ins.is_blocked:
         return "BLOQUE"
-    if ins.exemption_40:
+    if ins.is_under_exemption:
         return "SOUS EXEMPTION"
     return "A RISQUE"
 
@@ -937,28 +1131,20 @@ def _export_status(ins, rate, seuil):
 @permission_classes([IsAdminOrSecretary])
 def export_at_risk_excel_api(request):
     """Export students exceeding absence threshold to Excel."""
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    system_threshold = get_system_threshold()
+    academic_year = get_active_year()
 
     all_inscriptions = Inscription.objects.filter(
         status=Inscription.Status.EN_COURS
-    ).select_related("id_cours", "id_etudiant")
+    )
     if academic_year:
         all_inscriptions = all_inscriptions.filter(id_annee=academic_year)
 
-    inscription_ids = list(
-        all_inscriptions.values_list("id_inscription", flat=True)
-    )
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
+    # Filtrage en base : seules les inscriptions au-dessus du seuil sont chargées
+    at_risk = (
+        annotate_absence_risk(all_inscriptions)
+        .filter(is_at_risk=True)
+        .select_related("id_cours", "id_etudiant")
+        .order_by("id_inscription")
     )
 
     wb = Workbook()
@@ -974,32 +1160,23 @@ def export_at_risk_excel_api(request):
         "Statut",
     ])
 
-    for ins in all_inscriptions:
+    def _safe(val):
+        s = str(val) if val is not None else ""
+        if s and s[0] in ("=", "+", "-", "@", "\t", "\r"):
+            return "'" + s
+        return s
+
+    for ins in at_risk.iterator(chunk_size=2000):
         cours = ins.id_cours
-        if cours.nombre_total_periodes > 0:
-            total_abs = float(absence_sums.get(ins.id_inscription, 0) or 0)
-            rate = (total_abs / cours.nombre_total_periodes) * 100
-            seuil = (
-                cours.seuil_absence
-                if cours.seuil_absence is not None
-                else system_threshold
-            )
-            if rate >= seuil:
-                def _safe(val):
-                    s = str(val) if val is not None else ""
-                    if s and s[0] in ("=", "+", "-", "@", "\t", "\r"):
-                        return "'" + s
-                    return s
-
-                ws.append([
-                    _safe(ins.id_etudiant.nom),
-                    _safe(ins.id_etudiant.prenom),
-                    _safe(ins.id_etudiant.email),
-                    _safe(f"{cours.nom_cours} ({cours.code_cours})"),
-                    total_abs,
-                    round(rate, 2),
-                    _export_status(ins, rate, seuil),
-                ])
+        ws.append([
+            _safe(ins.id_etudiant.nom),
+            _safe(ins.id_etudiant.prenom),
+            _safe(ins.id_etudiant.email),
+            _safe(f"{cours.nom_cours} ({cours.code_cours})"),
+            float(ins.total_absence),
+            round(ins.taux, 2),
+            _export_status(ins),
+        ])
 
     buf = io.BytesIO()
     wb.save(buf)
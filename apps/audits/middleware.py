@@ -0,0 +1,21 @@
+"""
+FICHIER : apps/audits/middleware.py
+RESPONSABILITE : Regroupement des ecritures d'audit par requete
+FONCTIONNALITES PRINCIPALES :
+  - AuditBufferMiddleware : les log_action() hors transaction d'une requete sont
+    inseres en un seul bulk_create a la fin de la requete
+DEPENDANCES CLES : audits.utils.request_audit_collector
+"""
+
+from .utils import request_audit_collector
+
+
+class AuditBufferMiddleware:
+    """Collecte les entrées d'audit d'une requête et les écrit en un lot à la fin."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_audit_collector():
+            return self.get_response(request)
@@ -3,17 +3,35 @@ FICHIER : apps/audits/utils.py
 RESPONSABILITE : Fonctions utilitaires pour la creation d'entrees d'audit
 FONCTIONNALITES PRINCIPALES :
   - log_action() : cree une entree dans le journal d'audit avec sanitization
+  - build_log_entry() : meme entree non sauvegardee, pour les insertions groupees
+  - audit_buffer() : regroupe les log_action() d'un bloc en un seul bulk_create
+  - Collecteur par requete (AuditBufferMiddleware) et ecriture asynchrone optionnelle
+    (AUDIT_LOG_ASYNC) via un thread d'ecriture en arriere-plan
   - get_client_ip() : extraction IP client via proxies de confiance
 DEPENDANCES CLES : audits.models.LogAudit, audits.ip_utils
 """
 
+import atexit
+import logging
+import queue
 import re
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
 
 from apps.accounts.models import User
 
 from .ip_utils import extract_client_ip
 from .models import LogAudit
 
+logger = logging.getLogger(__name__)
+
+# Buffers actifs du thread courant : bloc audit_buffer() et collecteur de requête
+_state = threading.local()
+
 
 def get_client_ip(request):
     """
@@ -23,22 +41,20 @@ def get_client_ip(request):
     return extract_client_ip(request)
 
 
-def log_action(
+def build_log_entry(
     user, action, request=None, niveau="INFO", objet_type=None, objet_id=None
 ):
     """
-    Crée une entrée dans le journal d'audit.
+    Prépare une entrée d'audit (non sauvegardée) avec les règles de log_action().
 
-    Args:
-        user: L'utilisateur effectuant l'action
-        action: Description détaillée de l'action
-        request: Objet requête Django optionnel pour extraire l'IP
-        niveau: Niveau de criticité ('INFO', 'WARNING', 'CRITIQUE')
-        objet_type: Type d'objet affecté ('USER', 'COURS', 'FACULTE', etc.)
-        objet_id: ID de l'objet affecté
+    Permet d'enregistrer plusieurs entrées en un seul bulk_create.
+
+    Returns:
+        LogAudit non sauvegardé, ou None si l'entrée doit être ignorée
+        (utilisateur anonyme, action vide).
     """
     if not user or not user.is_authenticated:
-        return
+        return None
 
     ip = "0.0.0.0"  # nosec B104
     if request:
@@ -49,13 +65,13 @@ def log_action(
         action = str(action)
     action = re.sub(r"[\x00-\x1f\x7f-\x9f]", " ", action)[:500]
     if not action.strip():
-        return
+        return None
 
     # Déterminer automatiquement le niveau si 'CRITIQUE' est dans l'action
     if "CRITIQUE" in action.upper() and niveau == "INFO":
         niveau = "CRITIQUE"
 
-    LogAudit.objects.create(
+    return LogAudit(
         id_utilisateur=user,
         action=action,
         adresse_ip=ip,
@@ -63,3 +79,186 @@ def log_action(
         objet_type=objet_type,
         objet_id=objet_id,
     )
+
+
+def log_action(
+    user, action, request=None, niveau="INFO", objet_type=None, objet_id=None
+):
+    """
+    Crée une entrée dans le journal d'audit.
+
+    Args:
+        user: L'utilisateur effectuant l'action
+        action: Description détaillée de l'action
+        request: Objet requête Django optionnel pour extraire l'IP
+        niveau: Niveau de criticité ('INFO', 'WARNING', 'CRITIQUE')
+        objet_type: Type d'objet affecté ('USER', 'COURS', 'FACULTE', etc.)
+        objet_id: ID de l'objet affecté
+    """
+    entry = build_log_entry(user, action, request, niveau, objet_type, objet_id)
+    if entry is None:
+        return
+
+    # Dans un bloc audit_buffer() : inséré avec le reste du bloc, à sa sortie
+    entries = getattr(_state, "entries", None)
+    if entries is not None:
+        entries.append(entry)
+        return
+
+    # Hors transaction, rien ne peut annuler l'écriture : le collecteur de la
+    # requête peut la reporter à la fin de la requête sans changer la sémantique.
+    request_entries = getattr(_state, "request_entries", None)
+    if request_entries is not None and not transaction.get_connection().in_atomic_block:
+        request_entries.append(entry)
+        return
+
+    entry.save()
+
+
+def flush_log_entries(entries):
+    """
+    Insère un lot d'entrées d'audit (un bulk_create).
+
+    Avec AUDIT_LOG_ASYNC, un lot produit hors transaction est confié au thread
+    d'écriture en arrière-plan ; dans une transaction, l'insertion reste
+    synchrone pour être annulée avec elle en cas de rollback.
+    """
+    if not entries:
+        return
+    if (
+        getattr(settings, "AUDIT_LOG_ASYNC", False)
+        and not transaction.get_connection().in_atomic_block
+    ):
+        _get_async_flusher().submit(entries)
+        return
+    LogAudit.objects.bulk_create(entries, batch_size=500)
+
+
+@contextmanager
+def audit_buffer():
+    """
+    Regroupe les log_action() du bloc en un seul bulk_create à sa sortie.
+
+    Mêmes règles que log_action() (sanitization, escalade CRITIQUE). À placer
+    à l'intérieur de la transaction concernée : les entrées sont insérées
+    dans cette transaction et annulées avec elle. Les blocs imbriqués
+    partagent le buffer du bloc le plus externe.
+    """
+    entries = getattr(_state, "entries", None)
+    if entries is not None:
+        yield entries
+        return
+
+    entries = []
+    _state.entries = entries
+    try:
+        yield entries
+    except BaseException:
+        _state.entries = None
+        # Dans une transaction, l'exception l'annule : les entrées aussi
+        # (et la connexion peut être inutilisable jusqu'au rollback).
+        if not transaction.get_connection().in_atomic_block:
+            flush_log_entries(entries)
+        raise
+    _state.entries = None
+    flush_log_entries(entries)
+
+
+@contextmanager
+def request_audit_collector():
+    """
+    Collecteur d'entrées d'audit pour une requête (voir AuditBufferMiddleware).
+
+    Seules les entrées écrites hors transaction sont différées : elles sont
+    insérées en un lot à la fin de la requête, même si la vue lève une exception.
+    """
+    _state.request_entries = []
+    try:
+        yield
+    finally:
+        entries, _state.request_entries = _state.request_entries, None
+        try:
+            flush_log_entries(entries)
+        except Exception:
+            logger.exception("Failed to write %d buffered audit entries", len(entries))
+
+
+# ========================================================================== #
+#                 ECRITURE ASYNCHRONE (AUDIT_LOG_ASYNC)                      #
+# ========================================================================== #
+
+
+class _AsyncAuditFlusher:
+    """
+    Thread d'écriture en arrière-plan : regroupe les lots reçus et les insère
+    toutes les AUDIT_LOG_ASYNC_INTERVAL secondes (ou dès MAX_BATCH entrées).
+
+    Les entrées en attente sont écrites à l'arrêt du processus (atexit) ; un
+    arrêt brutal peut perdre au plus un intervalle d'entrées.
+    """
+
+    MAX_BATCH = 500
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(
+            target=self._run, name="audit-log-flusher", daemon=True
+        )
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, entries):
+        self.queue.put(list(entries))
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join(timeout=max(self.interval * 2, 5))
+
+    def _run(self):
+        pending = []
+        deadline = time.monotonic() + self.interval
+        stopping = False
+        while not stopping:
+            try:
+                batch = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                if batch is None:
+                    stopping = True
+                else:
+                    pending.extend(batch)
+            except queue.Empty:
+                pass
+            if (
+                stopping
+                or len(pending) >= self.MAX_BATCH
+                or time.monotonic() >= deadline
+            ):
+                if pending:
+                    self._write(pending)
+                    pending = []
+                deadline = time.monotonic() + self.interval
+
+    def _write(self, entries):
+        close_old_connections()
+        try:
+            LogAudit.objects.bulk_create(entries, batch_size=self.MAX_BATCH)
+        except Exception:
+            logger.exception(
+                "Async audit flusher failed to write %d entries", len(entries)
+            )
+        finally:
+            close_old_connections()
+
+
+_async_flusher = None
+_async_flusher_lock = threading.Lock()
+
+
+def _get_async_flusher():
+    global _async_flusher
+    with _async_flusher_lock:
+        if _async_flusher is None:
+            _async_flusher = _AsyncAuditFlusher(
+                getattr(settings, "AUDIT_LOG_ASYNC_INTERVAL", 2.0)
+            )
+        return _async_flusher
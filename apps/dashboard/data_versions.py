@@ -0,0 +1,177 @@
+"""
+FICHIER : apps/dashboard/data_versions.py
+RESPONSABILITE : Cache des contextes de tableaux de bord indexe par versions de donnees
+FONCTIONNALITES PRINCIPALES :
+  - Jeton de version par etudiant, cours et annee academique (cache partage,
+    sans expiration). Changer une version = supprimer son jeton : le lecteur
+    suivant en tire un nouveau au hasard, une valeur n'est jamais reutilisee
+  - *_version_keys() : jetons touches par une inscription, une absence,
+    une seance ou un cours (invalides au commit par absences.signals)
+  - cached_context() : contexte d'un tableau de bord calcule une fois par
+    combinaison de versions ; le recalcul n'a lieu qu'apres une modification
+    des donnees concernees (ou DASHBOARD_CACHE_TIMEOUT), par un seul
+    processus a la fois (apps.swr_cache)
+DEPENDANCES CLES : django.core.cache, apps.swr_cache, enrollments.Inscription, absences.Absence
+"""
+
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.swr_cache import swr_get
+
+logger = logging.getLogger(__name__)
+
+# Préfixe des clés ; changé seulement par reset_namespace()
+_namespace = "dv"
+
+
+def reset_namespace():
+    """
+    Rend inaccessibles les versions et contextes existants pour ce processus.
+
+    Pour les tests : un rollback n'émet aucun signal et des identifiants
+    réutilisés retrouveraient sinon les contextes d'un test précédent.
+    """
+    global _namespace
+    _namespace = f"dv{uuid.uuid4().hex[:8]}"
+
+
+def _timeout():
+    return getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 600)
+
+
+def student_key(student_id):
+    return f"{_namespace}:student:{student_id}"
+
+
+def course_key(course_id):
+    return f"{_namespace}:course:{course_id}"
+
+
+def year_key(year_id):
+    return f"{_namespace}:year:{year_id}"
+
+
+def version_keys(student_id, course_id, year_id):
+    """Jetons touchés par une inscription (étudiant, cours, année)."""
+    return _keys_from_rows([(student_id, course_id, year_id)])
+
+
+def _keys_from_rows(rows):
+    """Jetons (étudiant, cours, année) d'une liste de triplets d'ids."""
+    keys = set()
+    for student_id, course_id, year_id in rows:
+        keys.add(student_key(student_id))
+        keys.add(course_key(course_id))
+        if year_id is not None:
+            keys.add(year_key(year_id))
+    return keys
+
+
+def inscription_version_keys(inscription_ids):
+    """Jetons touchés par une modification des absences d'un lot d'inscriptions (une requête)."""
+    from apps.enrollments.models import Inscription
+
+    if not inscription_ids:
+        return set()
+    return _keys_from_rows(
+        Inscription.objects.filter(pk__in=inscription_ids).values_list(
+            "id_etudiant_id", "id_cours_id", "id_annee_id"
+        )
+    )
+
+
+def absence_version_keys(absence_id):
+    """Jetons touchés par le justificatif d'une absence (une requête)."""
+    from apps.absences.models import Absence
+
+    return _keys_from_rows(
+        Absence.objects.filter(pk=absence_id).values_list(
+            "id_inscription__id_etudiant_id",
+            "id_inscription__id_cours_id",
+            "id_inscription__id_annee_id",
+        )
+    )
+
+
+def course_version_keys(courses):
+    """
+    Jetons d'un lot de cours, de leurs années et de leurs étudiants (une requête).
+
+    Une séance ajoutée ou déplacée, un seuil ou un volume horaire modifié
+    change les indicateurs de chaque étudiant du cours.
+
+    Args:
+        courses: couples (id du cours, id de l'année ou None pour toutes).
+    """
+    from apps.enrollments.models import Inscription
+
+    courses = set(courses)
+    if not courses:
+        return set()
+    keys = set()
+    for course_id, year_id in courses:
+        keys.add(course_key(course_id))
+        if year_id is not None:
+            keys.add(year_key(year_id))
+    rows = Inscription.objects.filter(
+        id_cours_id__in={course_id for course_id, _ in courses}
+    ).values_list("id_etudiant_id", "id_cours_id", "id_annee_id")
+    keys.update(
+        student_key(student_id)
+        for student_id, course_id, year_id in rows
+        if (course_id, year_id) in courses or (course_id, None) in courses
+    )
+    return keys
+
+
+def get_versions(keys):
+    """Jetons courants des clés de version, créés s'ils n'existent pas."""
+    keys = list(keys)
+    tokens = cache.get_many(keys)
+    missing = [key for key in keys if key not in tokens]
+    if missing:
+        for key in missing:
+            # add() : un jeton créé en parallèle par un autre processus est conservé
+            cache.add(key, uuid.uuid4().hex, None)
+        tokens.update(cache.get_many(missing))
+    return [tokens.get(key, "") for key in keys]
+
+
+def cached_context(name, keys, build, extra=(), timeout=None):
+    """
+    Contexte d'un tableau de bord, recalculé seulement si une version change.
+
+    Args:
+        name: nom du tableau de bord (préfixe de la clé).
+        keys: jetons dont dépend le contexte (student_key(), course_key(), ...).
+        build: callable sans argument qui calcule le contexte (valeurs picklables).
+        extra: autres paramètres de la clé (utilisateur, année active, date du
+            jour, seuil système, ...).
+        timeout: durée de fraîcheur (s), DASHBOARD_CACHE_TIMEOUT par défaut ;
+            une valeur périmée est encore servie pendant son recalcul.
+
+    Returns:
+        dict: le contexte en cache ou nouvellement calculé.
+    """
+    if timeout is None:
+        timeout = _timeout()
+    if timeout <= 0:
+        return build()
+
+    keys = sorted(set(keys))
+    try:
+        tokens = get_versions(keys)
+    except Exception:
+        logger.warning(
+            "Dashboard versions unavailable, building %s directly", name, exc_info=True
+        )
+        return build()
+    digest = hashlib.sha256(
+        "|".join([*map(str, extra), *keys, *tokens]).encode()
+    ).hexdigest()[:32]
+    return swr_get(f"{_namespace}:dash:{name}:{digest}", build, timeout)
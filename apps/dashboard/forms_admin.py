@@ -15,6 +15,7 @@ from django import forms
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
 
+from apps.academic_sessions.active_year import get_active_year, invalidate_active_year
 from apps.academic_sessions.models import AnneeAcademique
 from apps.academics.models import Cours, Departement, Faculte
 from apps.accounts.models import User
@@ -194,7 +195,7 @@ class CoursForm(forms.ModelForm):
         cleaned_data = super().clean()
         # Validate academic year availability for new courses during clean(), not save()
         if not self.instance.pk:
-            active_year = AnneeAcademique.objects.filter(active=True).first()
+            active_year = get_active_year()
             if not active_year:
                 active_year = AnneeAcademique.objects.order_by("-libelle").first()
             if not active_year:
@@ -445,6 +446,7 @@ class AnneeAcademiqueForm(forms.ModelForm):
                     AnneeAcademique.objects.exclude(pk=instance.pk).filter(
                         active=True
                     ).update(active=False)
+                    invalidate_active_year()
                     instance.save()
             else:
                 instance.save()
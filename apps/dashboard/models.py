@@ -1,9 +1,18 @@
+import threading
+import time
+
 from django.core.cache import cache
-from django.db import models
+from django.core.signals import request_started
+from django.db import models, transaction
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 SYSTEM_SETTINGS_CACHE_KEY = "system_settings_singleton"
 SYSTEM_SETTINGS_CACHE_TIMEOUT = 300  # 5 minutes
+# Compteur incrémenté à chaque sauvegarde : valide l'instantané de chaque processus
+SYSTEM_SETTINGS_VERSION_KEY = "system_settings:version"
+# Hors requête HTTP (commandes, workers) : revalidation au plus toutes les N secondes
+SYSTEM_SETTINGS_SNAPSHOT_MAX_AGE = 30
 
 
 class SystemSettings(models.Model):
@@ -129,6 +138,34 @@ class SystemSettings(models.Model):
     def __str__(self):
         return "Paramètres système"
 
+    @classmethod
+    def current(cls):
+        """
+        Instantané en lecture seule des paramètres, partagé par le processus.
+
+        La version partagée n'est relue qu'une fois par requête (puis au plus
+        toutes les SYSTEM_SETTINGS_SNAPSHOT_MAX_AGE secondes hors requête) ;
+        le modèle n'est rechargé que si elle a changé. À utiliser partout où
+        les paramètres sont seulement lus ; get_settings() pour les modifier.
+        """
+        global _snapshot
+        now = time.monotonic()
+        state = _snapshot
+        checked_at = getattr(_checked, "at", None)
+        if (
+            state is not None
+            and checked_at is not None
+            and now - checked_at < SYSTEM_SETTINGS_SNAPSHOT_MAX_AGE
+        ):
+            return state[1]
+
+        version = cache.get(SYSTEM_SETTINGS_VERSION_KEY)
+        if state is None or state[0] != version:
+            state = (version, SystemSettingsSnapshot(cls.get_settings()))
+            _snapshot = state
+        _checked.at = now
+        return state[1]
+
     @classmethod
     def get_settings(cls):
         """Récupère le singleton depuis le cache, ou depuis la DB en fallback."""
@@ -149,7 +186,8 @@ class SystemSettings(models.Model):
         self.id = 1
         self.full_clean()
         super().save(*args, **kwargs)
-        cache.delete(SYSTEM_SETTINGS_CACHE_KEY)
+        _bump_settings_version()
+        transaction.on_commit(_bump_settings_version)
 
     def clean(self):
         """Validation des paramètres"""
@@ -173,3 +211,70 @@ class SystemSettings(models.Model):
                     "data_retention_days": "La rétention des données doit être entre 1 et 3650 jours."
                 }
             )
+
+
+_READ_ONLY_MESSAGE = (
+    "Paramètres système en lecture seule : modifier SystemSettings.get_settings()."
+)
+
+
+class SystemSettingsSnapshot:
+    """Valeurs figées de SystemSettings (immuable, partagée entre threads)."""
+
+    __slots__ = (
+        "default_absence_threshold",
+        "block_type",
+        "password_min_length",
+        "password_require_uppercase",
+        "password_require_lowercase",
+        "password_require_numbers",
+        "password_require_special",
+        "mfa_enabled_globally",
+        "gps_latitude",
+        "gps_longitude",
+        "gps_radius_meters",
+        "qr_token_duration_seconds",
+        "data_retention_days",
+        "last_modified",
+        "modified_by_id",
+    )
+
+    def __init__(self, settings):
+        for name in self.__slots__:
+            object.__setattr__(self, name, getattr(settings, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(_READ_ONLY_MESSAGE)
+
+    def __delattr__(self, name):
+        raise AttributeError(_READ_ONLY_MESSAGE)
+
+
+# (version, SystemSettingsSnapshot) du processus ; _checked.at : dernière
+# relecture de la version par le thread courant
+_snapshot = None
+_checked = threading.local()
+
+
+def _bump_settings_version():
+    """Paramètres modifiés : cache du modèle supprimé, version incrémentée."""
+    cache.delete(SYSTEM_SETTINGS_CACHE_KEY)
+    cache.add(SYSTEM_SETTINGS_VERSION_KEY, 0, None)
+    try:
+        cache.incr(SYSTEM_SETTINGS_VERSION_KEY)
+    except ValueError:
+        # Clé évincée entre add() et incr()
+        cache.set(SYSTEM_SETTINGS_VERSION_KEY, 1, None)
+    clear_local_settings()
+
+
+def clear_local_settings():
+    """Oublie l'instantané du processus sans toucher la version partagée (tests)."""
+    global _snapshot
+    _snapshot = None
+
+
+@receiver(request_started, dispatch_uid="system_settings_snapshot_recheck")
+def _recheck_settings_version(**kwargs):
+    """Nouvelle requête : la version partagée sera relue au premier accès."""
+    _checked.at = None
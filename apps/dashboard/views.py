@@ -15,19 +15,24 @@ from collections import defaultdict
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Count, Max, Min, Q, Sum
-from django.utils import timezone
+from django.db.models import Count, Max, Min, Q
 
 from apps.utils import safe_get_page
 from django.shortcuts import redirect, render
 from django.views.decorators.http import require_GET
 
 from apps.absences.models import Absence, Justification
-from apps.absences.services import get_system_threshold
-from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.absences.services import (
+    annotate_absence_risk,
+    at_risk_item,
+    get_system_threshold,
+)
+from apps.academic_sessions.active_year import get_active_year
+from apps.academic_sessions.models import Seance
 from apps.academics.models import Cours, Departement, Faculte
 from apps.accounts.models import User
 from apps.dashboard import views_professor, views_student
+from apps.dashboard.data_versions import cached_context, year_key
 from apps.dashboard.decorators import secretary_required
 from apps.enrollments.models import Inscription
 
@@ -88,18 +93,8 @@ def admin_dashboard(request):
 # ---------------------------------------------------------------------------
 
 
-@login_required
-@secretary_required
-@require_GET
-def secretary_dashboard(request):
-    """
-    Vue tableau de bord secrétaire - KPIs uniquement
-    """
-    # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
-
+def _secretary_dashboard_kpis(academic_year):
+    """Indicateurs du tableau de bord secrétaire (mis en cache par version de l'année)."""
     # 1. Absence status counts
     absence_base_qs = Absence.objects.all()
     if academic_year:
@@ -107,54 +102,17 @@ def secretary_dashboard(request):
     global_unjustified_count = absence_base_qs.filter(statut=Absence.Statut.NON_JUSTIFIEE).count()
     global_pending_count = absence_base_qs.filter(statut=Absence.Statut.EN_ATTENTE).count()
 
-    # 2. Global "At Risk" Calculation — filtré par année active
-    all_inscriptions_qs = Inscription.objects.filter(
-        status=Inscription.Status.EN_COURS
-    ).select_related("id_cours", "id_etudiant")
+    # 2. Global "At Risk" Calculation — filtré par année active, évalué en SQL
+    all_inscriptions_qs = Inscription.objects.filter(status=Inscription.Status.EN_COURS)
     if academic_year:
         all_inscriptions_qs = all_inscriptions_qs.filter(id_annee=academic_year)
-    all_inscriptions = list(all_inscriptions_qs)
-    inscription_ids = [ins.id_inscription for ins in all_inscriptions]
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
+    risk_counts = annotate_absence_risk(all_inscriptions_qs).aggregate(
+        blocked=Count("id_inscription", filter=Q(is_blocked=True)),
+        exempted=Count("id_inscription", filter=Q(is_under_exemption=True)),
     )
-    global_at_risk_count = 0
-    at_risk_list = []
-
-    for ins in all_inscriptions:
-        cours = ins.id_cours
-        if cours.nombre_total_periodes > 0:
-            total_abs = float(absence_sums.get(ins.id_inscription, 0) or 0)
-
-            rate = (total_abs / cours.nombre_total_periodes) * 100
-
-            # CORRECTION BUG CRITIQUE #4d — seuil configuré par cours
-            seuil = cours.get_seuil_absence()
-            seuil_effectif = min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-            if rate >= seuil_effectif:
-                at_risk_list.append(
-                    {
-                        "inscription": ins,
-                        "etudiant": ins.id_etudiant,
-                        "cours": cours,
-                        "total_abs": total_abs,
-                        "rate": round(rate, 1),
-                        "is_blocked": rate >= seuil_effectif,
-                        "exemption": ins.exemption_40,
-                    }
-                )
-                global_at_risk_count += 1
-
-    at_risk_blocked_count = sum(1 for item in at_risk_list if item["is_blocked"])
-    at_risk_exempted_count = len(at_risk_list) - at_risk_blocked_count
+    global_at_risk_count = risk_counts["blocked"]
+    at_risk_blocked_count = risk_counts["blocked"]
+    at_risk_exempted_count = risk_counts["exempted"]
 
     # 5. KPI Calculations
     # Active Inscriptions (Inscriptions in the current academic year)
@@ -169,20 +127,42 @@ def secretary_dashboard(request):
     active_courses_queryset = get_active_courses_queryset(academic_year)
     active_courses_count = active_courses_queryset.count()
 
+    return {
+        "global_unjustified_count": global_unjustified_count,
+        "global_pending_count": global_pending_count,
+        "global_at_risk_count": global_at_risk_count,
+        "at_risk_blocked_count": at_risk_blocked_count,
+        "at_risk_exempted_count": at_risk_exempted_count,
+        "active_inscriptions_count": active_inscriptions_count,
+        "active_courses_count": active_courses_count,
+    }
+
+
+@login_required
+@secretary_required
+@require_GET
+def secretary_dashboard(request):
+    """
+    Vue tableau de bord secrétaire - KPIs uniquement
+    """
+    # Get current academic year
+    academic_year = get_active_year(fallback=True)
+
+    # Indicateurs de l'année : recalculés après une modification de ses données
+    if academic_year:
+        kpis = cached_context(
+            "secretary",
+            [year_key(academic_year.pk)],
+            lambda: _secretary_dashboard_kpis(academic_year),
+            extra=(academic_year.pk, get_system_threshold()),
+        )
+    else:
+        kpis = _secretary_dashboard_kpis(None)
+
     return render(
         request,
         "dashboard/secretary_index.html",
-        {
-            "global_unjustified_count": global_unjustified_count,
-            "global_pending_count": global_pending_count,
-            "global_at_risk_count": global_at_risk_count,
-            "at_risk_list": at_risk_list,
-            "at_risk_blocked_count": at_risk_blocked_count,
-            "at_risk_exempted_count": at_risk_exempted_count,
-            "academic_year": academic_year,
-            "active_inscriptions_count": active_inscriptions_count,
-            "active_courses_count": active_courses_count,
-        },
+        {"academic_year": academic_year, **kpis},
     )
 
 
@@ -199,9 +179,7 @@ def secretary_enrollments(request):
     Page "Inscriptions" - Gestion des inscriptions étudiantes.
     """
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Get all inscriptions for current year
     if academic_year:
@@ -296,64 +274,28 @@ def secretary_seuils_absence(request):
     List students violating the absence threshold rule (per-course or system default).
     Integrated into the secretary dashboard layout.
     """
-    active_year = AnneeAcademique.objects.filter(active=True).first()
+    active_year = get_active_year()
     system_threshold = get_system_threshold()
 
-    inscriptions_qs = Inscription.objects.filter(
-        status=Inscription.Status.EN_COURS
-    ).select_related("id_cours", "id_etudiant")
+    inscriptions_qs = Inscription.objects.filter(status=Inscription.Status.EN_COURS)
     if active_year:
         inscriptions_qs = inscriptions_qs.filter(id_annee=active_year)
 
-    inscription_ids = list(inscriptions_qs.values_list("id_inscription", flat=True))
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
+    # Règle du seuil évaluée en SQL : seule la page affichée est chargée
+    at_risk_qs = (
+        annotate_absence_risk(inscriptions_qs, system_threshold)
+        .filter(is_at_risk=True)
+        .select_related("id_cours", "id_etudiant")
+        .order_by("id_inscription")
+    )
+    counts = at_risk_qs.aggregate(
+        blocked=Count("id_inscription", filter=Q(is_blocked=True)),
+        exempted=Count("id_inscription", filter=Q(is_under_exemption=True)),
     )
-    at_risk_list = []
-
-    for ins in inscriptions_qs:
-        cours = ins.id_cours
-        if cours.nombre_total_periodes > 0:
-            total_abs = float(absence_sums.get(ins.id_inscription, 0) or 0)
-            rate = (total_abs / cours.nombre_total_periodes) * 100
-            seuil = (
-                cours.seuil_absence
-                if cours.seuil_absence is not None
-                else system_threshold
-            )
-            seuil_effectif = min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-            if rate >= seuil:
-                is_blocked = rate >= seuil_effectif
-                is_under_exemption = ins.exemption_40 and not is_blocked
-                at_risk_list.append(
-                    {
-                        "inscription": ins,
-                        "etudiant": ins.id_etudiant,
-                        "cours": cours,
-                        "total_abs": total_abs,
-                        "rate": round(rate, 1),
-                        "seuil": seuil,
-                        "seuil_effectif": seuil_effectif,
-                        "is_blocked": is_blocked,
-                        "is_under_exemption": is_under_exemption,
-                        "exemption": ins.exemption_40,
-                        "exemption_margin": ins.exemption_margin,
-                    }
-                )
-
-    blocked_count = sum(1 for item in at_risk_list if item["is_blocked"])
-    exempted_count = sum(1 for item in at_risk_list if item["is_under_exemption"])
 
-    paginator = Paginator(at_risk_list, 25)
+    paginator = Paginator(at_risk_qs, 25)
     page_obj = safe_get_page(paginator, request.GET.get("page"))
+    page_obj.object_list = [at_risk_item(ins) for ins in page_obj.object_list]
 
     return render(
         request,
@@ -361,8 +303,8 @@ def secretary_seuils_absence(request):
         {
             "at_risk_list": page_obj,
             "page_obj": page_obj,
-            "blocked_count": blocked_count,
-            "exempted_count": exempted_count,
+            "blocked_count": counts["blocked"],
+            "exempted_count": counts["exempted"],
         },
     )
 
@@ -375,55 +317,26 @@ def secretary_exports(request):
     Page "Exports" - Téléchargement des rapports Excel/PDF.
     """
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Calculate statistics for display
+    active_inscriptions = Inscription.objects.filter(status=Inscription.Status.EN_COURS)
     if academic_year:
-        active_inscriptions = Inscription.objects.filter(
-            id_annee=academic_year,
-            status=Inscription.Status.EN_COURS,
-        ).select_related("id_cours")
-    else:
-        active_inscriptions = Inscription.objects.filter(
-            status=Inscription.Status.EN_COURS
-        ).select_related("id_cours")
-
-    active_inscriptions_list = list(active_inscriptions)
-    inscription_ids = [ins.id_inscription for ins in active_inscriptions_list]
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+        active_inscriptions = active_inscriptions.filter(id_annee=academic_year)
 
-    # Count at-risk students
-    at_risk_count = 0
-    for ins in active_inscriptions_list:
-        cours = ins.id_cours
-        if cours.nombre_total_periodes > 0:
-            total_abs = float(absence_sums.get(ins.id_inscription, 0) or 0)
-            rate = (total_abs / cours.nombre_total_periodes) * 100
-            # CORRECTION BUG CRITIQUE #4f — seuil configuré par cours
-            seuil = ins.id_cours.get_seuil_absence()
-            seuil_effectif = min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-            if rate >= seuil_effectif:
-                at_risk_count += 1
+    # Count at-risk students (COUNT SQL, règle du seuil évaluée en base)
+    risk_counts = annotate_absence_risk(active_inscriptions).aggregate(
+        total=Count("id_inscription"),
+        at_risk=Count("id_inscription", filter=Q(is_blocked=True)),
+    )
 
     return render(
         request,
         "dashboard/secretary_exports.html",
         {
             "academic_year": academic_year,
-            "active_inscriptions_count": len(active_inscriptions_list),
-            "at_risk_count": at_risk_count,
+            "active_inscriptions_count": risk_counts["total"],
+            "at_risk_count": risk_counts["at_risk"],
         },
     )
 
@@ -477,9 +390,7 @@ def active_courses(request):
         return redirect("dashboard:index")
 
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Get filter parameters
     faculty_filter = request.GET.get("faculty", "")
@@ -11,10 +11,9 @@ from datetime import timedelta
 
 import logging
 
+from django.conf import settings as django_settings
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
-from django.db.models import Count, F, Q, Sum
-from django.db.models.functions import TruncMonth
+from django.db.models import Q
 from django.shortcuts import render
 from django.utils import timezone
 from django.views.decorators.http import require_GET
@@ -22,10 +21,12 @@ from django.views.decorators.http import require_GET
 logger = logging.getLogger(__name__)
 
 from apps.absences.models import Absence
-from apps.academic_sessions.models import AnneeAcademique
+from apps.absences.services import absence_fact_breakdowns, get_system_threshold
+from apps.academic_sessions.active_year import get_active_year
 from apps.academics.models import Cours
 from apps.accounts.models import User
 from apps.audits.models import LogAudit
+from apps.dashboard.data_versions import cached_context, year_key
 from apps.dashboard.decorators import admin_required
 from apps.dashboard.models import SystemSettings
 from apps.enrollments.models import Inscription
@@ -44,55 +45,35 @@ def is_admin(user):
     return user.is_authenticated and user.role == User.Role.ADMIN
 
 
-CACHE_KEY_AT_RISK = "admin_dashboard:at_risk_count"
-CACHE_TTL_AT_RISK = 300  # 5 minutes
+def _admin_year_kpis(academic_year):
+    """Indicateurs de l'année active (mis en cache par version de l'année)."""
+    from apps.absences.services import annotate_absence_risk
 
-
-def _get_at_risk_count_cached(academic_year):
-    """Calcule le nombre d'etudiants a risque avec cache Redis (5 min)."""
-    cached = cache.get(CACHE_KEY_AT_RISK)
-    if cached is not None:
-        return cached
-
-    at_risk_count = 0
     all_inscriptions = Inscription.objects.filter(
-        status=Inscription.Status.EN_COURS
-    ).select_related("id_cours", "id_etudiant")
-    if academic_year:
-        all_inscriptions = all_inscriptions.filter(id_annee=academic_year)
-    inscription_ids = list(all_inscriptions.values_list("id_inscription", flat=True))
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
+        id_annee=academic_year, status=Inscription.Status.EN_COURS
     )
-    from apps.absences.services import get_system_threshold
-
-    system_threshold = get_system_threshold()
-    for ins in all_inscriptions:
-        cours = ins.id_cours
-        if cours.nombre_total_periodes > 0:
-            total_abs = float(absence_sums.get(ins.id_inscription, 0) or 0)
-            rate = (total_abs / cours.nombre_total_periodes) * 100
-            seuil = (
-                cours.seuil_absence
-                if cours.seuil_absence is not None
-                else system_threshold
-            )
-            seuil_effectif = (
-                min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-            )
-            if rate >= seuil_effectif:
-                at_risk_count += 1
+    return {
+        # Un seul COUNT SQL : la règle du seuil est évaluée en base
+        "system_alerts": annotate_absence_risk(all_inscriptions).filter(is_blocked=True).count(),
+        "total_inscriptions": all_inscriptions.count(),
+        "total_absences": Absence.objects.filter(id_inscription__id_annee=academic_year).count(),
+    }
 
-    cache.set(CACHE_KEY_AT_RISK, at_risk_count, CACHE_TTL_AT_RISK)
-    return at_risk_count
+
+def _admin_global_kpis():
+    """Comptes globaux (utilisateurs, cours, actions critiques), hors année."""
+    seven_days_ago = timezone.now() - timedelta(days=7)
+    return {
+        "total_students": User.objects.filter(role=User.Role.ETUDIANT, actif=True).count(),
+        "total_professors": User.objects.filter(role=User.Role.PROFESSEUR, actif=True).count(),
+        "total_secretaries": User.objects.filter(role=User.Role.SECRETAIRE, actif=True).count(),
+        # Tous les cours marqués actifs (configurés et prêts à être utilisés)
+        "active_courses": Cours.objects.filter(actif=True).count(),
+        # Journaux d'audit CRITIQUE des 7 derniers jours
+        "critical_actions": LogAudit.objects.filter(
+            date_action__gte=seven_days_ago, niveau="CRITIQUE"
+        ).count(),
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -110,25 +91,16 @@ def admin_dashboard_main(request):
     """
 
     # Récupérer l'année académique active
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-
-    # KPI 1: Nombre total d'étudiants
-    total_students = User.objects.filter(role=User.Role.ETUDIANT, actif=True).count()
-
-    # KPI 2: Nombre total de professeurs
-    total_professors = User.objects.filter(
-        role=User.Role.PROFESSEUR, actif=True
-    ).count()
-
-    # KPI 3: Nombre de secrétaires
-    total_secretaries = User.objects.filter(
-        role=User.Role.SECRETAIRE, actif=True
-    ).count()
-
-    # KPI 4: Nombre de cours actifs
-    # Pour le dashboard admin, on compte tous les cours actifs (configurés et prêts à être utilisés)
-    # Un cours est considéré comme "actif" s'il est marqué comme actif dans le système
-    active_courses = Cours.objects.filter(actif=True).count()
+    academic_year = get_active_year()
+
+    # KPI 1 à 4 et 6 : comptes globaux, servis jusqu'à ANALYTICS_CACHE_TIMEOUT
+    # secondes et recalculés par une seule requête à la fois
+    global_kpis = cached_context(
+        "admin_global",
+        [],
+        _admin_global_kpis,
+        timeout=getattr(django_settings, "ANALYTICS_CACHE_TIMEOUT", 60),
+    )
 
     # Optionnel : Compter aussi les cours avec professeur assigné ET utilisés dans l'année active
     # (pour avoir une vue plus détaillée)
@@ -153,31 +125,17 @@ def admin_dashboard_main(request):
     else:
         active_courses_with_activity = 0
 
-    # KPI 5: Nombre d'alertes système (étudiants à risque) — filtré par année active
-    # Calcul lourd -> cache 5 minutes
-    at_risk_count = _get_at_risk_count_cached(academic_year)
-
-    # KPI 6: Nombre d'actions critiques (journaux d'audit des 7 derniers jours)
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    critical_actions = LogAudit.objects.filter(
-        date_action__gte=seven_days_ago, niveau="CRITIQUE"
-    ).count()
-
-    # KPI 7: Total d'inscriptions actives
+    # KPI 5, 7, 8 : alertes (étudiants à risque), inscriptions et absences de l'année
+    # active — recalculés seulement après une modification des données de l'année
     if academic_year:
-        total_inscriptions = Inscription.objects.filter(
-            id_annee=academic_year, status=Inscription.Status.EN_COURS
-        ).count()
-    else:
-        total_inscriptions = 0
-
-    # KPI 8: Total d'absences enregistrées (année active)
-    if academic_year:
-        total_absences = Absence.objects.filter(
-            id_inscription__id_annee=academic_year
-        ).count()
+        year_kpis = cached_context(
+            "admin_year",
+            [year_key(academic_year.pk)],
+            lambda: _admin_year_kpis(academic_year),
+            extra=(academic_year.pk, get_system_threshold()),
+        )
     else:
-        total_absences = 0
+        year_kpis = {"system_alerts": 0, "total_inscriptions": 0, "total_absences": 0}
 
     # Journaux d'audit récents
     recent_audits = LogAudit.objects.select_related("id_utilisateur").order_by(
@@ -188,14 +146,8 @@ def admin_dashboard_main(request):
     settings = SystemSettings.get_settings()
 
     context = {
-        "total_students": total_students,
-        "total_professors": total_professors,
-        "total_secretaries": total_secretaries,
-        "active_courses": active_courses,
-        "system_alerts": at_risk_count,
-        "critical_actions": critical_actions,
-        "total_inscriptions": total_inscriptions,
-        "total_absences": total_absences,
+        **global_kpis,
+        **year_kpis,
         "recent_audits": recent_audits,
         "academic_year": academic_year,
         "settings": settings,
@@ -217,66 +169,43 @@ def admin_statistics(request):
     Page dédiée aux statistiques avancées des absences.
     Séparée du dashboard principal pour une meilleure lisibilité et performance.
     """
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    year_filter = Q(id_inscription__id_annee=academic_year) if academic_year else Q()
+    academic_year = get_active_year()
+
+    # Tous les graphiques sont lus dans les faits quotidiens (AbsenceDailyFact) :
+    # le coût ne dépend pas de la taille de la table absence
+    breakdowns = absence_fact_breakdowns(academic_year)
 
     # 1. Top 5 professeurs avec le plus d'absences
-    top_professors = list(
-        Absence.objects.filter(year_filter)
-        .values(
-            prof_nom=F("id_inscription__id_cours__professeur__nom"),
-            prof_prenom=F("id_inscription__id_cours__professeur__prenom"),
-        )
-        .annotate(total=Count("id_absence"))
-        .order_by("-total")[:5]
-    )
+    top_professors = [
+        {"prof_nom": p["nom"], "prof_prenom": p["prenom"], "total": p["total"]}
+        for p in breakdowns["top_professors"]
+    ]
     top_professors_labels = [
         f"{p['prof_prenom']} {p['prof_nom']}" for p in top_professors if p["prof_nom"]
     ]
     top_professors_data = [p["total"] for p in top_professors if p["prof_nom"]]
 
     # 2. Top 5 cours avec le plus d'absences
-    top_courses = list(
-        Absence.objects.filter(year_filter)
-        .values(cours_nom=F("id_inscription__id_cours__nom_cours"))
-        .annotate(total=Count("id_absence"))
-        .order_by("-total")[:5]
-    )
+    top_courses = [
+        {"cours_nom": c["nom_cours"], "total": c["total"]} for c in breakdowns["top_courses"]
+    ]
     top_courses_labels = [c["cours_nom"] for c in top_courses]
     top_courses_data = [c["total"] for c in top_courses]
 
     # 3. Évolution mensuelle des absences
-    monthly_absences = list(
-        Absence.objects.filter(year_filter)
-        .annotate(month=TruncMonth("id_seance__date_seance"))
-        .values("month")
-        .annotate(total=Count("id_absence"))
-        .order_by("month")
-    )
+    monthly_absences = breakdowns["monthly"]
     monthly_labels = [
         m["month"].strftime("%b %Y") for m in monthly_absences if m["month"]
     ]
     monthly_data = [m["total"] for m in monthly_absences if m["month"]]
 
     # 4. Répartition par département
-    dept_absences = list(
-        Absence.objects.filter(year_filter)
-        .values(
-            dept_nom=F("id_inscription__id_cours__id_departement__nom_departement")
-        )
-        .annotate(total=Count("id_absence"))
-        .order_by("-total")
-    )
-    dept_labels = [d["dept_nom"] for d in dept_absences if d["dept_nom"]]
-    dept_data = [d["total"] for d in dept_absences if d["dept_nom"]]
+    dept_absences = breakdowns["departments"]
+    dept_labels = [d["nom_departement"] for d in dept_absences if d["nom_departement"]]
+    dept_data = [d["total"] for d in dept_absences if d["nom_departement"]]
 
     # 5. Répartition par statut
-    status_absences = list(
-        Absence.objects.filter(year_filter)
-        .values("statut")
-        .annotate(total=Count("id_absence"))
-        .order_by("statut")
-    )
+    status_absences = breakdowns["statuses"]
     status_map = {
         Absence.Statut.NON_JUSTIFIEE: "Non justifiée",
         Absence.Statut.EN_ATTENTE: "En attente",
@@ -288,20 +217,15 @@ def admin_statistics(request):
     status_data = [s["total"] for s in status_absences]
 
     # 6. Répartition par niveau
-    level_absences = list(
-        Absence.objects.filter(year_filter)
-        .values(niveau=F("id_inscription__id_cours__niveau"))
-        .annotate(total=Count("id_absence"))
-        .order_by("niveau")
-    )
+    level_absences = breakdowns["levels"]
     level_labels = [
         f"Année {l['niveau']}" for l in level_absences if l["niveau"]
     ]
     level_data = [l["total"] for l in level_absences if l["niveau"]]
 
-    # 7. KPI summary stats
-    total_absences = Absence.objects.filter(year_filter).count()
+    # 7. KPI summary stats (chaque absence a exactement un statut)
     status_dict = {s["statut"]: s["total"] for s in status_absences}
+    total_absences = sum(status_dict.values())
     kpi_justified = status_dict.get(Absence.Statut.JUSTIFIEE, 0)
     kpi_pending = status_dict.get(Absence.Statut.EN_ATTENTE, 0)
     kpi_unjustified = status_dict.get(Absence.Statut.NON_JUSTIFIEE, 0)
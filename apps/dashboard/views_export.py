@@ -10,7 +10,6 @@ DEPENDANCES CLES : absences.utils, absences.services, openpyxl
 import datetime
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404
 from django.views.decorators.http import require_GET
@@ -21,6 +20,7 @@ from reportlab.pdfgen import canvas
 from django.utils import timezone
 
 from apps.absences.models import Absence
+from apps.absences.services import get_absence_sums
 from apps.accounts.models import User
 from apps.audits.utils import log_action
 from apps.dashboard.decorators import roles_required, secretary_required
@@ -44,7 +44,7 @@ def export_student_pdf(request, student_id=None):
     Accès filtré par @roles_required (PROFESSEUR exclu). Les contrôles fins
     (un étudiant ne peut accéder qu'à son propre rapport) restent en vue.
     """
-    from apps.academic_sessions.models import AnneeAcademique
+    from apps.academic_sessions.active_year import get_active_year
 
     # STRICT: Students can only export their own reports
     if request.user.role == User.Role.ETUDIANT:
@@ -57,9 +57,7 @@ def export_student_pdf(request, student_id=None):
         student = get_object_or_404(User, pk=effective_student_id, role=User.Role.ETUDIANT)
 
     # Filtrer par année académique active
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     response = HttpResponse(content_type="application/pdf")
     # Sanitize email for filename (remove special chars that could break header)
@@ -101,16 +99,7 @@ def export_student_pdf(request, student_id=None):
     inscription_ids = list(inscriptions.values_list("id_inscription", flat=True))
 
     today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscription_ids)
 
     p.setFont("Helvetica-Bold", 14)
     p.drawString(50, y_position, "Resume par Cours")
@@ -218,66 +207,41 @@ def export_at_risk_excel(request):
     ]
     ws.append(columns)
 
-    # Data — filtré par année active
-    from apps.absences.services import get_system_threshold
-    from apps.academic_sessions.models import AnneeAcademique
+    # Data — filtré par année active, règle du seuil évaluée en base
+    from apps.absences.services import annotate_absence_risk
+    from apps.academic_sessions.active_year import get_active_year
 
-    active_year = AnneeAcademique.objects.filter(active=True).first()
-    all_inscriptions = Inscription.objects.filter(status=Inscription.Status.EN_COURS).select_related(
-        "id_cours", "id_etudiant"
-    )
+    active_year = get_active_year()
+    all_inscriptions = Inscription.objects.filter(status=Inscription.Status.EN_COURS)
     if active_year:
         all_inscriptions = all_inscriptions.filter(id_annee=active_year)
-    inscription_ids = list(all_inscriptions.values_list("id_inscription", flat=True))
-    system_threshold = get_system_threshold()
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
+    at_risk = (
+        annotate_absence_risk(all_inscriptions)
+        .filter(is_at_risk=True)
+        .select_related("id_cours", "id_etudiant")
+        .order_by("id_inscription")
     )
 
-    for ins in all_inscriptions:
-        cours = ins.id_cours
-        if cours.nombre_total_periodes > 0:
-            total_abs = float(absence_sums.get(ins.id_inscription, 0) or 0)
+    def _safe(val):
+        s = str(val) if val is not None else ""
+        if s and s[0] in ("=", "+", "-", "@", "\t", "\r"):
+            return "'" + s
+        return s
 
-            rate = (total_abs / cours.nombre_total_periodes) * 100
-            seuil = (
-                cours.seuil_absence
-                if cours.seuil_absence is not None
-                else system_threshold
-            )
-
-            seuil_effectif = min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-            if rate >= seuil:
-                if ins.exemption_40 and rate < seuil_effectif:
-                    statut = "EXEMPTÉ"
-                else:
-                    statut = "BLOQUÉ"
-
-                def _safe(val):
-                    s = str(val) if val is not None else ""
-                    if s and s[0] in ("=", "+", "-", "@", "\t", "\r"):
-                        return "'" + s
-                    return s
-
-                ws.append(
-                    [
-                        _safe(ins.id_etudiant.nom),
-                        _safe(ins.id_etudiant.prenom),
-                        _safe(ins.id_etudiant.email),
-                        _safe(f"{cours.nom_cours} ({cours.code_cours})"),
-                        total_abs,
-                        round(rate, 2),
-                        statut,
-                    ]
-                )
+    for ins in at_risk.iterator(chunk_size=2000):
+        cours = ins.id_cours
+        statut = "EXEMPTÉ" if ins.is_under_exemption else "BLOQUÉ"
+        ws.append(
+            [
+                _safe(ins.id_etudiant.nom),
+                _safe(ins.id_etudiant.prenom),
+                _safe(ins.id_etudiant.email),
+                _safe(f"{cours.nom_cours} ({cours.code_cours})"),
+                float(ins.total_absence),
+                round(ins.taux, 2),
+                statut,
+            ]
+        )
 
     from apps.audits.utils import log_action
 
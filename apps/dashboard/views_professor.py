@@ -15,7 +15,7 @@ from collections import defaultdict
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Count, Sum
+from django.db.models import Count
 from django.utils import timezone
 
 from apps.utils import safe_get_page
@@ -23,9 +23,15 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_GET
 
 from apps.absences.models import Absence
-from apps.absences.services import get_system_threshold, predict_absence_risk
-from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.absences.services import (
+    get_absence_sums,
+    get_system_threshold,
+    predict_absence_risk,
+)
+from apps.academic_sessions.active_year import get_active_year
+from apps.academic_sessions.models import Seance
 from apps.academics.models import Cours
+from apps.dashboard.data_versions import cached_context, course_key
 from apps.dashboard.decorators import professor_required
 from apps.enrollments.models import Inscription
 
@@ -35,31 +41,16 @@ from apps.enrollments.models import Inscription
 # ---------------------------------------------------------------------------
 
 
-@login_required
-@professor_required
-@require_GET
-def instructor_dashboard(request):
-    """
-    Vue du tableau de bord professeur - Pédagogique uniquement
-    Affiche les KPIs, cours actifs, et informations pédagogiques.
-    STRICT: Aucune action administrative permise.
-    """
-
-    # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
-
-    today = timezone.localdate()
-
+def _instructor_dashboard_kpis(user, academic_year, today):
+    """Indicateurs du tableau de bord professeur (mis en cache par versions de données)."""
     # --- KPI 1: Active Courses (assigned to professor, marked as active)
-    active_courses = Cours.objects.filter(professeur=request.user, actif=True)
+    active_courses = Cours.objects.filter(professeur=user, actif=True)
     active_courses_count = active_courses.count()
 
     # --- KPI 2: Sessions Given (current year, past sessions)
     if academic_year:
         sessions_given = Seance.objects.filter(
-            id_cours__professeur=request.user,
+            id_cours__professeur=user,
             id_annee=academic_year,
             date_seance__lt=today,
         ).count()
@@ -69,7 +60,7 @@ def instructor_dashboard(request):
     # --- KPI 3: Upcoming Sessions (current year, future sessions)
     if academic_year:
         upcoming_sessions = Seance.objects.filter(
-            id_cours__professeur=request.user,
+            id_cours__professeur=user,
             id_annee=academic_year,
             date_seance__gte=today,
         ).count()
@@ -79,7 +70,7 @@ def instructor_dashboard(request):
     # --- KPI 4: Total Recorded Absences (current year, in professor's courses)
     if academic_year:
         total_absences = Absence.objects.filter(
-            id_seance__id_cours__professeur=request.user,
+            id_seance__id_cours__professeur=user,
             id_seance__id_annee=academic_year,
         ).count()
     else:
@@ -87,24 +78,14 @@ def instructor_dashboard(request):
 
     # --- KPI 5: Students At Risk - READ ONLY, INDICATIVE ONLY
     all_inscriptions_qs = Inscription.objects.filter(
-        id_cours__professeur=request.user, status=Inscription.Status.EN_COURS
+        id_cours__professeur=user, status=Inscription.Status.EN_COURS
     ).select_related("id_cours", "id_etudiant")
     if academic_year:
         all_inscriptions_qs = all_inscriptions_qs.filter(id_annee=academic_year)
 
     all_inscriptions = list(all_inscriptions_qs)
     inscription_ids = [ins.id_inscription for ins in all_inscriptions]
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscription_ids)
 
     at_risk_count = 0
     at_risk_list = []
@@ -150,48 +131,61 @@ def instructor_dashboard(request):
                     }
                 )
 
-    return render(
-        request,
-        "dashboard/instructor_index.html",
-        {
-            "academic_year": academic_year,
-            "active_courses_count": active_courses_count,
-            "sessions_given": sessions_given,
-            "upcoming_sessions": upcoming_sessions,
-            "total_absences": total_absences,
-            "at_risk_count": at_risk_count,
-            "at_risk_list": at_risk_list[:5],  # Limit to 5 for dashboard display
-        },
-    )
-
-
-# ---------------------------------------------------------------------------
-# Detail cours - etudiants, seances, statistiques
-# ---------------------------------------------------------------------------
+    return {
+        "active_courses_count": active_courses_count,
+        "sessions_given": sessions_given,
+        "upcoming_sessions": upcoming_sessions,
+        "total_absences": total_absences,
+        "at_risk_count": at_risk_count,
+        "at_risk_list": at_risk_list[:5],  # Limit to 5 for dashboard display
+    }
 
 
 @login_required
 @professor_required
 @require_GET
-def instructor_course_detail(request, course_id):
+def instructor_dashboard(request):
     """
-    Page de détails du cours pour le professeur - Lecture seule pour les étudiants, gestion des séances pour le professeur.
+    Vue du tableau de bord professeur - Pédagogique uniquement
+    Affiche les KPIs, cours actifs, et informations pédagogiques.
     STRICT: Aucune action administrative permise.
     """
-    # Get course and verify it belongs to the instructor
-    course = get_object_or_404(Cours, id_cours=course_id)
-    if course.professeur_id != request.user.pk:
-        messages.error(request, "Accès non autorisé à ce cours.")
-        return redirect("dashboard:instructor_dashboard")
 
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
-    # Get active tab
-    active_tab = request.GET.get("tab", "students")
+    today = timezone.localdate()
+
+    # Versions des cours du professeur : un cours ajouté ou retiré change aussi la clé
+    course_ids = list(
+        Cours.objects.filter(professeur=request.user).values_list("id_cours", flat=True)
+    )
+    kpis = cached_context(
+        "instructor",
+        [course_key(course_id) for course_id in course_ids],
+        lambda: _instructor_dashboard_kpis(request.user, academic_year, today),
+        extra=(
+            request.user.pk,
+            academic_year.pk if academic_year else None,
+            today,
+            get_system_threshold(),
+        ),
+    )
 
+    return render(
+        request,
+        "dashboard/instructor_index.html",
+        {"academic_year": academic_year, **kpis},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Detail cours - etudiants, seances, statistiques
+# ---------------------------------------------------------------------------
+
+
+def _course_detail_data(course, academic_year):
+    """Étudiants, séances et statistiques d'un cours (mis en cache par versions de données)."""
     # Tab 1: Students (READ ONLY)
     students_data = []
     if academic_year:
@@ -206,17 +200,7 @@ def instructor_course_detail(request, course_id):
     # Evaluate once: extract IDs from Python objects instead of an extra query.
     inscriptions = list(inscriptions)
     inscription_ids = [ins.id_inscription for ins in inscriptions]
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscription_ids)
 
     system_threshold = get_system_threshold()
     course_threshold = (
@@ -284,8 +268,71 @@ def instructor_course_detail(request, course_id):
             "-date_seance", "-heure_debut"
         )
 
-    # Reprise QR: attacher pour chaque seance le token actif (s'il existe)
     sessions = list(sessions)
+
+    # Tab 3: Statistics
+    total_students = len(students_data)
+    at_risk_students = sum(1 for s in students_data if s["is_at_risk"])
+    total_absences_all = Absence.objects.filter(id_seance__id_cours=course)
+    if academic_year:
+        total_absences_all = total_absences_all.filter(
+            id_seance__id_annee=academic_year
+        )
+    total_absences_all = total_absences_all.count()
+
+    # Overall absence rate (average)
+    if total_students > 0:
+        overall_rate = sum(s["rate"] for s in students_data) / total_students
+    else:
+        overall_rate = 0
+
+    return {
+        "students_data": students_data,
+        "sessions": sessions,
+        "total_students": total_students,
+        "at_risk_students": at_risk_students,
+        "total_absences_all": total_absences_all,
+        "overall_rate": round(overall_rate, 1),
+        "early_warnings_count": early_warnings_count,
+        "course_threshold": course_threshold,
+    }
+
+
+@login_required
+@professor_required
+@require_GET
+def instructor_course_detail(request, course_id):
+    """
+    Page de détails du cours pour le professeur - Lecture seule pour les étudiants, gestion des séances pour le professeur.
+    STRICT: Aucune action administrative permise.
+    """
+    # Get course and verify it belongs to the instructor
+    course = get_object_or_404(Cours, id_cours=course_id)
+    if course.professeur_id != request.user.pk:
+        messages.error(request, "Accès non autorisé à ce cours.")
+        return redirect("dashboard:instructor_dashboard")
+
+    # Get current academic year
+    academic_year = get_active_year(fallback=True)
+
+    # Get active tab
+    active_tab = request.GET.get("tab", "students")
+
+    # Étudiants, séances et statistiques : recalculés après une modification du cours
+    data = cached_context(
+        "course_detail",
+        [course_key(course.id_cours)],
+        lambda: _course_detail_data(course, academic_year),
+        extra=(
+            course.id_cours,
+            academic_year.pk if academic_year else None,
+            timezone.localdate(),
+            get_system_threshold(),
+        ),
+    )
+    sessions = data["sessions"]
+
+    # Reprise QR: attacher pour chaque seance le token actif (s'il existe)
     from apps.absences.models import QRAttendanceToken
 
     seance_ids = [s.id_seance for s in sessions]
@@ -314,37 +361,14 @@ def instructor_course_detail(request, course_id):
         ):
             course_active_manual = s
 
-    # Tab 3: Statistics
-    total_students = len(students_data)
-    at_risk_students = sum(1 for s in students_data if s["is_at_risk"])
-    total_absences_all = Absence.objects.filter(id_seance__id_cours=course)
-    if academic_year:
-        total_absences_all = total_absences_all.filter(
-            id_seance__id_annee=academic_year
-        )
-    total_absences_all = total_absences_all.count()
-
-    # Overall absence rate (average)
-    if total_students > 0:
-        overall_rate = sum(s["rate"] for s in students_data) / total_students
-    else:
-        overall_rate = 0
-
     return render(
         request,
         "dashboard/instructor_course_detail.html",
         {
+            **data,
             "course": course,
             "academic_year": academic_year,
             "active_tab": active_tab,
-            "students_data": students_data,
-            "sessions": sessions,
-            "total_students": total_students,
-            "at_risk_students": at_risk_students,
-            "total_absences_all": total_absences_all,
-            "overall_rate": round(overall_rate, 1),
-            "early_warnings_count": early_warnings_count,
-            "course_threshold": course_threshold,
             "course_active_qr": course_active_qr,
             "course_active_manual": course_active_manual,
         },
@@ -364,9 +388,7 @@ def instructor_courses(request):
     Page "Mes Cours" - Liste de tous les cours assignés au professeur.
     """
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Get all active courses assigned to professor
     courses = (
@@ -417,18 +439,8 @@ def instructor_courses(request):
         all_course_inscriptions = all_course_inscriptions.filter(
             id_annee=academic_year
         )
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=all_course_inscriptions.values_list(
-                "id_inscription", flat=True
-            ),
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
+    absence_sums = get_absence_sums(
+        all_course_inscriptions.values_list("id_inscription", flat=True)
     )
     inscriptions_by_course = defaultdict(list)
     for ins in all_course_inscriptions:
@@ -480,9 +492,7 @@ def instructor_sessions(request):
     Page "Séances" - Liste de toutes les séances du professeur.
     """
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Get all sessions for professor's courses
     if academic_year:
@@ -534,9 +544,7 @@ def instructor_statistics(request):
     Page "Statistiques" - Statistiques globales pour le professeur.
     """
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Get all active courses
     courses = Cours.objects.filter(professeur=request.user, actif=True)
@@ -558,17 +566,7 @@ def instructor_statistics(request):
         ).select_related("id_cours"))
 
     inscription_ids = [ins.id_inscription for ins in all_inscriptions]
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscription_ids)
     absence_counts = dict(
         Absence.objects.filter(id_inscription__in=inscription_ids)
         .values("id_inscription")
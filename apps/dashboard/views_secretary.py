@@ -22,6 +22,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_http_methods
 
 from apps.absences.models import Absence, Justification
+from apps.academic_sessions.active_year import invalidate_active_year
 from apps.academic_sessions.models import AnneeAcademique, Seance
 from apps.academics.models import Cours, Departement, Faculte
 from apps.audits.models import LogAudit
@@ -789,6 +790,7 @@ def secretary_academic_year_set_active(request, year_id):
     # où zéro année n'est active en cas de crash entre les deux opérations.
     with transaction.atomic():
         AnneeAcademique.objects.update(active=False)
+        invalidate_active_year()
         year.active = True
         year.save()
 
@@ -18,12 +18,17 @@ from django.db.models import Count, Sum
 from apps.utils import safe_get_page
 from django.db.models.functions import TruncMonth
 from django.shortcuts import get_object_or_404, render
-from django.utils import timezone
 from django.views.decorators.http import require_GET
 
 from apps.absences.models import Absence, Justification
-from apps.absences.services import get_system_threshold, is_justification_expired
-from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.absences.services import (
+    get_absence_sums,
+    get_system_threshold,
+    is_justification_expired,
+)
+from apps.academic_sessions.active_year import get_active_year
+from apps.academic_sessions.models import Seance
+from apps.dashboard.data_versions import cached_context, student_key
 from apps.dashboard.decorators import student_required
 from apps.enrollments.models import Inscription
 from apps.notifications.models import Notification
@@ -34,28 +39,16 @@ from apps.notifications.models import Notification
 # ---------------------------------------------------------------------------
 
 
-@login_required
-@student_required
-@require_GET
-def student_dashboard(request):
-    """
-    Dashboard étudiant - Informatif et pédagogique, AUCUN pouvoir décisionnel.
-    STRICT: L'étudiant peut uniquement consulter ses données, soumettre des justificatifs, télécharger des rapports.
-    """
-
-    # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
-
+def _student_dashboard_kpis(user, academic_year):
+    """Indicateurs du tableau de bord étudiant (mis en cache par versions de données)."""
     # Get student's inscriptions for current academic year
     if academic_year:
         inscriptions = list(Inscription.objects.filter(
-            id_etudiant=request.user, id_annee=academic_year, status=Inscription.Status.EN_COURS
+            id_etudiant=user, id_annee=academic_year, status=Inscription.Status.EN_COURS
         ).select_related("id_cours", "id_cours__professeur", "id_cours__id_departement"))
     else:
         inscriptions = list(Inscription.objects.filter(
-            id_etudiant=request.user, status=Inscription.Status.EN_COURS
+            id_etudiant=user, status=Inscription.Status.EN_COURS
         ).select_related("id_cours", "id_cours__professeur", "id_cours__id_departement"))
 
     # --- KPI 1: Total Courses Enrolled (current academic year)
@@ -78,17 +71,7 @@ def student_dashboard(request):
     total_abs_hours = 0
     total_periods = 0
     overall_rate = 0
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscription_ids)
 
     for ins in inscriptions:
         cours = ins.id_cours
@@ -128,6 +111,41 @@ def student_dashboard(request):
         academic_status = "À RISQUE"
         status_color = "warning"
 
+    return {
+        "total_courses": total_courses,
+        "total_sessions": total_sessions,
+        "total_absences": total_absences,
+        "overall_rate": round(overall_rate, 1),
+        "academic_status": academic_status,
+        "status_color": status_color,
+        "is_blocked": is_blocked,
+    }
+
+
+@login_required
+@student_required
+@require_GET
+def student_dashboard(request):
+    """
+    Dashboard étudiant - Informatif et pédagogique, AUCUN pouvoir décisionnel.
+    STRICT: L'étudiant peut uniquement consulter ses données, soumettre des justificatifs, télécharger des rapports.
+    """
+
+    # Get current academic year
+    academic_year = get_active_year(fallback=True)
+
+    # KPIs recalculés seulement après une modification des données de l'étudiant
+    kpis = cached_context(
+        "student",
+        [student_key(request.user.pk)],
+        lambda: _student_dashboard_kpis(request.user, academic_year),
+        extra=(
+            request.user.pk,
+            academic_year.pk if academic_year else None,
+            get_system_threshold(),
+        ),
+    )
+
     # Get notifications
     notifications = Notification.objects.filter(id_utilisateur=request.user).order_by(
         "-date_envoi"
@@ -138,13 +156,7 @@ def student_dashboard(request):
         "dashboard/student_index.html",
         {
             "academic_year": academic_year,
-            "total_courses": total_courses,
-            "total_sessions": total_sessions,
-            "total_absences": total_absences,
-            "overall_rate": round(overall_rate, 1),
-            "academic_status": academic_status,
-            "status_color": status_color,
-            "is_blocked": is_blocked,
+            **kpis,
             "notifications": notifications,
         },
     )
@@ -163,9 +175,7 @@ def student_statistics(request):
     Page de statistiques détaillées pour l'étudiant.
     """
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     user = request.user
     inscriptions_qs = Inscription.objects.filter(
@@ -194,17 +204,7 @@ def student_statistics(request):
         id_inscription__in=inscription_ids, statut=Absence.Statut.JUSTIFIEE
     ).count()
 
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscription_ids)
 
     system_threshold = get_system_threshold()
 
@@ -314,9 +314,7 @@ def student_course_detail(request, inscription_id):
     course = inscription.id_cours
 
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Get active tab
     active_tab = request.GET.get("tab", "sessions")
@@ -416,14 +414,8 @@ def student_course_detail(request, inscription_id):
         )
 
     # Calculate course statistics
-    today = timezone.localdate()
     total_abs_hours = float(
-        Absence.objects.filter(
-            id_inscription=inscription,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        ).aggregate(total=Sum("duree_absence"))["total"]
-        or 0
+        get_absence_sums([inscription.id_inscription]).get(inscription.id_inscription, 0)
     )
 
     absence_rate = (
@@ -468,9 +460,7 @@ def student_courses(request):
     Page "Mes Cours" - Liste de tous les cours de l'étudiant.
     """
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Get student's inscriptions
     if academic_year:
@@ -499,17 +489,7 @@ def student_courses(request):
     inscriptions = list(inscriptions)
     inscription_ids = [ins.id_inscription for ins in inscriptions]
     course_ids = [ins.id_cours_id for ins in inscriptions]
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscription_ids)
     absence_counts = dict(
         Absence.objects.filter(id_inscription__in=inscription_ids)
         .values("id_inscription")
@@ -610,9 +590,7 @@ def student_absences(request):
     Page "Mes Absences" - Liste de toutes les absences de l'étudiant.
     """
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Get all inscriptions
     if academic_year:
@@ -703,9 +681,7 @@ def student_reports(request):
     Page "Rapports" - Téléchargement des rapports PDF.
     """
     # Get current academic year
-    academic_year = AnneeAcademique.objects.filter(active=True).first()
-    if not academic_year:
-        academic_year = AnneeAcademique.objects.order_by("-id_annee").first()
+    academic_year = get_active_year(fallback=True)
 
     # Get student's inscriptions for statistics
     if academic_year:
@@ -724,17 +700,7 @@ def student_reports(request):
 
     total_abs_hours = 0
     total_periods = 0
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
-    )
+    absence_sums = get_absence_sums(inscription_ids)
     for ins in inscriptions:
         cours = ins.id_cours
         total_periods += cours.nombre_total_periodes
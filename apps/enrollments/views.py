@@ -20,6 +20,7 @@ from django.shortcuts import redirect, render
 from django.views.decorators.http import require_GET, require_http_methods
 from django_ratelimit.decorators import ratelimit
 
+from apps.academic_sessions.active_year import get_active_year
 from apps.academic_sessions.models import AnneeAcademique
 from apps.academics.models import Cours, Departement, Faculte
 from apps.accounts.models import User
@@ -320,7 +321,7 @@ def get_courses_by_student(request):
         return api_error("student_id doit être un entier", status=400, code="bad_request")
 
     try:
-        annee_active = AnneeAcademique.objects.filter(active=True).first()
+        annee_active = get_active_year()
         if not annee_active:
             return api_ok([])
 
@@ -834,7 +835,7 @@ def enroll_student(request):
     # GET request - afficher le formulaire
     # Filtrer les cours selon l'année académique par défaut (année active)
     academic_years = AnneeAcademique.objects.all().order_by("-libelle")
-    default_year = academic_years.filter(active=True).first() or academic_years.first()
+    default_year = get_active_year() or academic_years.first()
 
     if default_year:
         enrollment_form.fields["courses"].queryset = (
@@ -11,15 +11,18 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db import transaction
+from django.db.models import Count, Q
 
 from apps.utils import safe_get_page
-from django.db.models import Sum
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
 from django.views.decorators.http import require_GET, require_POST
 
-from apps.absences.models import Absence
-from apps.absences.services import get_system_threshold, recalculer_eligibilite
+from apps.absences.services import (
+    annotate_absence_risk,
+    at_risk_item,
+    get_system_threshold,
+    recalculer_eligibilite_batch,
+)
 from apps.accounts.models import User
 from apps.audits.utils import log_action
 from apps.dashboard.decorators import secretary_required
@@ -34,78 +37,40 @@ def rules_management(request):
     """
     List students violating the absence threshold rule (per-course or system default).
     """
-    from apps.academic_sessions.models import AnneeAcademique
+    from apps.academic_sessions.active_year import get_active_year
 
-    active_year = AnneeAcademique.objects.filter(active=True).first()
+    active_year = get_active_year()
     system_threshold = get_system_threshold()
 
     inscriptions_qs = Inscription.objects.filter(
         status=Inscription.Status.EN_COURS,
-    ).select_related("id_cours", "id_etudiant")
+    )
     if active_year:
         inscriptions_qs = inscriptions_qs.filter(id_annee=active_year)
 
-    # Evaluate once: extract IDs from Python objects instead of an extra query.
-    inscriptions_list = list(inscriptions_qs)
-    inscription_ids = [ins.id_inscription for ins in inscriptions_list]
     # Only NON_JUSTIFIEE absences for past séances count — strictly aligned with
     # apps.absences.services.calculer_absence_stats and every dashboard view
     # (admin/professor/student). Including EN_ATTENTE here would penalise
     # students whose justificatif is still under review and would surface a
     # "BLOQUÉ" badge that disagrees with their actual eligible_examen flag.
-    today = timezone.localdate()
-    absence_sums = dict(
-        Absence.objects.filter(
-            id_inscription__in=inscription_ids,
-            statut=Absence.Statut.NON_JUSTIFIEE,
-            id_seance__date_seance__lte=today,
-        )
-        .values("id_inscription")
-        .annotate(total=Sum("duree_absence"))
-        .values_list("id_inscription", "total")
+    # The threshold rule is evaluated in SQL: only the displayed page is loaded.
+    at_risk_qs = (
+        annotate_absence_risk(inscriptions_qs, system_threshold)
+        .filter(is_at_risk=True)
+        .select_related("id_cours", "id_etudiant")
+        .order_by("id_inscription")
     )
-    at_risk_list = []
-
-    for ins in inscriptions_list:
-        cours = ins.id_cours
-        if cours.nombre_total_periodes > 0:
-            total_abs = float(absence_sums.get(ins.id_inscription, 0) or 0)
-
-            rate = (total_abs / cours.nombre_total_periodes) * 100
-            seuil = (
-                cours.seuil_absence
-                if cours.seuil_absence is not None
-                else system_threshold
-            )
-
-            seuil_effectif = min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-
-            if rate >= seuil:
-                is_blocked = rate >= seuil_effectif
-                is_under_exemption = ins.exemption_40 and not is_blocked
-                at_risk_list.append(
-                    {
-                        "inscription": ins,
-                        "etudiant": ins.id_etudiant,
-                        "cours": cours,
-                        "total_abs": total_abs,
-                        "rate": round(rate, 1),
-                        "seuil": seuil,
-                        "seuil_effectif": seuil_effectif,
-                        "is_blocked": is_blocked,
-                        "is_under_exemption": is_under_exemption,
-                        "exemption": ins.exemption_40,
-                        "exemption_margin": ins.exemption_margin,
-                    }
-                )
 
     # Calculate statistics
-    blocked_count = sum(1 for item in at_risk_list if item["is_blocked"])
-    exempted_count = sum(1 for item in at_risk_list if item["is_under_exemption"])
+    counts = at_risk_qs.aggregate(
+        blocked=Count("id_inscription", filter=Q(is_blocked=True)),
+        exempted=Count("id_inscription", filter=Q(is_under_exemption=True)),
+    )
 
     # Pagination
-    paginator = Paginator(at_risk_list, 25)
+    paginator = Paginator(at_risk_qs, 25)
     page_obj = safe_get_page(paginator, request.GET.get("page"))
+    page_obj.object_list = [at_risk_item(ins) for ins in page_obj.object_list]
 
     return render(
         request,
@@ -113,8 +78,8 @@ def rules_management(request):
         {
             "at_risk_list": page_obj,
             "page_obj": page_obj,
-            "blocked_count": blocked_count,
-            "exempted_count": exempted_count,
+            "blocked_count": counts["blocked"],
+            "exempted_count": counts["exempted"],
         },
     )
 
@@ -159,7 +124,7 @@ def toggle_exemption(request, pk):
             inscription.motif_exemption = motif
             inscription.exemption_margin = margin
             inscription.save()
-            recalculer_eligibilite(inscription)
+            recalculer_eligibilite_batch(Inscription.objects.filter(pk=inscription.pk))
             log_action(
                 request.user,
                 f"Secrétaire a accordé une EXEMPTION à {inscription.id_etudiant.get_full_name()} pour le cours {inscription.id_cours.code_cours}. Motif: {motif[:200]}",
@@ -209,7 +174,7 @@ def toggle_exemption(request, pk):
             inscription.exemption_40 = False
             inscription.motif_exemption = None
             inscription.save()
-            recalculer_eligibilite(inscription)
+            recalculer_eligibilite_batch(Inscription.objects.filter(pk=inscription.pk))
             log_action(
                 request.user,
                 f"Secrétaire a RÉVOQUÉ l'exemption de {inscription.id_etudiant.get_full_name()} pour le cours {inscription.id_cours.code_cours}",
@@ -5,6 +5,7 @@ Features:
     - HTML email templates rendered via Django template engine
     - Plain-text fallback for all emails
     - Duplicate prevention via EmailLog model (configurable cooldown)
+    - Batched sending: one dedup query and one SMTP connection per batch
     - Thread-based async sending (non-blocking)
 
 Usage:
@@ -24,13 +25,16 @@ import threading
 from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 from django.db import IntegrityError, transaction
-from django.template.loader import render_to_string
+from django.template.loader import get_template, render_to_string
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# Active render cache of send_batch_with_dedup() (see _render_html)
+_render_state = threading.local()
+
 
 # Bounded thread pool for fire-and-forget async email sending.
 # Prevents thread explosion when bulk operations (e.g. mark_absence on 200 students)
@@ -214,13 +218,173 @@ def send_with_dedup(recipient_user, subject, body, html_body, event_type, event_
     return send_notification_email(recipient_user, subject, body, html_body)
 
 
+def _claim_dedup_slots(pending, event_type, cooldown_hours):
+    """
+    Claim the EmailLog slots of a batch. Returns the claimed items.
+
+    ``pending`` maps digest -> (recipient_user, event_key, payload). One
+    ``digest__in`` query splits the batch into new, cooling-down and stale
+    digests; new rows are inserted with one bulk_create. If that insert loses
+    a race, the batch falls back to the per-row claims of send_with_dedup.
+    """
+    from apps.notifications.models import EmailLog
+
+    cutoff = timezone.now() - timezone.timedelta(hours=cooldown_hours)
+    existing = dict(
+        EmailLog.objects.filter(digest__in=list(pending)).values_list(
+            "digest", "created_at"
+        )
+    )
+    new_digests = [digest for digest in pending if digest not in existing]
+    claimed = []
+
+    if new_digests:
+        try:
+            with transaction.atomic():
+                EmailLog.objects.bulk_create(
+                    [
+                        EmailLog(
+                            digest=digest,
+                            recipient_email=pending[digest][0].email,
+                            event_type=event_type,
+                        )
+                        for digest in new_digests
+                    ]
+                )
+            claimed.extend(pending[digest] for digest in new_digests)
+        except IntegrityError:
+            # Another worker claimed part of the batch — claim row by row.
+            for digest in new_digests:
+                try:
+                    with transaction.atomic():
+                        EmailLog.objects.create(
+                            digest=digest,
+                            recipient_email=pending[digest][0].email,
+                            event_type=event_type,
+                        )
+                except IntegrityError:
+                    logger.debug("Dedup race: another worker claimed %s", digest)
+                    continue
+                claimed.append(pending[digest])
+
+    for digest, created_at in existing.items():
+        if created_at >= cutoff:
+            continue
+        # Outside cooldown window — same conditional bump as send_with_dedup.
+        if EmailLog.objects.filter(digest=digest, created_at=created_at).update(
+            created_at=timezone.now()
+        ):
+            claimed.append(pending[digest])
+    return claimed
+
+
+def send_batch_with_dedup(items, event_type, build_email, cooldown_hours=24):
+    """
+    Batched send_with_dedup(). Never raises.
+
+    Args:
+        items: iterable of (recipient_user, event_key, payload)
+        event_type: EmailLog event type shared by the batch
+        build_email: callable(recipient_user, payload) -> (subject, body, html_body)
+        cooldown_hours: dedup window, as in send_with_dedup()
+
+    Dedup is resolved with one EmailLog query for the whole batch, each HTML
+    template is compiled once and rendered once per distinct context, and all
+    messages go through a single reused mail connection. Call it after commit
+    (``transaction.on_commit``) so nothing is sent for a rolled-back write.
+
+    Returns:
+        Number of emails sent.
+    """
+    from apps.notifications.models import EmailLog
+
+    pending = {}
+    for recipient_user, event_key, payload in items:
+        email = getattr(recipient_user, "email", None)
+        if not email or not getattr(recipient_user, "actif", True):
+            continue
+        digest = EmailLog.make_digest(email, event_type, event_key)
+        pending.setdefault(digest, (recipient_user, event_key, payload))
+    if not pending:
+        return 0
+
+    try:
+        claimed = _claim_dedup_slots(pending, event_type, cooldown_hours)
+    except Exception:
+        logger.exception("Failed to claim dedup slots for %d %s emails", len(pending), event_type)
+        return 0
+    if not claimed:
+        return 0
+
+    messages = []
+    _render_state.cache = {}
+    try:
+        for recipient_user, event_key, payload in claimed:
+            try:
+                subject, body, html_body = build_email(recipient_user, payload)
+            except Exception:
+                logger.exception(
+                    "Failed to build %s email for %s (key=%s)",
+                    event_type, recipient_user.email, event_key,
+                )
+                continue
+            message = EmailMultiAlternatives(
+                subject=subject,
+                body=body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[recipient_user.email],
+            )
+            if html_body:
+                message.attach_alternative(html_body, "text/html")
+            messages.append(message)
+    finally:
+        _render_state.cache = None
+
+    # Slots are claimed before sending, as in send_with_dedup: a failed send
+    # is not retried within the cooldown window.
+    sent = 0
+    try:
+        connection = get_connection()
+        connection.open()
+    except Exception:
+        logger.exception("Failed to open mail connection for %d %s emails", len(messages), event_type)
+        return 0
+    try:
+        for message in messages:
+            message.connection = connection
+            try:
+                sent += connection.send_messages([message]) or 0
+            except Exception:
+                logger.exception("Failed to send %s email to %s", event_type, message.to[0])
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            logger.exception("Failed to close mail connection")
+    return sent
+
+
 # ─── HTML template rendering helper ─────────────────────────────────────────
 
 
 def _render_html(template_name, context):
-    """Render an HTML email template. Returns None on error (graceful fallback)."""
+    """
+    Render an HTML email template. Returns None on error (graceful fallback).
+
+    Inside send_batch_with_dedup() the compiled template and the output for
+    each distinct context are reused across the batch.
+    """
+    cache = getattr(_render_state, "cache", None)
     try:
-        return render_to_string(template_name, context)
+        if cache is None:
+            return render_to_string(template_name, context)
+        key = (template_name, tuple(sorted((k, str(v)) for k, v in context.items())))
+        if key not in cache:
+            template = cache.get(template_name)
+            if template is None:
+                template = cache[template_name] = get_template(template_name)
+            cache[key] = template.render(context)
+        return cache[key]
     except Exception:
         logger.exception("Failed to render email template %s", template_name)
         return None
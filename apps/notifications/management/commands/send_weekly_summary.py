@@ -12,11 +12,11 @@ Schedule with cron (e.g. every Monday at 08:00):
 import datetime
 
 from django.core.management.base import BaseCommand
-from django.db.models import Count, Q, Sum
+from django.db.models import Count
 from django.utils import timezone
 
 from apps.absences.models import Absence
-from apps.absences.services import get_system_threshold
+from apps.absences.services import annotate_absence_risk
 from apps.academic_sessions.models import AnneeAcademique
 from apps.accounts.models import User
 from apps.enrollments.models import Inscription
@@ -74,41 +74,21 @@ class Command(BaseCommand):
             id_inscription__id_annee=active_year,
         ).count()
 
-        # 4. Courses with at-risk students
-        system_threshold = get_system_threshold()
-        active_inscriptions = (
-            Inscription.objects.filter(
-                id_annee=active_year,
-                status=Inscription.Status.EN_COURS,
-            )
-            .select_related("id_cours")
+        # 4. Courses with at-risk students — règle du seuil évaluée en SQL,
+        #    regroupée par cours (mêmes règles que les dashboards)
+        active_inscriptions = Inscription.objects.filter(
+            id_annee=active_year,
+            status=Inscription.Status.EN_COURS,
         )
-
-        # Aggregate non-justified absences per inscription
-        abs_sums = dict(
-            Absence.objects.filter(
-                id_inscription__id_annee=active_year,
-                id_inscription__status=Inscription.Status.EN_COURS,
-                statut__in=[Absence.Statut.NON_JUSTIFIEE, Absence.Statut.EN_ATTENTE],
-            )
-            .values("id_inscription")
-            .annotate(total=Sum("duree_absence"))
-            .values_list("id_inscription", "total")
+        course_risk = dict(
+            annotate_absence_risk(active_inscriptions)
+            .filter(is_blocked=True)
+            .values("id_cours__nom_cours")
+            .annotate(at_risk_count=Count("id_inscription"))
+            .order_by()
+            .values_list("id_cours__nom_cours", "at_risk_count")
         )
 
-        # Group by course
-        course_risk = {}  # course_name -> count
-        for ins in active_inscriptions:
-            cours = ins.id_cours
-            if not cours.nombre_total_periodes:
-                continue
-            seuil = cours.seuil_absence if cours.seuil_absence is not None else system_threshold
-            total_abs = float(abs_sums.get(ins.id_inscription, 0) or 0)
-            taux = (total_abs / cours.nombre_total_periodes) * 100
-            seuil_effectif = min(seuil + ins.exemption_margin, 100) if ins.exemption_40 else seuil
-            if taux >= seuil_effectif:
-                course_risk[cours.nom_cours] = course_risk.get(cours.nom_cours, 0) + 1
-
         courses_at_risk = [
             {"course_name": name, "at_risk_count": count}
             for name, count in sorted(course_risk.items(), key=lambda x: -x[1])
@@ -0,0 +1,145 @@
+"""
+FICHIER : apps/swr_cache.py
+RESPONSABILITE : Cache "stale-while-revalidate" a recalcul unique pour les agregats couteux
+FONCTIONNALITES PRINCIPALES :
+  - swr_get() : valeur en cache avec TTL souple ; une fois perimee, un seul
+    processus la recalcule (verrou par cle, SET NX du cache Redis) pendant
+    que les autres servent l'ancienne valeur jusqu'au TTL dur
+  - Recalcul anticipe probabiliste (XFetch) : plus le calcul est long et
+    l'echeance proche, plus un lecteur a de chances de le declencher avant
+    l'expiration, ce qui evite que tous les lecteurs la franchissent ensemble
+  - Cle absente (supprimee ou jamais calculee) : un seul calcul, les autres
+    lecteurs attendent brievement sa publication (SWR_WAIT_SECONDS)
+  - Cache indisponible (Redis arrete) : calcul direct, sans erreur
+DEPENDANCES CLES : django.core.cache
+"""
+
+import logging
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de relecture d'une clé absente pendant qu'un autre processus la calcule
+_POLL_SECONDS = 0.05
+
+
+def _lock_key(key):
+    return f"swr:lock:{key}"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _should_refresh(soft_expires_at, delta, beta, now):
+    """XFetch : recalcul anticipé avec une probabilité croissante près de l'échéance."""
+    if now >= soft_expires_at:
+        return True
+    if delta <= 0 or beta <= 0:
+        return False
+    # -log(U) suit une loi exponentielle : tirage rarement loin de l'échéance
+    return now - delta * beta * math.log(1.0 - random.random()) >= soft_expires_at
+
+
+def _acquire(lock_key):
+    """Verrou du recalcul : jeton si obtenu, None si un autre processus le détient."""
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, _setting("SWR_LOCK_TIMEOUT", 30)):
+        return token
+    return None
+
+
+def _release(lock_key, token):
+    try:
+        # Verrou expiré puis repris par un autre processus : ne pas le supprimer
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    except Exception:
+        logger.warning("SWR lock release failed for %s", lock_key, exc_info=True)
+
+
+def _recompute(key, compute, soft_ttl, stale_ttl):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    try:
+        cache.set(key, (value, time.time() + soft_ttl, delta), soft_ttl + stale_ttl)
+    except Exception:
+        logger.warning("SWR cache write failed for %s", key, exc_info=True)
+    return value
+
+
+def swr_get(key, compute, soft_ttl, stale_ttl=None, beta=1.0):
+    """
+    Valeur de ``key``, recalculée par un seul processus à la fois.
+
+    Args:
+        key: clé de cache.
+        compute: callable sans argument qui calcule la valeur (picklable).
+        soft_ttl: durée (s) pendant laquelle la valeur est considérée fraîche.
+        stale_ttl: durée (s) supplémentaire pendant laquelle une valeur
+            périmée est servie si un autre processus la recalcule
+            (défaut : soft_ttl).
+        beta: agressivité du recalcul anticipé (0 le désactive).
+
+    Returns:
+        la valeur en cache ou nouvellement calculée.
+    """
+    if soft_ttl <= 0:
+        return compute()
+    if stale_ttl is None:
+        stale_ttl = soft_ttl
+    lock_key = _lock_key(key)
+
+    try:
+        entry = cache.get(key)
+    except Exception:
+        logger.warning(
+            "SWR cache unavailable, computing %s directly", key, exc_info=True
+        )
+        return compute()
+
+    if entry is not None:
+        value, soft_expires_at, delta = entry
+        if not _should_refresh(soft_expires_at, delta, beta, time.time()):
+            return value
+        try:
+            token = _acquire(lock_key)
+        except Exception:
+            return value
+        if token is None:
+            # Recalcul déjà en cours ailleurs : la valeur périmée reste servie
+            return value
+        try:
+            return _recompute(key, compute, soft_ttl, stale_ttl)
+        finally:
+            _release(lock_key, token)
+
+    # Clé absente : pas de valeur à servir, un seul calcul et les autres attendent
+    try:
+        token = _acquire(lock_key)
+    except Exception:
+        return compute()
+    if token is not None:
+        try:
+            return _recompute(key, compute, soft_ttl, stale_ttl)
+        finally:
+            _release(lock_key, token)
+
+    deadline = time.monotonic() + _setting("SWR_WAIT_SECONDS", 2)
+    while time.monotonic() < deadline:
+        time.sleep(_POLL_SECONDS)
+        try:
+            entry = cache.get(key)
+        except Exception:
+            break
+        if entry is not None:
+            return entry[0]
+    # Calcul trop long ou processus détenteur du verrou arrêté
+    return _recompute(key, compute, soft_ttl, stale_ttl)
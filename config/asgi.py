@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served by uvicorn (``live`` service in docker-compose.yml) for the long-lived
+Server-Sent Events of the QR dashboard (apps.absences.views.qr_live_feed);
+every other route stays on the gunicorn/WSGI ``web`` service.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
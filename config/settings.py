@@ -270,6 +270,7 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "apps.audits.middleware.AuditBufferMiddleware",
     "apps.accounts.middleware.SessionInactivityMiddleware",
     "apps.accounts.middleware_2fa.TwoFactorMiddleware",
     "apps.accounts.middleware.RoleMiddleware",
@@ -441,6 +442,59 @@ MESSAGE_TAGS = {
     message_constants.ERROR: "danger",
 }
 
+# ========================================================================== #
+#                    TRAITEMENTS EN ARRIERE-PLAN                             #
+# ========================================================================== #
+# True : les recalculs d'eligibilite declenches par les absences sont mis en
+# file (EligibilityRecalcJob) et traites par `manage.py process_eligibility_queue`
+# (service "worker" du docker-compose). False : recalcul apres commit, dans la
+# requete.
+ELIGIBILITY_RECALC_ASYNC = env_bool("ELIGIBILITY_RECALC_ASYNC", False)
+
+# Journal d'audit : les entrees ecrites hors transaction sont inserees par lot
+# en fin de requete (AuditBufferMiddleware). True : ces lots sont confies a un
+# thread d'ecriture par processus, vide toutes les AUDIT_LOG_ASYNC_INTERVAL s.
+AUDIT_LOG_ASYNC = env_bool("AUDIT_LOG_ASYNC", False)
+AUDIT_LOG_ASYNC_INTERVAL = float(os.getenv("AUDIT_LOG_ASYNC_INTERVAL", "2"))
+
+# Flux SSE du dashboard QR (service ASGI) : duree maximale d'une connexion
+# (EventSource se reconnecte ensuite) et intervalle des keepalive.
+QR_LIVE_FEED_MAX_SECONDS = env_int("QR_LIVE_FEED_MAX_SECONDS", 300)
+QR_LIVE_FEED_HEARTBEAT_SECONDS = env_int("QR_LIVE_FEED_HEARTBEAT_SECONDS", 15)
+
+# Contexte de scan QR en cache (apps.absences.qr_context) : duree de vie du
+# roster d'un cours ; le contexte d'un token vit jusqu'a son expiration.
+QR_SCAN_CONTEXT_TIMEOUT = env_int("QR_SCAN_CONTEXT_TIMEOUT", 900)
+
+# Contextes des tableaux de bord (apps.dashboard.data_versions) : caches par
+# versions de donnees (etudiant, cours, annee) ; la duree ne borne que les
+# donnees non couvertes par les signaux. 0 desactive le cache.
+DASHBOARD_CACHE_TIMEOUT = env_int("DASHBOARD_CACHE_TIMEOUT", 600)
+# Indicateurs globaux (comptes utilisateurs, audit, API analytics) : servis
+# au plus ANALYTICS_CACHE_TIMEOUT secondes avant recalcul. 0 desactive le cache.
+ANALYTICS_CACHE_TIMEOUT = env_int("ANALYTICS_CACHE_TIMEOUT", 60)
+# Recalcul unique des agregats (apps.swr_cache) : duree max du verrou et
+# attente d'un lecteur quand la valeur est absente et deja en calcul
+SWR_LOCK_TIMEOUT = env_int("SWR_LOCK_TIMEOUT", 30)
+SWR_WAIT_SECONDS = env_int("SWR_WAIT_SECONDS", 2)
+
+# Codes QR sans etat (apps.absences.qr_codes) : le QR encode un HMAC de
+# (seance, fenetre de temps) derive du token de session ; la rotation ne cree
+# plus de QRAttendanceToken et la validation ne lit pas la table des tokens.
+QR_STATELESS_CODES = env_bool("QR_STATELESS_CODES", False)
+
+# Journal des tentatives de scan QR (apps.absences.scan_log) :
+#   sync   : un INSERT par tentative (defaut)
+#   memory : tampon du processus, bulk_create toutes les QR_SCAN_LOG_FLUSH_MS ms
+#            ou QR_SCAN_LOG_FLUSH_SIZE entrees, vide a l'arret du worker
+#   redis  : file Redis partagee videe par `manage.py drain_qr_scan_log`
+QR_SCAN_LOG_SINK = os.getenv("QR_SCAN_LOG_SINK", "sync").strip().lower()
+if QR_SCAN_LOG_SINK not in {"sync", "memory", "redis"}:
+    raise ImproperlyConfigured("QR_SCAN_LOG_SINK must be one of: sync, memory, redis.")
+QR_SCAN_LOG_FLUSH_SIZE = env_int("QR_SCAN_LOG_FLUSH_SIZE", 200)
+QR_SCAN_LOG_FLUSH_MS = env_int("QR_SCAN_LOG_FLUSH_MS", 500)
+QR_SCAN_LOG_MAX_PENDING = env_int("QR_SCAN_LOG_MAX_PENDING", 10000)
+
 # ========================================================================== #
 #                              LOGGING                                       #
 # ========================================================================== #
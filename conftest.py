@@ -1,4 +1,5 @@
 import django
+import pytest
 from django.conf import settings
 
 
@@ -30,3 +31,17 @@ def pytest_configure(config):
         conn.close()
     except Exception:
         pass  # If postgres is unreachable, let Django handle the error later
+
+
+@pytest.fixture(autouse=True)
+def _reset_process_caches():
+    """The active-year resolver and the SystemSettings snapshot keep their
+    values in process memory, and dashboard contexts are keyed by ids: rows
+    saved by a previous test are rolled back without any save() signal."""
+    from apps.academic_sessions.active_year import clear_local_active_year
+    from apps.dashboard.data_versions import reset_namespace
+    from apps.dashboard.models import clear_local_settings
+
+    clear_local_active_year()
+    clear_local_settings()
+    reset_namespace()
@@ -78,11 +78,14 @@ for attempt in range(1, max_attempts + 1):
         time.sleep(sleep_seconds)
 PY
 
-echo "[entrypoint] Running migrations..."
-run_as_app python manage.py migrate --noinput
+# Auxiliary containers (worker) reuse the image once "web" has migrated.
+if [ "${ENTRYPOINT_SKIP_SETUP:-0}" != "1" ]; then
+  echo "[entrypoint] Running migrations..."
+  run_as_app python manage.py migrate --noinput
 
-echo "[entrypoint] Collecting static files..."
-run_as_app python manage.py collectstatic --noinput --clear
+  echo "[entrypoint] Collecting static files..."
+  run_as_app python manage.py collectstatic --noinput --clear
+fi
 
 echo "[entrypoint] Launching application process..."
 if [ "$(id -u)" -eq 0 ]; then
@@ -0,0 +1,222 @@
+"""
+Tests for the daily absence facts (AbsenceDailyFact):
+- maintained at commit by Absence, Seance and Cours signals
+- rebuilt by the rebuild_absence_facts command
+- backfilled by migration 0027 from the existing absences
+- admin statistics and the analytics API read every chart from them
+"""
+
+from datetime import date, time
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.absences.models import Absence, AbsenceDailyFact
+from apps.absences.services import refresh_absence_facts
+from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.academics.models import Cours, Departement, Faculte
+from apps.accounts.models import User
+from apps.enrollments.models import Inscription
+
+
+class AbsenceFactTests(TestCase):
+    def setUp(self):
+        # Callbacks de commit du jeu de données exécutés : chaque test part de tampons neufs
+        with self.captureOnCommitCallbacks(execute=True):
+            self.annee = AnneeAcademique.objects.create(
+                libelle="2025-2026", active=True
+            )
+            self.admin = User.objects.create_user(
+                email="admin-facts@example.com",
+                nom="Admin",
+                prenom="Facts",
+                password="pass1234",
+                role=User.Role.ADMIN,
+            )
+            self.professor = User.objects.create_user(
+                email="prof-facts@example.com",
+                nom="Martin",
+                prenom="Paul",
+                password="pass1234",
+                role=User.Role.PROFESSEUR,
+            )
+            faculte = Faculte.objects.create(nom_faculte="Sciences")
+            self.dept = Departement.objects.create(
+                nom_departement="Info", id_faculte=faculte
+            )
+            self.other_dept = Departement.objects.create(
+                nom_departement="Maths", id_faculte=faculte
+            )
+            self.course = Cours.objects.create(
+                code_cours="FACT1",
+                nom_cours="Algèbre",
+                nombre_total_periodes=30,
+                niveau=2,
+                id_departement=self.dept,
+                professeur=self.professor,
+                id_annee=self.annee,
+            )
+            self.seances = [
+                Seance.objects.create(
+                    date_seance=date(2026, month, 5),
+                    heure_debut=time(8, 0),
+                    heure_fin=time(10, 0),
+                    id_cours=self.course,
+                    id_annee=self.annee,
+                )
+                for month in (1, 2)
+            ]
+            self.inscriptions = []
+            for idx in range(3):
+                student = User.objects.create_user(
+                    email=f"student-facts-{idx}@example.com",
+                    nom="Student",
+                    prenom=f"F{idx}",
+                    password="pass1234",
+                    role=User.Role.ETUDIANT,
+                )
+                self.inscriptions.append(
+                    Inscription.objects.create(
+                        id_etudiant=student,
+                        id_cours=self.course,
+                        id_annee=self.annee,
+                        status="EN_COURS",
+                    )
+                )
+
+    def create_absence(self, inscription, seance, statut=Absence.Statut.NON_JUSTIFIEE):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Absence.objects.create(
+                id_inscription=inscription,
+                id_seance=seance,
+                type_absence="ABSENT",
+                duree_absence=2.0,
+                statut=statut,
+                encodee_par=self.admin,
+            )
+
+    def facts(self):
+        return {
+            (f.date_seance, f.statut): (f.nb_absences, f.heures)
+            for f in AbsenceDailyFact.objects.filter(id_cours=self.course)
+        }
+
+    def test_absence_changes_update_facts_at_commit(self):
+        first = self.create_absence(self.inscriptions[0], self.seances[0])
+        self.create_absence(self.inscriptions[1], self.seances[0])
+        day = self.seances[0].date_seance
+        self.assertEqual(self.facts(), {(day, "NON_JUSTIFIEE"): (2, Decimal("4.00"))})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.statut = Absence.Statut.JUSTIFIEE
+            first.save(update_fields=["statut"])
+        self.assertEqual(
+            self.facts(),
+            {
+                (day, "NON_JUSTIFIEE"): (1, Decimal("2.00")),
+                (day, "JUSTIFIEE"): (1, Decimal("2.00")),
+            },
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.facts(), {(day, "NON_JUSTIFIEE"): (1, Decimal("2.00"))})
+
+    def test_seance_date_and_course_changes_refresh_facts(self):
+        self.create_absence(self.inscriptions[0], self.seances[0])
+        seance = self.seances[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            seance.date_seance = date(2026, 3, 9)
+            seance.save()
+        self.assertEqual(set(self.facts()), {(date(2026, 3, 9), "NON_JUSTIFIEE")})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.id_departement = self.other_dept
+            self.course.save()
+        fact = AbsenceDailyFact.objects.get(id_cours=self.course)
+        self.assertEqual(fact.id_departement_id, self.other_dept.pk)
+        self.assertEqual(fact.niveau, 2)
+        self.assertEqual(fact.professeur_id, self.professor.pk)
+
+    def test_refresh_locks_courses_first(self):
+        # Deux rafraîchissements concurrents d'un même cours s'exécutent l'un après l'autre
+        with patch.object(
+            Cours.objects, "select_for_update", wraps=Cours.objects.select_for_update
+        ) as mock_sfu:
+            refresh_absence_facts([(self.course.pk, None)])
+        mock_sfu.assert_called_once()
+
+    def test_rebuild_command_matches_absences(self):
+        # Écritures dont le commit n'a pas été capturé : aucun fait
+        for inscription in self.inscriptions:
+            Absence.objects.create(
+                id_inscription=inscription,
+                id_seance=self.seances[1],
+                type_absence="ABSENT",
+                duree_absence=1.5,
+                statut=Absence.Statut.EN_ATTENTE,
+                encodee_par=self.admin,
+            )
+        self.assertFalse(AbsenceDailyFact.objects.exists())
+
+        call_command("rebuild_absence_facts", stdout=StringIO())
+        self.assertEqual(
+            self.facts(),
+            {(self.seances[1].date_seance, "EN_ATTENTE"): (3, Decimal("4.50"))},
+        )
+
+    def test_migration_backfills_existing_absences(self):
+        for inscription in self.inscriptions[:2]:
+            Absence.objects.create(
+                id_inscription=inscription,
+                id_seance=self.seances[0],
+                type_absence="ABSENT",
+                duree_absence=2.0,
+                statut=Absence.Statut.NON_JUSTIFIEE,
+                encodee_par=self.admin,
+            )
+        self.assertFalse(AbsenceDailyFact.objects.exists())
+
+        migration = import_module("apps.absences.migrations.0027_absence_daily_fact")
+        migration.populate_facts(apps, None)
+
+        self.assertEqual(
+            self.facts(),
+            {(self.seances[0].date_seance, "NON_JUSTIFIEE"): (2, Decimal("4.00"))},
+        )
+        fact = AbsenceDailyFact.objects.get()
+        self.assertEqual(fact.id_departement_id, self.dept.pk)
+        self.assertEqual(fact.professeur_id, self.professor.pk)
+
+    def test_statistics_read_facts(self):
+        self.create_absence(self.inscriptions[0], self.seances[0])
+        self.create_absence(
+            self.inscriptions[1], self.seances[1], Absence.Statut.JUSTIFIEE
+        )
+        self.create_absence(self.inscriptions[2], self.seances[1])
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("dashboard:admin_statistics"), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total_absences"], 3)
+        self.assertEqual(response.context["kpi_justified"], 1)
+        chart = response.context["chart_data"]
+        self.assertEqual(chart["monthly_data"], [1, 2])
+        self.assertEqual(chart["top_professors_labels"], ["Paul Martin"])
+        self.assertEqual(chart["dept_labels"], ["Info"])
+        self.assertEqual(chart["level_labels"], ["Année 2"])
+
+        payload = self.client.get(
+            reverse("api:analytics-statistics"), secure=True
+        ).json()
+        self.assertEqual(payload["top_courses"], [{"name": "Algèbre", "count": 3}])
+        self.assertEqual(
+            payload["monthly_absences"],
+            [{"month": "2026-01", "count": 1}, {"month": "2026-02", "count": 2}],
+        )
@@ -11,12 +11,15 @@ from decimal import Decimal
 from unittest.mock import patch
 
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
 from django.utils import timezone
 
 from apps.absences.models import Absence
 from apps.absences.services import (
+    annotate_absence_risk,
     calculer_absence_stats,
+    calculer_risque_inscription,
     calculer_pourcentage_absence,
     etudiants_en_alerte,
     get_at_risk_count_for_queryset,
@@ -592,6 +595,97 @@ class EnAttenteExcludedFromThresholdTest(AbsenceLogicBaseTestCase):
         self.assertEqual(float(total), 12.0)
 
 
+class AnnotateAbsenceRiskTest(AbsenceLogicBaseTestCase):
+    """annotate_absence_risk() evaluates the threshold rule in SQL."""
+
+    def setUp(self):
+        super().setUp()
+        self.student2 = User.objects.create_user(
+            email="stu2@test.com",
+            nom="Etudiant",
+            prenom="Exempte",
+            password="pass1234",
+            role=User.Role.ETUDIANT,
+        )
+        self.inscription2 = Inscription.objects.create(
+            id_etudiant=self.student2,
+            id_cours=self.cours,
+            id_annee=self.annee,
+            exemption_40=True,
+            motif_exemption="Raison médicale",
+        )
+        # 6 x 4h = 24h / 60h = 40% for both students
+        for ins in (self.inscription, self.inscription2):
+            for seance in self.seances[:6]:
+                Absence.objects.create(
+                    id_inscription=ins,
+                    id_seance=seance,
+                    type_absence=Absence.TypeAbsence.ABSENT,
+                    duree_absence=Decimal("4.00"),
+                    statut=Absence.Statut.NON_JUSTIFIEE,
+                    encodee_par=self.prof,
+                )
+
+    def test_flags_match_calculer_risque_inscription(self):
+        qs = annotate_absence_risk(
+            Inscription.objects.filter(id_cours=self.cours), system_threshold=40
+        )
+        for ins in qs:
+            expected = calculer_risque_inscription(ins, system_threshold=40)
+            self.assertAlmostEqual(ins.taux, expected["taux"], places=1)
+            self.assertEqual(ins.seuil_effectif, expected["seuil_effectif"])
+            self.assertEqual(ins.is_at_risk, expected["is_at_risk"])
+            self.assertEqual(ins.is_blocked, expected["is_blocked"])
+            self.assertEqual(ins.is_under_exemption, expected["is_under_exemption"])
+
+        by_pk = {ins.pk: ins for ins in qs}
+        self.assertTrue(by_pk[self.inscription.pk].is_blocked)
+        self.assertFalse(by_pk[self.inscription2.pk].is_blocked)
+        self.assertTrue(by_pk[self.inscription2.pk].is_under_exemption)
+
+    def test_blocked_count_is_single_query(self):
+        qs = annotate_absence_risk(Inscription.objects.all(), system_threshold=40)
+        with self.assertNumQueries(1):
+            self.assertEqual(qs.filter(is_blocked=True).count(), 1)
+
+    def test_inscription_without_absences_not_at_risk(self):
+        Absence.objects.filter(id_inscription=self.inscription2).delete()
+        qs = annotate_absence_risk(
+            Inscription.objects.filter(pk=self.inscription2.pk), system_threshold=40
+        )
+        ins = qs.get()
+        self.assertEqual(ins.total_absence, 0)
+        self.assertFalse(ins.is_at_risk)
+
+    def test_course_without_periods_never_flagged(self):
+        """Un cours sans périodes n'est pas évalué, même avec un seuil de 0."""
+        # Lignes antérieures à la contrainte cours_nombre_total_periodes_range
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("PRAGMA ignore_check_constraints = ON")
+                self.addCleanup(
+                    connection.cursor().execute,
+                    "PRAGMA ignore_check_constraints = OFF",
+                )
+            else:
+                cursor.execute(
+                    f"ALTER TABLE {Cours._meta.db_table} "
+                    "DROP CONSTRAINT cours_nombre_total_periodes_range"
+                )
+        Cours.objects.filter(pk=self.cours.pk).update(
+            nombre_total_periodes=0, seuil_absence=0
+        )
+        qs = annotate_absence_risk(
+            Inscription.objects.filter(id_cours=self.cours), system_threshold=40
+        )
+        for ins in qs:
+            self.assertEqual(ins.taux, 0.0)
+            self.assertFalse(ins.is_at_risk)
+            self.assertFalse(ins.is_blocked)
+            self.assertFalse(ins.is_under_exemption)
+        self.assertFalse(qs.filter(is_at_risk=True).exists())
+
+
 class FutureSessionsExcludedTest(TestCase):
     """
     Absences linked to future séances must be excluded from ALL
@@ -0,0 +1,166 @@
+"""
+Tests for the materialized per-inscription absence summary:
+- InscriptionAbsenceSummary kept current by Absence signals
+- justification workflow (statut change) reflected in the summary
+- absences on future seances counted once the seance date has passed
+- rebuild_absence_summaries management command
+"""
+
+from datetime import time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.absences.models import Absence, InscriptionAbsenceSummary
+from apps.absences.services import (
+    annotate_absence_risk,
+    calculer_absence_stats,
+    get_absence_summaries,
+    get_absence_sums,
+    refresh_absence_summaries,
+)
+from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.academics.models import Cours, Departement, Faculte
+from apps.accounts.models import User
+from apps.enrollments.models import Inscription
+
+
+class AbsenceSummaryTests(TestCase):
+    def setUp(self):
+        faculte = Faculte.objects.create(nom_faculte="Faculte Resume")
+        departement = Departement.objects.create(
+            nom_departement="Departement Resume", id_faculte=faculte
+        )
+        self.annee = AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+        self.prof = User.objects.create_user(
+            email="prof-resume@test.com",
+            nom="Prof",
+            prenom="Resume",
+            password="pass1234",
+            role=User.Role.PROFESSEUR,
+        )
+        self.student = User.objects.create_user(
+            email="stu-resume@test.com",
+            nom="Etudiant",
+            prenom="Resume",
+            password="pass1234",
+            role=User.Role.ETUDIANT,
+        )
+        self.cours = Cours.objects.create(
+            code_cours="RESUME",
+            nom_cours="Resume",
+            nombre_total_periodes=20,
+            id_departement=departement,
+            professeur=self.prof,
+            id_annee=self.annee,
+            niveau=1,
+        )
+        self.inscription = Inscription.objects.create(
+            id_etudiant=self.student, id_cours=self.cours, id_annee=self.annee
+        )
+        self.today = timezone.localdate()
+
+    def _seance(self, days_offset):
+        return Seance.objects.create(
+            date_seance=self.today + timedelta(days=days_offset),
+            heure_debut=time(8, 0),
+            heure_fin=time(10, 0),
+            id_cours=self.cours,
+            id_annee=self.annee,
+        )
+
+    def _absence(self, seance, statut=Absence.Statut.NON_JUSTIFIEE):
+        return Absence.objects.create(
+            id_inscription=self.inscription,
+            id_seance=seance,
+            duree_absence=Decimal("2.00"),
+            statut=statut,
+            encodee_par=self.prof,
+        )
+
+    def _summary(self):
+        return InscriptionAbsenceSummary.objects.get(pk=self.inscription.pk)
+
+    def test_summary_created_and_updated_by_signals(self):
+        self._absence(self._seance(-2))
+        self._absence(self._seance(-1), statut=Absence.Statut.EN_ATTENTE)
+
+        summary = self._summary()
+        self.assertEqual(summary.heures_non_justifiees, Decimal("2.00"))
+        self.assertEqual(summary.heures_en_attente, Decimal("2.00"))
+        self.assertEqual(summary.nb_absences, 2)
+        self.assertEqual(summary.derniere_absence, self.today - timedelta(days=1))
+        self.assertIsNone(summary.prochaine_echeance)
+
+    def test_justification_accepted_updates_summary(self):
+        absence = self._absence(self._seance(-3))
+        absence.statut = Absence.Statut.JUSTIFIEE
+        absence.save(update_fields=["statut"])
+
+        summary = self._summary()
+        self.assertEqual(summary.heures_non_justifiees, Decimal("0.00"))
+        self.assertEqual(summary.heures_justifiees, Decimal("2.00"))
+        self.assertEqual(calculer_absence_stats(self.inscription)["total_absence"], 0.0)
+
+    def test_delete_last_absence_removes_summary(self):
+        absence = self._absence(self._seance(-1))
+        absence.delete()
+        self.assertFalse(
+            InscriptionAbsenceSummary.objects.filter(pk=self.inscription.pk).exists()
+        )
+        self.assertEqual(get_absence_sums([self.inscription.pk]), {})
+
+    def test_future_absence_counted_once_seance_passed(self):
+        seance = self._seance(2)
+        self._absence(seance)
+        summary = self._summary()
+        self.assertEqual(summary.heures_non_justifiees, Decimal("0.00"))
+        self.assertEqual(summary.prochaine_echeance, seance.date_seance)
+
+        # Le jour de la séance arrive : la ligne est échue et re-sommée à la lecture
+        Seance.objects.filter(pk=seance.pk).update(date_seance=self.today)
+        InscriptionAbsenceSummary.objects.filter(pk=self.inscription.pk).update(
+            prochaine_echeance=self.today
+        )
+        summaries = get_absence_summaries([self.inscription.pk])
+        self.assertEqual(
+            summaries[self.inscription.pk].heures_non_justifiees, Decimal("2.00")
+        )
+        risk = annotate_absence_risk(
+            Inscription.objects.filter(pk=self.inscription.pk)
+        ).get()
+        self.assertEqual(risk.total_absence, Decimal("2.00"))
+        # Les lectures n'écrivent pas : la ligne est rafraîchie par le cron
+        self.assertEqual(self._summary().prochaine_echeance, self.today)
+
+        call_command("rebuild_absence_summaries", "--stale-only", stdout=StringIO())
+        summary = self._summary()
+        self.assertEqual(summary.heures_non_justifiees, Decimal("2.00"))
+        self.assertIsNone(summary.prochaine_echeance)
+
+    def test_refresh_locks_inscriptions_first(self):
+        # Deux transactions concurrentes recalculent l'une après l'autre
+        with patch.object(
+            Inscription.objects,
+            "select_for_update",
+            wraps=Inscription.objects.select_for_update,
+        ) as mock_sfu:
+            refresh_absence_summaries([self.inscription.pk])
+        mock_sfu.assert_called_once()
+
+    def test_reads_single_query(self):
+        self._absence(self._seance(-1))
+        with self.assertNumQueries(1):
+            get_absence_sums([self.inscription.pk])
+
+    def test_rebuild_command_restores_summaries(self):
+        self._absence(self._seance(-1))
+        InscriptionAbsenceSummary.objects.all().delete()
+
+        call_command("rebuild_absence_summaries", stdout=StringIO())
+
+        self.assertEqual(self._summary().heures_non_justifiees, Decimal("2.00"))
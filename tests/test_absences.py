@@ -833,6 +833,35 @@ class ConcurrentAbsenceCreationTests(BaseAbsenceTestCase):
             mock_sfu.assert_called_once()
 
 
+class PartialAbsenceDurationTests(BaseAbsenceTestCase):
+    """La feuille de présence écrit en masse, sans Absence.clean() : la vue valide."""
+
+    def post_partial(self, duree):
+        self.client.force_login(self.prof)
+        url = reverse("absences:mark_absence", args=[self.course1.id_cours])
+        data = {
+            "date_seance": "2026-03-18",
+            "heure_debut": "08:00",
+            "heure_fin": "10:00",
+            f"status_{self.inscription1.id_inscription}": "ABSENT",
+            f"type_{self.inscription1.id_inscription}": "PARTIEL",
+            f"duree_{self.inscription1.id_inscription}": duree,
+        }
+        response = self.client.post(url, data, secure=True)
+        self.assertEqual(response.status_code, 302)
+        return Absence.objects.get(id_inscription=self.inscription1)
+
+    def test_partial_shorter_than_session_is_kept(self):
+        absence = self.post_partial("1.5")
+        self.assertEqual(absence.type_absence, "PARTIEL")
+        self.assertEqual(absence.duree_absence, Decimal("1.50"))
+
+    def test_partial_covering_whole_session_becomes_absent(self):
+        absence = self.post_partial("2")
+        self.assertEqual(absence.type_absence, "ABSENT")
+        self.assertEqual(absence.duree_absence, Decimal("2.00"))
+
+
 class CourseDeletionTests(BaseAbsenceTestCase):
     """Tests for course deletion cascade and ProtectedError handling."""
 
@@ -0,0 +1,80 @@
+"""
+Tests for the cached active academic year resolver
+(apps.academic_sessions.active_year):
+- served from process memory after the first lookup
+- invalidated by save(), delete() and the set-active views' bulk deactivation
+- fallback to the most recent year when none is active
+"""
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.academic_sessions.active_year import ACTIVE_YEAR_VERSION_KEY, get_active_year
+from apps.academic_sessions.models import AnneeAcademique
+from apps.accounts.models import User
+
+
+class ActiveYearResolverTests(TestCase):
+    def setUp(self):
+        self.year = AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+
+    def test_second_lookup_hits_no_database(self):
+        self.assertEqual(get_active_year(), self.year)
+        with self.assertNumQueries(0):
+            year = get_active_year()
+        self.assertEqual(
+            (year.pk, year.libelle, year.active), (self.year.pk, "2025-2026", True)
+        )
+
+    def test_each_call_returns_a_new_instance(self):
+        first = get_active_year()
+        first.libelle = "modifié"
+        self.assertEqual(get_active_year().libelle, "2025-2026")
+
+    def test_activation_invalidates(self):
+        get_active_year()
+        version = cache.get(ACTIVE_YEAR_VERSION_KEY)
+        new_year = AnneeAcademique.objects.create(libelle="2026-2027", active=True)
+        self.assertNotEqual(cache.get(ACTIVE_YEAR_VERSION_KEY), version)
+        self.assertEqual(get_active_year(), new_year)
+
+    def test_fallback_to_latest_year(self):
+        self.year.active = False
+        self.year.save()
+        older = AnneeAcademique.objects.create(libelle="2024-2025")
+        self.assertIsNone(get_active_year())
+        self.assertEqual(get_active_year(fallback=True), older)
+        with self.assertNumQueries(0):
+            get_active_year(fallback=True)
+
+    def test_delete_invalidates(self):
+        self.year.active = False
+        self.year.save()
+        self.assertEqual(get_active_year(fallback=True), self.year)
+        self.year.delete()
+        self.assertIsNone(get_active_year(fallback=True))
+
+
+@override_settings(RATELIMIT_ENABLE=False, SECURE_SSL_REDIRECT=False)
+class SecretarySetActiveYearTests(TestCase):
+    def setUp(self):
+        self.secretary = User.objects.create_user(
+            email="sec_year@example.com",
+            nom="Sec",
+            prenom="Year",
+            password="pass1234",
+            role=User.Role.SECRETAIRE,
+        )
+        self.client.force_login(self.secretary)
+        self.old = AnneeAcademique.objects.create(libelle="2024-2025", active=True)
+        self.new = AnneeAcademique.objects.create(libelle="2025-2026")
+
+    def test_set_active_is_seen_by_the_resolver(self):
+        self.assertEqual(get_active_year(), self.old)
+        self.client.post(
+            reverse(
+                "dashboard:secretary_academic_year_set_active", args=[self.new.id_annee]
+            )
+        )
+        self.assertEqual(get_active_year(), self.new)
@@ -0,0 +1,200 @@
+"""
+Tests for the whole-roster attendance endpoint (POST /api/seances/{id}/attendance/):
+- the roster is applied in one transaction and the diff is returned
+- replaying an Idempotency-Key returns the stored response, nothing reapplied
+- reusing a key for another roster is rejected (409)
+- ownership, validated sessions and protected absences follow mark_absence rules
+"""
+
+from datetime import date, time
+from decimal import Decimal
+
+from django.core import mail
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.absences.models import Absence, AttendanceSubmission
+from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.academics.models import Cours, Departement, Faculte
+from apps.accounts.models import User
+from apps.enrollments.models import Inscription
+
+
+class SeanceAttendanceApiTests(TestCase):
+    def setUp(self):
+        faculte = Faculte.objects.create(nom_faculte="Faculte Roster")
+        departement = Departement.objects.create(
+            nom_departement="Departement Roster", id_faculte=faculte
+        )
+        self.annee = AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+        self.prof = User.objects.create_user(
+            email="prof-roster@example.com",
+            nom="Prof",
+            prenom="Roster",
+            password="pass1234",
+            role=User.Role.PROFESSEUR,
+        )
+        self.other_prof = User.objects.create_user(
+            email="other-roster@example.com",
+            nom="Other",
+            prenom="Roster",
+            password="pass1234",
+            role=User.Role.PROFESSEUR,
+        )
+        self.course = Cours.objects.create(
+            code_cours="ROSTER",
+            nom_cours="Roster",
+            nombre_total_periodes=30,
+            id_departement=departement,
+            professeur=self.prof,
+            id_annee=self.annee,
+            niveau=1,
+        )
+        self.seance = Seance.objects.create(
+            id_cours=self.course,
+            date_seance=date(2026, 1, 12),
+            heure_debut=time(8, 0),
+            heure_fin=time(10, 0),
+            id_annee=self.annee,
+        )
+        self.inscriptions = []
+        for idx in range(4):
+            student = User.objects.create_user(
+                email=f"stu-roster-{idx}@example.com",
+                nom="Student",
+                prenom=f"Roster{idx}",
+                password="pass1234",
+                role=User.Role.ETUDIANT,
+            )
+            self.inscriptions.append(
+                Inscription.objects.create(
+                    id_etudiant=student, id_cours=self.course, id_annee=self.annee
+                )
+            )
+        self.url = reverse("api:seance-attendance", args=[self.seance.id_seance])
+
+    def _post(self, payload, key="roster-1", user=None):
+        self.client.force_login(user or self.prof)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                self.url,
+                payload,
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY=key,
+                secure=True,
+            )
+
+    def _roster(self, absent=(), partial=None, validate=False):
+        entries = []
+        for ins in self.inscriptions:
+            if ins.pk in absent:
+                entries.append({"inscription": ins.pk, "status": "ABSENT"})
+            elif partial and ins.pk in partial:
+                entries.append(
+                    {
+                        "inscription": ins.pk,
+                        "status": "ABSENT",
+                        "type_absence": "PARTIEL",
+                        "duree_absence": str(partial[ins.pk]),
+                    }
+                )
+            else:
+                entries.append({"inscription": ins.pk, "status": "PRESENT"})
+        return {"entries": entries, "validate_seance": validate}
+
+    def test_roster_applied_and_diff_returned(self):
+        first, second = self.inscriptions[0].pk, self.inscriptions[1].pk
+        response = self._post(self._roster(absent=[first], partial={second: "0.5"}))
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(sorted(body["created"]), sorted([first, second]))
+        self.assertEqual(body["updated"], [])
+        self.assertEqual(len(body["unchanged"]), 2)
+        self.assertFalse(body["validated"])
+        self.assertEqual(
+            Absence.objects.get(id_inscription_id=first).duree_absence, Decimal("2.00")
+        )
+        self.assertEqual(
+            Absence.objects.get(id_inscription_id=second).duree_absence, Decimal("0.50")
+        )
+        self.assertEqual(len(mail.outbox), 2)
+
+        # Correction avec une nouvelle clé : diff par rapport à l'état courant
+        response = self._post(
+            self._roster(absent=[second], validate=True), key="roster-2"
+        )
+        body = response.json()
+        self.assertEqual(body["deleted"], [first])
+        self.assertEqual(body["updated"], [second])
+        self.assertTrue(body["validated"])
+        self.seance.refresh_from_db()
+        self.assertTrue(self.seance.validated)
+
+    def test_replayed_key_returns_stored_response(self):
+        payload = self._roster(absent=[self.inscriptions[0].pk])
+        first = self._post(payload)
+        Absence.objects.all().delete()
+
+        replay = self._post(payload)
+
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(replay.json(), first.json())
+        # Rien n'a été réappliqué
+        self.assertFalse(Absence.objects.exists())
+        self.assertEqual(AttendanceSubmission.objects.count(), 1)
+
+    def test_key_reused_for_other_roster_conflicts(self):
+        self._post(self._roster(absent=[self.inscriptions[0].pk]))
+        response = self._post(self._roster(absent=[self.inscriptions[1].pk]))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(
+            Absence.objects.filter(id_inscription=self.inscriptions[1]).exists()
+        )
+
+    def test_key_required(self):
+        response = self._post(self._roster(), key="")
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_professor_forbidden(self):
+        response = self._post(self._roster(), user=self.other_prof)
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_inscription_rejected(self):
+        payload = self._roster()
+        payload["entries"].append({"inscription": 999999, "status": "ABSENT"})
+        response = self._post(payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Absence.objects.exists())
+
+    def test_partial_longer_than_session_rejected(self):
+        payload = self._roster(partial={self.inscriptions[0].pk: "3"})
+        response = self._post(payload)
+        self.assertEqual(response.status_code, 400)
+
+    def test_partial_covering_whole_session_rejected(self):
+        payload = self._roster(partial={self.inscriptions[0].pk: "2"})
+        response = self._post(payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Absence.objects.exists())
+
+    def test_validated_session_conflicts(self):
+        self.seance.validated = True
+        self.seance.save(update_fields=["validated"])
+        response = self._post(self._roster(absent=[self.inscriptions[0].pk]))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Absence.objects.exists())
+
+    def test_justified_absence_protected(self):
+        justified = Absence.objects.create(
+            id_inscription=self.inscriptions[0],
+            id_seance=self.seance,
+            type_absence=Absence.TypeAbsence.ABSENT,
+            duree_absence=Decimal("2.00"),
+            statut=Absence.Statut.JUSTIFIEE,
+            encodee_par=self.prof,
+        )
+        response = self._post(self._roster())
+        self.assertEqual(response.json()["protected"], [self.inscriptions[0].pk])
+        self.assertTrue(Absence.objects.filter(pk=justified.pk).exists())
@@ -0,0 +1,109 @@
+"""
+Tests for the buffered audit log API (apps.audits.utils):
+- audit_buffer() writes a block's entries in one INSERT, same sanitization
+- entries buffered inside a rolled-back transaction are discarded
+- AuditBufferMiddleware defers entries written outside a transaction
+- async flusher writes submitted batches from a background thread
+"""
+
+from django.db import transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase
+
+from apps.accounts.models import User
+from apps.audits.middleware import AuditBufferMiddleware
+from apps.audits.models import LogAudit
+from apps.audits.utils import (
+    _AsyncAuditFlusher,
+    audit_buffer,
+    build_log_entry,
+    log_action,
+)
+
+
+def _create_user(email):
+    return User.objects.create_user(
+        email=email,
+        nom="Audit",
+        prenom="Buffer",
+        password="pass1234",
+        role=User.Role.SECRETAIRE,
+    )
+
+
+class AuditBufferTests(TestCase):
+    def setUp(self):
+        self.user = _create_user("audit-buffer@test.com")
+
+    def test_block_written_in_single_insert(self):
+        with self.assertNumQueries(1):
+            with audit_buffer():
+                for idx in range(5):
+                    log_action(self.user, f"Action {idx}", objet_type="AUTRE")
+        self.assertEqual(LogAudit.objects.count(), 5)
+
+    def test_same_sanitization_and_escalation(self):
+        with audit_buffer():
+            log_action(self.user, "CRITIQUE: suppression\x00\nmassive")
+            log_action(self.user, "   ")
+        entry = LogAudit.objects.get()
+        self.assertEqual(entry.niveau, "CRITIQUE")
+        self.assertEqual(entry.action, "CRITIQUE: suppression  massive")
+
+    def test_nested_blocks_share_outer_buffer(self):
+        with audit_buffer() as outer:
+            log_action(self.user, "outer")
+            with audit_buffer() as inner:
+                log_action(self.user, "inner")
+            self.assertIs(inner, outer)
+            self.assertEqual(LogAudit.objects.count(), 0)
+        self.assertEqual(LogAudit.objects.count(), 2)
+
+    def test_rolled_back_transaction_discards_entries(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic(), audit_buffer():
+                log_action(self.user, "annulé")
+                raise RuntimeError("rollback")
+        self.assertFalse(LogAudit.objects.exists())
+
+    def test_anonymous_user_ignored(self):
+        self.assertIsNone(build_log_entry(None, "action"))
+
+
+class AuditRequestCollectorTests(TransactionTestCase):
+    def setUp(self):
+        self.user = _create_user("audit-request@test.com")
+        self.factory = RequestFactory()
+
+    def test_entries_outside_transaction_written_at_request_end(self):
+        counts = {}
+
+        def view(request):
+            log_action(self.user, "hors transaction 1")
+            log_action(self.user, "hors transaction 2")
+            counts["during"] = LogAudit.objects.count()
+            with transaction.atomic():
+                log_action(self.user, "dans une transaction")
+            counts["after_atomic"] = LogAudit.objects.count()
+            return "response"
+
+        response = AuditBufferMiddleware(view)(self.factory.get("/"))
+
+        self.assertEqual(response, "response")
+        self.assertEqual(counts, {"during": 0, "after_atomic": 1})
+        self.assertEqual(LogAudit.objects.count(), 3)
+
+    def test_entries_written_when_view_raises(self):
+        def view(request):
+            log_action(self.user, "avant erreur")
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            AuditBufferMiddleware(view)(self.factory.get("/"))
+        self.assertEqual(LogAudit.objects.count(), 1)
+
+    def test_async_flusher_writes_batches(self):
+        flusher = _AsyncAuditFlusher(interval=0.05)
+        flusher.submit([build_log_entry(self.user, f"async {idx}") for idx in range(3)])
+        flusher.submit([build_log_entry(self.user, "async 3")])
+        flusher.stop()
+        self.assertEqual(LogAudit.objects.filter(action__startswith="async").count(), 4)
@@ -1,10 +1,19 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from io import StringIO
+from unittest.mock import MagicMock
 
 from django.core.management import call_command
 from django.test import TestCase
 from django.utils import timezone
 
 from apps.absences.models import QRScanLog
+from apps.absences.partitions import (
+    add_months,
+    create_partition,
+    month_start,
+    partition_name,
+)
 from apps.accounts.models import User
 
 
@@ -60,3 +69,81 @@ class CleanupQRLogsCommandTest(TestCase):
 
         self.assertEqual(QRScanLog.objects.count(), 1)
         self.assertTrue(QRScanLog.objects.filter(pk=recent.pk).exists())
+
+    def test_deletes_in_primary_key_batches(self):
+        """Expired rows are deleted in bounded pk ranges with progress output."""
+        old = [self._create_log(days_ago=100) for _ in range(3)]
+        recent = self._create_log(days_ago=1)
+        out = StringIO()
+
+        call_command("cleanup_qr_logs", "--batch-size=1", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn(f"3 entries deleted (up to id {old[-1].pk})", output)
+        self.assertIn("Deleted 3 QRScanLog entries", output)
+        self.assertEqual(
+            list(QRScanLog.objects.values_list("pk", flat=True)), [recent.pk]
+        )
+
+
+class QRScanLogPartitionNamingTest(TestCase):
+    def test_month_arithmetic_and_names(self):
+        month = month_start(datetime(2026, 12, 31, 23, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(month, datetime(2026, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(
+            add_months(month, 1), datetime(2027, 1, 1, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(
+            add_months(month, -12), datetime(2025, 12, 1, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(partition_name(month), "qr_scan_log_p202612")
+
+
+class CreatePartitionTest(TestCase):
+    """create_partition sur une connexion PostgreSQL simulée (SQL émis)."""
+
+    month = datetime(2026, 11, 1, tzinfo=dt_timezone.utc)
+
+    def _connection(self, *fetched):
+        connection = MagicMock(alias="default")
+        connection.ops.quote_name = lambda name: f'"{name}"'
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.side_effect = list(fetched)
+        return connection, cursor
+
+    def _statements(self, cursor):
+        return [call.args[0].split(" (")[0] for call in cursor.execute.call_args_list]
+
+    def test_creates_partition_when_default_has_no_rows_for_month(self):
+        connection, cursor = self._connection(("qr_scan_log_default",), None)
+
+        create_partition(self.month, connection)
+
+        statements = self._statements(cursor)
+        self.assertEqual(len(statements), 3)
+        self.assertTrue(statements[-1].startswith("CREATE TABLE"))
+        self.assertNotIn("DETACH", " ".join(statements))
+
+    def test_moves_rows_out_of_default_partition(self):
+        """Lignes du mois déjà dans la partition par défaut : detach, create, move, attach."""
+        connection, cursor = self._connection(("qr_scan_log_default",), (1,))
+
+        create_partition(self.month, connection)
+
+        statements = self._statements(cursor)[2:]
+        self.assertEqual(
+            statements,
+            [
+                'ALTER TABLE "qr_scan_log" DETACH PARTITION "qr_scan_log_default"',
+                'CREATE TABLE IF NOT EXISTS "qr_scan_log_p202611" PARTITION OF '
+                '"qr_scan_log" FOR VALUES FROM',
+                'INSERT INTO "qr_scan_log_p202611" SELECT * FROM "qr_scan_log_default" '
+                'WHERE "timestamp" >= %s AND "timestamp" < %s',
+                'DELETE FROM "qr_scan_log_default" '
+                'WHERE "timestamp" >= %s AND "timestamp" < %s',
+                'ALTER TABLE "qr_scan_log" ATTACH PARTITION "qr_scan_log_default" DEFAULT',
+            ],
+        )
+        bounds = [self.month.isoformat(), add_months(self.month, 1).isoformat()]
+        for call in cursor.execute.call_args_list[3:5]:
+            self.assertEqual(call.args[1], bounds)
@@ -0,0 +1,135 @@
+"""
+Tests for versioned dashboard contexts (apps.dashboard.data_versions):
+- a context is computed once per combination of versions
+- absence / séance changes delete the affected versions at commit
+- a repeated page load skips the KPI queries
+"""
+
+from datetime import date, time
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.absences.models import Absence
+from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.academics.models import Cours, Departement, Faculte
+from apps.accounts.models import User
+from apps.dashboard.data_versions import (
+    cached_context,
+    course_key,
+    get_versions,
+    student_key,
+    year_key,
+)
+from apps.enrollments.models import Inscription
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        self.annee = AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+        self.professor = User.objects.create_user(
+            email="prof-dv@example.com",
+            nom="Prof",
+            prenom="DV",
+            password="pass1234",
+            role=User.Role.PROFESSEUR,
+        )
+        self.secretary = User.objects.create_user(
+            email="sec-dv@example.com",
+            nom="Sec",
+            prenom="DV",
+            password="pass1234",
+            role=User.Role.SECRETAIRE,
+        )
+        self.student = User.objects.create_user(
+            email="student-dv@example.com",
+            nom="Student",
+            prenom="DV",
+            password="pass1234",
+            role=User.Role.ETUDIANT,
+        )
+        dept = Departement.objects.create(
+            nom_departement="Info",
+            id_faculte=Faculte.objects.create(nom_faculte="Sciences"),
+        )
+        self.course = Cours.objects.create(
+            code_cours="DV1",
+            nom_cours="Cours DV",
+            nombre_total_periodes=30,
+            niveau=1,
+            id_departement=dept,
+            professeur=self.professor,
+            id_annee=self.annee,
+        )
+        self.seance = Seance.objects.create(
+            date_seance=date(2026, 1, 5),
+            heure_debut=time(8, 0),
+            heure_fin=time(10, 0),
+            id_cours=self.course,
+            id_annee=self.annee,
+        )
+        self.inscription = Inscription.objects.create(
+            id_etudiant=self.student,
+            id_cours=self.course,
+            id_annee=self.annee,
+            status="EN_COURS",
+        )
+
+    def test_context_built_once_per_version(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return {"value": len(calls)}
+
+        keys = [student_key(self.student.pk)]
+        self.assertEqual(cached_context("t", keys, build), {"value": 1})
+        self.assertEqual(cached_context("t", keys, build), {"value": 1})
+        self.assertEqual(
+            cached_context("t", keys, build, extra=("other",)), {"value": 2}
+        )
+
+    def test_absence_change_bumps_versions_at_commit(self):
+        keys = [
+            student_key(self.student.pk),
+            course_key(self.course.id_cours),
+            year_key(self.annee.id_annee),
+        ]
+        before = get_versions(keys)
+        with self.captureOnCommitCallbacks(execute=True):
+            Absence.objects.create(
+                id_inscription=self.inscription,
+                id_seance=self.seance,
+                type_absence="ABSENT",
+                duree_absence=2.0,
+                statut="NON_JUSTIFIEE",
+                encodee_par=self.secretary,
+            )
+        after = get_versions(keys)
+        self.assertTrue(all(a != b for a, b in zip(before, after)))
+
+    def test_course_detail_reuses_context_until_change(self):
+        self.client.force_login(self.professor)
+        url = reverse("dashboard:instructor_course_detail", args=[self.course.id_cours])
+
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.context["students_data"][0]["total_abs"], 0)
+
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url, secure=True)
+        self.assertLess(len(second.captured_queries), len(first.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Absence.objects.create(
+                id_inscription=self.inscription,
+                id_seance=self.seance,
+                type_absence="ABSENT",
+                duree_absence=2.0,
+                statut="NON_JUSTIFIEE",
+                encodee_par=self.secretary,
+            )
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.context["students_data"][0]["total_abs"], 2.0)
@@ -0,0 +1,326 @@
+"""
+Tests for the set-based eligibility engine (recalculer_eligibilite_batch):
+- only inscriptions whose eligible_examen flips are written
+- Notification / LogAudit rows are bulk-inserted for the flips
+- triggered by course threshold and system default threshold changes
+- Absence signals coalesced into one recalculation per transaction
+- EligibilityRecalcJob queue: idempotent enqueue, worker, retry with backoff
+"""
+
+from datetime import date, time
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+
+from apps.absences.models import Absence, EligibilityRecalcJob
+from apps.absences.services import (
+    eligibility_queue_depth,
+    enqueue_eligibility_recalc,
+    process_eligibility_queue,
+    recalculer_eligibilite_batch,
+    schedule_eligibility_recalc,
+)
+from apps.absences.signals import _CommitBuffer
+from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.academics.models import Cours, Departement, Faculte
+from apps.accounts.models import User
+from apps.audits.models import LogAudit
+from apps.dashboard.models import SystemSettings
+from apps.enrollments.models import Inscription
+from apps.notifications.models import Notification
+
+
+class EligibilityBatchBase(TestCase):
+    # Exécuter les callbacks on_commit des absences créées dans setUp
+    commit_fixtures = False
+
+    def setUp(self):
+        cache.clear()
+        faculte = Faculte.objects.create(nom_faculte="Faculte Lot")
+        departement = Departement.objects.create(
+            nom_departement="Departement Lot", id_faculte=faculte
+        )
+        self.annee = AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+        self.prof = User.objects.create_user(
+            email="prof-lot@test.com",
+            nom="Prof",
+            prenom="Lot",
+            password="pass1234",
+            role=User.Role.PROFESSEUR,
+        )
+        # 20h course, 2h sessions
+        self.cours = Cours.objects.create(
+            code_cours="LOT",
+            nom_cours="Lot",
+            nombre_total_periodes=20,
+            id_departement=departement,
+            professeur=self.prof,
+            id_annee=self.annee,
+            niveau=1,
+        )
+        self.seances = [
+            Seance.objects.create(
+                date_seance=date(2026, 1, day),
+                heure_debut=time(8, 0),
+                heure_fin=time(10, 0),
+                id_cours=self.cours,
+                id_annee=self.annee,
+            )
+            for day in range(1, 6)
+        ]
+        # Absence hours per student: 10h (50%), 6h (30%), 0h
+        self.inscriptions = []
+        with self.captureOnCommitCallbacks(execute=self.commit_fixtures):
+            self._create_students()
+
+    def _create_students(self):
+        for idx, nb_seances in enumerate((5, 3, 0)):
+            student = User.objects.create_user(
+                email=f"stu-lot-{idx}@test.com",
+                nom="Etudiant",
+                prenom=f"Lot{idx}",
+                password="pass1234",
+                role=User.Role.ETUDIANT,
+            )
+            ins = Inscription.objects.create(
+                id_etudiant=student, id_cours=self.cours, id_annee=self.annee
+            )
+            for seance in self.seances[:nb_seances]:
+                Absence.objects.create(
+                    id_inscription=ins,
+                    id_seance=seance,
+                    duree_absence=Decimal("2.00"),
+                    statut=Absence.Statut.NON_JUSTIFIEE,
+                    encodee_par=self.prof,
+                )
+            self.inscriptions.append(ins)
+
+    def _eligibility(self):
+        return [
+            Inscription.objects.get(pk=ins.pk).eligible_examen
+            for ins in self.inscriptions
+        ]
+
+
+@override_settings(ELIGIBILITY_RECALC_ASYNC=False)
+@patch("apps.absences.services.send_notification_email")
+class EligibilityBatchTests(EligibilityBatchBase):
+    def test_only_flipped_rows_written(self, _mock_email):
+        result = recalculer_eligibilite_batch(
+            Inscription.objects.filter(id_cours=self.cours), system_threshold=40
+        )
+        self.assertEqual(result, {"blocked": 1, "unblocked": 0})
+        self.assertEqual(self._eligibility(), [False, True, True])
+        self.assertEqual(Notification.objects.filter(type="ALERTE").count(), 1)
+        self.assertEqual(LogAudit.objects.filter(niveau="CRITIQUE").count(), 1)
+
+        # Second pass: nothing flips, nothing written (one read, no summary refresh)
+        with self.assertNumQueries(1):
+            result = recalculer_eligibilite_batch(
+                Inscription.objects.filter(id_cours=self.cours), system_threshold=40
+            )
+        self.assertEqual(result, {"blocked": 0, "unblocked": 0})
+
+    def test_unblock_creates_info_notification(self, _mock_email):
+        recalculer_eligibilite_batch(
+            Inscription.objects.filter(id_cours=self.cours), system_threshold=40
+        )
+        result = recalculer_eligibilite_batch(
+            Inscription.objects.filter(id_cours=self.cours), system_threshold=60
+        )
+        self.assertEqual(result, {"blocked": 0, "unblocked": 1})
+        self.assertEqual(self._eligibility(), [True, True, True])
+        self.assertEqual(Notification.objects.filter(type="INFO").count(), 1)
+
+    def test_course_threshold_change_triggers_batch(self, _mock_email):
+        self.cours.seuil_absence = 25
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cours.save()
+        self.assertEqual(self._eligibility(), [False, False, True])
+
+    def test_system_threshold_change_triggers_batch(self, _mock_email):
+        settings_obj = SystemSettings.get_settings()
+        settings_obj.default_absence_threshold = 25
+        with self.captureOnCommitCallbacks(execute=True):
+            settings_obj.save()
+        self.assertEqual(self._eligibility(), [False, False, True])
+
+    def test_system_threshold_ignored_for_custom_course_threshold(self, _mock_email):
+        Cours.objects.filter(pk=self.cours.pk).update(seuil_absence=90)
+        settings_obj = SystemSettings.get_settings()
+        settings_obj.default_absence_threshold = 25
+        with self.captureOnCommitCallbacks(execute=True):
+            settings_obj.save()
+        self.assertEqual(self._eligibility(), [True, True, True])
+
+
+@override_settings(ELIGIBILITY_RECALC_ASYNC=False)
+@patch("apps.absences.services.send_notification_email")
+class CommitCoalescingTests(EligibilityBatchBase):
+    commit_fixtures = True
+
+    def test_roll_call_recalculates_once_at_commit(self, _mock_email):
+        student_30 = self.inscriptions[1]
+        student_0 = self.inscriptions[2]
+        with patch(
+            "apps.absences.signals.schedule_eligibility_recalc",
+            wraps=schedule_eligibility_recalc,
+        ) as mock_batch, patch("apps.absences.signals.cache") as mock_cache:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                for ins, seances in (
+                    (student_30, self.seances[3:]),
+                    (student_0, self.seances[:1]),
+                ):
+                    for seance in seances:
+                        Absence.objects.create(
+                            id_inscription=ins,
+                            id_seance=seance,
+                            duree_absence=Decimal("2.00"),
+                            statut=Absence.Statut.NON_JUSTIFIEE,
+                            encodee_par=self.prof,
+                        )
+
+        # Un seul tampon enregistré (le second callback est l'envoi des emails)
+        self.assertEqual(sum(isinstance(cb, _CommitBuffer) for cb in callbacks), 1)
+        self.assertEqual(mock_batch.call_count, 1)
+        self.assertEqual(set(mock_batch.call_args[0][0]), {student_30.pk, student_0.pk})
+        mock_cache.delete.assert_not_called()
+        mock_cache.delete_many.assert_called_once()
+        # 30% + 4h = 50% : bloqué ; 0% + 2h = 10% : éligible
+        self.assertEqual(self._eligibility(), [False, False, True])
+
+    def test_new_buffer_after_commit(self, _mock_email):
+        with self.captureOnCommitCallbacks(execute=True) as first:
+            Absence.objects.create(
+                id_inscription=self.inscriptions[2],
+                id_seance=self.seances[0],
+                duree_absence=Decimal("2.00"),
+                statut=Absence.Statut.NON_JUSTIFIEE,
+                encodee_par=self.prof,
+            )
+        with self.captureOnCommitCallbacks(execute=True) as second:
+            Absence.objects.create(
+                id_inscription=self.inscriptions[2],
+                id_seance=self.seances[1],
+                duree_absence=Decimal("2.00"),
+                statut=Absence.Statut.NON_JUSTIFIEE,
+                encodee_par=self.prof,
+            )
+        self.assertIsInstance(first[0], _CommitBuffer)
+        self.assertIsInstance(second[0], _CommitBuffer)
+        self.assertIsNot(first[0], second[0])
+
+    def test_new_buffer_after_savepoint_rollback(self, _mock_email):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Absence.objects.create(
+                        id_inscription=self.inscriptions[1],
+                        id_seance=self.seances[4],
+                        duree_absence=Decimal("2.00"),
+                        statut=Absence.Statut.NON_JUSTIFIEE,
+                        encodee_par=self.prof,
+                    )
+                    raise IntegrityError("rollback")
+            except IntegrityError:
+                pass
+            # Le callback du savepoint annulé est abandonné : un nouveau tampon est inscrit
+            Absence.objects.create(
+                id_inscription=self.inscriptions[2],
+                id_seance=self.seances[1],
+                duree_absence=Decimal("2.00"),
+                statut=Absence.Statut.NON_JUSTIFIEE,
+                encodee_par=self.prof,
+            )
+        buffers = [cb for cb in callbacks if isinstance(cb, _CommitBuffer)]
+        self.assertEqual(len(buffers), 1)
+        self.assertEqual(buffers[0].inscription_ids, {self.inscriptions[2].pk})
+        self.assertFalse(buffers[0].pending)
+
+
+@override_settings(ELIGIBILITY_RECALC_ASYNC=True)
+@patch("apps.absences.services.send_notification_email")
+class EligibilityQueueTests(EligibilityBatchBase):
+    commit_fixtures = True
+
+    def test_signals_enqueue_instead_of_recalculating(self, _mock_email):
+        # Les absences du setUp (50%, 30%) sont en file, rien n'est encore recalculé
+        self.assertEqual(EligibilityRecalcJob.objects.count(), 2)
+        self.assertEqual(self._eligibility(), [True, True, True])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = process_eligibility_queue()
+
+        self.assertEqual(result, {"processed": 2, "retried": 0, "failed": 0})
+        self.assertFalse(EligibilityRecalcJob.objects.exists())
+        self.assertEqual(self._eligibility(), [False, True, True])
+
+    def test_enqueue_is_idempotent(self, _mock_email):
+        pk = self.inscriptions[2].pk
+        enqueue_eligibility_recalc([pk, pk])
+        enqueue_eligibility_recalc([pk])
+        self.assertEqual(EligibilityRecalcJob.objects.filter(pk=pk).count(), 1)
+
+    def test_enqueue_ignores_deleted_inscription(self, _mock_email):
+        self.assertEqual(enqueue_eligibility_recalc([999999]), 0)
+
+    def test_failure_rescheduled_with_backoff_then_failed(self, _mock_email):
+        with patch(
+            "apps.absences.services.recalculer_eligibilite_batch",
+            side_effect=RuntimeError("boom"),
+        ):
+            result = process_eligibility_queue()
+        self.assertEqual(result, {"processed": 0, "retried": 2, "failed": 0})
+        job = EligibilityRecalcJob.objects.get(pk=self.inscriptions[0].pk)
+        self.assertEqual(job.tentatives, 1)
+        self.assertGreater(job.prochaine_tentative, job.date_demande)
+        self.assertIn("boom", job.derniere_erreur)
+
+        # Pas encore prêt : le worker n'y touche pas
+        self.assertEqual(process_eligibility_queue()["processed"], 0)
+
+        EligibilityRecalcJob.objects.update(
+            tentatives=EligibilityRecalcJob.MAX_TENTATIVES - 1,
+            prochaine_tentative=job.date_demande,
+        )
+        with patch(
+            "apps.absences.services.recalculer_eligibilite_batch",
+            side_effect=RuntimeError("boom"),
+        ):
+            result = process_eligibility_queue()
+        self.assertEqual(result["failed"], 2)
+        self.assertEqual(eligibility_queue_depth()["failed"], 2)
+
+    def test_failing_inscription_isolated_from_batch(self, _mock_email):
+        bad_pk = self.inscriptions[1].pk
+
+        def _batch(inscriptions_qs, system_threshold=None):
+            if bad_pk in set(inscriptions_qs.values_list("pk", flat=True)):
+                raise RuntimeError("boom")
+            return recalculer_eligibilite_batch(inscriptions_qs, system_threshold)
+
+        with patch(
+            "apps.absences.services.recalculer_eligibilite_batch", side_effect=_batch
+        ):
+            result = process_eligibility_queue()
+
+        self.assertEqual(result, {"processed": 1, "retried": 1, "failed": 0})
+        self.assertEqual(
+            list(EligibilityRecalcJob.objects.values_list("pk", flat=True)), [bad_pk]
+        )
+        self.assertFalse(
+            Inscription.objects.get(pk=self.inscriptions[0].pk).eligible_examen
+        )
+
+    def test_worker_command_once_and_stats(self, _mock_email):
+        out = StringIO()
+        call_command("process_eligibility_queue", "--stats", stdout=out)
+        self.assertIn('"pending": 2', out.getvalue())
+
+        call_command("process_eligibility_queue", "--once", stdout=StringIO())
+        self.assertEqual(eligibility_queue_depth()["pending"], 0)
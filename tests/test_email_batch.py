@@ -0,0 +1,88 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core import mail
+from django.template.loader import get_template
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.notifications.email import (
+    build_absence_recorded_email,
+    send_batch_with_dedup,
+)
+from apps.notifications.models import EmailLog
+
+
+def _build(student, taux):
+    return build_absence_recorded_email(student, "Algorithmique", "2026-01-12", taux)
+
+
+class SendBatchWithDedupTests(TestCase):
+    def setUp(self):
+        self.students = [
+            User.objects.create_user(
+                email=f"batch-{idx}@example.com",
+                password="testpass123",
+                nom="Batch",
+                prenom=f"Student{idx}",
+                role=User.Role.ETUDIANT,
+            )
+            for idx in range(5)
+        ]
+
+    def _items(self, taux=10.0):
+        return [(student, f"ins-{student.pk}-1", taux) for student in self.students]
+
+    def test_batch_sent_with_constant_queries(self):
+        # SELECT digest__in + savepoint + bulk INSERT + release
+        with self.assertNumQueries(4):
+            sent = send_batch_with_dedup(self._items(), "absence_recorded", _build)
+        self.assertEqual(sent, 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(EmailLog.objects.count(), 5)
+        self.assertEqual(mail.outbox[0].to, [self.students[0].email])
+        self.assertEqual(len(mail.outbox[0].alternatives), 1)
+
+    def test_second_batch_deduplicated_within_cooldown(self):
+        send_batch_with_dedup(self._items(), "absence_recorded", _build)
+        mail.outbox.clear()
+
+        with self.assertNumQueries(1):
+            sent = send_batch_with_dedup(self._items(), "absence_recorded", _build)
+        self.assertEqual(sent, 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_stale_slots_are_reclaimed(self):
+        send_batch_with_dedup(self._items()[:2], "absence_recorded", _build)
+        EmailLog.objects.update(created_at=timezone.now() - timedelta(hours=48))
+        mail.outbox.clear()
+
+        sent = send_batch_with_dedup(self._items(), "absence_recorded", _build)
+        self.assertEqual(sent, 5)
+        self.assertEqual(EmailLog.objects.count(), 5)
+
+    def test_inactive_and_duplicate_items_skipped(self):
+        self.students[0].actif = False
+        items = self._items() + self._items()
+        sent = send_batch_with_dedup(items, "absence_recorded", _build)
+        self.assertEqual(sent, 4)
+        self.assertFalse(
+            EmailLog.objects.filter(recipient_email=self.students[0].email).exists()
+        )
+
+    def test_template_compiled_once_per_batch(self):
+        with patch(
+            "apps.notifications.email.get_template", wraps=get_template
+        ) as mock_get_template:
+            send_batch_with_dedup(self._items(), "absence_recorded", _build)
+        mock_get_template.assert_called_once_with("emails/absence_recorded.html")
+
+    def test_build_failure_does_not_block_batch(self):
+        def flaky_build(student, taux):
+            if student == self.students[1]:
+                raise ValueError("boom")
+            return _build(student, taux)
+
+        sent = send_batch_with_dedup(self._items(), "absence_recorded", flaky_build)
+        self.assertEqual(sent, 4)
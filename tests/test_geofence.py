@@ -0,0 +1,121 @@
+"""
+Tests for the campus geofence index (apps.absences.geofence):
+- circle and polygon zones, grid candidates, nearest zone on rejection
+- the index is rebuilt when a building changes
+- qr_scan accepts a scan inside a campus zone, rejects it elsewhere and
+  only accepts the building pinned to the course
+"""
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.absences.geofence import (
+    GeofenceIndex,
+    Zone,
+    get_geofence_index,
+    invalidate_geofences,
+)
+from apps.absences.models import QRScanLog, QRScanRecord
+from apps.absences.qr_context import prime_scan_context
+from apps.academics.models import Batiment, Campus
+
+from .test_qr_gps import BaseQRTestCase
+
+NORTH = Zone(id=1, name="Nord", latitude=36.7525, longitude=3.0420, radius=100)
+SOUTH = Zone(
+    id=2,
+    name="Sud",
+    latitude=36.7005,
+    longitude=3.0005,
+    radius=100,
+    polygon=((36.700, 3.000), (36.700, 3.001), (36.701, 3.001), (36.701, 3.000)),
+)
+
+
+class GeofenceIndexTests(TestCase):
+    def setUp(self):
+        self.index = GeofenceIndex([NORTH, SOUTH])
+
+    def test_point_in_circle(self):
+        zone, distance, inside = self.index.resolve(36.7528, 3.0421)
+        self.assertEqual((zone.id, inside), (1, True))
+        self.assertLess(distance, 100)
+
+    def test_point_in_polygon(self):
+        zone, _, inside = self.index.resolve(36.7008, 3.0002)
+        self.assertEqual((zone.id, inside), (2, True))
+        _, _, inside = self.index.resolve(36.7015, 3.0002)
+        self.assertFalse(inside)
+
+    def test_outside_every_zone_reports_nearest(self):
+        zone, distance, inside = self.index.resolve(36.7600, 3.0420)
+        self.assertEqual((zone.id, inside), (1, False))
+        self.assertGreater(distance, 800)
+
+    def test_pinned_zone_only(self):
+        zone, _, inside = self.index.resolve(36.7528, 3.0421, zone_id=2)
+        self.assertEqual((zone.id, inside), (2, False))
+
+    def test_empty_index(self):
+        self.assertFalse(GeofenceIndex([]))
+        self.assertEqual(GeofenceIndex([]).resolve(36.75, 3.04), (None, None, False))
+
+
+class GeofenceScanTests(BaseQRTestCase):
+    def setUp(self):
+        super().setUp()
+        # L'index vit en mémoire du processus : ne pas le partager entre tests
+        invalidate_geofences()
+        self.addCleanup(invalidate_geofences)
+        self.campus = Campus.objects.create(nom_campus="Campus Nord")
+        self.batiment = Batiment.objects.create(
+            nom_batiment="Bloc A",
+            id_campus=self.campus,
+            latitude=36.7600,
+            longitude=3.0500,
+            rayon_metres=150,
+        )
+        self.client.login(email="stu_qr@example.com", password="pass1234")
+
+    def _scan(self, lat, lng):
+        token = self._create_token(verify_location=True)
+        prime_scan_context(token)
+        return self.client.post(
+            reverse("absences:qr_scan", kwargs={"token": token.token}),
+            {"latitude": lat, "longitude": lng, "gps_status": "accepted"},
+            secure=True,
+        )
+
+    def test_scan_inside_campus_zone_accepted(self):
+        # Loin du point unique de l'établissement (SystemSettings), mais dans le Bloc A
+        self.assertContains(self._scan(36.7601, 3.0501), "avec succ")
+
+    def test_scan_outside_zones_rejected(self):
+        resp = self._scan(36.75250, 3.04200)
+        self.assertContains(resp, "Bloc A (Campus Nord)")
+        self.assertFalse(QRScanRecord.objects.exists())
+        self.assertEqual(
+            QRScanLog.objects.get().scan_result, QRScanLog.ScanResult.REJECTED_DISTANCE
+        )
+
+    def test_course_pinned_to_other_building(self):
+        other = Batiment.objects.create(
+            nom_batiment="Bloc B",
+            id_campus=self.campus,
+            latitude=36.7700,
+            longitude=3.0600,
+            rayon_metres=150,
+        )
+        self.course.batiment = other
+        self.course.save()
+        self.assertContains(self._scan(36.7601, 3.0501), "Bloc B")
+        self.assertFalse(QRScanRecord.objects.exists())
+
+    def test_index_rebuilt_when_building_changes(self):
+        self.assertEqual(len(get_geofence_index().zones), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.batiment.actif = False
+            self.batiment.save()
+        self.assertFalse(get_geofence_index())
+        self.assertTrue(cache.get("geofence:version"))
@@ -0,0 +1,68 @@
+"""
+Tests for the QR scan load-test command (loadtest_qr_scan):
+- seeds a course, opens a QR session and scans it concurrently (in-process)
+- writes a JSON report with latency percentiles and queries per scan
+- removes the seeded data afterwards
+"""
+
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TransactionTestCase
+
+from apps.absences.management.commands.loadtest_qr_scan import percentile
+from apps.academic_sessions.models import AnneeAcademique
+from apps.academics.models import Cours
+from apps.accounts.models import User
+
+
+class LoadTestQRScanCommandTests(TransactionTestCase):
+    def test_requires_active_year(self):
+        with self.assertRaises(CommandError):
+            call_command("loadtest_qr_scan", "--students", "2", stdout=StringIO())
+
+    @skipIf(
+        connection.vendor == "sqlite",
+        "SQLite verrouille toute la base pendant une écriture : pas de scans concurrents",
+    )
+    def test_burst_report_written_and_data_removed(self):
+        AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        call_command(
+            "loadtest_qr_scan",
+            "--students",
+            "4",
+            "--concurrency",
+            "2",
+            "--output",
+            path,
+            stdout=StringIO(),
+        )
+
+        with open(path, encoding="utf-8") as fh:
+            report = json.load(fh)
+        self.assertEqual(report["mode"], "in-process")
+        self.assertEqual(report["scans"], 4)
+        self.assertEqual(report["scan_records"], 4)
+        self.assertEqual(report["http_status"], {"200": 4})
+        self.assertIsNotNone(report["latency_ms"]["p99"])
+        self.assertGreater(report["queries_per_scan"]["mean"], 0)
+        self.assertFalse(Cours.objects.filter(code_cours__startswith="LT-").exists())
+        self.assertFalse(
+            User.objects.filter(email__endswith="@loadtest.local").exists()
+        )
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 95))
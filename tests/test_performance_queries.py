@@ -1,14 +1,23 @@
-from datetime import date, time
+from datetime import date, time, timedelta
 
+from django.core import mail
+from django.core.cache import cache
 from django.db import connection
 from django.test import TestCase
 from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from apps.absences.models import Absence
+from apps.absences.models import (
+    Absence,
+    InscriptionAbsenceSummary,
+    QRAttendanceToken,
+    QRScanRecord,
+)
 from apps.academic_sessions.models import AnneeAcademique, Seance
 from apps.academics.models import Cours, Departement, Faculte
 from apps.accounts.models import User
+from apps.dashboard.models import SystemSettings
 from apps.enrollments.models import Inscription
 
 
@@ -237,3 +246,234 @@ class QueryBudgetTests(TestCase):
             secure=True,
         )
         self.assertEqual(response.status_code, 200)
+
+
+class MarkAbsenceQueryBudgetTests(TestCase):
+    """La saisie d'un appel coûte un nombre de requêtes indépendant de la classe."""
+
+    CLASS_SIZE = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        faculte = Faculte.objects.create(nom_faculte="Faculte Appel")
+        departement = Departement.objects.create(
+            nom_departement="Departement Appel", id_faculte=faculte
+        )
+        cls.annee = AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+        cls.professor = User.objects.create_user(
+            email="prof-appel@example.com",
+            nom="Professor",
+            prenom="Appel",
+            password="pass1234",
+            role=User.Role.PROFESSEUR,
+        )
+        cls.course = Cours.objects.create(
+            code_cours="AMPHI",
+            nom_cours="Amphi",
+            nombre_total_periodes=30,
+            id_departement=departement,
+            professeur=cls.professor,
+            id_annee=cls.annee,
+            niveau=1,
+        )
+        User.objects.bulk_create(
+            User(
+                email=f"student-appel-{idx}@example.com",
+                nom="Student",
+                prenom=f"Appel{idx}",
+                password="!",
+                role=User.Role.ETUDIANT,
+                niveau=1,
+            )
+            for idx in range(cls.CLASS_SIZE)
+        )
+        students = User.objects.filter(email__startswith="student-appel-").order_by(
+            "pk"
+        )
+        Inscription.objects.bulk_create(
+            Inscription(id_etudiant=student, id_cours=cls.course, id_annee=cls.annee)
+            for student in students
+        )
+        cls.inscription_ids = list(
+            Inscription.objects.filter(id_cours=cls.course)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def _post(self, absent_ids):
+        data = {
+            "date_seance": "2026-01-12",
+            "heure_debut": "08:00",
+            "heure_fin": "10:00",
+            "form_action": "draft",
+        }
+        for pk in self.inscription_ids:
+            data[f"status_{pk}"] = "ABSENT" if pk in absent_ids else "PRESENT"
+        with CaptureQueriesContext(connection) as captured:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("absences:mark_absence", args=[self.course.id_cours]),
+                    data,
+                    secure=True,
+                )
+        business_queries = [
+            q for q in captured.captured_queries if "django_session" not in q["sql"]
+        ]
+        return response, business_queries
+
+    def test_mark_absence_300_students_query_budget(self):
+        self.client.force_login(self.professor)
+        # Singleton des paramètres créé et mis en cache hors mesure
+        cache.clear()
+        SystemSettings.get_settings()
+
+        # Premier appel : la moitié de l'amphi est absente
+        absent = set(self.inscription_ids[::2])
+        response, queries = self._post(absent)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            Absence.objects.filter(id_seance__id_cours=self.course).count(), 150
+        )
+        # Emails envoyés après commit, dédupliqués en lot : inclus dans le budget
+        self.assertEqual(len(mail.outbox), 150)
+        # Dont le verrou des inscriptions avant le recalcul des résumés
+        self.assertLessEqual(
+            len(queries), 41, "\n".join(q["sql"][:200] for q in queries)
+        )
+
+        # Correction : un tiers passe présent, d'autres deviennent absents
+        absent = set(self.inscription_ids[::3])
+        response, queries = self._post(absent)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(
+                Absence.objects.filter(id_seance__id_cours=self.course).values_list(
+                    "id_inscription", flat=True
+                )
+            ),
+            absent,
+        )
+        # Seuls les nouveaux absents reçoivent un email
+        self.assertEqual(
+            len(mail.outbox), 150 + len(absent - set(self.inscription_ids[::2]))
+        )
+        self.assertLessEqual(
+            len(queries), 41, "\n".join(q["sql"][:200] for q in queries)
+        )
+
+
+class QRFinalizeQueryBudgetTests(TestCase):
+    """La finalisation QR d'un amphi coûte un nombre de requêtes constant."""
+
+    CLASS_SIZE = 400
+
+    @classmethod
+    def setUpTestData(cls):
+        faculte = Faculte.objects.create(nom_faculte="Faculte QR Amphi")
+        departement = Departement.objects.create(
+            nom_departement="Departement QR Amphi", id_faculte=faculte
+        )
+        cls.annee = AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+        cls.professor = User.objects.create_user(
+            email="prof-qr-amphi@example.com",
+            nom="Professor",
+            prenom="Amphi",
+            password="pass1234",
+            role=User.Role.PROFESSEUR,
+        )
+        cls.course = Cours.objects.create(
+            code_cours="QRAMPHI",
+            nom_cours="QR Amphi",
+            nombre_total_periodes=30,
+            id_departement=departement,
+            professeur=cls.professor,
+            id_annee=cls.annee,
+            niveau=1,
+        )
+        cls.seance = Seance.objects.create(
+            id_cours=cls.course,
+            date_seance=date(2026, 1, 12),
+            heure_debut=time(8, 0),
+            heure_fin=time(10, 0),
+            id_annee=cls.annee,
+        )
+        User.objects.bulk_create(
+            User(
+                email=f"student-qr-amphi-{idx}@example.com",
+                nom="Student",
+                prenom=f"Amphi{idx}",
+                password="!",
+                role=User.Role.ETUDIANT,
+                niveau=1,
+            )
+            for idx in range(cls.CLASS_SIZE)
+        )
+        students = User.objects.filter(email__startswith="student-qr-amphi-").order_by(
+            "pk"
+        )
+        Inscription.objects.bulk_create(
+            Inscription(id_etudiant=student, id_cours=cls.course, id_annee=cls.annee)
+            for student in students
+        )
+        cls.inscriptions = list(
+            Inscription.objects.filter(id_cours=cls.course).order_by("pk")
+        )
+        # Un quart de l'amphi a scanné le QR
+        QRScanRecord.objects.bulk_create(
+            QRScanRecord(
+                seance=cls.seance, student_id=ins.id_etudiant_id, inscription=ins
+            )
+            for ins in cls.inscriptions[::4]
+        )
+        cls.token = QRAttendanceToken.objects.create(
+            seance=cls.seance,
+            created_by=cls.professor,
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+
+    def test_qr_finalize_400_students_query_budget(self):
+        self.client.force_login(self.professor)
+        cache.clear()
+        SystemSettings.get_settings()
+        # Absence déjà saisie à la main : conservée, pas de doublon
+        manual = self.inscriptions[1]
+        Absence.objects.create(
+            id_inscription=manual,
+            id_seance=self.seance,
+            type_absence=Absence.TypeAbsence.ABSENT,
+            duree_absence=2,
+            statut=Absence.Statut.NON_JUSTIFIEE,
+            encodee_par=self.professor,
+            note_professeur="Saisie manuelle",
+        )
+
+        with CaptureQueriesContext(connection) as captured:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("absences:qr_finalize", args=[self.token.token]),
+                    secure=True,
+                )
+        queries = [
+            q for q in captured.captured_queries if "django_session" not in q["sql"]
+        ]
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Absence.objects.filter(id_seance=self.seance).count(), 300)
+        self.assertEqual(
+            Absence.objects.get(
+                id_inscription=manual, id_seance=self.seance
+            ).note_professeur,
+            "Saisie manuelle",
+        )
+        self.assertEqual(
+            InscriptionAbsenceSummary.objects.filter(
+                id_inscription__id_cours=self.course, nb_absences=1
+            ).count(),
+            300,
+        )
+        self.seance.refresh_from_db()
+        self.assertTrue(self.seance.validated)
+        # Dont le verrou des inscriptions avant le recalcul des résumés
+        self.assertLessEqual(
+            len(queries), 36, "\n".join(q["sql"][:200] for q in queries)
+        )
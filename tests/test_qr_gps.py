@@ -2,15 +2,21 @@
 Tests for QR code GPS enforcement, token expiration, and scan logging.
 """
 
+import json
 from datetime import date, time, timedelta
 from unittest.mock import patch
 
-from django.db import IntegrityError
-from django.test import TestCase, RequestFactory
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
+from apps.absences.live_feed import publish_scan_event
 from apps.absences.models import QRAttendanceToken, QRScanLog, QRScanRecord
+from apps.absences.qr_codes import current_window, window_code
+from apps.absences.qr_context import prime_scan_context
 from apps.absences.views import _haversine
 from apps.academic_sessions.models import AnneeAcademique, Seance
 from apps.academics.models import Cours, Departement, Faculte
@@ -21,6 +27,8 @@ from apps.enrollments.models import Inscription
 
 class BaseQRTestCase(TestCase):
     def setUp(self):
+        # Scan contexts, rosters and scanned markers live in the cache
+        cache.clear()
         self.faculte = Faculte.objects.create(nom_faculte="Faculte QR")
         self.departement = Departement.objects.create(
             nom_departement="Dept QR", id_faculte=self.faculte,
@@ -327,26 +335,49 @@ class DuplicateQRScanTest(BaseQRTestCase):
         ).first()
         self.assertIsNotNone(log)
 
-    def test_concurrent_duplicate_scan_handled_by_integrity_error(self):
+    def test_concurrent_duplicate_scan_derived_from_insert_result(self):
         """
-        Simulates a race condition: select_for_update check passes (no row yet)
-        but IntegrityError fires on create (concurrent insert between check and create).
+        Simulates a race condition: a concurrent request recorded the scan after
+        the cached checks passed. The conflicting INSERT returns no row and the
+        duplicate response is derived from it.
         """
         token = self._create_token(verify_location=False)
         self.client.login(email="stu_qr@example.com", password="pass1234")
         url = reverse("absences:qr_scan", kwargs={"token": token.token})
+        # Cached context first (no marker yet), then the concurrent insert
+        self.client.get(url, secure=True)
+        QRScanRecord.objects.create(
+            seance=self.seance, student=self.student, inscription=self.inscription,
+        )
 
-        # Patch create() to raise IntegrityError — simulates a concurrent insert
-        # that happened between the select_for_update check and the create call.
-        # No first scan needed: the checks will naturally return None.
-        with patch.object(
-            type(QRScanRecord.objects), "create",
-            side_effect=IntegrityError("UNIQUE constraint failed"),
-        ):
+        with CaptureQueriesContext(connection) as ctx:
             resp = self.client.post(url, {"gps_status": "not_required"}, secure=True)
 
         self.assertEqual(resp.status_code, 200)
         self.assertContains(resp, "déjà été enregistrée")
+        self.assertEqual(QRScanRecord.objects.filter(seance=self.seance).count(), 1)
+        inserts = [q["sql"] for q in ctx.captured_queries if "qr_scan_record" in q["sql"]]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn("ON CONFLICT", inserts[0])
+
+    def test_successful_scan_is_one_statement(self):
+        token = self._create_token(verify_location=False)
+        self.client.login(email="stu_qr@example.com", password="pass1234")
+        url = reverse("absences:qr_scan", kwargs={"token": token.token})
+        self.client.get(url, secure=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(url, {"gps_status": "not_required"}, secure=True)
+
+        self.assertContains(resp, "avec succ")
+        record = QRScanRecord.objects.get(seance=self.seance)
+        self.assertEqual(record.inscription, self.inscription)
+        self.assertIsNotNone(record.scanned_at)
+        sqls = [q["sql"] for q in ctx.captured_queries]
+        scan_sqls = [sql for sql in sqls if "qr_scan_record" in sql]
+        self.assertEqual(len(scan_sqls), 1)
+        # No lookup and no transaction round trip around the insert
+        self.assertFalse([sql for sql in sqls[:sqls.index(scan_sqls[0])] if "SAVEPOINT" in sql])
 
     def test_unique_constraint_on_scan_record(self):
         """DB-level unique_together on (seance, inscription) prevents duplicates."""
@@ -366,3 +397,301 @@ class DuplicateQRScanTest(BaseQRTestCase):
                 student=self.student,
                 inscription=self.inscription,
             )
+
+
+class QRImageEndpointTest(BaseQRTestCase):
+    """QR image served from its own cached URL instead of inline base64."""
+
+    def setUp(self):
+        super().setUp()
+        from apps.absences import qr_images
+
+        qr_images._lru.clear()
+        self.token = self._create_token()
+        self.client.login(email="prof_qr@example.com", password="pass1234")
+
+    def _url(self, fmt="svg"):
+        return reverse("absences:qr_image", kwargs={"token": self.token.token, "fmt": fmt})
+
+    def test_svg_served_with_etag_and_cache_control(self):
+        resp = self.client.get(self._url(), secure=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "image/svg+xml")
+        self.assertIn(b"<svg", resp.content)
+        self.assertTrue(resp["ETag"])
+        self.assertTrue(resp["Cache-Control"].startswith("private, max-age="))
+
+        png = self.client.get(self._url("png"), secure=True)
+        self.assertEqual(png["Content-Type"], "image/png")
+        self.assertTrue(png.content.startswith(b"\x89PNG"))
+
+    def test_revalidation_returns_304(self):
+        etag = self.client.get(self._url(), secure=True)["ETag"]
+        with patch("apps.absences.qr_images.render_qr") as mock_render:
+            resp = self.client.get(self._url(), HTTP_IF_NONE_MATCH=etag, secure=True)
+        self.assertEqual(resp.status_code, 304)
+        mock_render.assert_not_called()
+
+    def test_image_rendered_once(self):
+        from apps.absences import qr_images
+
+        with patch(
+            "apps.absences.qr_images.render_qr", wraps=qr_images.render_qr
+        ) as mock_render:
+            self.client.get(self._url(), secure=True)
+            self.client.get(self._url(), secure=True)
+        self.assertEqual(mock_render.call_count, 1)
+
+    def test_other_professor_forbidden(self):
+        User.objects.create_user(
+            email="other_prof_qr@example.com", nom="Other", prenom="QR",
+            password="pass1234", role=User.Role.PROFESSEUR,
+        )
+        self.client.login(email="other_prof_qr@example.com", password="pass1234")
+        self.assertEqual(self.client.get(self._url(), secure=True).status_code, 403)
+
+    def test_unknown_format_404(self):
+        self.assertEqual(self.client.get(self._url("gif"), secure=True).status_code, 404)
+
+    def test_dashboard_poll_has_no_inline_image(self):
+        url = reverse("absences:qr_dashboard", kwargs={"token": self.token.token})
+        page = self.client.get(url, secure=True)
+        self.assertContains(page, self._url())
+        self.assertNotContains(page, "data:image/png;base64")
+
+
+@override_settings(QR_LIVE_FEED_MAX_SECONDS=5, QR_LIVE_FEED_HEARTBEAT_SECONDS=1)
+class QRLiveFeedTest(BaseQRTestCase):
+    """New scans pushed to the dashboard over SSE instead of roster polling."""
+
+    def setUp(self):
+        super().setUp()
+        self.token = self._create_token()
+        self.url = reverse("absences:qr_live_feed", kwargs={"token": self.token.token})
+        User.objects.create_user(
+            email="other_live_qr@example.com", nom="Other", prenom="QR",
+            password="pass1234", role=User.Role.PROFESSEUR,
+        )
+
+    async def test_stream_sends_sync_then_scan_events(self):
+        await self.async_client.aforce_login(self.prof)
+        resp = await self.async_client.get(self.url, secure=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        self.assertEqual(resp["X-Accel-Buffering"], "no")
+
+        stream = aiter(resp.streaming_content)
+        first = await anext(stream)
+        self.assertIn(b"event: sync", first)
+
+        publish_scan_event(self.seance.id_seance, {"inscription": 42, "student": "QR Student"})
+        event = await anext(stream)
+        self.assertTrue(event.startswith(b"event: scan\n"))
+        self.assertEqual(
+            json.loads(event.split(b"data: ", 1)[1]),
+            {"inscription": 42, "student": "QR Student"},
+        )
+        await stream.aclose()
+
+    async def test_other_professor_forbidden(self):
+        other = await User.objects.aget(email="other_live_qr@example.com")
+        await self.async_client.aforce_login(other)
+        resp = await self.async_client.get(self.url, secure=True)
+        self.assertEqual(resp.status_code, 403)
+
+    def test_wsgi_request_tells_client_to_poll(self):
+        self.client.login(email="prof_qr@example.com", password="pass1234")
+        resp = self.client.get(self.url, secure=True)
+        self.assertEqual(resp.status_code, 204)
+
+    def test_scan_published_after_commit(self):
+        self.client.login(email="stu_qr@example.com", password="pass1234")
+        url = reverse("absences:qr_scan", kwargs={"token": self.token.token})
+        with patch("apps.absences.views.publish_scan_event") as mock_publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, {"gps_status": "not_required"}, secure=True)
+        mock_publish.assert_called_once()
+        seance_id, payload = mock_publish.call_args.args
+        self.assertEqual(seance_id, self.seance.id_seance)
+        self.assertEqual(payload["inscription"], self.inscription.id_inscription)
+        self.assertEqual(payload["student"], self.student.get_full_name())
+        self.assertFalse(payload["is_suspicious"])
+
+
+class QRScanContextCacheTest(BaseQRTestCase):
+    """qr_scan validates from the cached scan context; the DB only sees the writes."""
+
+    def setUp(self):
+        super().setUp()
+        self.token = self._create_token()
+        prime_scan_context(self.token)
+        self.client.login(email="stu_qr@example.com", password="pass1234")
+
+    def _scan(self, token=None):
+        url = reverse("absences:qr_scan", kwargs={"token": (token or self.token).token})
+        return self.client.post(url, {"gps_status": "not_required"}, secure=True)
+
+    def test_scan_reads_no_scan_tables(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self._scan()
+        self.assertContains(resp, "avec succ")
+        selects = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        for table in ("qr_attendance_token", "inscription", "qr_scan_record", "seance", "cours"):
+            self.assertFalse(
+                [sql for sql in selects if f'FROM "{table}"' in sql], table
+            )
+
+    def test_duplicate_answered_from_cache(self):
+        self._scan()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self._scan()
+        self.assertContains(resp, "déjà été enregistrée")
+        self.assertFalse(
+            [q for q in ctx.captured_queries if 'INSERT INTO "qr_scan_record"' in q["sql"]]
+        )
+
+    def test_refresh_invalidates_old_token(self):
+        self.client.login(email="prof_qr@example.com", password="pass1234")
+        self.client.post(
+            reverse("absences:qr_refresh_token", kwargs={"token": self.token.token}),
+            secure=True,
+        )
+        self.client.login(email="stu_qr@example.com", password="pass1234")
+        self.assertContains(self._scan(), "plus actif")
+        new_token = QRAttendanceToken.objects.get(seance=self.seance, is_active=True)
+        self.assertContains(self._scan(new_token), "avec succ")
+
+    def test_enrollment_change_invalidates_roster(self):
+        self.inscription.status = Inscription.Status.NON_VALIDE
+        self.inscription.save()
+        self.assertContains(self._scan(), "pas inscrit")
+        self.assertFalse(QRScanRecord.objects.exists())
+
+    def test_validated_seance_invalidates_context(self):
+        self.seance.validated = True
+        self.seance.save(update_fields=["validated"])
+        self.assertContains(self._scan(), "verrouillée")
+
+
+@override_settings(QR_STATELESS_CODES=True)
+class QRStatelessCodeTest(BaseQRTestCase):
+    """Time-windowed HMAC codes: rotation and validation without token rows."""
+
+    def setUp(self):
+        super().setUp()
+        self.token = self._create_token()
+        prime_scan_context(self.token)
+        self.client.login(email="stu_qr@example.com", password="pass1234")
+
+    def _scan(self, window, code=None):
+        url = reverse("absences:qr_scan_code", kwargs={
+            "seance_id": self.seance.id_seance,
+            "window": window,
+            "code": code or window_code(self.token.pk, self.seance.id_seance, window),
+        })
+        return self.client.post(url, {"gps_status": "not_required"}, secure=True)
+
+    def test_current_window_validated_without_token_lookup(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self._scan(current_window())
+        self.assertContains(resp, "avec succ")
+        self.assertFalse(
+            [q for q in ctx.captured_queries if 'FROM "qr_attendance_token"' in q["sql"]]
+        )
+        log = QRScanLog.objects.get()
+        self.assertTrue(log.qr_token_used.startswith("sha256:"))
+
+    def test_previous_window_accepted(self):
+        self.assertContains(self._scan(current_window() - 1), "avec succ")
+
+    def test_older_window_expired_and_logged(self):
+        resp = self._scan(current_window() - 2)
+        self.assertContains(resp, "expiré")
+        self.assertFalse(QRScanRecord.objects.exists())
+        self.assertEqual(
+            QRScanLog.objects.get().scan_result, QRScanLog.ScanResult.REJECTED_EXPIRED
+        )
+
+    def test_tampered_code_rejected(self):
+        resp = self._scan(current_window(), code="0" * 32)
+        self.assertEqual(resp.status_code, 404)
+        self.assertFalse(QRScanRecord.objects.exists())
+
+    def test_session_uuid_scan_rejected(self):
+        # L'UUID figure dans les URL du professeur : ce n'est pas un justificatif de scan
+        resp = self.client.post(
+            reverse("absences:qr_scan", kwargs={"token": self.token.token}),
+            {"gps_status": "not_required"},
+            secure=True,
+        )
+        self.assertEqual(resp.status_code, 404)
+        self.assertFalse(QRScanRecord.objects.exists())
+
+    def test_code_not_derived_from_session_uuid(self):
+        window = current_window()
+        self.assertNotEqual(
+            window_code(self.token.token, self.seance.id_seance, window),
+            window_code(self.token.pk, self.seance.id_seance, window),
+        )
+        resp = self._scan(window, code=window_code(self.token.token, self.seance.id_seance, window))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_refresh_keeps_session_token(self):
+        self.client.login(email="prof_qr@example.com", password="pass1234")
+        resp = self.client.post(
+            reverse("absences:qr_refresh_token", kwargs={"token": self.token.token}),
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            secure=True,
+        )
+        data = resp.json()
+        self.assertEqual(data["token"], str(self.token.token))
+        self.assertIn(f"/qr/c/{self.seance.id_seance}/{current_window()}/", data["scan_url"])
+        self.assertNotIn(str(self.token.token), data["scan_url"])
+        self.assertEqual(QRAttendanceToken.objects.count(), 1)
+
+
+class QRDashboardAnomalyTest(BaseQRTestCase):
+    """The dashboard's analyse action refreshes the anomaly flags; GET only shows them."""
+
+    def test_shared_device_shown_on_dashboard(self):
+        token = self._create_token()
+        other = User.objects.create_user(
+            email="stu_qr2@example.com", nom="Other", prenom="QR",
+            password="pass1234", role=User.Role.ETUDIANT,
+        )
+        other_inscription = Inscription.objects.create(
+            id_etudiant=other, id_cours=self.course,
+            id_annee=self.annee, status=Inscription.Status.EN_COURS,
+        )
+        for student, inscription in ((self.student, self.inscription), (other, other_inscription)):
+            QRScanRecord.objects.create(
+                seance=self.seance, student=student, inscription=inscription,
+                ip_address="10.0.0.9",
+            )
+            QRScanLog.objects.create(
+                etudiant=student, seance=self.seance, user_agent="Same phone",
+                gps_status=QRScanLog.GPSStatus.NOT_REQUIRED,
+                scan_result=QRScanLog.ScanResult.VALIDATED,
+            )
+        self.client.login(email="prof_qr@example.com", password="pass1234")
+        dashboard_url = reverse("absences:qr_dashboard", kwargs={"token": token.token})
+
+        # Un simple affichage ne recalcule rien
+        resp = self.client.get(dashboard_url, secure=True)
+        self.assertEqual(resp.context["suspicious_count"], 0)
+        self.assertFalse(QRScanRecord.objects.exclude(anomaly_flags=[]).exists())
+
+        resp = self.client.post(
+            reverse("absences:qr_analyse", kwargs={"token": token.token}), secure=True
+        )
+        self.assertRedirects(resp, dashboard_url, fetch_redirect_response=False)
+        resp = self.client.get(dashboard_url, secure=True)
+
+        self.assertContains(
+            resp, '<span class="badge bg-warning text-dark ms-1">Même appareil', count=2
+        )
+        self.assertEqual(resp.context["suspicious_count"], 2)
+        self.assertEqual(
+            list(QRScanRecord.objects.values_list("anomaly_flags", flat=True)),
+            [["shared_device"], ["shared_device"]],
+        )
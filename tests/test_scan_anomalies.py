@@ -0,0 +1,137 @@
+"""
+Tests for the batch QR scan anomaly analysis (apps.absences.scan_anomalies):
+- identical positions, shared devices and shared IPs are flagged
+- a campus-wide IP (NAT) and ordinary GPS spread are not
+- analyse_seances() writes the flags back and only updates what changed
+"""
+
+from datetime import date, time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.absences.models import QRScanLog, QRScanRecord
+from apps.absences.scan_anomalies import analyse_seances, detect_anomalies
+from apps.academic_sessions.models import AnneeAcademique, Seance
+from apps.academics.models import Cours, Departement, Faculte
+from apps.accounts.models import User
+from apps.enrollments.models import Inscription
+
+
+def _scan(i, lat=None, lng=None, ip=None, ua=""):
+    return {
+        "id": i,
+        "student_id": 100 + i,
+        "latitude": lat,
+        "longitude": lng,
+        "ip_address": ip,
+        "user_agent": ua,
+    }
+
+
+class DetectAnomaliesTests(TestCase):
+    def test_identical_positions_flagged(self):
+        scans = [_scan(i, 36.752500, 3.042000) for i in range(3)]
+        # Dispersion GPS ordinaire (~5-20 m)
+        scans += [
+            _scan(3 + i, 36.75250 + i * 0.00005, 3.04200 + i * 0.00007)
+            for i in range(1, 4)
+        ]
+        flags = detect_anomalies(scans)
+        self.assertEqual([flags[i] for i in range(3)], [["same_position"]] * 3)
+        self.assertEqual([flags[i] for i in range(4, 7)], [[], [], []])
+
+    def test_far_from_group_flagged(self):
+        scans = [_scan(i, 36.75250 + i * 0.00005, 3.04200) for i in range(5)]
+        scans.append(_scan(9, 36.76500, 3.04200))  # ~1,4 km
+        flags = detect_anomalies(scans)
+        self.assertEqual(flags[9], ["far_from_group"])
+        self.assertEqual(flags[0], [])
+
+    def test_shared_device_and_ip(self):
+        scans = [
+            _scan(0, ip="10.0.0.5", ua="Phone A"),
+            _scan(1, ip="10.0.0.5", ua="Phone A"),
+            _scan(2, ip="10.0.0.5", ua="Phone B"),
+        ]
+        scans += [_scan(3 + i, ip=f"10.0.1.{i}", ua="Phone") for i in range(4)]
+        flags = detect_anomalies(scans)
+        self.assertEqual(flags[0], ["shared_device", "shared_ip"])
+        self.assertEqual(flags[2], ["shared_ip"])
+        self.assertEqual(flags[3], [])
+
+    def test_campus_nat_not_flagged(self):
+        scans = [_scan(i, ip="193.0.0.1", ua=f"Phone {i}") for i in range(10)]
+        self.assertEqual(set(map(tuple, detect_anomalies(scans).values())), {()})
+
+
+class AnalyseSeancesTests(TestCase):
+    def setUp(self):
+        faculte = Faculte.objects.create(nom_faculte="Faculte Anomalies")
+        departement = Departement.objects.create(
+            nom_departement="Dept A", id_faculte=faculte
+        )
+        annee = AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+        course = Cours.objects.create(
+            code_cours="ANO101",
+            nom_cours="Anomalies",
+            id_departement=departement,
+            nombre_total_periodes=30,
+            niveau=1,
+            id_annee=annee,
+        )
+        self.seance = Seance.objects.create(
+            id_cours=course,
+            date_seance=date.today(),
+            heure_debut=time(8, 0),
+            heure_fin=time(10, 0),
+            id_annee=annee,
+        )
+        for i in range(3):
+            student = User.objects.create_user(
+                email=f"ano{i}@example.com",
+                nom="Ano",
+                prenom=str(i),
+                password="pass1234",
+                role=User.Role.ETUDIANT,
+            )
+            inscription = Inscription.objects.create(
+                id_etudiant=student,
+                id_cours=course,
+                id_annee=annee,
+                status=Inscription.Status.EN_COURS,
+            )
+            QRScanRecord.objects.create(
+                seance=self.seance,
+                student=student,
+                inscription=inscription,
+                latitude=36.7525,
+                longitude=3.042,
+                ip_address=f"10.0.0.{i}",
+            )
+            QRScanLog.objects.create(
+                etudiant=student,
+                seance=self.seance,
+                user_agent="Phone",
+                gps_status=QRScanLog.GPSStatus.ACCEPTED,
+                scan_result=QRScanLog.ScanResult.VALIDATED,
+            )
+
+    def test_flags_written_back_once(self):
+        stats = analyse_seances(Seance.objects.filter(pk=self.seance.pk))
+        self.assertEqual(stats, {"seances": 1, "scans": 3, "flagged": 3, "updated": 3})
+        self.assertEqual(
+            list(QRScanRecord.objects.values_list("anomaly_flags", flat=True)),
+            [["same_position"]] * 3,
+        )
+        # Rien n'a changé : aucune écriture
+        with self.assertNumQueries(2):
+            stats = analyse_seances(Seance.objects.filter(pk=self.seance.pk))
+        self.assertEqual(stats["updated"], 0)
+
+    def test_command_by_date(self):
+        out = StringIO()
+        call_command("analyse_qr_scans", "--date", date.today().isoformat(), stdout=out)
+        self.assertIn("Analysed 3 scans in 1 séances", out.getvalue())
+        self.assertTrue(QRScanRecord.objects.exclude(anomaly_flags=[]).exists())
@@ -0,0 +1,180 @@
+"""
+Tests for the QR scan log sink (apps.absences.scan_log):
+- the in-process buffer bulk-inserts entries and flushes what is pending on stop
+- attempt timestamps survive the deferred insert
+- a full buffer drops and counts entries
+- the redis sink falls back to a direct insert when Redis is unavailable
+- the drainer nulls keys of deleted rows instead of requeueing the batch,
+  and requeues it only on transient database errors
+"""
+
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.absences.models import QRScanLog
+from apps.absences.scan_log import (
+    REDIS_DROPPED_KEY,
+    REDIS_QUEUE_KEY,
+    _deserialize,
+    _ScanLogBuffer,
+    _serialize,
+    drain_scan_log_queue,
+    record_scan_log,
+)
+from apps.accounts.models import User
+
+
+def _entry(user, result=QRScanLog.ScanResult.VALIDATED, **kwargs):
+    return QRScanLog(
+        etudiant=user,
+        gps_status=QRScanLog.GPSStatus.NOT_REQUIRED,
+        scan_result=result,
+        qr_token_used="sha256:abc",
+        **kwargs,
+    )
+
+
+class ScanLogBufferTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="scanlog@example.com",
+            nom="Scan",
+            prenom="Log",
+            password="pass1234",
+            role=User.Role.ETUDIANT,
+        )
+
+    def test_entries_flushed_in_batches_and_on_stop(self):
+        buffer = _ScanLogBuffer(interval=30, flush_size=3, max_pending=100)
+        attempted_at = timezone.now() - timedelta(minutes=5)
+        for _ in range(4):
+            buffer.submit(_entry(self.user, timestamp=attempted_at))
+        buffer.stop()
+
+        self.assertEqual(QRScanLog.objects.count(), 4)
+        self.assertEqual(buffer.stats(), {"pending": 0, "flushed": 4, "dropped": 0})
+        # Heure de la tentative, pas celle de l'insertion
+        self.assertEqual(
+            set(QRScanLog.objects.values_list("timestamp", flat=True)), {attempted_at}
+        )
+
+    def test_full_buffer_drops_and_counts(self):
+        buffer = _ScanLogBuffer(interval=30, flush_size=100, max_pending=2)
+        buffer.stop()  # flusher arrêté : la file ne se vide plus
+        for _ in range(5):
+            buffer.submit(_entry(self.user))
+        self.assertEqual(buffer.stats()["pending"], 2)
+        self.assertEqual(buffer.stats()["dropped"], 3)
+
+
+class ScanLogDrainTests(TransactionTestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f"scanlog-drain-{idx}@example.com",
+                nom="Scan",
+                prenom="Drain",
+                password="pass1234",
+                role=User.Role.ETUDIANT,
+            )
+            for idx in range(2)
+        ]
+
+    def _client(self, raw_rows):
+        # File Redis simulée : le lot retiré par LRANGE + LTRIM
+        client = MagicMock()
+        client.pipeline.return_value.execute.return_value = [raw_rows, True]
+        return client
+
+    def test_entries_of_deleted_student_kept_without_key(self):
+        raw_rows = [_serialize(_entry(user)) for user in self.users]
+        self.users[0].delete()
+        client = self._client(raw_rows)
+
+        with patch("apps.absences.scan_log._redis", return_value=client):
+            with self.assertLogs("apps.absences.scan_log", "WARNING"):
+                self.assertEqual(drain_scan_log_queue(), 2)
+
+        self.assertEqual(
+            sorted(QRScanLog.objects.values_list("etudiant_id", flat=True), key=str),
+            sorted([None, self.users[1].pk], key=str),
+        )
+        client.lpush.assert_not_called()
+        client.incrby.assert_not_called()
+
+    def test_transient_error_requeues_batch(self):
+        raw_rows = [_serialize(_entry(user)) for user in self.users]
+        client = self._client(raw_rows)
+
+        with patch("apps.absences.scan_log._redis", return_value=client), patch.object(
+            QRScanLog.objects, "bulk_create", side_effect=OperationalError
+        ):
+            with self.assertRaises(OperationalError):
+                drain_scan_log_queue()
+
+        client.lpush.assert_called_once_with(REDIS_QUEUE_KEY, *reversed(raw_rows))
+        self.assertFalse(QRScanLog.objects.exists())
+        self.assertFalse(
+            any(
+                c.args[:1] == (REDIS_DROPPED_KEY,) for c in client.incrby.call_args_list
+            )
+        )
+
+
+class ScanLogSinkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="scanlog-sink@example.com",
+            nom="Scan",
+            prenom="Sink",
+            password="pass1234",
+            role=User.Role.ETUDIANT,
+        )
+
+    def test_sync_sink_inserts_immediately(self):
+        record_scan_log(_entry(self.user))
+        self.assertEqual(QRScanLog.objects.count(), 1)
+
+    @override_settings(QR_SCAN_LOG_SINK="memory")
+    def test_memory_sink_submits_to_buffer(self):
+        with patch("apps.absences.scan_log._get_buffer") as mock_buffer:
+            record_scan_log(_entry(self.user))
+        mock_buffer.return_value.submit.assert_called_once()
+        self.assertFalse(QRScanLog.objects.exists())
+
+    @override_settings(QR_SCAN_LOG_SINK="redis")
+    def test_redis_sink_falls_back_to_direct_insert(self):
+        with patch("apps.absences.scan_log._redis", side_effect=ConnectionError):
+            record_scan_log(_entry(self.user))
+        self.assertEqual(QRScanLog.objects.count(), 1)
+
+    def test_queue_serialization_round_trip(self):
+        entry = _entry(
+            self.user,
+            result=QRScanLog.ScanResult.REJECTED_DISTANCE,
+            latitude=36.75,
+            longitude=3.04,
+            distance_meters=250.0,
+            ip_address="10.0.0.1",
+        )
+        restored = _deserialize(_serialize(entry))
+        for field in (
+            "etudiant_id",
+            "scan_result",
+            "distance_meters",
+            "ip_address",
+            "timestamp",
+        ):
+            self.assertEqual(getattr(restored, field), getattr(entry, field))
+
+    def test_stats_command(self):
+        out = StringIO()
+        call_command("drain_qr_scan_log", "--stats", stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["sink"], "sync")
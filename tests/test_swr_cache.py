@@ -0,0 +1,65 @@
+"""
+Tests for the stale-while-revalidate helper (apps.swr_cache.swr_get):
+- fresh values are served without recomputing
+- a stale value is served while another worker holds the recompute lock
+- a missing key is computed once; the lock holder's value is awaited
+- a failing cache backend falls back to a direct computation
+"""
+
+import time
+import uuid
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.swr_cache import _lock_key, swr_get
+
+
+class SWRCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.key = f"test:swr:{uuid.uuid4().hex}"
+        self.calls = []
+
+    def compute(self):
+        self.calls.append(1)
+        return len(self.calls)
+
+    def test_fresh_value_is_reused(self):
+        self.assertEqual(swr_get(self.key, self.compute, 60, beta=0), 1)
+        self.assertEqual(swr_get(self.key, self.compute, 60, beta=0), 1)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_stale_value_served_while_locked(self):
+        cache.set(self.key, ("old", time.time() - 1, 0.1), 60)
+        cache.add(_lock_key(self.key), "other-worker", 30)
+        self.assertEqual(swr_get(self.key, self.compute, 60), "old")
+        self.assertEqual(self.calls, [])
+
+    def test_stale_value_recomputed_by_lock_holder(self):
+        cache.set(self.key, ("old", time.time() - 1, 0.1), 60)
+        self.assertEqual(swr_get(self.key, self.compute, 60), 1)
+        self.assertIsNone(cache.get(_lock_key(self.key)))
+        self.assertEqual(swr_get(self.key, self.compute, 60, beta=0), 1)
+
+    def test_early_refresh_near_expiry(self):
+        # Calcul d'une heure, échéance dans une seconde : recalcul anticipé certain
+        cache.set(self.key, ("old", time.time() + 1, 3600.0), 60)
+        with patch("apps.swr_cache.random.random", return_value=0.5):
+            self.assertEqual(swr_get(self.key, self.compute, 60), 1)
+
+    @override_settings(SWR_WAIT_SECONDS=1)
+    def test_missing_key_waits_for_lock_holder(self):
+        cache.add(_lock_key(self.key), "other-worker", 30)
+
+        def publish(_seconds):
+            cache.set(self.key, ("from-other-worker", time.time() + 60, 0.1), 60)
+
+        with patch("apps.swr_cache.time.sleep", side_effect=publish):
+            self.assertEqual(swr_get(self.key, self.compute, 60), "from-other-worker")
+        self.assertEqual(self.calls, [])
+
+    def test_cache_unavailable_computes_directly(self):
+        with patch("apps.swr_cache.cache.get", side_effect=ConnectionError):
+            self.assertEqual(swr_get(self.key, self.compute, 60), 1)
+            self.assertEqual(swr_get(self.key, self.compute, 60), 2)
@@ -0,0 +1,93 @@
+"""
+Tests for the in-process SystemSettings snapshot (SystemSettings.current()):
+- immutable values shared by the process
+- version checked at most once per request (request_started), reloaded
+  only when SystemSettings.save() has bumped it
+- threshold lookups in loops cost no query
+"""
+
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.test import TestCase
+
+from apps.absences.services import get_system_threshold
+from apps.academic_sessions.models import AnneeAcademique
+from apps.academics.models import Cours, Departement, Faculte
+from apps.accounts.models import User
+from apps.dashboard.models import (
+    SYSTEM_SETTINGS_VERSION_KEY,
+    SystemSettings,
+    SystemSettingsSnapshot,
+)
+
+
+class SystemSettingsSnapshotTests(TestCase):
+    def setUp(self):
+        settings = SystemSettings.get_settings()
+        settings.default_absence_threshold = 35
+        settings.save()
+
+    def test_snapshot_values_are_read_only(self):
+        snapshot = SystemSettings.current()
+        self.assertIsInstance(snapshot, SystemSettingsSnapshot)
+        self.assertEqual(snapshot.default_absence_threshold, 35)
+        with self.assertRaises(AttributeError):
+            snapshot.default_absence_threshold = 10
+
+    def test_version_checked_once_per_request(self):
+        snapshot = SystemSettings.current()
+        # Changement fait par un autre processus : visible à la requête suivante
+        SystemSettings.objects.filter(id=1).update(default_absence_threshold=20)
+        cache.delete("system_settings_singleton")
+        cache.incr(SYSTEM_SETTINGS_VERSION_KEY)
+        self.assertIs(SystemSettings.current(), snapshot)
+
+        request_started.send(sender=self.__class__)
+        self.assertEqual(SystemSettings.current().default_absence_threshold, 20)
+
+    def test_unchanged_version_keeps_snapshot(self):
+        snapshot = SystemSettings.current()
+        request_started.send(sender=self.__class__)
+        with self.assertNumQueries(0):
+            self.assertIs(SystemSettings.current(), snapshot)
+
+    def test_save_bumps_version(self):
+        self.assertEqual(get_system_threshold(), 35)
+        settings = SystemSettings.get_settings()
+        settings.default_absence_threshold = 50
+        settings.save()
+        self.assertEqual(get_system_threshold(), 50)
+
+
+class ThresholdLookupQueryTests(TestCase):
+    def test_course_thresholds_cost_no_query(self):
+        prof = User.objects.create_user(
+            email="prof_snap@example.com",
+            nom="P",
+            prenom="S",
+            password="pass1234",
+            role=User.Role.PROFESSEUR,
+        )
+        year = AnneeAcademique.objects.create(libelle="2025-2026", active=True)
+        dept = Departement.objects.create(
+            nom_departement="Info",
+            id_faculte=Faculte.objects.create(nom_faculte="Sciences"),
+        )
+        courses = [
+            Cours.objects.create(
+                code_cours=f"SNAP{i}",
+                nom_cours=f"Cours {i}",
+                nombre_total_periodes=30,
+                niveau=1,
+                id_departement=dept,
+                professeur=prof,
+                id_annee=year,
+            )
+            for i in range(5)
+        ]
+        courses[0].get_seuil_absence()
+        with self.assertNumQueries(0):
+            thresholds = {course.get_seuil_absence() for course in courses}
+        self.assertEqual(
+            thresholds, {SystemSettings.get_settings().default_absence_threshold}
+        )